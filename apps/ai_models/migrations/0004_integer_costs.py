@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:14
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+
+NANOS_PER_DOLLAR = 10 ** 9
+
+
+# 复制自 apps.ai_models.pricing 当时的实现，之后修改换算代码不会改变这个迁移的结果
+def dollars_to_nanos(value):
+    if value is None:
+        return 0
+    return int((Decimal(str(value)) * NANOS_PER_DOLLAR).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def fill_price_nanos(apps, schema_editor):
+    AIModel = apps.get_model('ai_models', 'AIModel')
+    for model in AIModel.objects.all():
+        model.input_price_nanos = dollars_to_nanos(model.input_price_per_1m)
+        model.output_price_nanos = dollars_to_nanos(model.output_price_per_1m)
+        model.save(update_fields=['input_price_nanos', 'output_price_nanos'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_models', '0003_fix_provider_cascade'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aimodel',
+            name='input_price_nanos',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='输入单价(纳美元/1M tokens)'),
+        ),
+        migrations.AddField(
+            model_name='aimodel',
+            name='output_price_nanos',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='输出单价(纳美元/1M tokens)'),
+        ),
+        migrations.RunPython(fill_price_nanos, migrations.RunPython.noop),
+    ]
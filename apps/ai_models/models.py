@@ -1,6 +1,8 @@
 from django.db import models
 from decimal import Decimal
 
+from .pricing import ModelPrice, dollars_to_nanos
+
 
 class AIModel(models.Model):
     """AI模型信息"""
@@ -30,6 +32,9 @@ class AIModel(models.Model):
         decimal_places=6,
         default=Decimal('0.000000')
     )
+    # 整数单价（纳美元/1M tokens），保存时由上面的价格换算，计费只使用整数单价
+    input_price_nanos = models.BigIntegerField('输入单价(纳美元/1M tokens)', default=0, editable=False)
+    output_price_nanos = models.BigIntegerField('输出单价(纳美元/1M tokens)', default=0, editable=False)
     
     # 技术参数
     context_length = models.IntegerField('上下文长度', default=4096)
@@ -79,11 +84,26 @@ class AIModel(models.Model):
         """完整模型名称"""
         return f"{self.provider.name}/{self.display_name}"
     
+    def sync_price_nanos(self):
+        """根据 $/1M tokens 价格刷新整数单价"""
+        self.input_price_nanos = dollars_to_nanos(self.input_price_per_1m)
+        self.output_price_nanos = dollars_to_nanos(self.output_price_per_1m)
+    
+    def save(self, *args, **kwargs):
+        self.sync_price_nanos()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'input_price_per_1m', 'output_price_per_1m'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'input_price_nanos', 'output_price_nanos'}
+        super().save(*args, **kwargs)
+    
+    @property
+    def pricing(self):
+        """整数计价单价"""
+        return ModelPrice.for_model(self)
+    
     def calculate_cost(self, input_tokens, output_tokens):
-        """计算调用成本"""
-        input_cost = (Decimal(input_tokens) / Decimal('1000000')) * self.input_price_per_1m
-        output_cost = (Decimal(output_tokens) / Decimal('1000000')) * self.output_price_per_1m
-        return input_cost + output_cost
+        """计算调用成本（美元）"""
+        return self.pricing.cost(input_tokens, output_tokens).total_cost
     
     @classmethod
     def create_from_api_data(cls, provider, api_data):
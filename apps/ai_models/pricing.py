@@ -0,0 +1,85 @@
+"""
+计价引擎
+
+成本以整数纳美元（1e-9 美元）计算和存储：模型价格预先换算为 纳美元/1M tokens 的整数，
+每次请求只做一次整数乘除（token 数 × 单价，按百万 tokens 四舍五入），
+结果写入 BigInteger 列，汇总时直接对整数求和。
+原有的 Decimal 成本字段由整数结果换算得到，保留给现有的接口和报表使用。
+"""
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_HALF_UP
+
+NANOS_PER_DOLLAR = 10 ** 9
+TOKENS_PER_PRICE_UNIT = 10 ** 6  # 价格按每1M tokens计
+COST_PLACES = Decimal('0.000001')
+
+
+def dollars_to_nanos(value):
+    """美元金额（Decimal/字符串/数字）换算为整数纳美元"""
+    if value is None:
+        return 0
+    return int((Decimal(str(value)) * NANOS_PER_DOLLAR).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def nanos_to_dollars(nanos, places=COST_PLACES):
+    """整数纳美元换算为美元 Decimal（默认保留6位小数）"""
+    return (Decimal(nanos or 0) / NANOS_PER_DOLLAR).quantize(places, rounding=ROUND_HALF_UP)
+
+
+def token_cost_nanos(tokens, price_nanos_per_1m):
+    """按 纳美元/1M tokens 的单价计算 tokens 的成本（纳美元，四舍五入）"""
+    return (int(tokens) * int(price_nanos_per_1m) + TOKENS_PER_PRICE_UNIT // 2) // TOKENS_PER_PRICE_UNIT
+
+
+@dataclass(frozen=True)
+class Cost:
+    """一次请求的成本（纳美元）"""
+    input_nanos: int
+    output_nanos: int
+
+    @property
+    def total_nanos(self):
+        return self.input_nanos + self.output_nanos
+
+    @property
+    def input_cost(self):
+        return nanos_to_dollars(self.input_nanos)
+
+    @property
+    def output_cost(self):
+        return nanos_to_dollars(self.output_nanos)
+
+    @property
+    def total_cost(self):
+        return nanos_to_dollars(self.total_nanos)
+
+    def as_fields(self):
+        """APIRequest 的成本字段"""
+        return {
+            'input_cost_nanos': self.input_nanos,
+            'output_cost_nanos': self.output_nanos,
+            'total_cost_nanos': self.total_nanos,
+            'input_cost': self.input_cost,
+            'output_cost': self.output_cost,
+            'total_cost': self.total_cost,
+        }
+
+
+@dataclass(frozen=True)
+class ModelPrice:
+    """模型单价（纳美元/1M tokens）"""
+    input_nanos_per_1m: int
+    output_nanos_per_1m: int
+
+    @classmethod
+    def for_model(cls, model):
+        return cls(model.input_price_nanos, model.output_price_nanos)
+
+    def cost(self, input_tokens, output_tokens):
+        return Cost(
+            token_cost_nanos(input_tokens, self.input_nanos_per_1m),
+            token_cost_nanos(output_tokens, self.output_nanos_per_1m),
+        )
+
+
+FREE = ModelPrice(0, 0)
@@ -0,0 +1,76 @@
+import pytest
+from decimal import Decimal
+from django.db.models import Sum
+from django.utils import timezone
+from apps.ai_models.pricing import ModelPrice, dollars_to_nanos, nanos_to_dollars, token_cost_nanos
+from apps.billing.closing import close_billing_period, month_period
+from apps.billing.factories import APIRequestFactory
+from apps.billing.models import APIRequest, BillingRecord
+from apps.quotas.factories import UserQuotaFactory
+
+pytestmark = pytest.mark.django_db
+
+
+class TestPricing:
+    def test_dollar_conversion_round_trips(self):
+        assert dollars_to_nanos(Decimal('2.500000')) == 2_500_000_000
+        assert dollars_to_nanos('0.000001') == 1000
+        assert nanos_to_dollars(2_500_000_000) == Decimal('2.500000')
+        assert nanos_to_dollars(1499) == Decimal('0.000001')
+        assert nanos_to_dollars(None) == Decimal('0.000000')
+
+    def test_token_cost_rounds_half_up(self):
+        # $0.00015/1M tokens，7 个 token = 1.05 纳美元
+        assert token_cost_nanos(7, dollars_to_nanos('0.00015')) == 1
+        assert token_cost_nanos(10, dollars_to_nanos('0.00015')) == 2
+        assert token_cost_nanos(1_000_000, dollars_to_nanos('30')) == 30 * 10 ** 9
+
+    def test_model_price_cost(self):
+        cost = ModelPrice(dollars_to_nanos('10'), dollars_to_nanos('30')).cost(1234, 567)
+        assert cost.input_nanos == 12_340_000
+        assert cost.output_nanos == 17_010_000
+        assert cost.total_cost == Decimal('0.029350')
+
+
+
+class TestModelPricing:
+    def test_save_syncs_integer_prices(self):
+        model = APIRequestFactory().model
+        model.input_price_per_1m = Decimal('2.500000')
+        model.save(update_fields=['input_price_per_1m'])
+
+        model.refresh_from_db()
+        assert model.input_price_nanos == 2_500_000_000
+        assert model.calculate_cost(1_000_000, 0) == Decimal('2.500000')
+
+    def test_request_cost_columns_stay_consistent(self):
+        api_request = APIRequestFactory(input_tokens=1000, output_tokens=1000)
+        api_request.refresh_from_db()
+        assert api_request.total_cost_nanos == api_request.input_cost_nanos + api_request.output_cost_nanos
+        assert nanos_to_dollars(api_request.total_cost_nanos) == api_request.total_cost
+
+        computed = APIRequest(model=api_request.model, input_tokens=100, output_tokens=10)
+        computed.calculate_cost()
+        assert computed.total_cost_nanos == 1_300_000
+        assert computed.total_cost == Decimal('0.001300')
+
+    def test_costs_beyond_old_column_range_round_trip(self):
+        # 5 亿输入 token × $75/1M = $37,500，超过原 DecimalField(10, 6) 的上限 $9,999.999999
+        quota = UserQuotaFactory()
+        api_request = APIRequestFactory(user=quota.user, model_group=quota.model_group, input_tokens=0, output_tokens=0)
+        api_request.set_cost(ModelPrice(dollars_to_nanos('75'), 0).cost(500_000_000, 0))
+        api_request.save()
+        period_start, period_end = month_period(timezone.localtime(api_request.created_at).strftime('%Y-%m'))
+        close_billing_period(period_start, period_end)
+
+        api_request.refresh_from_db()
+        record = BillingRecord.objects.get(quota=quota, period_start=period_start)
+        assert api_request.total_cost_nanos == 37_500 * 10 ** 9
+        assert api_request.total_cost == api_request.input_cost == Decimal('37500.000000')
+        assert record.total_cost == record.input_cost == Decimal('37500.000000')
+
+    def test_integer_sums_match_decimal_sums(self):
+        for tokens in (17, 333, 1001):
+            APIRequestFactory(input_tokens=tokens, output_tokens=tokens)
+        totals = APIRequest.objects.aggregate(nanos=Sum('total_cost_nanos'), dollars=Sum('total_cost'))
+        assert nanos_to_dollars(totals['nanos']) == Decimal(str(totals['dollars'])).quantize(Decimal('0.000001'))
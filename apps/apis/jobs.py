@@ -0,0 +1,18 @@
+"""API提供商相关的定时任务（由 apps.scheduler 调度）"""
+from apps.scheduler.registry import periodic_job
+
+from .sync import sync_all_providers
+
+
+@periodic_job('apis.sync_catalogs', interval=6 * 60 * 60, jitter=10 * 60)
+def sync_catalogs():
+    """同步所有启用的提供商的模型目录（跳过未变化的目录）"""
+    results = sync_all_providers()
+    return {
+        'providers': len(results),
+        'failed': sum(1 for result in results.values() if result.error),
+        'not_modified': sum(1 for result in results.values() if result.not_modified),
+        'created': sum(len(result.created) for result in results.values()),
+        'updated': sum(len(result.updated) for result in results.values()),
+        'deactivated': sum(len(result.deactivated) for result in results.values()),
+    }
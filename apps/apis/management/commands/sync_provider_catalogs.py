@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from apps.apis.models import APIProvider
+from apps.apis.sync import sync_all_providers
+
+
+class Command(BaseCommand):
+    help = '并发同步所有启用的API提供商的模型目录（未变化的目录会被跳过）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--provider-id', type=int, action='append', help='只同步指定的提供商（可重复）')
+        parser.add_argument('--force', action='store_true', help='忽略 ETag 和内容哈希，强制同步')
+        parser.add_argument('--keep-missing', action='store_true', help='保留目录中已不存在的模型（默认停用）')
+        parser.add_argument('--workers', type=int, default=None, help='同时获取目录的提供商数')
+        parser.add_argument('--timeout', type=int, default=None, help='每个提供商获取目录的超时时间(秒)')
+
+    def handle(self, *args, **options):
+        providers = APIProvider.objects.filter(is_active=True)
+        if options['provider_id']:
+            providers = providers.filter(id__in=options['provider_id'])
+
+        results = sync_all_providers(
+            providers,
+            force=options['force'],
+            deactivate_missing=not options['keep_missing'],
+            max_workers=options['workers'],
+            timeout=options['timeout'],
+        )
+
+        failed = 0
+        for provider, result in sorted(results.items(), key=lambda item: item[0].name):
+            if result.error:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'{provider.name}: 同步失败: {result.error}'))
+            elif result.not_modified:
+                self.stdout.write(f'{provider.name}: 目录未变化')
+            else:
+                self.stdout.write(
+                    f'{provider.name}: 新建 {len(result.created)}，更新 {len(result.updated)}，'
+                    f'停用 {len(result.deactivated)}，跳过 {len(result.skipped)}'
+                )
+
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(f'同步了 {len(results)} 个提供商，失败 {failed} 个'))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0002_apiprovider_description'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apiprovider',
+            name='catalog_etag',
+            field=models.CharField(blank=True, default='', max_length=200, verbose_name='目录ETag'),
+        ),
+        migrations.AddField(
+            model_name='apiprovider',
+            name='catalog_hash',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='目录内容哈希'),
+        ),
+    ]
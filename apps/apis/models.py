@@ -27,6 +27,10 @@ class APIProvider(models.Model):
     is_active = models.BooleanField('是否启用', default=True)
     last_sync_at = models.DateTimeField('最后同步时间', null=True, blank=True)
     
+    # 模型目录的版本（用于跳过未变化的目录）
+    catalog_etag = models.CharField('目录ETag', max_length=200, blank=True, default='')
+    catalog_hash = models.CharField('目录内容哈希', max_length=64, blank=True, default='')
+    
     # 时间戳
     created_at = models.DateTimeField('创建时间', auto_now_add=True)
     updated_at = models.DateTimeField('更新时间', auto_now=True)
@@ -63,30 +67,42 @@ class APIProvider(models.Model):
                 'error': str(e)
             }
     
-    def fetch_models(self):
-        """从API获取模型列表"""
+    def fetch_catalog(self, etag=None, timeout=None):
+        """
+        获取模型目录，返回 (模型列表, ETag)
+        传入 etag 时发送 If-None-Match，目录未变化（304）时模型列表为 None
+        """
+        headers = self.get_auth_headers()
+        if etag:
+            headers['If-None-Match'] = etag
         try:
-            headers = self.get_auth_headers()
             response = requests.get(
                 f"{self.base_url.rstrip('/')}/models",
                 headers=headers,
-                timeout=self.timeout
+                timeout=timeout or self.timeout
             )
-            
-            if response.status_code == 200:
-                data = response.json()
-                # 不同API提供商的模型数据结构可能不同
-                if 'data' in data:
-                    return data['data']  # OpenAI格式
-                elif isinstance(data, list):
-                    return data  # 直接列表格式
-                else:
-                    return [data]  # 单个对象
-            else:
-                raise Exception(f"API返回错误: {response.status_code}")
-                
         except Exception as e:
             raise Exception(f"获取模型失败: {str(e)}")
+        
+        if response.status_code == 304:
+            return None, etag
+        if response.status_code != 200:
+            raise Exception(f"获取模型失败: API返回错误: {response.status_code}")
+        
+        data = response.json()
+        # 不同API提供商的模型数据结构可能不同
+        if 'data' in data:
+            models_data = data['data']  # OpenAI格式
+        elif isinstance(data, list):
+            models_data = data  # 直接列表格式
+        else:
+            models_data = [data]  # 单个对象
+        return models_data, response.headers.get('ETag', '')
+    
+    def fetch_models(self):
+        """从API获取模型列表"""
+        models_data, _ = self.fetch_catalog()
+        return models_data
 
 
 class APIProviderLog(models.Model):
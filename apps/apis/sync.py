@@ -0,0 +1,304 @@
+"""
+模型目录同步
+
+从提供商的 /models 接口获取模型目录，在内存中与该提供商已有的 AIModel 逐字段比较，
+只写入有变化的模型：新模型用 bulk_create 插入（并发同步时按 (provider, name) 冲突改为更新），
+有变化的模型用 bulk_update 更新，目录中已不存在的模型停用。
+整个同步只需要固定数量的查询，不随模型数量增长。
+批量写入不触发 post_save 信号，写入后需要手动使模型目录缓存失效。
+
+同步全部提供商时并发获取目录，并记录目录的 ETag 和内容哈希：
+下次同步时发送 If-None-Match，返回 304 或内容哈希不变的目录直接跳过。
+"""
+import hashlib
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.ai_models.models import AIModel
+from apps.proxy.catalog import invalidate_model_catalog
+from .models import APIProvider, APIProviderLog
+
+logger = logging.getLogger(__name__)
+
+# 同步时从目录写入的字段（model_type 只在创建时按名称推断，不覆盖管理员的修改）
+SYNC_FIELDS = (
+    'display_name', 'description', 'input_price_per_1m', 'output_price_per_1m',
+    'context_length', 'capabilities', 'external_id', 'is_active',
+)
+# 写入时还需要更新的派生字段
+WRITE_FIELDS = list(SYNC_FIELDS) + ['input_price_nanos', 'output_price_nanos', 'last_updated_from_api', 'updated_at']
+PRICE_PLACES = Decimal('0.000001')
+MAX_PRICE = Decimal('9999.999999')
+BATCH_SIZE = 500
+
+
+@dataclass
+class SyncResult:
+    """一次同步的结果（模型名称列表）"""
+    created: list = field(default_factory=list)
+    updated: list = field(default_factory=list)
+    deactivated: list = field(default_factory=list)
+    skipped: list = field(default_factory=list)
+    unchanged: int = 0
+    not_modified: bool = False
+    error: str = ''
+
+    @property
+    def models_count(self):
+        return len(self.created) + len(self.updated) + self.unchanged
+
+    @property
+    def changed(self):
+        return bool(self.created or self.updated or self.deactivated)
+
+    def as_dict(self):
+        return {
+            'models_count': self.models_count,
+            'created': len(self.created),
+            'updated': len(self.updated),
+            'unchanged': self.unchanged,
+            'deactivated': len(self.deactivated),
+            'skipped': len(self.skipped),
+            'not_modified': self.not_modified,
+            'changes': {
+                'created': self.created,
+                'updated': self.updated,
+                'deactivated': self.deactivated,
+            },
+        }
+
+
+class CatalogEntryError(ValueError):
+    """目录中无法同步的模型"""
+
+
+def parse_price_per_1m(value):
+    """把每 token 价格（字符串或数字）换算为每 1M tokens 价格，负数（如自动路由的 -1）按 0 计"""
+    try:
+        price = Decimal(str(value or 0).replace('$', '').strip()) * 1_000_000
+    except InvalidOperation:
+        raise CatalogEntryError(f'无效的价格: {value}')
+    price = max(price, Decimal('0')).quantize(PRICE_PLACES, rounding=ROUND_HALF_UP)
+    if price > MAX_PRICE:
+        raise CatalogEntryError(f'价格超出范围: {value}')
+    return price
+
+
+def determine_model_type(model_id):
+    """根据模型名称推断模型类型"""
+    model_id = model_id.lower()
+    if 'embedding' in model_id or 'embed' in model_id:
+        return 'embedding'
+    if any(keyword in model_id for keyword in ('dall-e', 'midjourney', 'stable-diffusion')):
+        return 'image'
+    return 'chat'
+
+
+def parse_catalog_entry(data):
+    """把目录中的一个模型转换为 AIModel 字段，返回 (名称, 字段)"""
+    model_id = data.get('id')
+    if not model_id:
+        raise CatalogEntryError('缺少模型ID')
+    if len(model_id) > AIModel._meta.get_field('name').max_length:
+        raise CatalogEntryError(f'模型ID过长: {model_id}')
+
+    pricing = data.get('pricing') or {}
+
+    context_length = data.get('context_length') or (data.get('top_provider') or {}).get('context_length')
+
+    capabilities = []
+    architecture = data.get('architecture') or {}
+    if architecture:
+        capabilities = (architecture.get('input_modalities') or []) + (architecture.get('output_modalities') or [])
+
+    return model_id, {
+        'display_name': (data.get('name') or model_id)[:100],
+        'description': data.get('description') or '',
+        'input_price_per_1m': parse_price_per_1m(pricing.get('prompt')),
+        'output_price_per_1m': parse_price_per_1m(pricing.get('completion')),
+        'context_length': context_length or 4096,
+        'capabilities': capabilities,
+        'external_id': model_id[:200],
+        'is_active': True,
+    }
+
+
+def apply_catalog(provider, models_data, deactivate_missing=True, **versions):
+    """把获取到的模型目录与数据库比较并写入差异，返回 SyncResult；versions 为同时记录的目录 ETag/哈希"""
+    result = SyncResult()
+    existing = {model.name: model for model in AIModel.objects.filter(provider=provider)}
+    now = timezone.now()
+
+    fetched = {}
+    for data in models_data:
+        try:
+            name, fields = parse_catalog_entry(data)
+        except CatalogEntryError as e:
+            result.skipped.append(data.get('id') or '')
+            logger.warning(f"Skipped catalog entry of provider {provider.id}: {e}")
+            continue
+        fetched[name] = fields
+
+    to_create, to_update = [], []
+    for name, fields in fetched.items():
+        model = existing.get(name)
+        if model is None:
+            model = AIModel(provider=provider, name=name, model_type=determine_model_type(name),
+                            last_updated_from_api=now, **fields)
+            model.sync_price_nanos()
+            to_create.append(model)
+            result.created.append(name)
+        elif any(getattr(model, key) != value for key, value in fields.items()):
+            for key, value in fields.items():
+                setattr(model, key, value)
+            model.sync_price_nanos()
+            model.last_updated_from_api = now
+            model.updated_at = now
+            to_update.append(model)
+            result.updated.append(name)
+        else:
+            result.unchanged += 1
+
+    missing = []
+    if deactivate_missing:
+        missing = [model for name, model in existing.items() if name not in fetched and model.is_active]
+        result.deactivated = [model.name for model in missing]
+
+    with transaction.atomic():
+        if to_create:
+            AIModel.objects.bulk_create(
+                to_create,
+                batch_size=BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['provider', 'name'],
+                update_fields=WRITE_FIELDS,
+            )
+        if to_update:
+            AIModel.objects.bulk_update(to_update, WRITE_FIELDS, batch_size=BATCH_SIZE)
+        if missing:
+            AIModel.objects.filter(id__in=[model.id for model in missing]).update(is_active=False, updated_at=now)
+        provider.last_sync_at = now
+        for key, value in versions.items():
+            setattr(provider, key, value)
+        APIProvider.objects.filter(pk=provider.pk).update(last_sync_at=now, **versions)
+
+    if result.changed:
+        transaction.on_commit(invalidate_model_catalog)
+    return result
+
+
+def catalog_hash(models_data):
+    """目录内容的哈希（与字段顺序无关）"""
+    return hashlib.sha256(json.dumps(models_data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+@dataclass
+class FetchedCatalog:
+    """一次目录获取的结果；models 为 None 表示目录未变化（304）"""
+    models: list = None
+    etag: str = ''
+    response_time: float = 0
+    error: str = ''
+
+
+def fetch_provider_catalog(provider, conditional=False, timeout=None):
+    """获取提供商的模型目录（不访问数据库，可以在线程中执行），失败时记录在 error 中"""
+    start_time = time.time()
+    try:
+        models_data, etag = provider.fetch_catalog(
+            etag=provider.catalog_etag if conditional else None, timeout=timeout
+        )
+    except Exception as e:
+        return FetchedCatalog(response_time=time.time() - start_time, error=str(e))
+    return FetchedCatalog(models=models_data, etag=etag or '', response_time=time.time() - start_time)
+
+
+def apply_fetched_catalog(provider, fetched, conditional=False, deactivate_missing=True):
+    """
+    同步获取到的目录并写入一条提供商日志
+    conditional 时目录未变化（304 或内容哈希相同）则只更新同步时间
+    """
+    now = timezone.now()
+    if fetched.error:
+        APIProviderLog.objects.create(
+            provider=provider,
+            action='sync_models',
+            success=False,
+            response_time=fetched.response_time,
+            error_message=fetched.error,
+            details={'timestamp': now.isoformat()},
+        )
+        return SyncResult(error=fetched.error)
+
+    content_hash = catalog_hash(fetched.models) if fetched.models is not None else provider.catalog_hash
+    if fetched.models is None or (conditional and content_hash == provider.catalog_hash):
+        result = SyncResult(not_modified=True)
+        provider.last_sync_at = now
+        APIProvider.objects.filter(pk=provider.pk).update(last_sync_at=now, catalog_etag=fetched.etag)
+    else:
+        result = apply_catalog(provider, fetched.models, deactivate_missing=deactivate_missing,
+                               catalog_etag=fetched.etag, catalog_hash=content_hash)
+
+    APIProviderLog.objects.create(
+        provider=provider,
+        action='sync_models',
+        success=True,
+        response_time=fetched.response_time,
+        details={
+            'fetched': len(fetched.models) if fetched.models is not None else 0,
+            'not_modified': result.not_modified,
+            'created': len(result.created),
+            'updated': len(result.updated),
+            'deactivated': len(result.deactivated),
+            'skipped': len(result.skipped),
+            'timestamp': now.isoformat(),
+        },
+    )
+    return result
+
+
+def sync_provider_models(provider, deactivate_missing=True, conditional=False, timeout=None):
+    """获取提供商的模型目录并同步，获取失败时抛出异常；结果写入提供商日志"""
+    fetched = fetch_provider_catalog(provider, conditional=conditional, timeout=timeout)
+    result = apply_fetched_catalog(provider, fetched, conditional=conditional, deactivate_missing=deactivate_missing)
+    if result.error:
+        raise Exception(result.error)
+    return result
+
+
+def sync_all_providers(providers=None, force=False, deactivate_missing=True, max_workers=None, timeout=None):
+    """
+    并发获取所有启用的提供商的目录并依次同步，返回 {提供商: SyncResult}
+    获取在线程池中进行（每个提供商单独超时，慢的提供商不阻塞其他提供商），
+    数据库写入在调用线程中按获取完成的顺序执行；force 为 False 时跳过未变化的目录
+    """
+    if providers is None:
+        providers = APIProvider.objects.filter(is_active=True)
+    providers = list(providers)
+    if not providers:
+        return {}
+    max_workers = max_workers or settings.CATALOG_SYNC_WORKERS
+    timeout = timeout or settings.CATALOG_SYNC_TIMEOUT
+    conditional = not force
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(providers)), thread_name_prefix='catalog-sync') as executor:
+        futures = {
+            executor.submit(fetch_provider_catalog, provider, conditional, min(provider.timeout, timeout)): provider
+            for provider in providers
+        }
+        for future in as_completed(futures):
+            provider = futures[future]
+            results[provider] = apply_fetched_catalog(
+                provider, future.result(), conditional=conditional, deactivate_missing=deactivate_missing
+            )
+            logger.info(f"Synced catalog of provider {provider.id}: {results[provider].as_dict()}")
+    return results
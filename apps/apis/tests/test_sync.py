@@ -0,0 +1,236 @@
+import pytest
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from apps.ai_models.models import AIModel
+from apps.apis.models import APIProvider, APIProviderLog
+import requests
+from apps.apis.sync import apply_catalog, parse_price_per_1m, sync_all_providers, sync_provider_models
+from apps.users.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def catalog_entry(model_id, prompt='0.000001', completion='0.000002', **kwargs):
+    entry = {
+        'id': model_id,
+        'name': model_id.upper(),
+        'description': f'{model_id} model',
+        'pricing': {'prompt': prompt, 'completion': completion},
+        'context_length': 8192,
+        'architecture': {'input_modalities': ['text'], 'output_modalities': ['text']},
+    }
+    entry.update(kwargs)
+    return entry
+
+
+@pytest.fixture
+def provider():
+    return APIProvider.objects.create(name='OpenRouter', base_url='https://openrouter.ai/api/v1', api_key='key')
+
+
+@pytest.fixture
+def mock_catalog(mocker):
+    def mock(entries, status_code=200, etag=''):
+        response = mocker.Mock(status_code=status_code, headers={'ETag': etag} if etag else {})
+        response.json.return_value = {'data': entries}
+        return mocker.patch('requests.get', return_value=response)
+    return mock
+
+
+@pytest.fixture
+def mock_catalogs(mocker):
+    """按 base_url 返回不同的目录：{base_url: 模型列表、状态码或异常}"""
+    def mock(catalogs):
+        def get(url, headers=None, timeout=None):
+            catalog = catalogs[url.rsplit('/models', 1)[0]]
+            if isinstance(catalog, Exception):
+                raise catalog
+            if isinstance(catalog, int):
+                return mocker.Mock(status_code=catalog, headers={})
+            response = mocker.Mock(status_code=200, headers={})
+            response.json.return_value = {'data': catalog}
+            return response
+        return mocker.patch('requests.get', side_effect=get)
+    return mock
+
+
+class TestApplyCatalog:
+    def test_creates_models_with_per_1m_prices(self, provider):
+        result = apply_catalog(provider, [catalog_entry('a'), catalog_entry('b', prompt='-1', completion='-1')])
+
+        assert sorted(result.created) == ['a', 'b']
+        model = AIModel.objects.get(provider=provider, name='a')
+        assert model.input_price_per_1m == Decimal('1.000000')
+        assert model.output_price_per_1m == Decimal('2.000000')
+        assert model.input_price_nanos == 1_000_000_000
+        assert model.capabilities == ['text', 'text']
+        assert model.last_updated_from_api is not None
+        # 负价格按 0 计
+        assert AIModel.objects.get(provider=provider, name='b').input_price_per_1m == 0
+
+    def test_resync_writes_only_changes(self, provider, django_assert_max_num_queries):
+        entries = [catalog_entry(f'model-{index}') for index in range(50)]
+        apply_catalog(provider, entries)
+        untouched = AIModel.objects.get(provider=provider, name='model-1').updated_at
+
+        entries[0] = catalog_entry('model-0', prompt='0.000003')
+        with django_assert_max_num_queries(8):
+            result = apply_catalog(provider, entries)
+
+        assert result.updated == ['model-0']
+        assert result.unchanged == 49
+        assert not result.created
+        changed = AIModel.objects.get(provider=provider, name='model-0')
+        assert changed.input_price_per_1m == Decimal('3.000000')
+        assert changed.input_price_nanos == 3_000_000_000
+        assert AIModel.objects.get(provider=provider, name='model-1').updated_at == untouched
+
+    def test_bulk_writes_for_large_catalog(self, provider, django_assert_max_num_queries):
+        # SQLite 限制单条语句的参数个数，批量插入会被拆成多条；逐个创建需要 800 条以上
+        with django_assert_max_num_queries(20):
+            result = apply_catalog(provider, [catalog_entry(f'model-{index}') for index in range(400)])
+        assert len(result.created) == 400
+
+    def test_missing_models_are_deactivated(self, provider):
+        apply_catalog(provider, [catalog_entry('a'), catalog_entry('b')])
+
+        result = apply_catalog(provider, [catalog_entry('a')])
+
+        assert result.deactivated == ['b']
+        assert not AIModel.objects.get(provider=provider, name='b').is_active
+
+        result = apply_catalog(provider, [catalog_entry('a'), catalog_entry('b')])
+        assert result.updated == ['b']
+        assert AIModel.objects.get(provider=provider, name='b').is_active
+
+    def test_keep_missing(self, provider):
+        apply_catalog(provider, [catalog_entry('a'), catalog_entry('b')])
+
+        result = apply_catalog(provider, [catalog_entry('a')], deactivate_missing=False)
+
+        assert not result.deactivated
+        assert AIModel.objects.get(provider=provider, name='b').is_active
+
+    def test_invalid_entries_are_skipped(self, provider):
+        result = apply_catalog(provider, [catalog_entry('a'), catalog_entry('bad', prompt='n/a'), {'name': 'no id'}])
+
+        assert result.created == ['a']
+        assert len(result.skipped) == 2
+
+    def test_parse_price(self):
+        assert parse_price_per_1m('0.0000025') == Decimal('2.500000')
+        assert parse_price_per_1m(None) == 0
+
+
+class TestSyncEndpoints:
+    def test_admin_sync(self, api_client, provider, mock_catalog):
+        mock_catalog([catalog_entry('a'), catalog_entry('b')])
+        api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+
+        response = api_client.post(reverse('apiprovider-sync-models', args=[provider.id]))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['success']
+        assert response.data['created'] == 2
+        assert response.data['changes']['created'] == ['a', 'b']
+        assert APIProviderLog.objects.get(provider=provider).success
+        provider.refresh_from_db()
+        assert provider.last_sync_at is not None
+
+    def test_admin_sync_failure(self, api_client, provider, mock_catalog):
+        mock_catalog([], status_code=500)
+        api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+
+        response = api_client.post(reverse('apiprovider-sync-models', args=[provider.id]))
+
+        assert not response.data['success']
+        assert not APIProviderLog.objects.get(provider=provider).success
+
+    def test_command(self, provider, mock_catalog):
+        mock_catalog([catalog_entry('a')])
+        out = StringIO()
+
+        call_command('sync_openrouter_models', '--api-key', 'key', stdout=out)
+
+        assert '新创建: 1 个模型' in out.getvalue()
+        assert AIModel.objects.filter(provider=provider, name='a').exists()
+
+
+class TestSyncAllProviders:
+    @pytest.fixture
+    def providers(self):
+        return [
+            APIProvider.objects.create(name=f'Provider {index}', base_url=f'https://p{index}.test/v1', api_key='key')
+            for index in range(3)
+        ]
+
+    def test_syncs_all_and_isolates_failures(self, providers, mock_catalogs):
+        mock_catalogs({
+            'https://p0.test/v1': [catalog_entry('a')],
+            'https://p1.test/v1': requests.Timeout('timed out'),
+            'https://p2.test/v1': 500,
+        })
+
+        results = sync_all_providers()
+
+        assert results[providers[0]].created == ['a']
+        assert 'timed out' in results[providers[1]].error
+        assert results[providers[2]].error
+        # 每个提供商一条日志
+        assert APIProviderLog.objects.count() == 3
+        assert APIProviderLog.objects.get(provider=providers[0]).success
+        assert not APIProviderLog.objects.get(provider=providers[1]).success
+
+    def test_unchanged_catalog_is_skipped(self, providers, mock_catalogs):
+        mock_catalogs({provider.base_url: [catalog_entry('a')] for provider in providers})
+        sync_all_providers()
+
+        results = sync_all_providers()
+
+        assert all(result.not_modified for result in results.values())
+        assert APIProviderLog.objects.filter(details__not_modified=True).count() == 3
+
+        results = sync_all_providers(force=True)
+        assert not any(result.not_modified for result in results.values())
+
+    def test_not_modified_response(self, provider, mock_catalog):
+        mock_catalog([catalog_entry('a')], etag='"v1"')
+        sync_provider_models(provider)
+        provider.refresh_from_db()
+        assert provider.catalog_etag == '"v1"'
+
+        get = mock_catalog([], status_code=304)
+        result = sync_provider_models(provider, conditional=True)
+
+        assert result.not_modified
+        assert get.call_args.kwargs['headers']['If-None-Match'] == '"v1"'
+        assert AIModel.objects.get(provider=provider, name='a').is_active
+
+    def test_timeout_is_capped(self, providers, mock_catalogs, settings):
+        settings.CATALOG_SYNC_TIMEOUT = 5
+        get = mock_catalogs({provider.base_url: [] for provider in providers})
+
+        sync_all_providers()
+
+        assert {call.kwargs['timeout'] for call in get.call_args_list} == {5}
+
+    def test_admin_sync_all(self, api_client, providers, mock_catalogs):
+        mock_catalogs({provider.base_url: [catalog_entry('a')] for provider in providers})
+        api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+
+        response = api_client.post(reverse('apiprovider-sync-all'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['success']
+        assert [entry['created'] for entry in response.data['providers']] == [1, 1, 1]
+
+    def test_command(self, providers, mock_catalogs):
+        mock_catalogs({provider.base_url: [catalog_entry('a')] for provider in providers})
+        out = StringIO()
+
+        call_command('sync_provider_catalogs', stdout=out)
+
+        assert '同步了 3 个提供商，失败 0 个' in out.getvalue()
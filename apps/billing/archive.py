@@ -0,0 +1,263 @@
+"""
+审计记录冷归档
+
+把早于截止日期的 APIRequest 按 月份×用户 写入本地 Parquet 文件（默认 zstd 压缩），
+文件写完后回读校验记录ID和成本合计，确认无误后才在同一事务中登记 ArchiveSegment 并删除数据库中的记录。
+只归档已被使用量汇总处理过的记录（ID 不超过汇总水位线），汇总表中的统计数据不受影响。
+
+读取时按 ArchiveSegment 清单筛选出涉及的文件再逐批读取，
+统计和导出在查询范围覆盖已归档时间段时自动合并归档数据。
+需要安装 pyarrow；没有归档文件时不会导入。
+"""
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .export import COLUMN_FIELDS, PAYLOAD_COLUMNS
+from .models import APIRequest, ArchiveSegment, ProcessingWatermark
+from .rollups import ROLLUP_WATERMARK
+
+logger = logging.getLogger(__name__)
+
+# 归档列：导出列之外额外保存提供商ID，供按提供商统计
+ARCHIVE_FIELDS = dict(COLUMN_FIELDS, provider_id='model__provider_id')
+
+# 筛选维度 -> 归档列
+FILTER_COLUMNS = {
+    'user': 'user_id',
+    'model': 'model_id',
+    'provider': 'provider_id',
+    'model_group': 'model_group_id',
+}
+
+
+class ArchiveError(Exception):
+    """归档错误"""
+
+
+@dataclass
+class ArchiveResult:
+    """一次归档运行的结果"""
+    rows: int = 0
+    segments: int = 0
+    bytes: int = 0
+
+
+def load_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+    except ImportError:
+        raise ArchiveError('冷归档需要安装 pyarrow（pip install pyarrow）')
+    return pyarrow
+
+
+def archive_schema(pa):
+    integer_columns = {
+        'id', 'user_id', 'model_id', 'provider_id', 'model_group_id',
+        'input_tokens', 'output_tokens', 'total_tokens', 'status_code', 'duration_ms',
+    }
+    fields = []
+    for column in ARCHIVE_FIELDS:
+        if column in integer_columns:
+            column_type = pa.int64()
+        elif column == 'created_at':
+            column_type = pa.timestamp('us', tz='UTC')
+        elif column.endswith('_cost'):
+            # 与数据库中成本列的精度一致
+            cost_field = APIRequest._meta.get_field('total_cost')
+            column_type = pa.decimal128(cost_field.max_digits, cost_field.decimal_places)
+        else:
+            column_type = pa.string()
+        fields.append(pa.field(column, column_type))
+    return pa.schema(fields)
+
+
+def archive_dir(base=None):
+    return Path(base or settings.AUDIT_ARCHIVE_DIR)
+
+
+def segment_path(month, user_id, min_id, max_id):
+    return f"month={month:%Y-%m}/user={user_id}/part-{min_id:012d}-{max_id:012d}.parquet"
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def _local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+
+
+def _to_record(row):
+    record = dict(zip(ARCHIVE_FIELDS, row))
+    record['request_id'] = str(record['request_id'])
+    record['ip_address'] = str(record['ip_address']) if record['ip_address'] is not None else None
+    for column in PAYLOAD_COLUMNS:
+        record[column] = json.dumps(record[column], cls=DjangoJSONEncoder, ensure_ascii=False)
+    return record
+
+
+def _file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_segment(pa, records, month, user_id, base):
+    """写入一个归档文件并回读校验，返回清单字段"""
+    ids = [record['id'] for record in records]
+    total_cost = sum((record['total_cost'] for record in records), Decimal('0'))
+    relative = segment_path(month, user_id, ids[0], ids[-1])
+    target = base / relative
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    temporary = target.with_suffix('.parquet.tmp')
+    table = pa.Table.from_pylist(records, schema=archive_schema(pa))
+    pa.parquet.write_table(table, temporary, compression=settings.AUDIT_ARCHIVE_COMPRESSION)
+    with open(temporary, 'rb') as handle:
+        os.fsync(handle.fileno())
+    os.replace(temporary, target)
+
+    check = pa.parquet.read_table(target, columns=['id', 'total_cost'])
+    if check.column('id').to_pylist() != ids:
+        raise ArchiveError(f'归档文件校验失败（记录ID不一致）: {relative}')
+    if sum(check.column('total_cost').to_pylist(), Decimal('0')) != total_cost:
+        raise ArchiveError(f'归档文件校验失败（成本合计不一致）: {relative}')
+
+    return {
+        'path': relative,
+        'row_count': len(records),
+        'min_id': ids[0],
+        'max_id': ids[-1],
+        'first_created_at': min(record['created_at'] for record in records),
+        'last_created_at': max(record['created_at'] for record in records),
+        'total_cost': total_cost,
+        'size_bytes': target.stat().st_size,
+        'checksum': _file_checksum(target),
+    }
+
+
+def archive_requests(before, batch_size=50000, base_dir=None, max_segments=None):
+    """
+    归档 created_at 早于 before（本地日期零点）的请求记录
+    每个文件最多 batch_size 条记录；max_segments 限制本次写入的文件数
+    """
+    pa = load_pyarrow()
+    base = archive_dir(base_dir)
+    cutoff = _local_midnight(before)
+    watermark = ProcessingWatermark.current(ROLLUP_WATERMARK)
+    candidates = APIRequest.objects.filter(created_at__lt=cutoff, id__lte=watermark)
+    result = ArchiveResult()
+
+    first = candidates.aggregate(first=Min('created_at'))['first']
+    if first is None:
+        return result
+
+    month = _month_start(timezone.localtime(first).date())
+    while month < before:
+        month_rows = candidates.filter(
+            created_at__gte=_local_midnight(month),
+            created_at__lt=min(_local_midnight(_next_month(month)), cutoff),
+        )
+        user_ids = list(month_rows.order_by().values_list('user_id', flat=True).distinct())
+        for user_id in sorted(user_ids):
+            user_rows = month_rows.filter(user_id=user_id).order_by('id')
+            last_id = 0
+            while True:
+                if max_segments is not None and result.segments >= max_segments:
+                    return result
+                rows = list(user_rows.filter(id__gt=last_id).values_list(*ARCHIVE_FIELDS.values())[:batch_size])
+                if not rows:
+                    break
+                records = [_to_record(row) for row in rows]
+                segment = _write_segment(pa, records, month, user_id, base)
+
+                with transaction.atomic():
+                    ArchiveSegment.objects.update_or_create(
+                        path=segment['path'],
+                        defaults=dict(segment, month=month, user_id=user_id)
+                    )
+                    deleted, _ = user_rows.filter(id__gte=segment['min_id'], id__lte=segment['max_id']).delete()
+                    if deleted != segment['row_count']:
+                        raise ArchiveError(
+                            f"删除的记录数({deleted})与归档记录数({segment['row_count']})不一致: {segment['path']}"
+                        )
+
+                last_id = segment['max_id']
+                result.rows += segment['row_count']
+                result.segments += 1
+                result.bytes += segment['size_bytes']
+                logger.info(f"Archived {segment['row_count']} requests to {segment['path']}")
+        month = _next_month(month)
+
+    return result
+
+
+def archived_segments(start=None, end=None, user=None):
+    """与时间范围 [start, end) 重叠的归档文件"""
+    segments = ArchiveSegment.objects.all()
+    if start is not None:
+        segments = segments.filter(last_created_at__gte=start)
+    if end is not None:
+        segments = segments.filter(first_created_at__lt=end)
+    if user is not None:
+        segments = segments.filter(user_id=user)
+    return segments.order_by('first_created_at', 'min_id')
+
+
+def iter_archived_rows(columns, start=None, end=None, filters=None, base_dir=None, batch_size=10000):
+    """
+    逐行读取归档记录，返回按 columns 排列的元组
+    filters 为 {维度: ID}，维度为 user/model/provider/model_group
+    """
+    filters = filters or {}
+    segments = list(archived_segments(start, end, filters.get('user')))
+    if not segments:
+        return
+
+    pa = load_pyarrow()
+    compute = pa.compute
+    timestamp_type = pa.timestamp('us', tz='UTC')
+    base = archive_dir(base_dir)
+    read_columns = list(dict.fromkeys(list(columns) + ['created_at'] + [FILTER_COLUMNS[name] for name in filters]))
+
+    for segment in segments:
+        parquet_file = pa.parquet.ParquetFile(base / segment.path)
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=read_columns):
+            mask = None
+            conditions = []
+            if start is not None:
+                conditions.append(compute.greater_equal(batch.column('created_at'), pa.scalar(start, timestamp_type)))
+            if end is not None:
+                conditions.append(compute.less(batch.column('created_at'), pa.scalar(end, timestamp_type)))
+            for name, value in filters.items():
+                conditions.append(compute.equal(batch.column(FILTER_COLUMNS[name]), pa.scalar(value, pa.int64())))
+            for condition in conditions:
+                mask = condition if mask is None else compute.and_(mask, condition)
+            if mask is not None:
+                batch = batch.filter(mask)
+
+            for record in batch.to_pylist():
+                yield tuple(
+                    json.loads(record[column]) if column in PAYLOAD_COLUMNS else record[column]
+                    for column in columns
+                )
@@ -0,0 +1,185 @@
+"""
+计费周期结算
+
+对计费周期内所有有效配额一次性生成/更新 BillingRecord：
+按配额ID分块，每块用一条分组聚合查询（带条件计数）统计 api_requests，
+再批量写入计费记录。每块单独提交并推进水位线，中断后可以从上次位置继续。
+配额在周期内有已冷归档或已删除的请求记录时跳过该配额、保留原有计费记录，避免用不完整的数据覆盖。
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime, date
+
+from django.db import transaction
+from django.db.models import Count, Sum, Q
+from django.utils import timezone
+
+from apps.ai_models.pricing import nanos_to_dollars
+from apps.quotas.models import UserQuota
+from .models import APIRequest, BillingRecord, ProcessingWatermark
+from .rollups import removed_scopes, removed_requests_until
+
+logger = logging.getLogger(__name__)
+
+# 已支付或已取消的记录不再重新计算
+FINAL_STATUSES = ('paid', 'cancelled')
+
+STATISTIC_FIELDS = [
+    'total_requests', 'successful_requests', 'failed_requests',
+    'total_tokens', 'total_input_tokens', 'total_output_tokens',
+    'total_cost', 'input_cost', 'output_cost', 'status', 'period_end',
+]
+
+BILLING_AGGREGATES = {
+    'total_requests': Count('id'),
+    'successful_requests': Count('id', filter=Q(status_code__range=[200, 299])),
+    'total_tokens': Sum('total_tokens'),
+    'total_input_tokens': Sum('input_tokens'),
+    'total_output_tokens': Sum('output_tokens'),
+    # 成本按整数纳美元求和，换算为美元时只舍入一次
+    'total_cost': Sum('total_cost_nanos'),
+    'input_cost': Sum('input_cost_nanos'),
+    'output_cost': Sum('output_cost_nanos'),
+}
+
+
+@dataclass
+class BillingCloseResult:
+    """一次结算运行的结果"""
+    quotas: int = 0
+    chunks: int = 0
+    skipped: int = 0
+    # 有请求记录已归档或已删除、未重新计算的配额数
+    protected: int = 0
+    last_quota_id: int = 0
+    finished: bool = False
+
+
+def billing_statistics(stats):
+    """把聚合结果转换为计费记录字段"""
+    stats = stats or {}
+    total_requests = stats.get('total_requests') or 0
+    successful_requests = stats.get('successful_requests') or 0
+    return {
+        'total_requests': total_requests,
+        'successful_requests': successful_requests,
+        'failed_requests': total_requests - successful_requests,
+        'total_tokens': stats.get('total_tokens') or 0,
+        'total_input_tokens': stats.get('total_input_tokens') or 0,
+        'total_output_tokens': stats.get('total_output_tokens') or 0,
+        'total_cost': nanos_to_dollars(stats.get('total_cost')),
+        'input_cost': nanos_to_dollars(stats.get('input_cost')),
+        'output_cost': nanos_to_dollars(stats.get('output_cost')),
+        'status': 'calculated',
+    }
+
+
+def period_requests(period_start, period_end):
+    """计费周期 [period_start, period_end) 内的请求"""
+    return APIRequest.objects.filter(created_at__gte=period_start, created_at__lt=period_end)
+
+
+def month_period(value):
+    """把 YYYY-MM 解析为计费周期 (本月一日零点, 下月一日零点)，本地时区"""
+    try:
+        year, month = (int(part) for part in value.split('-'))
+        first_day = date(year, month, 1)
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError(f'无效的月份: {value}，应为 YYYY-MM 格式')
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(first_day, datetime.min.time()), tz),
+        timezone.make_aware(datetime.combine(next_month, datetime.min.time()), tz),
+    )
+
+
+def watermark_name(period_start):
+    return f'billing_close:{period_start.isoformat()}'
+
+
+def close_billing_period(period_start, period_end, chunk_size=1000, resume=False, max_chunks=None):
+    """
+    结算计费周期
+    配额的请求口径与 UserQuota.get_all_requests 一致（同一用户同一模型组）
+    """
+    result = BillingCloseResult()
+    scopes = removed_scopes()
+    name = watermark_name(period_start)
+
+    start_after = 0
+    if resume:
+        start_after = ProcessingWatermark.current(name)
+    result.last_quota_id = start_after
+
+    quotas = UserQuota.objects.filter(is_active=True, deleted_at__isnull=True).order_by('id')
+
+    while max_chunks is None or result.chunks < max_chunks:
+        chunk = list(
+            quotas.filter(id__gt=result.last_quota_id).values('id', 'user_id', 'model_group_id')[:chunk_size]
+        )
+        if not chunk:
+            result.finished = True
+            break
+
+        with transaction.atomic():
+            skipped, protected = _close_chunk(chunk, period_start, period_end, scopes)
+            result.skipped += skipped
+            result.protected += protected
+            result.last_quota_id = chunk[-1]['id']
+            ProcessingWatermark.objects.update_or_create(
+                name=name,
+                defaults={'last_id': result.last_quota_id, 'details': {'period_end': period_end.isoformat()}}
+            )
+
+        result.quotas += len(chunk)
+        result.chunks += 1
+        logger.info(f"Billing close {period_start.date()}: processed quotas up to id {result.last_quota_id}")
+
+    return result
+
+
+def _close_chunk(chunk, period_start, period_end, scopes):
+    """结算一批配额，返回 (已结清跳过的配额数, 有记录已归档或删除而跳过的配额数)"""
+    quota_ids = [quota['id'] for quota in chunk]
+    protected_ids = set()
+    for quota in chunk:
+        removed = removed_requests_until({quota['user_id']}, {quota['model_group_id']}, scopes)
+        if removed is not None and removed >= period_start:
+            protected_ids.add(quota['id'])
+    final_ids = set(
+        BillingRecord.objects.filter(
+            quota_id__in=quota_ids,
+            period_start=period_start,
+            status__in=FINAL_STATUSES,
+        ).values_list('quota_id', flat=True)
+    )
+
+    stats_by_pair = {
+        (row['user_id'], row['model_group_id']): row
+        for row in period_requests(period_start, period_end).filter(
+            user_id__in={quota['user_id'] for quota in chunk},
+            model_group_id__in={quota['model_group_id'] for quota in chunk},
+        ).order_by().values('user_id', 'model_group_id').annotate(**BILLING_AGGREGATES)
+    }
+
+    records = []
+    for quota in chunk:
+        if quota['id'] in final_ids or quota['id'] in protected_ids:
+            continue
+        stats = billing_statistics(stats_by_pair.get((quota['user_id'], quota['model_group_id'])))
+        records.append(BillingRecord(
+            user_id=quota['user_id'],
+            quota_id=quota['id'],
+            period_start=period_start,
+            period_end=period_end,
+            **stats
+        ))
+
+    BillingRecord.objects.bulk_create(
+        records,
+        update_conflicts=True,
+        unique_fields=['user', 'quota', 'period_start'],
+        update_fields=STATISTIC_FIELDS,
+    )
+    return len(final_ids), len(protected_ids - final_ids)
@@ -0,0 +1,107 @@
+"""
+成本警告评估
+
+定时按 CostAlertRule 检查各配额在当前小时/当天的花费：花费从使用量汇总（ModelGroupUsageLog）读取，
+每个周期一条分组聚合查询覆盖所有规则，不扫描 api_requests，也不在请求路径上执行。
+每个规则每个周期最多产生一条 CostAlert（唯一约束保证重复评估不会重复告警）。
+花费以汇总进度为准，汇总任务的延迟即告警的延迟。
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime, time
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from apps.groups.models import ModelGroupUsageLog
+from .models import CostAlert, CostAlertRule
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CostAlertResult:
+    """一次评估的结果"""
+    rules: int = 0
+    alerts: int = 0
+
+
+def period_bounds(period, now):
+    """规则周期对应的 (日期, 小时, 周期开始时间)，按日统计时小时为 None"""
+    local = timezone.localtime(now)
+    if period == 'hour':
+        start = local.replace(minute=0, second=0, microsecond=0)
+        return local.date(), local.hour, start
+    start = timezone.make_aware(datetime.combine(local.date(), time.min), timezone.get_current_timezone())
+    return local.date(), None, start
+
+
+def period_spend(rules, period, now):
+    """当前周期内 (模型组, 用户, 模型) 的花费"""
+    day, hour, _ = period_bounds(period, now)
+    logs = ModelGroupUsageLog.objects.filter(
+        date=day,
+        group_id__in={rule.quota.model_group_id for rule in rules},
+        user_id__in={rule.quota.user_id for rule in rules},
+    )
+    logs = logs.filter(hour=hour) if hour is not None else logs.filter(hour__isnull=True)
+    rows = logs.order_by().values('group_id', 'user_id', 'model_id').annotate(cost=Sum('total_cost'))
+    return {(row['group_id'], row['user_id'], row['model_id']): row['cost'] for row in rows}
+
+
+def rule_spend(rule, spend):
+    """从分组花费中取出规则范围内的合计"""
+    quota = rule.quota
+    return sum(
+        (cost for (group_id, user_id, model_id), cost in spend.items()
+         if group_id == quota.model_group_id and user_id == quota.user_id
+         and (rule.model_id is None or model_id == rule.model_id)),
+        0,
+    )
+
+
+def evaluate_cost_alerts(now=None):
+    """评估所有启用的规则，为超过阈值的规则创建本周期的警告"""
+    now = now or timezone.now()
+    rules = list(
+        CostAlertRule.objects.filter(is_active=True, quota__deleted_at__isnull=True)
+        .select_related('quota', 'model')
+    )
+    result = CostAlertResult(rules=len(rules))
+
+    alerts = []
+    for period in ('hour', 'day'):
+        period_rules = [rule for rule in rules if rule.period == period]
+        if not period_rules:
+            continue
+        spend = period_spend(period_rules, period, now)
+        _, _, start = period_bounds(period, now)
+        for rule in period_rules:
+            cost = rule_spend(rule, spend)
+            if cost <= rule.threshold:
+                continue
+            scope = f'模型 {rule.model.name} ' if rule.model else ''
+            alerts.append(CostAlert(
+                user_id=rule.quota.user_id,
+                quota=rule.quota,
+                rule=rule,
+                period_start=start,
+                alert_type=rule.alert_type,
+                threshold=rule.threshold,
+                current_value=cost,
+                message=f'{scope}{rule.get_period_display()}花费 ${cost:.6f} 超过阈值 ${rule.threshold}',
+            ))
+
+    if alerts:
+        existing = set(CostAlert.objects.filter(
+            rule__in=[alert.rule for alert in alerts],
+            period_start__in={alert.period_start for alert in alerts},
+        ).values_list('rule_id', 'period_start'))
+        new_alerts = [alert for alert in alerts if (alert.rule.id, alert.period_start) not in existing]
+        CostAlert.objects.bulk_create(new_alerts, ignore_conflicts=True)
+        result.alerts = len(new_alerts)
+        for alert in new_alerts:
+            logger.info(f"Cost alert for rule {alert.rule.id}: {alert.message}")
+
+    CostAlertRule.objects.filter(id__in=[rule.id for rule in rules]).update(last_evaluated_at=now)
+    return result
@@ -0,0 +1,184 @@
+"""
+审计日志导出
+
+按用户、配额、模型、模型组和时间范围流式导出 APIRequest，格式为 NDJSON 或 CSV，可选 gzip 压缩。
+通过 values_list().iterator(chunk_size) 读取（PostgreSQL 上为服务端游标），
+逐行编码后立即产出，内存占用与导出行数无关。已冷归档的记录会先于数据库中的记录一并导出。
+"""
+import csv
+import io
+import json
+import zlib
+from itertools import chain
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import APIRequest
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+# 导出列名 -> 查询字段
+COLUMN_FIELDS = {
+    'id': 'id',
+    'request_id': 'request_id',
+    'created_at': 'created_at',
+    'user_id': 'user_id',
+    'user_name': 'user__name',
+    'model_id': 'model_id',
+    'model_name': 'model_name',
+    'model_provider_name': 'model_provider_name',
+    'model_group_id': 'model_group_id',
+    'model_group_name': 'model_group_name',
+    'method': 'method',
+    'endpoint': 'endpoint',
+    'input_tokens': 'input_tokens',
+    'output_tokens': 'output_tokens',
+    'total_tokens': 'total_tokens',
+    'input_cost': 'input_cost',
+    'output_cost': 'output_cost',
+    'total_cost': 'total_cost',
+    'status_code': 'status_code',
+    'duration_ms': 'duration_ms',
+    'ip_address': 'ip_address',
+    'user_agent': 'user_agent',
+    'error_type': 'error_type',
+    'error_message': 'error_message',
+    'request_data': 'request_data',
+    'response_data': 'response_data',
+}
+
+PAYLOAD_COLUMNS = ('request_data', 'response_data')
+DEFAULT_COLUMNS = tuple(column for column in COLUMN_FIELDS if column not in PAYLOAD_COLUMNS)
+
+
+class ExportError(ValueError):
+    """导出参数错误"""
+
+
+def resolve_columns(columns=None, include_payload=False):
+    """确定导出列；未指定时导出全部非载荷列，include_payload 时追加请求/响应数据"""
+    if columns:
+        unknown = [column for column in columns if column not in COLUMN_FIELDS]
+        if unknown:
+            raise ExportError(f"不支持的列: {', '.join(unknown)}")
+        columns = list(dict.fromkeys(columns))
+    else:
+        columns = list(DEFAULT_COLUMNS)
+
+    if include_payload:
+        columns.extend(column for column in PAYLOAD_COLUMNS if column not in columns)
+    return columns
+
+
+def build_export_queryset(user=None, quota=None, model=None, model_group=None, start=None, end=None):
+    """
+    构建导出查询集，时间范围为 [start, end)
+    配额的请求口径与 UserQuota.get_all_requests 一致
+    """
+    queryset = APIRequest.objects.all()
+    if user is not None:
+        queryset = queryset.filter(user_id=user)
+    if quota is not None:
+        queryset = queryset.filter(user_id=quota.user_id, model_group_id=quota.model_group_id)
+    if model is not None:
+        queryset = queryset.filter(model_id=model)
+    if model_group is not None:
+        queryset = queryset.filter(model_group_id=model_group)
+    if start is not None:
+        queryset = queryset.filter(created_at__gte=start)
+    if end is not None:
+        queryset = queryset.filter(created_at__lt=end)
+    return queryset
+
+
+def iter_rows(queryset, columns, chunk_size=2000):
+    """按ID顺序逐行读取所需列"""
+    fields = [COLUMN_FIELDS[column] for column in columns]
+    return queryset.order_by('id').values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+def iter_export_rows(columns, chunk_size=2000, user=None, quota=None, model=None, model_group=None,
+                     start=None, end=None):
+    """按筛选条件读取导出行：先读取已归档的记录，再读取数据库中的记录"""
+    from .archive import archived_segments, iter_archived_rows, load_pyarrow
+
+    filters = {
+        name: value for name, value in (('user', user), ('model', model), ('model_group', model_group))
+        if value is not None
+    }
+    if quota is not None:
+        filters.update(user=quota.user_id, model_group=quota.model_group_id)
+    # 存在相关归档文件时提前检查依赖，避免在响应流中途失败
+    if archived_segments(start, end, filters.get('user')).exists():
+        load_pyarrow()
+
+    queryset = build_export_queryset(user, quota, model, model_group, start, end)
+    return chain(
+        iter_archived_rows(columns, start, end, filters, batch_size=chunk_size),
+        iter_rows(queryset, columns, chunk_size=chunk_size),
+    )
+
+
+def iter_ndjson(rows, columns):
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for row in rows:
+        yield (encoder.encode(dict(zip(columns, row))) + '\n').encode('utf-8')
+
+
+def iter_csv(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate(0)
+        return data
+
+    writer.writerow(columns)
+    yield flush()
+    for row in rows:
+        writer.writerow([
+            json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False) if column in PAYLOAD_COLUMNS else value
+            for column, value in zip(columns, row)
+        ])
+        yield flush()
+
+
+def gzip_stream(chunks, flush_bytes=64 * 1024):
+    """把字节流压缩为 gzip 流，每积累 flush_bytes 字节输出一次"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    pending = []
+    pending_size = 0
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            pending.append(data)
+            pending_size += len(data)
+        if pending_size >= flush_bytes:
+            yield b''.join(pending)
+            pending, pending_size = [], 0
+    pending.append(compressor.flush())
+    yield b''.join(pending)
+
+
+def export_stream(rows, columns, export_format='ndjson', compress=False):
+    """把导出行编码为字节流"""
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError(f"不支持的导出格式: {export_format}，可选值: {', '.join(EXPORT_FORMATS)}")
+
+    encode = iter_ndjson if export_format == 'ndjson' else iter_csv
+    stream = encode(rows, columns)
+    if compress:
+        stream = gzip_stream(stream)
+    return stream
+
+
+def export_filename(export_format, compress=False):
+    return f"api_requests.{export_format}" + ('.gz' if compress else '')
+
+
+def export_content_type(export_format, compress=False):
+    if compress:
+        return 'application/gzip'
+    return 'application/x-ndjson' if export_format == 'ndjson' else 'text/csv; charset=utf-8'
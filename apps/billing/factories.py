@@ -1,6 +1,5 @@
 import factory
 from decimal import Decimal
-from django.utils import timezone
 from faker import Faker
 from .models import APIRequest
 from apps.users.factories import UserFactory
@@ -22,10 +21,10 @@ class APIRequestFactory(factory.django.DjangoModelFactory):
         ),
         name='test-model',
         display_name='Test Model',
-        input_price_per_1k=Decimal('0.010000'),
-        output_price_per_1k=Decimal('0.030000')
+        input_price_per_1m=Decimal('10.000000'),
+        output_price_per_1m=Decimal('30.000000')
     ))
-    model_group = factory.SelfAttribute('user.quotas.first.model_group')
+    model_group = factory.LazyAttribute(lambda o: getattr(o.user.quotas.first(), 'model_group', None))
     method = 'POST'
     endpoint = '/v1/chat/completions'
     request_data = factory.LazyFunction(lambda: {'messages': [{'role': 'user', 'content': fake.text()}]})
@@ -33,11 +32,20 @@ class APIRequestFactory(factory.django.DjangoModelFactory):
     input_tokens = factory.LazyFunction(lambda: fake.random_int(min=10, max=1000))
     output_tokens = factory.LazyFunction(lambda: fake.random_int(min=10, max=1000))
     total_tokens = factory.LazyAttribute(lambda o: o.input_tokens + o.output_tokens)
-    input_cost = factory.LazyAttribute(lambda o: (Decimal(o.input_tokens) / Decimal('1000')) * o.model.input_price_per_1k)
-    output_cost = factory.LazyAttribute(lambda o: (Decimal(o.output_tokens) / Decimal('1000')) * o.model.output_price_per_1k)
+    input_cost = factory.LazyAttribute(lambda o: (Decimal(o.input_tokens) / Decimal('1000000')) * o.model.input_price_per_1m)
+    output_cost = factory.LazyAttribute(lambda o: (Decimal(o.output_tokens) / Decimal('1000000')) * o.model.output_price_per_1m)
     total_cost = factory.LazyAttribute(lambda o: o.input_cost + o.output_cost)
     status_code = 200
     duration_ms = factory.LazyFunction(lambda: fake.random_int(min=100, max=5000))
     ip_address = factory.LazyFunction(lambda: fake.ipv4())
     user_agent = factory.LazyFunction(lambda: fake.user_agent())
-    created_at = factory.LazyFunction(lambda: timezone.now()) 
\ No newline at end of file
+
+    @classmethod
+    def _create(cls, model_class, *args, **kwargs):
+        # created_at 为 auto_now_add，指定时需要在创建后回写
+        created_at = kwargs.pop('created_at', None)
+        api_request = super()._create(model_class, *args, **kwargs)
+        if created_at is not None:
+            model_class.objects.filter(pk=api_request.pk).update(created_at=created_at)
+            api_request.created_at = created_at
+        return api_request 
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""计费相关的定时任务（由 apps.scheduler 调度）"""
+from apps.scheduler.registry import periodic_job
+
+from .cost_alerts import evaluate_cost_alerts
+from .models import UserUsageCounter
+from .retention import active_policies, apply_policy
+from .rollups import run_rollup
+
+
+@periodic_job('billing.rollup_usage', interval=60, jitter=10)
+def rollup_usage():
+    """把新的API请求增量汇总到小时/日统计表"""
+    return run_rollup()
+
+
+@periodic_job('billing.evaluate_cost_alerts', interval=300, jitter=30)
+def cost_alerts():
+    """按成本警告规则检查花费"""
+    return evaluate_cost_alerts()
+
+
+@periodic_job('billing.apply_retention', interval=24 * 60 * 60, jitter=30 * 60, lease=4 * 60 * 60)
+def retention():
+    """按数据保留策略清理过期的审计记录"""
+    rows = 0
+    for policy in active_policies():
+        rows += apply_policy(policy).rows
+    return {'rows': rows}
+
+
+@periodic_job('billing.rebuild_user_counters', interval=24 * 60 * 60, jitter=30 * 60, lease=2 * 60 * 60)
+def rebuild_user_counters():
+    """按使用量汇总重建已有的用户使用计数器，校正增量累加的偏差"""
+    count = 0
+    for counter in UserUsageCounter.objects.select_related('user').iterator():
+        UserUsageCounter.rebuild(counter.user)
+        count += 1
+    return {'counters': count}
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.billing.models import RetentionPolicy
+from apps.billing.retention import active_policies, apply_policy, policy_queryset
+
+
+class Command(BaseCommand):
+    help = '按数据保留策略分批清理过期的审计记录'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--policy',
+            type=int,
+            help='只执行指定ID的策略'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='每批处理的记录数'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.05,
+            help='批次之间的休眠时间(秒)'
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            help='每个策略本次最多处理的批数'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只统计待处理的记录数'
+        )
+
+    def handle(self, *args, **options):
+        if options['policy']:
+            policy = RetentionPolicy.objects.filter(pk=options['policy']).first()
+            if policy is None:
+                raise CommandError(f'策略 {options["policy"]} 不存在')
+            policies = [policy]
+        else:
+            policies = active_policies()
+
+        for policy in policies:
+            if options['dry_run']:
+                self.stdout.write(f'{policy}: 待处理 {policy_queryset(policy).count()} 条')
+                continue
+
+            started = time.monotonic()
+            result = apply_policy(
+                policy,
+                batch_size=options['batch_size'],
+                sleep_seconds=options['sleep'],
+                max_batches=options['max_batches'],
+                progress=self.report_progress,
+            )
+            status = '完成' if result.finished else '未完成（再次执行将继续）'
+            self.stdout.write(self.style.SUCCESS(
+                f'{policy}: 处理 {result.rows} 条（{result.batches} 批，{time.monotonic() - started:.1f}秒），{status}'
+            ))
+
+    def report_progress(self, policy, result):
+        if self.verbosity >= 2:
+            self.stdout.write(f'  策略 {policy.pk}: 第 {result.batches} 批，累计 {result.rows} 条')
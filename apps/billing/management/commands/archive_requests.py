@@ -0,0 +1,59 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.billing.archive import ArchiveError, archive_requests
+
+
+class Command(BaseCommand):
+    help = '把早于截止日期的API请求记录冷归档到压缩的 Parquet 文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before',
+            type=date.fromisoformat,
+            help='归档该日期(YYYY-MM-DD)之前的记录'
+        )
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            help='归档早于若干天前的记录'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50000,
+            help='每个归档文件的最大记录数'
+        )
+        parser.add_argument(
+            '--max-segments',
+            type=int,
+            help='本次最多写入的文件数'
+        )
+        parser.add_argument(
+            '--dir',
+            help='归档目录，默认使用 AUDIT_ARCHIVE_DIR'
+        )
+
+    def handle(self, *args, **options):
+        if options['before']:
+            before = options['before']
+        elif options['older_than_days'] is not None:
+            before = timezone.localdate() - timezone.timedelta(days=options['older_than_days'])
+        else:
+            raise CommandError('需要指定 --before 或 --older-than-days')
+
+        try:
+            result = archive_requests(
+                before,
+                batch_size=options['batch_size'],
+                base_dir=options['dir'],
+                max_segments=options['max_segments'],
+            )
+        except ArchiveError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'归档了 {result.rows} 条记录，写入 {result.segments} 个文件（{result.bytes} 字节）'
+        ))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.billing.closing import close_billing_period, month_period
+
+
+class Command(BaseCommand):
+    help = '结算计费周期，为所有有效配额生成或更新计费记录'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'month',
+            help='计费月份(YYYY-MM)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='每批处理的配额数'
+        )
+        parser.add_argument(
+            '--max-chunks',
+            type=int,
+            help='本次最多处理的批数（配合 --resume 分多次运行）'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='从上次中断的位置继续'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            period_start, period_end = month_period(options['month'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        result = close_billing_period(
+            period_start,
+            period_end,
+            chunk_size=options['chunk_size'],
+            resume=options['resume'],
+            max_chunks=options['max_chunks'],
+        )
+
+        self.stdout.write(
+            f'处理了 {result.quotas} 个配额（{result.chunks} 批），'
+            f'跳过已结清 {result.skipped} 个、记录已归档或删除 {result.protected} 个，进度: 配额ID {result.last_quota_id}'
+        )
+        if result.finished:
+            self.stdout.write(self.style.SUCCESS(f'{options["month"]} 计费周期结算完成'))
+        else:
+            self.stdout.write(self.style.WARNING('尚未完成，使用 --resume 继续'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from apps.billing.cost_alerts import evaluate_cost_alerts
+
+
+class Command(BaseCommand):
+    help = '按成本警告规则检查当前小时/当天的花费并创建警告（建议在 rollup_usage 之后定时执行）'
+
+    def handle(self, *args, **options):
+        result = evaluate_cost_alerts()
+        self.stdout.write(self.style.SUCCESS(
+            f'评估了 {result.rules} 条规则，新建 {result.alerts} 条成本警告'
+        ))
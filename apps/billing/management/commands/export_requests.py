@@ -0,0 +1,92 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.billing.export import (
+    EXPORT_FORMATS, ExportError, iter_export_rows, resolve_columns, export_stream,
+)
+from apps.billing.archive import ArchiveError
+from apps.billing.statistics import parse_time_bound
+from apps.quotas.models import UserQuota
+
+
+class Command(BaseCommand):
+    help = '流式导出API请求记录（NDJSON/CSV）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            dest='export_format',
+            choices=EXPORT_FORMATS,
+            default='ndjson',
+            help='导出格式'
+        )
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='输出文件路径，默认输出到标准输出'
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='使用 gzip 压缩输出'
+        )
+        parser.add_argument(
+            '--columns',
+            help='导出列，逗号分隔'
+        )
+        parser.add_argument(
+            '--include-payload',
+            action='store_true',
+            help='包含请求数据和响应数据'
+        )
+        parser.add_argument('--user', type=int, help='用户ID')
+        parser.add_argument('--quota', type=int, help='配额ID')
+        parser.add_argument('--model', type=int, help='模型ID')
+        parser.add_argument('--model-group', type=int, help='模型组ID')
+        parser.add_argument('--start', help='开始时间（ISO日期或日期时间）')
+        parser.add_argument('--end', help='结束时间（ISO日期或日期时间，日期包含当天）')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='每次从数据库读取的行数'
+        )
+
+    def handle(self, *args, **options):
+        quota = None
+        if options['quota']:
+            quota = UserQuota.objects.filter(pk=options['quota']).first()
+            if quota is None:
+                raise CommandError(f'配额 {options["quota"]} 不存在')
+
+        try:
+            columns = resolve_columns(
+                [column.strip() for column in options['columns'].split(',')] if options['columns'] else None,
+                include_payload=options['include_payload'],
+            )
+            rows = iter_export_rows(
+                columns,
+                chunk_size=options['chunk_size'],
+                user=options['user'],
+                quota=quota,
+                model=options['model'],
+                model_group=options['model_group'],
+                start=parse_time_bound(options['start']),
+                end=parse_time_bound(options['end'], end=True),
+            )
+            stream = export_stream(rows, columns, export_format=options['export_format'], compress=options['gzip'])
+        except (ExportError, ArchiveError, ValueError) as e:
+            raise CommandError(str(e))
+
+        if options['output'] == '-':
+            output = sys.stdout.buffer
+            for chunk in stream:
+                output.write(chunk)
+            output.flush()
+            return
+
+        with open(options['output'], 'wb') as output:
+            for chunk in stream:
+                output.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f'已导出到 {options["output"]}'))
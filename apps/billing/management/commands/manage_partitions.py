@@ -0,0 +1,74 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.billing.partitions import (
+    GRANULARITIES, PartitionError, convert_to_partitioned, ensure_partitions, detach_partitions, list_partitions,
+)
+
+
+class Command(BaseCommand):
+    help = '管理 api_requests 的时间分区（仅 PostgreSQL）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='把现有的 api_requests 转换为分区表'
+        )
+        parser.add_argument(
+            '--granularity',
+            choices=GRANULARITIES,
+            help='分区粒度，默认使用 API_REQUESTS_PARTITION_GRANULARITY'
+        )
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            help='预先创建的分区数，默认使用 API_REQUESTS_PARTITIONS_AHEAD'
+        )
+        parser.add_argument(
+            '--detach-before',
+            type=date.fromisoformat,
+            help='分离结束时间不晚于该日期(YYYY-MM-DD)的分区'
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            help='分离后删除分区表（数据不可恢复，分区中的记录需已汇总）'
+        )
+        parser.add_argument(
+            '--concurrently',
+            action='store_true',
+            help='使用 DETACH PARTITION CONCURRENTLY（PostgreSQL 14+）'
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='列出现有分区'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            if options['convert']:
+                created = convert_to_partitioned(granularity=options['granularity'])
+                self.stdout.write(self.style.SUCCESS('api_requests 已转换为分区表'))
+            else:
+                created = ensure_partitions(ahead=options['ahead'], granularity=options['granularity'])
+            for name in created:
+                self.stdout.write(f'创建分区: {name}')
+
+            if options['detach_before']:
+                detached = detach_partitions(
+                    options['detach_before'],
+                    drop=options['drop'],
+                    concurrently=options['concurrently'],
+                )
+                action = '删除' if options['drop'] else '分离'
+                for name in detached:
+                    self.stdout.write(f'{action}分区: {name}')
+
+            if options['list']:
+                for partition in list_partitions():
+                    self.stdout.write(f'{partition.name}: {partition.start or "MINVALUE"} ~ {partition.end or "MAXVALUE"}')
+        except PartitionError as e:
+            raise CommandError(str(e))
@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from apps.billing.models import UserUsageCounter
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = '根据使用量汇总和未汇总的API请求记录重建用户使用计数器（初始化或校正）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            action='append',
+            help='只重建指定用户（可多次指定）'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['user_id']:
+            users = users.filter(id__in=options['user_id'])
+
+        count = 0
+        for user in users.iterator():
+            UserUsageCounter.rebuild(user)
+            count += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'已重建 {count} 个用户的使用计数器')
+        )
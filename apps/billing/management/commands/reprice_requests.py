@@ -0,0 +1,102 @@
+from datetime import date, datetime, time
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.ai_models.models import AIModel
+from apps.ai_models.pricing import nanos_to_dollars
+from apps.billing.repricing import reprice_requests
+from apps.billing.rollups import RebuildRangeError
+
+
+def price(value):
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(value)
+    if price < 0:
+        raise ValueError(value)
+    return price
+
+
+class Command(BaseCommand):
+    help = '按新价格重新计算模型在指定日期范围内的请求成本，并调整相关配额（默认只预览）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model_id', type=int, help='模型ID')
+        parser.add_argument('--start', type=date.fromisoformat, required=True, help='开始日期(YYYY-MM-DD)')
+        parser.add_argument('--end', type=date.fromisoformat, required=True, help='结束日期(YYYY-MM-DD，含当天)')
+        parser.add_argument('--input-price', type=price, required=True, help='新的输入价格($/1M tokens)')
+        parser.add_argument('--output-price', type=price, required=True, help='新的输出价格($/1M tokens)')
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='实际修改数据；不指定时只统计影响范围'
+        )
+        parser.add_argument(
+            '--update-model',
+            action='store_true',
+            help='同时把模型的当前价格更新为新价格'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=10000,
+            help='每块更新的请求数'
+        )
+        parser.add_argument(
+            '--max-chunks',
+            type=int,
+            help='本次最多处理的块数（以相同参数再次执行会继续）'
+        )
+        parser.add_argument('--note', default='', help='写入配额调整日志的备注')
+
+    def handle(self, *args, **options):
+        model = AIModel.objects.filter(pk=options['model_id']).select_related('provider').first()
+        if model is None:
+            raise CommandError(f'模型 {options["model_id"]} 不存在')
+        if options['end'] < options['start']:
+            raise CommandError('结束日期不能早于开始日期')
+
+        tz = timezone.get_current_timezone()
+        start = timezone.make_aware(datetime.combine(options['start'], time.min), tz)
+        end = timezone.make_aware(datetime.combine(options['end'] + timezone.timedelta(days=1), time.min), tz)
+        note = options['note'] or (
+            f'{model} 重新计价 {options["start"]}~{options["end"]}: '
+            f'${options["input_price"]}/${options["output_price"]} per 1M tokens'
+        )
+
+        try:
+            result = reprice_requests(
+                model, start, end, options['input_price'], options['output_price'],
+                chunk_size=options['chunk_size'],
+                dry_run=not options['apply'],
+                max_chunks=options['max_chunks'],
+                note=note,
+            )
+        except RebuildRangeError as e:
+            raise CommandError(str(e))
+
+        summary = (
+            f'{model}: {result.requests} 条请求，成本 ${nanos_to_dollars(result.old_cost_nanos)} → '
+            f'${nanos_to_dollars(result.new_cost_nanos)}（差额 ${nanos_to_dollars(result.delta_nanos)}），'
+            f'涉及 {len(result.deltas)} 个用户/模型组'
+        )
+        if result.dry_run:
+            self.stdout.write(f'[预览] {summary}')
+            for (user_id, model_group_id), delta in sorted(result.deltas.items(), key=lambda item: str(item[0])):
+                self.stdout.write(f'  用户 {user_id} / 模型组 {model_group_id}: ${nanos_to_dollars(delta)}')
+            self.stdout.write('使用 --apply 执行')
+            return
+
+        if not result.finished:
+            self.stdout.write(self.style.WARNING(f'已处理 {result.chunks} 块，未完成（以相同参数再次执行将继续）'))
+            return
+
+        if options['update_model']:
+            model.input_price_per_1m = options['input_price']
+            model.output_price_per_1m = options['output_price']
+            model.save(update_fields=['input_price_per_1m', 'output_price_per_1m', 'updated_at'])
+
+        self.stdout.write(self.style.SUCCESS(f'{summary}，调整了 {result.adjusted_quotas} 个配额'))
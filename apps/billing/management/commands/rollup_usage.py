@@ -0,0 +1,61 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.billing.rollups import run_rollup, rebuild_range, RebuildRangeError
+
+
+class Command(BaseCommand):
+    help = '把新的API请求增量汇总到小时/日统计表'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='每批汇总的请求数'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='持续运行（后台工作进程模式）'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='持续运行时每轮之间的间隔(秒)'
+        )
+        parser.add_argument(
+            '--rebuild-from',
+            type=date.fromisoformat,
+            help='重新计算该日期(YYYY-MM-DD)起的汇总数据'
+        )
+        parser.add_argument(
+            '--rebuild-to',
+            type=date.fromisoformat,
+            help='重新计算截止到该日期(YYYY-MM-DD)的汇总数据，默认与起始日期相同'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild_from']:
+            start = options['rebuild_from']
+            end = options['rebuild_to'] or start
+            if end < start:
+                raise CommandError('结束日期不能早于起始日期')
+            try:
+                rebuild_range(start, end)
+            except RebuildRangeError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f'已重新计算 {start} 至 {end} 的汇总数据'))
+            return
+
+        while True:
+            result = run_rollup(batch_size=options['batch_size'])
+            self.stdout.write(
+                self.style.SUCCESS(f'汇总了 {result.rows} 条请求（{result.batches} 批），水位线: {result.last_id}')
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_models', '0003_fix_provider_cascade'),
+        ('billing', '0005_fix_apirequest_foreign_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='任务名称')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='已处理的最大ID')),
+                ('details', models.JSONField(blank=True, default=dict, verbose_name='详细信息')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '处理水位线',
+                'verbose_name_plural': '处理水位线',
+                'db_table': 'processing_watermarks',
+            },
+        ),
+        migrations.AddField(
+            model_name='usagestatistics',
+            name='total_duration_ms',
+            field=models.BigIntegerField(default=0, verbose_name='总耗时(毫秒)'),
+        ),
+        migrations.AlterField(
+            model_name='usagestatistics',
+            name='model',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='usage_statistics', to='ai_models.aimodel'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:54
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0006_usage_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='月份')),
+                ('path', models.CharField(max_length=500, unique=True, verbose_name='文件路径')),
+                ('row_count', models.IntegerField(verbose_name='记录数')),
+                ('min_id', models.BigIntegerField(verbose_name='最小请求ID')),
+                ('max_id', models.BigIntegerField(verbose_name='最大请求ID')),
+                ('first_created_at', models.DateTimeField(verbose_name='最早创建时间')),
+                ('last_created_at', models.DateTimeField(verbose_name='最晚创建时间')),
+                ('total_cost', models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=14, verbose_name='总成本')),
+                ('size_bytes', models.BigIntegerField(verbose_name='文件大小')),
+                ('checksum', models.CharField(max_length=64, verbose_name='SHA256')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archive_segments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': '归档文件',
+                'verbose_name_plural': '归档文件',
+                'db_table': 'archive_segments',
+                'ordering': ['first_created_at', 'min_id'],
+                'indexes': [models.Index(fields=['user', 'month'], name='archive_seg_user_id_b56c7b_idx'), models.Index(fields=['first_created_at', 'last_created_at'], name='archive_seg_first_c_018a6c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0007_archive_segments'),
+        ('groups', '0003_modelgroupusagelog_success_count'),
+        ('quotas', '0007_quotausagecounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetentionPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='策略名称')),
+                ('target', models.CharField(choices=[('api_requests', 'API请求记录'), ('quota_usage_logs', '配额使用日志'), ('provider_logs', 'API提供商日志')], max_length=30, verbose_name='数据表')),
+                ('action', models.CharField(choices=[('delete', '删除记录'), ('strip_payload', '清空载荷')], default='delete', max_length=20, verbose_name='处理方式')),
+                ('retention_days', models.PositiveIntegerField(verbose_name='保留天数')),
+                ('is_active', models.BooleanField(default=True, verbose_name='是否激活')),
+                ('last_run_at', models.DateTimeField(blank=True, null=True, verbose_name='最近执行时间')),
+                ('last_run_rows', models.BigIntegerField(default=0, verbose_name='最近处理记录数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('model_group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='retention_policies', to='groups.modelgroup')),
+                ('quota', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='retention_policies', to='quotas.userquota')),
+            ],
+            options={
+                'verbose_name': '数据保留策略',
+                'verbose_name_plural': '数据保留策略',
+                'db_table': 'retention_policies',
+                'ordering': ['target', 'id'],
+            },
+        ),
+    ]
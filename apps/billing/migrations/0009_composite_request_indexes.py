@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+from utils.migrations import AddIndexOnline, RemoveIndexOnline
+
+
+class Migration(migrations.Migration):
+    # PostgreSQL 上并发建索引，不能在事务中执行
+    atomic = False
+
+    dependencies = [
+        ('ai_models', '0003_fix_provider_cascade'),
+        ('billing', '0008_retention_policies'),
+        ('groups', '0003_modelgroupusagelog_success_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexOnline(
+            model_name='apirequest',
+            index=models.Index(fields=['user', 'model_group', 'created_at', 'id'], name='api_request_user_id_529841_idx'),
+        ),
+        AddIndexOnline(
+            model_name='apirequest',
+            index=models.Index(fields=['model_group', 'created_at'], name='api_request_model_g_d4bd25_idx'),
+        ),
+        AddIndexOnline(
+            model_name='apirequest',
+            index=models.Index(fields=['created_at', 'id'], name='api_request_created_3aa6d1_idx'),
+        ),
+        # (created_at, id) 已覆盖单列 created_at 索引
+        RemoveIndexOnline(
+            model_name='apirequest',
+            name='api_request_created_ea1fe3_idx',
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:11
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0009_composite_request_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserUsageCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('day', models.DateField(blank=True, null=True, verbose_name='当前日期')),
+                ('day_requests', models.IntegerField(default=0, verbose_name='今日请求数')),
+                ('day_tokens', models.BigIntegerField(default=0, verbose_name='今日tokens')),
+                ('day_cost', models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=16, verbose_name='今日成本')),
+                ('month', models.DateField(blank=True, null=True, verbose_name='当前月份')),
+                ('month_requests', models.IntegerField(default=0, verbose_name='本月请求数')),
+                ('month_tokens', models.BigIntegerField(default=0, verbose_name='本月tokens')),
+                ('month_cost', models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=16, verbose_name='本月成本')),
+                ('total_requests', models.BigIntegerField(default=0, verbose_name='累计请求数')),
+                ('total_tokens', models.BigIntegerField(default=0, verbose_name='累计tokens')),
+                ('total_cost', models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=16, verbose_name='累计成本')),
+                ('last_request_at', models.DateTimeField(blank=True, null=True, verbose_name='最近请求时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '用户使用计数器',
+                'verbose_name_plural': '用户使用计数器',
+                'db_table': 'user_usage_counters',
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:14
+
+from django.db import migrations, models
+from django.db.models import F, Max
+from django.db.models.functions import Cast, Round
+
+BACKFILL_CHUNK = 50000
+
+
+def fill_cost_nanos(apps, schema_editor):
+    """按ID区间分批回填整数成本，每批单独提交，不长时间锁表"""
+    APIRequest = apps.get_model('billing', 'APIRequest')
+    max_id = APIRequest.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+
+    def nanos(field):
+        return Cast(Round(F(field) * 1000000000), models.BigIntegerField())
+
+    for start in range(0, max_id, BACKFILL_CHUNK):
+        APIRequest.objects.filter(id__gt=start, id__lte=start + BACKFILL_CHUNK).update(
+            input_cost_nanos=nanos('input_cost'),
+            output_cost_nanos=nanos('output_cost'),
+            total_cost_nanos=nanos('total_cost'),
+        )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('billing', '0010_user_usage_counters'),
+        ('ai_models', '0004_integer_costs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apirequest',
+            name='input_cost_nanos',
+            field=models.BigIntegerField(default=0, verbose_name='输入成本(纳美元)'),
+        ),
+        migrations.AddField(
+            model_name='apirequest',
+            name='output_cost_nanos',
+            field=models.BigIntegerField(default=0, verbose_name='输出成本(纳美元)'),
+        ),
+        migrations.AddField(
+            model_name='apirequest',
+            name='total_cost_nanos',
+            field=models.BigIntegerField(default=0, verbose_name='总成本(纳美元)'),
+        ),
+        migrations.RunPython(fill_cost_nanos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_models', '0004_integer_costs'),
+        ('billing', '0011_integer_costs'),
+        ('quotas', '0007_quotausagecounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='costalert',
+            name='period_start',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='周期开始时间'),
+        ),
+        migrations.CreateModel(
+            name='CostAlertRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', '每小时'), ('day', '每天')], default='day', max_length=10, verbose_name='统计周期')),
+                ('threshold', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='花费阈值($)')),
+                ('is_active', models.BooleanField(default=True, verbose_name='是否启用')),
+                ('last_evaluated_at', models.DateTimeField(blank=True, null=True, verbose_name='最后评估时间')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('model', models.ForeignKey(blank=True, help_text='为空表示配额下所有模型', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cost_alert_rules', to='ai_models.aimodel')),
+                ('quota', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_alert_rules', to='quotas.userquota')),
+            ],
+            options={
+                'verbose_name': '成本警告规则',
+                'verbose_name_plural': '成本警告规则',
+                'db_table': 'cost_alert_rules',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='costalert',
+            name='rule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alerts', to='billing.costalertrule'),
+        ),
+        migrations.AddConstraint(
+            model_name='costalert',
+            constraint=models.UniqueConstraint(fields=('rule', 'period_start'), name='uniq_cost_alert_rule_period'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_models', '0004_integer_costs'),
+        ('apis', '0002_apiprovider_description'),
+        ('billing', '0012_cost_alert_rules'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatencySketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('hour', models.IntegerField(blank=True, null=True, verbose_name='小时')),
+                ('count', models.BigIntegerField(default=0, verbose_name='请求次数')),
+                ('bins', models.JSONField(default=dict, verbose_name='分桶次数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('model', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='latency_sketches', to='ai_models.aimodel')),
+                ('provider', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='latency_sketches', to='apis.apiprovider')),
+            ],
+            options={
+                'verbose_name': '耗时分位数草图',
+                'verbose_name_plural': '耗时分位数草图',
+                'db_table': 'latency_sketches',
+                'indexes': [models.Index(fields=['date', 'hour'], name='latency_ske_date_f204eb_idx'), models.Index(fields=['provider', 'date'], name='latency_ske_provide_9eb067_idx')],
+                'unique_together': {('model', 'date', 'hour')},
+            },
+        ),
+    ]
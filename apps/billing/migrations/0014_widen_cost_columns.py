@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:41
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0013_latency_sketches'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='apirequest',
+            name='input_cost',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=20, verbose_name='输入成本'),
+        ),
+        migrations.AlterField(
+            model_name='apirequest',
+            name='output_cost',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=20, verbose_name='输出成本'),
+        ),
+        migrations.AlterField(
+            model_name='apirequest',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=20, verbose_name='总成本'),
+        ),
+        migrations.AlterField(
+            model_name='billingrecord',
+            name='input_cost',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=20, verbose_name='输入成本'),
+        ),
+        migrations.AlterField(
+            model_name='billingrecord',
+            name='output_cost',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=20, verbose_name='输出成本'),
+        ),
+        migrations.AlterField(
+            model_name='billingrecord',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=20, verbose_name='总成本'),
+        ),
+        migrations.AlterField(
+            model_name='usagestatistics',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=20, verbose_name='总成本'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 20:06
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0014_widen_cost_columns'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivesegment',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=20, verbose_name='总成本'),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.4 on 2026-10-19 20:40
+
+from datetime import datetime, time
+
+from django.db import migrations
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+BATCH_SIZE = 500
+COUNTER_FIELDS = [
+    'day', 'day_requests', 'day_tokens', 'day_cost',
+    'month', 'month_requests', 'month_tokens', 'month_cost',
+    'total_requests', 'total_tokens', 'total_cost', 'last_request_at',
+]
+
+
+def window_sums(requests, windows):
+    """按时间窗口分别求请求数、tokens和成本：{窗口: 过滤条件}，条件为空表示累计"""
+    sums = {}
+    for window, condition in windows.items():
+        options = {'filter': condition} if condition else {}
+        sums[f'{window}_requests'] = requests(**options)
+        sums[f'{window}_tokens'] = Sum('total_tokens', **options)
+        sums[f'{window}_cost'] = Sum('total_cost', **options)
+    return sums
+
+
+def backfill_user_counters(apps, schema_editor):
+    """
+    为已有请求记录的用户重建使用计数器（口径与当时的 UserUsageCounter.rebuild 一致）
+    已汇总的记录读取 UsageStatistics 日桶，汇总水位线之后的记录扫描 APIRequest；
+    之前首次请求时从 1 开始计数的计数器也一并覆盖校正
+    """
+    APIRequest = apps.get_model('billing', 'APIRequest')
+    UsageStatistics = apps.get_model('billing', 'UsageStatistics')
+    ProcessingWatermark = apps.get_model('billing', 'ProcessingWatermark')
+    UserUsageCounter = apps.get_model('billing', 'UserUsageCounter')
+
+    now = timezone.now()
+    day = timezone.localdate(now)
+    month = day.replace(day=1)
+    tz = timezone.get_current_timezone()
+    day_start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    month_start = timezone.make_aware(datetime.combine(month, time.min), tz)
+    last_id = ProcessingWatermark.objects.filter(name='usage_rollup').values_list('last_id', flat=True).first() or 0
+
+    rolled = UsageStatistics.objects.filter(hour__isnull=True, date__lte=day).order_by().values('user_id').annotate(
+        **window_sums(
+            lambda **options: Sum('request_count', **options),
+            {'day': Q(date=day), 'month': Q(date__gte=month), 'total': None},
+        )
+    )
+    pending = APIRequest.objects.filter(id__gt=last_id, created_at__lte=now).order_by().values('user_id').annotate(
+        **window_sums(
+            lambda **options: Count('id', **options),
+            {'day': Q(created_at__gte=day_start), 'month': Q(created_at__gte=month_start), 'total': None},
+        )
+    )
+
+    counters = {}
+    for rows in (rolled, pending):
+        for row in rows.iterator():
+            counter = counters.setdefault(row.pop('user_id'), {})
+            for field, value in row.items():
+                counter[field] = counter.get(field, 0) + (value or 0)
+
+    last_requests = APIRequest.objects.filter(created_at__lte=now).order_by().values('user_id').annotate(
+        last=Max('created_at')
+    )
+    for row in last_requests.iterator():
+        if row['user_id'] in counters:
+            counters[row['user_id']]['last_request_at'] = row['last']
+
+    batch = []
+    for user_id, values in counters.items():
+        batch.append(UserUsageCounter(user_id=user_id, day=day, month=month, **values))
+        if len(batch) >= BATCH_SIZE:
+            UserUsageCounter.objects.bulk_create(
+                batch, update_conflicts=True, unique_fields=['user'], update_fields=COUNTER_FIELDS
+            )
+            batch = []
+    if batch:
+        UserUsageCounter.objects.bulk_create(
+            batch, update_conflicts=True, unique_fields=['user'], update_fields=COUNTER_FIELDS
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0015_widen_archive_segment_cost'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_user_counters, migrations.RunPython.noop),
+    ]
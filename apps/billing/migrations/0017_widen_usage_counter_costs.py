@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-19 20:19
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0016_backfill_user_usage_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userusagecounter',
+            name='day_cost',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=20, verbose_name='今日成本'),
+        ),
+        migrations.AlterField(
+            model_name='userusagecounter',
+            name='month_cost',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=20, verbose_name='本月成本'),
+        ),
+        migrations.AlterField(
+            model_name='userusagecounter',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=20, verbose_name='累计成本'),
+        ),
+    ]
@@ -1,8 +1,11 @@
-from django.db import models
-from decimal import Decimal
+from django.db import models, transaction
+from decimal import Decimal, ROUND_HALF_UP
 import uuid
+from datetime import datetime, time
 from django.utils import timezone
 
+from apps.ai_models.pricing import COST_PLACES, Cost, dollars_to_nanos
+
 
 class APIRequest(models.Model):
     """API请求记录"""
@@ -33,10 +36,15 @@ class APIRequest(models.Model):
     output_tokens = models.IntegerField('输出tokens', default=0)
     total_tokens = models.IntegerField('总tokens', default=0)
     
-    # 成本计算
-    input_cost = models.DecimalField('输入成本', max_digits=10, decimal_places=6, default=Decimal('0.000000'))
-    output_cost = models.DecimalField('输出成本', max_digits=10, decimal_places=6, default=Decimal('0.000000'))
-    total_cost = models.DecimalField('总成本', max_digits=10, decimal_places=6, default=Decimal('0.000000'))
+    # 成本（整数纳美元，计费和汇总以此为准）
+    input_cost_nanos = models.BigIntegerField('输入成本(纳美元)', default=0)
+    output_cost_nanos = models.BigIntegerField('输出成本(纳美元)', default=0)
+    total_cost_nanos = models.BigIntegerField('总成本(纳美元)', default=0)
+    
+    # 成本（美元，由整数成本换算；位数足以容纳 BigIntegerField 纳美元的全部范围）
+    input_cost = models.DecimalField('输入成本', max_digits=20, decimal_places=6, default=Decimal('0.000000'))
+    output_cost = models.DecimalField('输出成本', max_digits=20, decimal_places=6, default=Decimal('0.000000'))
+    total_cost = models.DecimalField('总成本', max_digits=20, decimal_places=6, default=Decimal('0.000000'))
     
     # 响应信息
     status_code = models.IntegerField('响应状态码')
@@ -62,7 +70,12 @@ class APIRequest(models.Model):
             models.Index(fields=['user', 'created_at']),
             models.Index(fields=['model', 'created_at']),
             models.Index(fields=['status_code']),
-            models.Index(fields=['created_at']),
+            # 配额维度（UserQuota.get_all_requests）的时间范围查询和游标分页
+            models.Index(fields=['user', 'model_group', 'created_at', 'id']),
+            # 按模型组的统计
+            models.Index(fields=['model_group', 'created_at']),
+            # 全局游标分页和时间范围扫描
+            models.Index(fields=['created_at', 'id']),
         ]
     
     def __str__(self):
@@ -71,10 +84,23 @@ class APIRequest(models.Model):
     def calculate_cost(self):
         """计算并更新成本"""
         if self.model:
-            self.input_cost = (Decimal(self.input_tokens) / Decimal('1000000')) * self.model.input_price_per_1m
-            self.output_cost = (Decimal(self.output_tokens) / Decimal('1000000')) * self.model.output_price_per_1m
-            self.total_cost = self.input_cost + self.output_cost
+            self.set_cost(self.model.pricing.cost(self.input_tokens, self.output_tokens))
         self.total_tokens = self.input_tokens + self.output_tokens
+    
+    def set_cost(self, cost):
+        """写入计价引擎算出的成本（pricing.Cost）"""
+        for field, value in cost.as_fields().items():
+            setattr(self, field, value)
+    
+    def _sync_cost_fields(self):
+        """整数成本与美元成本保持一致：有整数成本时以其为准，否则由美元成本换算"""
+        if self.total_cost_nanos:
+            self.set_cost(Cost(self.input_cost_nanos, self.output_cost_nanos))
+        else:
+            for field in ('input_cost', 'output_cost', 'total_cost'):
+                value = Decimal(str(getattr(self, field) or 0)).quantize(COST_PLACES, rounding=ROUND_HALF_UP)
+                setattr(self, field, value)
+                setattr(self, f'{field}_nanos', dollars_to_nanos(value))
         
     def _populate_snapshot_fields(self):
         """填充快照字段"""
@@ -88,8 +114,9 @@ class APIRequest(models.Model):
         # 填充快照字段
         self._populate_snapshot_fields()
         # 自动计算成本
-        if not self.total_cost:
+        if not self.total_cost and not self.total_cost_nanos:
             self.calculate_cost()
+        self._sync_cost_fields()
         super().save(*args, **kwargs)
     
     @property
@@ -123,9 +150,9 @@ class BillingRecord(models.Model):
     total_output_tokens = models.IntegerField('总输出tokens', default=0)
     
     # 成本统计
-    total_cost = models.DecimalField('总成本', max_digits=10, decimal_places=6, default=Decimal('0.000000'))
-    input_cost = models.DecimalField('输入成本', max_digits=10, decimal_places=6, default=Decimal('0.000000'))
-    output_cost = models.DecimalField('输出成本', max_digits=10, decimal_places=6, default=Decimal('0.000000'))
+    total_cost = models.DecimalField('总成本', max_digits=20, decimal_places=6, default=Decimal('0.000000'))
+    input_cost = models.DecimalField('输入成本', max_digits=20, decimal_places=6, default=Decimal('0.000000'))
+    output_cost = models.DecimalField('输出成本', max_digits=20, decimal_places=6, default=Decimal('0.000000'))
     
     # 状态
     STATUS_CHOICES = [
@@ -151,36 +178,16 @@ class BillingRecord(models.Model):
         return f"{self.user.name} - {self.period_start.strftime('%Y-%m')} - ${self.total_cost}"
     
     def calculate_statistics(self):
-        """计算统计数据"""
-        requests = APIRequest.objects.filter(
-            user=self.user,
-            model__groups=self.quota.model_group,
-            created_at__range=[self.period_start, self.period_end]
-        )
-        
-        # 基本统计
-        self.total_requests = requests.count()
-        self.successful_requests = requests.filter(status_code__range=[200, 299]).count()
-        self.failed_requests = self.total_requests - self.successful_requests
-        
-        # Token统计
-        aggregation = requests.aggregate(
-            total_tokens=models.Sum('total_tokens'),
-            total_input_tokens=models.Sum('input_tokens'),
-            total_output_tokens=models.Sum('output_tokens'),
-            total_cost=models.Sum('total_cost'),
-            input_cost=models.Sum('input_cost'),
-            output_cost=models.Sum('output_cost'),
-        )
-        
-        self.total_tokens = aggregation['total_tokens'] or 0
-        self.total_input_tokens = aggregation['total_input_tokens'] or 0
-        self.total_output_tokens = aggregation['total_output_tokens'] or 0
-        self.total_cost = aggregation['total_cost'] or Decimal('0.000000')
-        self.input_cost = aggregation['input_cost'] or Decimal('0.000000')
-        self.output_cost = aggregation['output_cost'] or Decimal('0.000000')
-        
-        self.status = 'calculated'
+        """计算统计数据（单次分组聚合，口径与计费周期结算一致）"""
+        from .closing import BILLING_AGGREGATES, billing_statistics, period_requests
+
+        stats = period_requests(self.period_start, self.period_end).filter(
+            user_id=self.user_id,
+            model_group_id=self.quota.model_group_id,
+        ).aggregate(**BILLING_AGGREGATES)
+
+        for field, value in billing_statistics(stats).items():
+            setattr(self, field, value)
         self.save()
 
 
@@ -188,7 +195,7 @@ class UsageStatistics(models.Model):
     """使用统计（按日/时维度）"""
     
     user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='usage_statistics')
-    model = models.ForeignKey('ai_models.AIModel', on_delete=models.PROTECT, related_name='usage_statistics')
+    model = models.ForeignKey('ai_models.AIModel', on_delete=models.SET_NULL, related_name='usage_statistics', null=True)
     
     # 时间维度
     date = models.DateField('日期')
@@ -203,7 +210,8 @@ class UsageStatistics(models.Model):
     input_tokens = models.IntegerField('输入tokens', default=0)
     output_tokens = models.IntegerField('输出tokens', default=0)
     
-    total_cost = models.DecimalField('总成本', max_digits=10, decimal_places=6, default=Decimal('0.000000'))
+    total_cost = models.DecimalField('总成本', max_digits=20, decimal_places=6, default=Decimal('0.000000'))
+    total_duration_ms = models.BigIntegerField('总耗时(毫秒)', default=0)
     avg_duration_ms = models.FloatField('平均耗时(毫秒)', default=0)
     
     # 时间戳
@@ -226,7 +234,8 @@ class UsageStatistics(models.Model):
         time_str = f"{self.date}"
         if self.hour is not None:
             time_str += f" {self.hour:02d}:00"
-        return f"{self.user.name} - {self.model.name} - {time_str}"
+        model_name = self.model.name if self.model else '已删除的模型'
+        return f"{self.user.name} - {model_name} - {time_str}"
     
     @classmethod
     def aggregate_daily_stats(cls, date, user=None, model=None):
@@ -246,11 +255,247 @@ class UsageStatistics(models.Model):
         )
 
 
+class LatencySketch(models.Model):
+    """请求耗时分位数草图（按 模型×日/时 汇总的 DDSketch，可合并）"""
+    
+    model = models.ForeignKey('ai_models.AIModel', on_delete=models.SET_NULL, related_name='latency_sketches', null=True)
+    provider = models.ForeignKey('apis.APIProvider', on_delete=models.SET_NULL, related_name='latency_sketches', null=True)
+    
+    # 时间维度
+    date = models.DateField('日期')
+    hour = models.IntegerField('小时', null=True, blank=True)  # 空表示按日统计
+    
+    count = models.BigIntegerField('请求次数', default=0)
+    bins = models.JSONField('分桶次数', default=dict)  # {桶序号: 次数}，见 billing.sketches
+    
+    updated_at = models.DateTimeField('更新时间', auto_now=True)
+    
+    class Meta:
+        db_table = 'latency_sketches'
+        verbose_name = '耗时分位数草图'
+        verbose_name_plural = '耗时分位数草图'
+        unique_together = ['model', 'date', 'hour']
+        indexes = [
+            models.Index(fields=['date', 'hour']),
+            models.Index(fields=['provider', 'date']),
+        ]
+    
+    def __str__(self):
+        time_str = f"{self.date}" + (f" {self.hour:02d}:00" if self.hour is not None else '')
+        return f"{self.model_id} - {time_str} - {self.count} requests"
+    
+    def sketch(self):
+        from .sketches import DDSketch
+        return DDSketch(self.bins)
+
+
+class UserUsageCounter(models.Model):
+    """用户使用计数器（按日、按月和累计维护，供仪表盘直接读取）"""
+    
+    user = models.OneToOneField('users.User', on_delete=models.CASCADE, primary_key=True, related_name='usage_counter')
+    
+    # 当日
+    day = models.DateField('当前日期', null=True, blank=True)
+    day_requests = models.IntegerField('今日请求数', default=0)
+    day_tokens = models.BigIntegerField('今日tokens', default=0)
+    day_cost = models.DecimalField('今日成本', max_digits=20, decimal_places=6, default=Decimal('0.000000'))
+    
+    # 当月
+    month = models.DateField('当前月份', null=True, blank=True)  # 当月第一天
+    month_requests = models.IntegerField('本月请求数', default=0)
+    month_tokens = models.BigIntegerField('本月tokens', default=0)
+    month_cost = models.DecimalField('本月成本', max_digits=20, decimal_places=6, default=Decimal('0.000000'))
+    
+    # 累计
+    total_requests = models.BigIntegerField('累计请求数', default=0)
+    total_tokens = models.BigIntegerField('累计tokens', default=0)
+    total_cost = models.DecimalField('累计成本', max_digits=20, decimal_places=6, default=Decimal('0.000000'))
+    
+    last_request_at = models.DateTimeField('最近请求时间', null=True, blank=True)
+    updated_at = models.DateTimeField('更新时间', auto_now=True)
+    
+    class Meta:
+        db_table = 'user_usage_counters'
+        verbose_name = '用户使用计数器'
+        verbose_name_plural = '用户使用计数器'
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.total_requests} requests"
+    
+    @staticmethod
+    def _buckets(at):
+        """计算时间点所在的日期和月份（本地时区）"""
+        day = timezone.localdate(at)
+        return day, day.replace(day=1)
+    
+    @classmethod
+    def record(cls, user_id, tokens, cost, at=None):
+        """
+        记录一次请求（在API请求记录保存之后调用）
+        使用单条 UPDATE 原子累加，跨日/跨月时自动重置对应桶
+        """
+        at = at or timezone.now()
+        day, month = cls._buckets(at)
+        cost = Decimal(cost)
+        cost_field = models.DecimalField(max_digits=20, decimal_places=6)
+        
+        def bucketed(field, key_field, key, amount, output_field):
+            return models.Case(
+                models.When(**{key_field: key}, then=models.F(field) + models.Value(amount, output_field=output_field)),
+                default=models.Value(amount, output_field=output_field),
+                output_field=output_field,
+            )
+        
+        # 桶键放在最后赋值，保证按列顺序求值的数据库也使用旧值判断
+        updates = {
+            'day_requests': bucketed('day_requests', 'day', day, 1, models.IntegerField()),
+            'day_tokens': bucketed('day_tokens', 'day', day, tokens, models.BigIntegerField()),
+            'day_cost': bucketed('day_cost', 'day', day, cost, cost_field),
+            'month_requests': bucketed('month_requests', 'month', month, 1, models.IntegerField()),
+            'month_tokens': bucketed('month_tokens', 'month', month, tokens, models.BigIntegerField()),
+            'month_cost': bucketed('month_cost', 'month', month, cost, cost_field),
+            'total_requests': models.F('total_requests') + 1,
+            'total_tokens': models.F('total_tokens') + tokens,
+            'total_cost': models.F('total_cost') + models.Value(cost, output_field=cost_field),
+            'last_request_at': at,
+            'updated_at': timezone.now(),
+            'day': day,
+            'month': month,
+        }
+        
+        if cls.objects.filter(user_id=user_id).update(**updates):
+            return
+        
+        # 还没有计数器时从历史记录初始化（本次请求已保存，重建时一并计入）；
+        # 重建是全量重算，并发的首次记录各自重建也不会重复累加
+        from django.contrib.auth import get_user_model
+        cls.rebuild(get_user_model().objects.get(pk=user_id))
+    
+    def snapshot(self, at=None):
+        """返回当前时刻的计数（过期的桶视为0）"""
+        day, month = self._buckets(at or timezone.now())
+        current_day = self.day == day
+        current_month = self.month == month
+        return {
+            'today': {
+                'requests': self.day_requests if current_day else 0,
+                'tokens': self.day_tokens if current_day else 0,
+                'cost': float(self.day_cost) if current_day else 0.0,
+            },
+            'month': {
+                'requests': self.month_requests if current_month else 0,
+                'tokens': self.month_tokens if current_month else 0,
+                'cost': float(self.month_cost) if current_month else 0.0,
+            },
+            'lifetime': {
+                'requests': self.total_requests,
+                'tokens': self.total_tokens,
+                'cost': float(self.total_cost),
+            },
+        }
+    
+    @classmethod
+    def rebuild(cls, user, at=None):
+        """
+        重新计算计数器（用于初始化和校正）
+        已汇总的记录从 UsageStatistics 日桶读取，只有汇总水位线之后的记录需要扫描 APIRequest，
+        计算量与用户的历史记录数无关，已冷归档的记录也能计入累计值
+        """
+        from .rollups import ROLLUP_WATERMARK
+        
+        at = at or timezone.now()
+        day, month = cls._buckets(at)
+        tz = timezone.get_current_timezone()
+        day_start = timezone.make_aware(datetime.combine(day, time.min), tz)
+        month_start = timezone.make_aware(datetime.combine(month, time.min), tz)
+        
+        def totals(queryset, requests_field, since=None, **filters):
+            condition = {'filter': models.Q(**filters)} if filters else {}
+            stats = queryset.aggregate(
+                requests=models.Sum(requests_field, **condition) if requests_field else models.Count('id', **condition),
+                tokens=models.Sum('total_tokens', **condition),
+                cost=models.Sum('total_cost', **condition),
+            )
+            return [stats['requests'] or 0, stats['tokens'] or 0, stats['cost'] or Decimal('0.000000')]
+        
+        with transaction.atomic():
+            # 锁住汇总水位线，保证汇总表与未汇总记录的分界一致
+            watermark, _ = ProcessingWatermark.objects.select_for_update().get_or_create(name=ROLLUP_WATERMARK)
+            daily = UsageStatistics.objects.filter(user=user, hour__isnull=True, date__lte=day)
+            pending = APIRequest.objects.filter(user=user, id__gt=watermark.last_id, created_at__lte=at).order_by()
+            
+            buckets = []
+            for rollup_filters, pending_filters in (
+                ({'date': day}, {'created_at__gte': day_start}),
+                ({'date__gte': month}, {'created_at__gte': month_start}),
+                ({}, {}),
+            ):
+                rolled = totals(daily, 'request_count', **rollup_filters)
+                tail = totals(pending, None, **pending_filters)
+                buckets.append([a + b for a, b in zip(rolled, tail)])
+            today, this_month, total = buckets
+            
+            last_request = APIRequest.objects.filter(user=user, created_at__lte=at).order_by(
+                '-created_at'
+            ).values_list('created_at', flat=True).first()
+            
+            counter, _ = cls.objects.update_or_create(
+                user=user,
+                defaults={
+                    'day': day,
+                    'day_requests': today[0], 'day_tokens': today[1], 'day_cost': today[2],
+                    'month': month,
+                    'month_requests': this_month[0], 'month_tokens': this_month[1], 'month_cost': this_month[2],
+                    'total_requests': total[0], 'total_tokens': total[1], 'total_cost': total[2],
+                    'last_request_at': last_request,
+                }
+            )
+        return counter
+
+
+class CostAlertRule(models.Model):
+    """成本警告规则（配额在每小时/每天内的花费超过阈值时告警，可限定模型）"""
+    
+    PERIOD_CHOICES = [
+        ('hour', '每小时'),
+        ('day', '每天'),
+    ]
+    
+    quota = models.ForeignKey('quotas.UserQuota', on_delete=models.CASCADE, related_name='cost_alert_rules')
+    model = models.ForeignKey(
+        'ai_models.AIModel', on_delete=models.CASCADE, related_name='cost_alert_rules',
+        null=True, blank=True, help_text='为空表示配额下所有模型'
+    )
+    period = models.CharField('统计周期', max_length=10, choices=PERIOD_CHOICES, default='day')
+    threshold = models.DecimalField('花费阈值($)', max_digits=10, decimal_places=2)
+    is_active = models.BooleanField('是否启用', default=True)
+    last_evaluated_at = models.DateTimeField('最后评估时间', null=True, blank=True)
+    created_at = models.DateTimeField('创建时间', auto_now_add=True)
+    
+    class Meta:
+        db_table = 'cost_alert_rules'
+        verbose_name = '成本警告规则'
+        verbose_name_plural = '成本警告规则'
+        ordering = ['id']
+    
+    def __str__(self):
+        scope = f"{self.quota_id}/{self.model_id}" if self.model_id else f"{self.quota_id}"
+        return f"{scope} - {self.get_period_display()} > ${self.threshold}"
+    
+    @property
+    def alert_type(self):
+        prefix = 'model_' if self.model_id else ''
+        return f"{prefix}{'hourly' if self.period == 'hour' else 'daily'}_spend"
+
+
 class CostAlert(models.Model):
     """成本警告"""
     
     user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='cost_alerts')
     quota = models.ForeignKey('quotas.UserQuota', on_delete=models.CASCADE, related_name='cost_alerts')
+    # 由规则产生的警告：每个规则每个周期最多一条
+    rule = models.ForeignKey(CostAlertRule, on_delete=models.SET_NULL, related_name='alerts', null=True, blank=True)
+    period_start = models.DateTimeField('周期开始时间', null=True, blank=True)
     
     # 警告信息
     alert_type = models.CharField('警告类型', max_length=50)
@@ -271,6 +516,9 @@ class CostAlert(models.Model):
         verbose_name = '成本警告'
         verbose_name_plural = '成本警告'
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['rule', 'period_start'], name='uniq_cost_alert_rule_period'),
+        ]
     
     def __str__(self):
         return f"{self.user.name} - {self.alert_type} - ${self.current_value}"
@@ -281,3 +529,129 @@ class CostAlert(models.Model):
         self.is_active = False
         self.resolved_at = timezone.now()
         self.save()
+
+
+class ProcessingWatermark(models.Model):
+    """增量处理水位线（记录后台任务已处理到的API请求ID）"""
+    
+    name = models.CharField('任务名称', max_length=100, unique=True)
+    last_id = models.BigIntegerField('已处理的最大ID', default=0)
+    details = models.JSONField('详细信息', default=dict, blank=True)
+    updated_at = models.DateTimeField('更新时间', auto_now=True)
+    
+    class Meta:
+        db_table = 'processing_watermarks'
+        verbose_name = '处理水位线'
+        verbose_name_plural = '处理水位线'
+    
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
+    
+    @classmethod
+    def current(cls, name):
+        """获取任务当前水位（未运行过时为0）"""
+        return cls.objects.filter(name=name).values_list('last_id', flat=True).first() or 0
+
+
+class ArchiveSegment(models.Model):
+    """冷归档文件清单（每个文件为某用户某月的一段API请求记录）"""
+    
+    month = models.DateField('月份')  # 当月第一天
+    user = models.ForeignKey('users.User', on_delete=models.SET_NULL, related_name='archive_segments', null=True)
+    path = models.CharField('文件路径', max_length=500, unique=True)  # 相对于归档目录
+    
+    # 内容范围
+    row_count = models.IntegerField('记录数')
+    min_id = models.BigIntegerField('最小请求ID')
+    max_id = models.BigIntegerField('最大请求ID')
+    first_created_at = models.DateTimeField('最早创建时间')
+    last_created_at = models.DateTimeField('最晚创建时间')
+    total_cost = models.DecimalField('总成本', max_digits=20, decimal_places=6, default=Decimal('0.000000'))
+    
+    # 文件信息
+    size_bytes = models.BigIntegerField('文件大小')
+    checksum = models.CharField('SHA256', max_length=64)
+    
+    created_at = models.DateTimeField('创建时间', auto_now_add=True)
+    
+    class Meta:
+        db_table = 'archive_segments'
+        verbose_name = '归档文件'
+        verbose_name_plural = '归档文件'
+        ordering = ['first_created_at', 'min_id']
+        indexes = [
+            models.Index(fields=['user', 'month']),
+            models.Index(fields=['first_created_at', 'last_created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.path} ({self.row_count})"
+
+
+class RetentionPolicy(models.Model):
+    """数据保留策略（可按模型组或配额单独设置）"""
+    
+    TARGET_CHOICES = [
+        ('api_requests', 'API请求记录'),
+        ('quota_usage_logs', '配额使用日志'),
+        ('provider_logs', 'API提供商日志'),
+    ]
+    ACTION_CHOICES = [
+        ('delete', '删除记录'),
+        ('strip_payload', '清空载荷'),
+    ]
+    
+    # 清空载荷时各数据表需要重置的字段
+    PAYLOAD_FIELDS = {
+        'api_requests': {'request_data': {}, 'response_data': {}},
+        'provider_logs': {'details': {}},
+    }
+    # 支持按模型组/配额设置策略的数据表
+    SCOPED_TARGETS = ('api_requests', 'quota_usage_logs')
+    
+    name = models.CharField('策略名称', max_length=100)
+    target = models.CharField('数据表', max_length=30, choices=TARGET_CHOICES)
+    action = models.CharField('处理方式', max_length=20, choices=ACTION_CHOICES, default='delete')
+    retention_days = models.PositiveIntegerField('保留天数')
+    
+    # 适用范围（都为空表示全局策略，更具体的策略优先）
+    model_group = models.ForeignKey('groups.ModelGroup', on_delete=models.CASCADE, related_name='retention_policies', null=True, blank=True)
+    quota = models.ForeignKey('quotas.UserQuota', on_delete=models.CASCADE, related_name='retention_policies', null=True, blank=True)
+    
+    is_active = models.BooleanField('是否激活', default=True)
+    
+    # 最近一次执行
+    last_run_at = models.DateTimeField('最近执行时间', null=True, blank=True)
+    last_run_rows = models.BigIntegerField('最近处理记录数', default=0)
+    
+    # 时间戳
+    created_at = models.DateTimeField('创建时间', auto_now_add=True)
+    updated_at = models.DateTimeField('更新时间', auto_now=True)
+    
+    class Meta:
+        db_table = 'retention_policies'
+        verbose_name = '数据保留策略'
+        verbose_name_plural = '数据保留策略'
+        ordering = ['target', 'id']
+    
+    def __str__(self):
+        return f"{self.name} - {self.get_target_display()} - {self.retention_days}天"
+    
+    @property
+    def scope(self):
+        """适用范围：quota / model_group / global"""
+        if self.quota_id:
+            return 'quota'
+        if self.model_group_id:
+            return 'model_group'
+        return 'global'
+    
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        
+        if self.quota_id and self.model_group_id:
+            raise ValidationError('配额和模型组只能指定一个')
+        if self.scope != 'global' and self.target not in self.SCOPED_TARGETS:
+            raise ValidationError(f'{self.get_target_display()}只支持全局策略')
+        if self.action == 'strip_payload' and self.target not in self.PAYLOAD_FIELDS:
+            raise ValidationError(f'{self.get_target_display()}没有可清空的载荷')
@@ -0,0 +1,198 @@
+"""
+请求日志分页
+
+按 (created_at, id) 做键集（游标）分页：每一页都是一次带范围条件的索引扫描，
+不执行 COUNT(*) 和 OFFSET，翻到第几页的成本都一样。
+总数默认不返回，可通过 count=approximate（PostgreSQL 上取查询计划的估算行数）
+或 count=exact 显式请求。传入 page 参数时退回原有的页码分页（越界的页码与原接口一样取最近的有效页）。
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def approximate_count(queryset):
+    """
+    估算查询结果行数
+    PostgreSQL 上读取 EXPLAIN 的估算值，不扫描数据；其他数据库退回精确计数
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.order_by().values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class LegacyRequestLogPagination(PageNumberPagination):
+    """页码分页（兼容模式）"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # 与原有接口一致：无效或越界的页码用 Paginator.get_page 取最近的有效页，而不是返回 404
+        self.request = request
+        paginator = self.django_paginator_class(queryset, self.get_page_size(request))
+        self.page = paginator.get_page(request.query_params.get(self.page_query_param))
+        return list(self.page)
+
+
+class RequestLogPagination(BasePagination):
+    """请求日志键集分页器，按 created_at、id 倒序"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = '无效的游标'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.legacy = None
+        if 'page' in request.query_params:
+            self.legacy = LegacyRequestLogPagination()
+            return self.legacy.paginate_queryset(queryset, request, view)
+
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        self.count, self.count_type = self.get_count(queryset, request)
+
+        # 冗余的 created_at 单边条件让数据库可以直接定位到索引中的游标位置
+        if position is None:
+            queryset = queryset.order_by('-created_at', '-id')
+        else:
+            created_at, pk = position
+            if reverse:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk),
+                    created_at__gte=created_at,
+                ).order_by('created_at', 'id')
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk),
+                    created_at__lte=created_at,
+                ).order_by('-created_at', '-id')
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_previous = has_more
+            self.has_next = True
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_count(self, queryset, request):
+        count_type = request.query_params.get(self.count_query_param)
+        if count_type == 'exact':
+            return queryset.count(), count_type
+        if count_type == 'approximate':
+            return approximate_count(queryset), count_type
+        return None, None
+
+    def encode_cursor(self, instance, reverse=False):
+        payload = f"{instance.created_at.isoformat()}|{instance.pk}|{int(reverse)}"
+        return urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            created_at, pk, reverse = urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8').split('|')
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+            reverse = bool(int(reverse))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return (created_at, pk), reverse
+
+    def get_next_cursor(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_cursor(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.get_next_cursor())
+
+    def get_previous_link(self):
+        return self._link(self.get_previous_cursor())
+
+    def get_pagination_info(self):
+        """分页信息（用于嵌入在自定义响应中）"""
+        if self.legacy is not None:
+            page = self.legacy.page
+            return {
+                'count': page.paginator.count,
+                'page': page.number,
+                'pages': page.paginator.num_pages,
+                'has_next': page.has_next(),
+                'has_previous': page.has_previous(),
+            }
+
+        info = {
+            'page_size': self.page_size,
+            'next_cursor': self.get_next_cursor(),
+            'previous_cursor': self.get_previous_cursor(),
+            'has_next': self.has_next,
+            'has_previous': self.has_previous,
+        }
+        if self.count_type:
+            info['count'] = self.count
+            info['count_type'] = self.count_type
+        return info
+
+    def get_paginated_response(self, data):
+        if self.legacy is not None:
+            return self.legacy.get_paginated_response(data)
+
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count_type:
+            response['count'] = self.count
+            response['count_type'] = self.count_type
+        return Response(response)
@@ -0,0 +1,322 @@
+"""
+api_requests 时间分区（仅 PostgreSQL）
+
+按 created_at 对 api_requests 做按月或按日的范围分区：
+convert_to_partitioned 把现有表改名为 api_requests_legacy，作为第一个分区挂到新的分区表下；
+ensure_partitions 预先创建后续周期的分区；detach_partitions 分离（并可删除）早于指定日期的分区，
+删除一个月的数据只是一次 DETACH + DROP TABLE，不需要逐行 DELETE（只能删除已汇总的分区）。
+带 created_at 条件的查询（get_all_requests 的 since/until、统计、计费结算、导出）由 PostgreSQL 自动裁剪分区。
+"""
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import APIRequest, ProcessingWatermark
+from .rollups import ROLLUP_WATERMARK, record_purged
+
+PARENT_TABLE = APIRequest._meta.db_table
+LEGACY_TABLE = f'{PARENT_TABLE}_legacy'
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+BOUND_CHECK = f'{PARENT_TABLE}_partition_bound_check'
+GRANULARITIES = ('month', 'day')
+
+BOUND_PATTERN = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+class PartitionError(Exception):
+    """分区操作错误"""
+
+
+@dataclass(frozen=True)
+class Partition:
+    """一个范围分区，start/end 为 None 表示 MINVALUE/MAXVALUE"""
+    name: str
+    start: Optional[datetime]
+    end: Optional[datetime]
+
+    def overlaps(self, other):
+        return (
+            (self.end is None or other.start is None or other.start < self.end)
+            and (other.end is None or self.start is None or self.start < other.end)
+        )
+
+
+def get_granularity(granularity=None):
+    granularity = granularity or getattr(settings, 'API_REQUESTS_PARTITION_GRANULARITY', 'month')
+    if granularity not in GRANULARITIES:
+        raise PartitionError(f"不支持的分区粒度: {granularity}，可选值: {', '.join(GRANULARITIES)}")
+    return granularity
+
+
+def period_start(day, granularity):
+    """日期所在周期的第一天"""
+    return day.replace(day=1) if granularity == 'month' else day
+
+
+def next_period(start, granularity):
+    """下一个周期的第一天"""
+    if granularity == 'month':
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+
+def local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+
+
+def partition_name(start, granularity):
+    suffix = start.strftime('%Y%m') if granularity == 'month' else start.strftime('%Y%m%d')
+    return f'{PARENT_TABLE}_p{suffix}'
+
+
+def plan_partitions(first_day, last_day, granularity):
+    """覆盖 [first_day, last_day] 所有周期的分区（本地时区边界）"""
+    partitions = []
+    start = period_start(first_day, granularity)
+    while start <= last_day:
+        end = next_period(start, granularity)
+        partitions.append(Partition(partition_name(start, granularity), local_midnight(start), local_midnight(end)))
+        start = end
+    return partitions
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _bound_literal(value, minmax):
+    return minmax if value is None else f"'{value.isoformat()}'"
+
+
+def create_partition_sql(partition):
+    return (
+        f'CREATE TABLE IF NOT EXISTS {_quote(partition.name)} PARTITION OF {_quote(PARENT_TABLE)} '
+        f'FOR VALUES FROM ({_bound_literal(partition.start, "MINVALUE")}) '
+        f'TO ({_bound_literal(partition.end, "MAXVALUE")})'
+    )
+
+
+def parse_bound(name, expression):
+    """解析 pg_get_expr(relpartbound) 的结果，默认分区返回 None"""
+    match = BOUND_PATTERN.search(expression)
+    if match is None:
+        return None
+
+    def parse(value):
+        value = value.strip()
+        if value in ('MINVALUE', 'MAXVALUE'):
+            return None
+        return datetime.fromisoformat(value.strip("'"))
+
+    return Partition(name, parse(match.group(1)), parse(match.group(2)))
+
+
+def is_partitioned():
+    """api_requests 是否已经是分区表"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [PARENT_TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def _require_partitioned():
+    if not is_partitioned():
+        raise PartitionError(f'{PARENT_TABLE} 尚未分区（需要 PostgreSQL 并先执行转换）')
+
+
+def list_partitions():
+    """列出所有范围分区（不含默认分区），按起始时间排序"""
+    _require_partitioned()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s AND pg_table_is_visible(p.oid)",
+            [PARENT_TABLE]
+        )
+        partitions = [parse_bound(name, expression) for name, expression in cursor.fetchall()]
+    partitions = [partition for partition in partitions if partition is not None]
+    return sorted(partitions, key=lambda partition: partition.start or datetime.min.replace(tzinfo=timezone.utc))
+
+
+def ensure_partitions(ahead=None, granularity=None, today=None):
+    """创建当前周期及之后 ahead 个周期的分区，返回新建的分区名"""
+    granularity = get_granularity(granularity)
+    ahead = getattr(settings, 'API_REQUESTS_PARTITIONS_AHEAD', 3) if ahead is None else ahead
+    today = today or timezone.localdate()
+
+    last_day = period_start(today, granularity)
+    for _ in range(ahead):
+        last_day = next_period(last_day, granularity)
+
+    existing = list_partitions()
+    created = []
+    with connection.cursor() as cursor:
+        for partition in plan_partitions(today, last_day, granularity):
+            if any(partition.overlaps(current) for current in existing):
+                continue
+            cursor.execute(create_partition_sql(partition))
+            existing.append(partition)
+            created.append(partition.name)
+    return created
+
+
+def _partition_summary(cursor, partition):
+    """分区中汇总水位线之后的记录数和最晚的创建时间"""
+    cursor.execute(
+        f'SELECT count(*) FILTER (WHERE id > %s), max(created_at) FROM {_quote(partition.name)}',
+        [ProcessingWatermark.current(ROLLUP_WATERMARK)]
+    )
+    return cursor.fetchone()
+
+
+def detach_partitions(before, drop=False, concurrently=False):
+    """
+    分离结束时间不晚于 before（本地日期零点）的分区，drop 为 True 时同时删除
+    concurrently 需要 PostgreSQL 14+，且不能在事务中执行
+
+    删除前要求分区中的记录都已汇总（否则使用统计会丢失这些请求，抛出 PartitionError，不做任何修改），
+    并和保留策略一样记录删除水位，之后覆盖这段时间的重算、重新计价和账单结算会被拒绝。
+    转换时挂载的 legacy 分区范围是 [MINVALUE, 转换时的边界)，只能整体删除，不能按月删除。
+    """
+    cutoff = local_midnight(before)
+    partitions = [
+        partition for partition in list_partitions()
+        if partition.end is not None and partition.end <= cutoff
+    ]
+    detached = []
+    with connection.cursor() as cursor:
+        if drop:
+            for partition in partitions:
+                pending, _ = _partition_summary(cursor, partition)
+                if pending:
+                    raise PartitionError(
+                        f'分区 {partition.name} 中还有 {pending} 条请求记录未汇总，请先执行 rollup_usage 再删除'
+                    )
+        for partition in partitions:
+            cursor.execute(
+                f'ALTER TABLE {_quote(PARENT_TABLE)} DETACH PARTITION {_quote(partition.name)}'
+                + (' CONCURRENTLY' if concurrently else '')
+            )
+            if drop:
+                with transaction.atomic():
+                    _, last_created_at = _partition_summary(cursor, partition)
+                    record_purged(last_created_at)
+                    cursor.execute(f'DROP TABLE {_quote(partition.name)}')
+            detached.append(partition.name)
+    return detached
+
+
+def bound_check_sql(boundary):
+    """与 legacy 分区范围 [MINVALUE, boundary) 等价的 CHECK 约束，先 NOT VALID 添加，不扫描表"""
+    return (
+        f'ALTER TABLE {_quote(PARENT_TABLE)} ADD CONSTRAINT {_quote(BOUND_CHECK)} '
+        f"CHECK (created_at IS NOT NULL AND created_at < {_bound_literal(boundary, 'MAXVALUE')}) NOT VALID"
+    )
+
+
+def convert_to_partitioned(granularity=None):
+    """
+    把现有的 api_requests 转换为分区表
+    原表改名为 api_requests_legacy，以 [MINVALUE, 下一周期起点) 的范围挂载为第一个分区，不复制数据；
+    主键变为 (id, created_at)，request_id 的唯一约束变为 (request_id, created_at)
+
+    ATTACH PARTITION 默认会在 ACCESS EXCLUSIVE 锁下全表扫描校验分区范围。
+    因此先以 NOT VALID 添加等价的 CHECK 约束，再在单独的事务中 VALIDATE
+    （只持有 SHARE UPDATE EXCLUSIVE 锁，不阻塞读写），挂载时 PostgreSQL 据此跳过扫描。
+    """
+    if connection.vendor != 'postgresql':
+        raise PartitionError('分区仅支持 PostgreSQL')
+    if is_partitioned():
+        raise PartitionError(f'{PARENT_TABLE} 已经是分区表')
+    granularity = get_granularity(granularity)
+
+    parent = _quote(PARENT_TABLE)
+    legacy = _quote(LEGACY_TABLE)
+    sequence = f'{PARENT_TABLE}_id_seq'
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT max(created_at) FROM {parent}')
+        max_created_at = cursor.fetchone()[0]
+    # 边界取数据和今天中较晚者所在周期的下一周期起点，转换期间的新写入仍满足约束
+    last_day = max(timezone.localdate(max_created_at), timezone.localdate()) if max_created_at else timezone.localdate()
+    boundary = local_midnight(next_period(period_start(last_day, granularity), granularity))
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {parent} DROP CONSTRAINT IF EXISTS {_quote(BOUND_CHECK)}')
+        cursor.execute(bound_check_sql(boundary))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {parent} VALIDATE CONSTRAINT {_quote(BOUND_CHECK)}')
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {parent} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'SELECT max(id) FROM {parent}')
+        max_id = cursor.fetchone()[0]
+
+        cursor.execute(
+            "SELECT attidentity FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'id'",
+            [PARENT_TABLE]
+        )
+        is_identity = cursor.fetchone()[0] != ''
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [PARENT_TABLE])
+        serial_sequence = cursor.fetchone()[0]
+
+        # 普通索引（约束自带的索引除外）和外键，需要在新表上重建
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s "
+            "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)",
+            [PARENT_TABLE, PARENT_TABLE]
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [PARENT_TABLE]
+        )
+        foreign_keys = cursor.fetchall()
+
+        cursor.execute(f'ALTER TABLE {parent} RENAME TO {legacy}')
+        for name, _ in indexes:
+            cursor.execute(f'ALTER INDEX {_quote(name)} RENAME TO {_quote(name[:55] + "_legacy")}')
+
+        if is_identity:
+            cursor.execute(f'ALTER TABLE {legacy} ALTER COLUMN id DROP IDENTITY')
+            cursor.execute(f'CREATE SEQUENCE {_quote(sequence)} START WITH {(max_id or 0) + 1}')
+        cursor.execute(f'CREATE TABLE {parent} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)')
+        if is_identity:
+            cursor.execute(f"ALTER TABLE {parent} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+            cursor.execute(f'ALTER SEQUENCE {_quote(sequence)} OWNED BY {parent}.id')
+        elif serial_sequence:
+            cursor.execute(f'ALTER SEQUENCE {serial_sequence} OWNED BY {parent}.id')
+
+        cursor.execute(f'ALTER TABLE {parent} ADD PRIMARY KEY (id, created_at)')
+        cursor.execute(
+            f'ALTER TABLE {parent} ADD CONSTRAINT {_quote(PARENT_TABLE + "_request_id_created_at_uniq")} '
+            f'UNIQUE (request_id, created_at)'
+        )
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {parent} ADD CONSTRAINT {_quote(name)} {definition}')
+        # 索引定义中的表名仍为 api_requests，此时指向新的分区表；挂载分区时会复用同结构的旧索引
+        for _, definition in indexes:
+            cursor.execute(definition)
+
+        cursor.execute(
+            f'ALTER TABLE {parent} ATTACH PARTITION {legacy} '
+            f'FOR VALUES FROM (MINVALUE) TO ({_bound_literal(boundary, "MAXVALUE")})'
+        )
+        # 分区约束已经保证范围，CHECK 约束不再需要
+        cursor.execute(f'ALTER TABLE {legacy} DROP CONSTRAINT {_quote(BOUND_CHECK)}')
+        # 默认分区兜底，避免预建分区不足时写入失败
+        cursor.execute(f'CREATE TABLE {_quote(DEFAULT_PARTITION)} PARTITION OF {parent} DEFAULT')
+
+    return ensure_partitions(granularity=granularity)
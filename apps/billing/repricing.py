@@ -0,0 +1,227 @@
+"""
+历史请求重新计价
+
+提供商事后修正价格或同步导入了错误价格时，按新价格重新计算某个模型在时间范围 [start, end) 内
+的 APIRequest 成本，并按差额调整相关配额的 used_quota。
+
+成本在数据库中按ID区间分块用 UPDATE 直接计算（整数纳美元，与计价引擎的舍入一致），
+不把记录读到 Python；每块单独提交，已处理的差额和进度记录在水位线中，
+以相同参数再次执行会从中断处继续。全部完成后为每个配额写一条 reprice 调整日志，
+并重算受影响用户在这些日期的使用量汇总和相关计数器。
+受影响用户在范围内有已冷归档或已删除的记录时只能预览，不能执行（汇总无法按数据库中的记录重算）。
+"""
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, Count, DecimalField, F, Max, Sum, Value, When
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from apps.ai_models.pricing import ModelPrice, TOKENS_PER_PRICE_UNIT, dollars_to_nanos, nanos_to_dollars
+from apps.quotas.models import UserQuota, QuotaUsageLog, QuotaUsageCounter
+from .models import APIRequest, ProcessingWatermark, UserUsageCounter
+from .rollups import rebuild_range, ensure_rebuildable
+
+logger = logging.getLogger(__name__)
+
+NANOS_FACTOR = Value(Decimal('0.000000001'), output_field=DecimalField(max_digits=10, decimal_places=9))
+
+
+@dataclass
+class RepriceResult:
+    """一次重新计价的结果（成本单位为纳美元）"""
+    requests: int = 0
+    chunks: int = 0
+    old_cost_nanos: int = 0
+    new_cost_nanos: int = 0
+    # (user_id, model_group_id) -> 成本差额
+    deltas: dict = field(default_factory=dict)
+    adjusted_quotas: int = 0
+    finished: bool = False
+    dry_run: bool = True
+
+    @property
+    def delta_nanos(self):
+        return self.new_cost_nanos - self.old_cost_nanos
+
+
+def watermark_name(model, start, end, price):
+    key = f'{model.pk}|{start.isoformat()}|{end.isoformat()}|{price.input_nanos_per_1m}|{price.output_nanos_per_1m}'
+    return f'reprice:{hashlib.sha1(key.encode()).hexdigest()[:20]}'
+
+
+def _token_cost(tokens_field, price_nanos):
+    """SQL 中的 tokens × 单价 / 1M（四舍五入），与 pricing.token_cost_nanos 一致"""
+    return (
+        F(tokens_field) * Value(price_nanos, output_field=BigIntegerField())
+        + Value(TOKENS_PER_PRICE_UNIT // 2, output_field=BigIntegerField())
+    ) / Value(TOKENS_PER_PRICE_UNIT, output_field=BigIntegerField())
+
+
+def _to_dollars(nanos):
+    return Round(nanos * NANOS_FACTOR, 6, output_field=DecimalField(max_digits=20, decimal_places=6))
+
+
+def _cost_expressions(price):
+    input_nanos = _token_cost('input_tokens', price.input_nanos_per_1m)
+    output_nanos = _token_cost('output_tokens', price.output_nanos_per_1m)
+    return input_nanos, output_nanos
+
+
+def _pair_costs(queryset, price):
+    """按 (用户, 模型组) 汇总重新计价前后的成本"""
+    input_nanos, output_nanos = _cost_expressions(price)
+    rows = queryset.order_by().values('user_id', 'model_group_id').annotate(
+        requests=Count('id'),
+        old_cost=Sum('total_cost_nanos'),
+        new_cost=Sum(input_nanos + output_nanos, output_field=BigIntegerField()),
+    )
+    return {(row['user_id'], row['model_group_id']): row for row in rows}
+
+
+def _merge_pair_costs(result, pairs):
+    for key, row in pairs.items():
+        result.requests += row['requests']
+        result.old_cost_nanos += row['old_cost'] or 0
+        result.new_cost_nanos += row['new_cost'] or 0
+        delta = (row['new_cost'] or 0) - (row['old_cost'] or 0)
+        if delta:
+            result.deltas[key] = result.deltas.get(key, 0) + delta
+
+
+def _encode_deltas(deltas):
+    return {f'{user_id}:{model_group_id or ""}': delta for (user_id, model_group_id), delta in deltas.items()}
+
+
+def _decode_deltas(encoded):
+    deltas = {}
+    for key, delta in encoded.items():
+        user_id, model_group_id = key.split(':')
+        deltas[(int(user_id), int(model_group_id) if model_group_id else None)] = delta
+    return deltas
+
+
+def adjust_quotas(deltas, note=''):
+    """把成本差额计入配额的 used_quota，每个配额写一条调整日志，返回调整的配额数"""
+    quotas = {
+        (quota.user_id, quota.model_group_id): quota
+        for quota in UserQuota.objects.filter(
+            deleted_at__isnull=True,
+            user_id__in={user_id for user_id, _ in deltas},
+        )
+    }
+    amounts = {}
+    for key, delta in deltas.items():
+        quota = quotas.get(key)
+        if quota is None:
+            logger.warning(f"No quota for user {key[0]} / model group {key[1]}, skipped adjustment of {delta} nanos")
+            continue
+        amount = nanos_to_dollars(delta)
+        if amount:
+            amounts[quota.id] = amount
+    if not amounts:
+        return 0
+
+    with transaction.atomic():
+        UserQuota.objects.filter(id__in=amounts).update(used_quota=F('used_quota') + Case(
+            *[When(id=quota_id, then=Value(amount)) for quota_id, amount in amounts.items()],
+            output_field=DecimalField(max_digits=10, decimal_places=6),
+        ))
+        remaining = dict(
+            UserQuota.objects.filter(id__in=amounts).values_list('id', F('total_quota') - F('used_quota'))
+        )
+        QuotaUsageLog.objects.bulk_create([
+            QuotaUsageLog(
+                quota_id=quota_id,
+                action='reprice',
+                amount=amount,
+                remaining=remaining[quota_id],
+                notes=note,
+            )
+            for quota_id, amount in amounts.items()
+        ])
+    return len(amounts)
+
+
+def _refresh_derived(start, end, deltas):
+    """重算受影响日期的使用量汇总和相关的计数器"""
+    user_ids = {user_id for user_id, _ in deltas}
+    rebuild_range(timezone.localdate(start), timezone.localdate(end - timedelta(microseconds=1)), user_ids=user_ids)
+    for quota in UserQuota.objects.filter(deleted_at__isnull=True, user_id__in=user_ids):
+        if (quota.user_id, quota.model_group_id) in deltas:
+            QuotaUsageCounter.rebuild(quota)
+    for user in get_user_model().objects.filter(id__in=user_ids):
+        UserUsageCounter.rebuild(user)
+
+
+def reprice_requests(model, start, end, input_price_per_1m, output_price_per_1m,
+                     chunk_size=10000, dry_run=True, max_chunks=None, note=''):
+    """
+    按新价格（$/1M tokens）重新计算模型在 [start, end) 内的请求成本
+    dry_run 时只统计影响的请求数和成本差额，不修改数据
+    """
+    price = ModelPrice(dollars_to_nanos(input_price_per_1m), dollars_to_nanos(output_price_per_1m))
+    requests = APIRequest.objects.filter(model=model, created_at__gte=start, created_at__lt=end)
+    result = RepriceResult(dry_run=dry_run)
+
+    if dry_run:
+        _merge_pair_costs(result, _pair_costs(requests, price))
+        result.finished = True
+        return result
+
+    user_ids = set(requests.order_by().values_list('user_id', flat=True).distinct())
+    ensure_rebuildable(timezone.localdate(start), user_ids=user_ids)
+    name = watermark_name(model, start, end, price)
+    watermark, _ = ProcessingWatermark.objects.get_or_create(name=name)
+    details = watermark.details or {}
+    result.requests = details.get('requests', 0)
+    result.old_cost_nanos = details.get('old_cost_nanos', 0)
+    result.new_cost_nanos = details.get('new_cost_nanos', 0)
+    result.deltas = _decode_deltas(details.get('deltas', {}))
+
+    input_nanos, output_nanos = _cost_expressions(price)
+    cursor = watermark.last_id
+    while True:
+        pending = requests.filter(id__gt=cursor).order_by('id')
+        upper = pending.values_list('id', flat=True)[chunk_size - 1:chunk_size].first()
+        if upper is None:
+            upper = pending.aggregate(max_id=Max('id'))['max_id']
+        if upper is None:
+            break
+        if max_chunks is not None and result.chunks >= max_chunks:
+            return result
+        chunk = requests.filter(id__gt=cursor, id__lte=upper)
+
+        with transaction.atomic():
+            _merge_pair_costs(result, _pair_costs(chunk, price))
+            chunk.update(
+                input_cost_nanos=input_nanos,
+                output_cost_nanos=output_nanos,
+                total_cost_nanos=input_nanos + output_nanos,
+                input_cost=_to_dollars(input_nanos),
+                output_cost=_to_dollars(output_nanos),
+                total_cost=_to_dollars(input_nanos + output_nanos),
+            )
+            ProcessingWatermark.objects.filter(name=name).update(last_id=upper, details={
+                'requests': result.requests,
+                'old_cost_nanos': result.old_cost_nanos,
+                'new_cost_nanos': result.new_cost_nanos,
+                'deltas': _encode_deltas(result.deltas),
+            })
+
+        cursor = upper
+        result.chunks += 1
+        logger.info(f"Repriced requests of model {model.pk} up to id {upper}")
+
+    with transaction.atomic():
+        result.adjusted_quotas = adjust_quotas(result.deltas, note=note)
+        ProcessingWatermark.objects.filter(name=name).delete()
+    if result.deltas:
+        _refresh_derived(start, end, result.deltas)
+    result.finished = True
+    return result
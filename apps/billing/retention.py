@@ -0,0 +1,167 @@
+"""
+数据保留清理
+
+按 RetentionPolicy 删除过期记录或清空其载荷：
+每批先按主键顺序取出至多 batch_size 个ID，再按ID删除/更新，每批单独提交并在批次之间休眠，
+避免长事务锁表和大量WAL集中写入，不影响请求写入的延迟。
+每批提交后把进度记录在水位线中，中断后从上次位置继续；一轮处理完成后重置进度。
+
+同一数据表、同一处理方式下，更具体的策略优先：配额策略覆盖的记录不受模型组策略和全局策略影响，
+模型组策略覆盖的记录不受全局策略影响。
+删除API请求记录时只处理已被使用量汇总处理过的记录，汇总统计不受影响；
+同时按策略范围记录已删除记录中最晚的创建时间，该范围内此前的日期不再允许按数据库重算汇总和计费。
+"""
+import logging
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q, Max
+from django.utils import timezone
+
+from apps.apis.models import APIProviderLog
+from apps.quotas.models import QuotaUsageLog
+from .models import APIRequest, RetentionPolicy, ProcessingWatermark
+from .rollups import ROLLUP_WATERMARK, record_purged
+
+logger = logging.getLogger(__name__)
+
+TARGET_MODELS = {
+    'api_requests': APIRequest,
+    'quota_usage_logs': QuotaUsageLog,
+    'provider_logs': APIProviderLog,
+}
+
+SCOPE_ORDER = {'quota': 0, 'model_group': 1, 'global': 2}
+
+
+@dataclass
+class RetentionResult:
+    """一个策略一次执行的结果"""
+    policy_id: int
+    rows: int = 0
+    batches: int = 0
+    finished: bool = False
+
+
+def watermark_name(policy):
+    return f'retention:{policy.pk}'
+
+
+def _quota_q(target, quota):
+    if target == 'api_requests':
+        # 与 UserQuota.get_all_requests 口径一致
+        return Q(user_id=quota.user_id, model_group_id=quota.model_group_id)
+    return Q(quota_id=quota.id)
+
+
+def _model_group_q(target, model_group_id):
+    if target == 'api_requests':
+        return Q(model_group_id=model_group_id)
+    return Q(quota__model_group_id=model_group_id)
+
+
+def policy_queryset(policy, now=None):
+    """策略当前需要处理的记录"""
+    now = now or timezone.now()
+    model = TARGET_MODELS[policy.target]
+    queryset = model.objects.filter(created_at__lt=now - timedelta(days=policy.retention_days))
+
+    narrower = RetentionPolicy.objects.filter(
+        target=policy.target, action=policy.action, is_active=True
+    ).exclude(pk=policy.pk).select_related('quota')
+
+    if policy.scope == 'quota':
+        queryset = queryset.filter(_quota_q(policy.target, policy.quota))
+    elif policy.scope == 'model_group':
+        queryset = queryset.filter(_model_group_q(policy.target, policy.model_group_id))
+        for other in narrower.filter(quota__model_group_id=policy.model_group_id):
+            queryset = queryset.exclude(_quota_q(policy.target, other.quota))
+    else:
+        for other in narrower.exclude(quota__isnull=True, model_group__isnull=True):
+            if other.scope == 'quota':
+                queryset = queryset.exclude(_quota_q(policy.target, other.quota))
+            else:
+                queryset = queryset.exclude(_model_group_q(policy.target, other.model_group_id))
+
+    if policy.action == 'strip_payload':
+        # 跳过载荷已清空的记录
+        stripped = Q()
+        for field, value in RetentionPolicy.PAYLOAD_FIELDS[policy.target].items():
+            stripped &= Q(**{field: value})
+        queryset = queryset.exclude(stripped)
+    elif policy.target == 'api_requests':
+        queryset = queryset.filter(id__lte=ProcessingWatermark.current(ROLLUP_WATERMARK))
+
+    return queryset
+
+
+def _purge_scope(policy):
+    """策略删除的API请求所在的范围 (user_id, model_group_id)，None 表示不限"""
+    if policy.scope == 'quota':
+        return policy.quota.user_id, policy.quota.model_group_id
+    if policy.scope == 'model_group':
+        return None, policy.model_group_id
+    return None, None
+
+
+def apply_policy(policy, batch_size=1000, sleep_seconds=0.05, max_batches=None, now=None, progress=None):
+    """
+    执行一个保留策略
+    progress 为每批完成后的回调 progress(policy, result)
+    """
+    model = TARGET_MODELS[policy.target]
+    name = watermark_name(policy)
+    queryset = policy_queryset(policy, now)
+    result = RetentionResult(policy_id=policy.pk)
+    cursor = ProcessingWatermark.current(name)
+
+    while max_batches is None or result.batches < max_batches:
+        ids = list(queryset.filter(id__gt=cursor).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            result.finished = True
+            ProcessingWatermark.objects.filter(name=name).delete()
+            break
+
+        with transaction.atomic():
+            batch = model.objects.filter(id__in=ids)
+            if policy.action == 'delete':
+                if policy.target == 'api_requests':
+                    record_purged(batch.aggregate(last=Max('created_at'))['last'], *_purge_scope(policy))
+                rows, _ = batch.delete()
+            else:
+                rows = batch.update(**RetentionPolicy.PAYLOAD_FIELDS[policy.target])
+            ProcessingWatermark.objects.update_or_create(
+                name=name,
+                defaults={'last_id': ids[-1], 'details': {'rows': result.rows + rows}}
+            )
+
+        cursor = ids[-1]
+        result.rows += rows
+        result.batches += 1
+        if progress:
+            progress(policy, result)
+        if sleep_seconds:
+            time.sleep(sleep_seconds)
+
+    policy.last_run_at = timezone.now()
+    policy.last_run_rows = result.rows
+    policy.save(update_fields=['last_run_at', 'last_run_rows'])
+    logger.info(f"Retention policy {policy.pk} processed {result.rows} rows in {result.batches} batches")
+    return result
+
+
+def active_policies():
+    """按 配额 → 模型组 → 全局 的顺序返回启用的策略"""
+    policies = RetentionPolicy.objects.filter(is_active=True).select_related('quota')
+    return sorted(policies, key=lambda policy: (SCOPE_ORDER[policy.scope], policy.id))
+
+
+def apply_retention(batch_size=1000, sleep_seconds=0.05, max_batches=None, progress=None):
+    """执行所有启用的保留策略"""
+    return [
+        apply_policy(policy, batch_size=batch_size, sleep_seconds=sleep_seconds,
+                     max_batches=max_batches, progress=progress)
+        for policy in active_policies()
+    ]
@@ -0,0 +1,368 @@
+"""
+使用量增量汇总
+
+按API请求ID水位线把新的 APIRequest 增量汇总到 UsageStatistics（用户×模型）、
+ModelGroupUsageLog（模型组×用户×模型）和 LatencySketch（模型的耗时分位数草图）的小时桶和日桶中。
+桶的增量写入与水位线推进在同一事务内完成，每条记录只会被汇总一次；
+回填或修改了历史记录时，可以用 rebuild_range 重新计算指定日期范围。
+已冷归档或被保留策略删除的记录不在数据库中，覆盖这些记录的日期不能重算，否则汇总数据会丢失。
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import Count, Sum, Q, Max
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.ai_models.pricing import nanos_to_dollars
+from apps.groups.models import ModelGroupUsageLog
+from .models import APIRequest, UsageStatistics, LatencySketch, ProcessingWatermark, ArchiveSegment
+from .sketches import bucket_index_expression
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_WATERMARK = 'usage_rollup'
+# 被删除的API请求中最晚的创建时间，按 用户×模型组 范围分别记录在 details['last_created_at']
+PURGE_WATERMARK = 'api_requests_purged'
+
+
+class RebuildRangeError(ValueError):
+    """重算范围覆盖了已归档或已删除的请求记录"""
+
+
+@dataclass
+class RollupResult:
+    """一次汇总运行的结果"""
+    rows: int = 0
+    batches: int = 0
+    last_id: int = 0
+
+
+def _aggregate_requests(queryset):
+    """按 用户×模型×模型组×小时 聚合请求（本地时区）"""
+    return (
+        queryset.order_by()
+        .annotate(bucket=TruncHour('created_at'))
+        .values('user_id', 'model_id', 'model_group_id', 'bucket')
+        .annotate(
+            request_count=Count('id'),
+            success_count=Count('id', filter=Q(status_code__range=[200, 299])),
+            input_tokens=Sum('input_tokens'),
+            output_tokens=Sum('output_tokens'),
+            total_tokens=Sum('total_tokens'),
+            total_cost=Sum('total_cost_nanos'),
+            total_duration_ms=Sum('duration_ms'),
+        )
+    )
+
+
+def _fold_groups(groups):
+    """
+    把小时聚合结果展开为小时桶和日桶的增量
+    模型已删除（model 为空）的请求汇总到 model 为空的 UsageStatistics，使汇总与原始记录的合计一致；
+    ModelGroupUsageLog 的模型不能为空，这些请求不计入模型组使用日志
+    """
+    usage_deltas = {}
+    group_deltas = {}
+
+    for row in groups:
+        bucket = timezone.localtime(row['bucket'])
+        day = bucket.date()
+        delta = {
+            'request_count': row['request_count'],
+            'success_count': row['success_count'],
+            'input_tokens': row['input_tokens'] or 0,
+            'output_tokens': row['output_tokens'] or 0,
+            'total_tokens': row['total_tokens'] or 0,
+            'total_cost': nanos_to_dollars(row['total_cost']),
+            'total_duration_ms': row['total_duration_ms'] or 0,
+        }
+        for hour in (bucket.hour, None):
+            _merge(usage_deltas, (row['user_id'], row['model_id'], day, hour), delta)
+            if row['model_id'] is not None and row['model_group_id'] is not None:
+                _merge(group_deltas, (row['model_group_id'], row['user_id'], row['model_id'], day, hour), delta)
+
+    return usage_deltas, group_deltas
+
+
+def _merge(target, key, delta):
+    current = target.setdefault(key, dict.fromkeys(delta, 0))
+    for field, value in delta.items():
+        current[field] += value
+
+
+def _apply_usage_statistics(deltas):
+    """把增量写入 UsageStatistics"""
+    if not deltas:
+        return
+    existing = {}
+    model_ids = {key[1] for key in deltas}
+    model_q = Q(model_id__in=model_ids - {None})
+    if None in model_ids:
+        model_q |= Q(model__isnull=True)
+    candidates = UsageStatistics.objects.filter(
+        model_q,
+        user_id__in={key[0] for key in deltas},
+        date__in={key[2] for key in deltas},
+    )
+    for stat in candidates:
+        existing[(stat.user_id, stat.model_id, stat.date, stat.hour)] = stat
+
+    to_create, to_update = [], []
+    for key, delta in deltas.items():
+        stat = existing.get(key)
+        if stat is None:
+            user_id, model_id, day, hour = key
+            stat = UsageStatistics(user_id=user_id, model_id=model_id, date=day, hour=hour)
+            to_create.append(stat)
+        else:
+            to_update.append(stat)
+        stat.request_count += delta['request_count']
+        stat.success_count += delta['success_count']
+        stat.error_count = stat.request_count - stat.success_count
+        stat.input_tokens += delta['input_tokens']
+        stat.output_tokens += delta['output_tokens']
+        stat.total_tokens += delta['total_tokens']
+        stat.total_cost += delta['total_cost']
+        stat.total_duration_ms += delta['total_duration_ms']
+        stat.avg_duration_ms = stat.total_duration_ms / stat.request_count if stat.request_count else 0
+        stat.updated_at = timezone.now()
+
+    UsageStatistics.objects.bulk_create(to_create)
+    UsageStatistics.objects.bulk_update(to_update, [
+        'request_count', 'success_count', 'error_count', 'input_tokens', 'output_tokens',
+        'total_tokens', 'total_cost', 'total_duration_ms', 'avg_duration_ms', 'updated_at',
+    ])
+
+
+def _apply_group_usage_logs(deltas):
+    """把增量写入 ModelGroupUsageLog"""
+    if not deltas:
+        return
+    existing = {}
+    candidates = ModelGroupUsageLog.objects.filter(
+        group_id__in={key[0] for key in deltas},
+        user_id__in={key[1] for key in deltas},
+        date__in={key[3] for key in deltas},
+    )
+    for log in candidates:
+        existing[(log.group_id, log.user_id, log.model_id, log.date, log.hour)] = log
+
+    to_create, to_update = [], []
+    for key, delta in deltas.items():
+        log = existing.get(key)
+        if log is None:
+            group_id, user_id, model_id, day, hour = key
+            log = ModelGroupUsageLog(group_id=group_id, user_id=user_id, model_id=model_id, date=day, hour=hour)
+            to_create.append(log)
+        else:
+            to_update.append(log)
+        log.request_count += delta['request_count']
+        log.success_count += delta['success_count']
+        log.input_tokens += delta['input_tokens']
+        log.output_tokens += delta['output_tokens']
+        log.total_tokens += delta['total_tokens']
+        log.total_cost += delta['total_cost']
+        log.total_duration_ms += delta['total_duration_ms']
+        log.updated_at = timezone.now()
+
+    ModelGroupUsageLog.objects.bulk_create(to_create)
+    ModelGroupUsageLog.objects.bulk_update(to_update, [
+        'request_count', 'success_count', 'input_tokens', 'output_tokens', 'total_tokens',
+        'total_cost', 'total_duration_ms', 'updated_at',
+    ])
+
+
+def _latency_deltas(queryset):
+    """按 模型×小时×耗时桶 计数，展开为小时和日草图的增量：{(模型, 日期, 小时): (提供商, {桶: 次数})}"""
+    rows = (
+        queryset.filter(model__isnull=False)
+        .order_by()
+        .annotate(bucket=TruncHour('created_at'), bin=bucket_index_expression())
+        .values('model_id', 'model__provider_id', 'bucket', 'bin')
+        .annotate(count=Count('id'))
+    )
+    deltas = {}
+    for row in rows:
+        bucket = timezone.localtime(row['bucket'])
+        for hour in (bucket.hour, None):
+            _, bins = deltas.setdefault((row['model_id'], bucket.date(), hour), (row['model__provider_id'], {}))
+            index = int(row['bin'])
+            bins[index] = bins.get(index, 0) + row['count']
+    return deltas
+
+
+def _apply_latency_sketches(deltas):
+    """把增量合并到 LatencySketch"""
+    if not deltas:
+        return
+    existing = {}
+    candidates = LatencySketch.objects.filter(
+        model_id__in={key[0] for key in deltas},
+        date__in={key[1] for key in deltas},
+    )
+    for row in candidates:
+        existing[(row.model_id, row.date, row.hour)] = row
+
+    to_create, to_update = [], []
+    for key, (provider_id, bins) in deltas.items():
+        row = existing.get(key)
+        if row is None:
+            model_id, day, hour = key
+            row = LatencySketch(model_id=model_id, date=day, hour=hour)
+            to_create.append(row)
+        else:
+            to_update.append(row)
+        sketch = row.sketch()
+        sketch.merge_bins(bins)
+        row.provider_id = provider_id
+        row.count = sketch.count
+        row.bins = sketch.to_json()
+        row.updated_at = timezone.now()
+
+    LatencySketch.objects.bulk_create(to_create)
+    LatencySketch.objects.bulk_update(to_update, ['provider', 'count', 'bins', 'updated_at'])
+
+
+def fold_requests(queryset, with_sketches=True):
+    """把一批请求的聚合结果累加到汇总表"""
+    usage_deltas, group_deltas = _fold_groups(_aggregate_requests(queryset))
+    _apply_usage_statistics(usage_deltas)
+    _apply_group_usage_logs(group_deltas)
+    if with_sketches:
+        _apply_latency_sketches(_latency_deltas(queryset))
+
+
+def run_rollup(batch_size=5000, settle_seconds=5, max_batches=None):
+    """
+    增量汇总新的API请求
+    只处理创建时间早于 settle_seconds 秒前的记录，避免遗漏尚未提交的并发写入
+    """
+    result = RollupResult()
+    while max_batches is None or result.batches < max_batches:
+        cutoff = timezone.now() - timedelta(seconds=settle_seconds)
+        with transaction.atomic():
+            watermark, _ = ProcessingWatermark.objects.select_for_update().get_or_create(name=ROLLUP_WATERMARK)
+            pending = APIRequest.objects.filter(id__gt=watermark.last_id, created_at__lte=cutoff).order_by('id')
+            upper_id = pending.values_list('id', flat=True)[batch_size - 1:batch_size].first()
+            if upper_id is None:
+                upper_id = pending.aggregate(max_id=Max('id'))['max_id']
+            if upper_id is None:
+                result.last_id = watermark.last_id
+                break
+
+            batch = APIRequest.objects.filter(id__gt=watermark.last_id, id__lte=upper_id)
+            rows = batch.count()
+            fold_requests(batch)
+
+            watermark.last_id = upper_id
+            watermark.details = {'last_batch_rows': rows, 'last_run_at': timezone.now().isoformat()}
+            watermark.save()
+
+        result.rows += rows
+        result.batches += 1
+        result.last_id = upper_id
+        logger.info(f"Usage rollup folded {rows} requests up to id {upper_id}")
+
+    return result
+
+
+@dataclass(frozen=True)
+class RemovedScope:
+    """一个范围内已冷归档或已删除的API请求：user_id/model_group_id 为 None 表示不限"""
+    user_id: Optional[int]
+    model_group_id: Optional[int]
+    last_created_at: datetime
+
+    def covers(self, user_ids=None, model_group_ids=None):
+        """是否可能包含指定用户/模型组的请求，参数为 None 表示不限"""
+        return (
+            (self.user_id is None or user_ids is None or self.user_id in user_ids)
+            and (self.model_group_id is None or model_group_ids is None or self.model_group_id in model_group_ids)
+        )
+
+
+def purge_watermark_name(user_id=None, model_group_id=None):
+    return f"{PURGE_WATERMARK}:{user_id or '*'}:{model_group_id or '*'}"
+
+
+def record_purged(last_created_at, user_id=None, model_group_id=None):
+    """记录某个范围内被删除的API请求中最晚的创建时间（需在删除记录的事务中调用）"""
+    if last_created_at is None:
+        return
+    watermark, _ = ProcessingWatermark.objects.select_for_update().get_or_create(
+        name=purge_watermark_name(user_id, model_group_id)
+    )
+    current = watermark.details.get('last_created_at')
+    if current is None or parse_datetime(current) < last_created_at:
+        watermark.details = {'last_created_at': last_created_at.isoformat()}
+        watermark.save()
+
+
+def removed_scopes():
+    """所有已冷归档或已删除请求的范围（归档按用户，删除按保留策略或分区的范围）"""
+    scopes = [
+        # 用户已删除的归档文件无法确定范围，按不限用户处理
+        RemovedScope(row['user_id'], None, row['last'])
+        for row in ArchiveSegment.objects.order_by().values('user_id').annotate(last=Max('last_created_at'))
+    ]
+    purges = ProcessingWatermark.objects.filter(name__startswith=f'{PURGE_WATERMARK}:').values_list('name', 'details')
+    for name, details in purges:
+        user_id, model_group_id = (None if part == '*' else int(part) for part in name.split(':')[1:])
+        scopes.append(RemovedScope(user_id, model_group_id, parse_datetime(details['last_created_at'])))
+    return scopes
+
+
+def removed_requests_until(user_ids=None, model_group_ids=None, scopes=None):
+    """指定用户/模型组（None 表示不限）已冷归档或已删除的API请求中最晚的创建时间，没有时返回 None"""
+    scopes = removed_scopes() if scopes is None else scopes
+    return max(
+        (scope.last_created_at for scope in scopes if scope.covers(user_ids, model_group_ids)),
+        default=None,
+    )
+
+
+def ensure_rebuildable(start_date, user_ids=None, model_group_ids=None):
+    """
+    检查从 start_date（本地日期）起指定用户/模型组的数据能否按数据库中的请求记录重算
+    该日期及之前有相关记录已被归档或删除时抛出 RebuildRangeError
+    """
+    removed = removed_requests_until(user_ids, model_group_ids)
+    if removed is not None and start_date <= timezone.localdate(removed):
+        raise RebuildRangeError(
+            f'{timezone.localdate(removed)} 及之前的请求记录已被归档或删除，'
+            f'不能重算，请从 {timezone.localdate(removed) + timedelta(days=1)} 之后开始'
+        )
+
+
+def rebuild_range(start_date, end_date, user_ids=None):
+    """
+    重新计算 [start_date, end_date] 日期范围（本地日期）的汇总数据
+    用于修正回填或修改过的历史记录；只重算水位线以内的记录，之后的记录留给增量汇总。
+    指定 user_ids 时只重算这些用户的使用统计和模型组使用日志；耗时草图跨用户汇总，保持不变，
+    因此只适用于没有修改耗时的场景（如重新计价）。
+    范围内有相关的已归档或已删除记录时抛出 RebuildRangeError，不修改任何数据
+    """
+    ensure_rebuildable(start_date, user_ids=user_ids)
+    tz = timezone.get_current_timezone()
+    start_dt = timezone.make_aware(datetime.combine(start_date, time.min), tz)
+    end_dt = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min), tz)
+    user_filter = {} if user_ids is None else {'user_id__in': user_ids}
+
+    with transaction.atomic():
+        watermark, _ = ProcessingWatermark.objects.select_for_update().get_or_create(name=ROLLUP_WATERMARK)
+        requests = APIRequest.objects.filter(
+            id__lte=watermark.last_id,
+            created_at__gte=start_dt,
+            created_at__lt=end_dt,
+            **user_filter
+        )
+        UsageStatistics.objects.filter(date__range=[start_date, end_date], **user_filter).delete()
+        ModelGroupUsageLog.objects.filter(date__range=[start_date, end_date], **user_filter).delete()
+        if user_ids is None:
+            LatencySketch.objects.filter(date__range=[start_date, end_date]).delete()
+        fold_requests(requests, with_sketches=user_ids is None)
@@ -1,5 +1,6 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
-from .models import APIRequest, BillingRecord, UsageStatistics, CostAlert
+from .models import APIRequest, BillingRecord, UsageStatistics, CostAlert, RetentionPolicy
 
 
 class APIRequestSerializer(serializers.ModelSerializer):
@@ -112,4 +113,28 @@ class CostAlertSerializer(serializers.ModelSerializer):
         return {
             'id': obj.quota.id,
             'model_group': obj.quota.model_group.name,
-        } 
\ No newline at end of file
+        } 
+
+
+class RetentionPolicySerializer(serializers.ModelSerializer):
+    """数据保留策略序列化器"""
+    scope = serializers.CharField(read_only=True)
+    
+    class Meta:
+        model = RetentionPolicy
+        fields = [
+            'id', 'name', 'target', 'action', 'retention_days', 'model_group', 'quota', 'scope',
+            'is_active', 'last_run_at', 'last_run_rows', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'scope', 'last_run_at', 'last_run_rows', 'created_at', 'updated_at']
+    
+    def validate(self, attrs):
+        data = {}
+        if self.instance:
+            data = {field: getattr(self.instance, field) for field in ('target', 'action', 'model_group', 'quota')}
+        data.update(attrs)
+        try:
+            RetentionPolicy(**data).clean()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
+        return attrs
@@ -0,0 +1,427 @@
+"""
+基于汇总表的使用统计查询
+
+查询区间被拆分为：
+- 完整的自然日：读取日桶（UsageStatistics / ModelGroupUsageLog 中 hour 为空的记录）
+- 区间两端不足一天的完整小时：读取小时桶
+- 区间两端不足一小时的部分：扫描水位线以内的原始请求
+- 水位线之后尚未汇总的请求：扫描原始请求
+各部分互不重叠，合并后即为完整结果。已冷归档的记录（都在水位线以内）在两端不足一小时的部分从归档文件读取
+
+耗时分位数（p50/p95/p99）按同样的拆分合并 LatencySketch 的小时/日草图和原始记录的耗时分桶得到，
+不读取和排序原始耗时；草图按模型汇总，只在不分组或按模型/提供商分组、且只按模型/提供商筛选时提供。
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Sum, Q
+from django.db.models.functions import TruncHour, TruncDay, TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_date
+
+from apps.ai_models.models import AIModel
+from apps.ai_models.pricing import nanos_to_dollars
+from apps.apis.models import APIProvider
+from apps.groups.models import ModelGroup, ModelGroupUsageLog
+from .models import APIRequest, UsageStatistics, LatencySketch, ProcessingWatermark
+from .sketches import DDSketch, bucket_index_expression
+from .rollups import ROLLUP_WATERMARK
+from .archive import FILTER_COLUMNS, archived_segments, iter_archived_rows
+
+GRANULARITIES = ('hour', 'day', 'month')
+GROUP_BY_CHOICES = ('user', 'model', 'provider', 'model_group')
+
+# 各数据源中分组/筛选维度对应的字段
+RAW_FIELDS = {
+    'user': 'user_id',
+    'model': 'model_id',
+    'provider': 'model__provider_id',
+    'model_group': 'model_group_id',
+}
+USAGE_FIELDS = {
+    'user': 'user_id',
+    'model': 'model_id',
+    'provider': 'model__provider_id',
+}
+GROUP_LOG_FIELDS = {
+    'user': 'user_id',
+    'model': 'model_id',
+    'provider': 'model__provider_id',
+    'model_group': 'group_id',
+}
+
+RAW_METRICS = {
+    'requests': Count('id'),
+    'successful_requests': Count('id', filter=Q(status_code__range=[200, 299])),
+    'input_tokens': Sum('input_tokens'),
+    'output_tokens': Sum('output_tokens'),
+    'total_tokens': Sum('total_tokens'),
+    # 按整数纳美元求和，读取时换算为美元
+    'total_cost': Sum('total_cost_nanos'),
+    'duration_ms': Sum('duration_ms'),
+}
+USAGE_METRICS = {
+    'requests': Sum('request_count'),
+    'successful_requests': Sum('success_count'),
+    'input_tokens': Sum('input_tokens'),
+    'output_tokens': Sum('output_tokens'),
+    'total_tokens': Sum('total_tokens'),
+    'total_cost': Sum('total_cost'),
+    'duration_ms': Sum('total_duration_ms'),
+}
+SKETCH_FIELDS = {
+    'model': 'model_id',
+    'provider': 'provider_id',
+}
+GROUP_LOG_METRICS = {
+    'requests': Sum('request_count'),
+    'successful_requests': Sum('success_count'),
+    'input_tokens': Sum('input_tokens'),
+    'output_tokens': Sum('output_tokens'),
+    'total_tokens': Sum('total_tokens'),
+    'total_cost': Sum('total_cost'),
+    'duration_ms': Sum('total_duration_ms'),
+}
+
+NAME_SOURCES = {
+    'user': lambda ids: get_user_model().objects.filter(id__in=ids).values_list('id', 'name'),
+    'model': lambda ids: AIModel.objects.filter(id__in=ids).values_list('id', 'name'),
+    'provider': lambda ids: APIProvider.objects.filter(id__in=ids).values_list('id', 'name'),
+    'model_group': lambda ids: ModelGroup.objects.filter(id__in=ids).values_list('id', 'name'),
+}
+
+RAW_TRUNC = {'hour': TruncHour, 'day': TruncDay, 'month': TruncMonth}
+
+
+class StatisticsQueryError(ValueError):
+    """统计查询参数错误"""
+
+
+@dataclass
+class UsageBucket:
+    """一个统计桶"""
+    requests: int = 0
+    successful_requests: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    total_tokens: int = 0
+    total_cost: Decimal = field(default_factory=lambda: Decimal('0'))
+    duration_ms: int = 0
+
+    def add(self, row):
+        for name in ('requests', 'successful_requests', 'input_tokens', 'output_tokens',
+                     'total_tokens', 'total_cost', 'duration_ms'):
+            value = row.get(name)
+            if value:
+                setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'successful_requests': self.successful_requests,
+            'success_rate': round(self.successful_requests / self.requests * 100, 2) if self.requests else 0,
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'total_tokens': self.total_tokens,
+            'total_cost': float(self.total_cost),
+            'avg_duration_ms': round(self.duration_ms / self.requests, 2) if self.requests else 0,
+        }
+
+
+def _floor_hour(dt):
+    return timezone.localtime(dt).replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_hour(dt):
+    floor = _floor_hour(dt)
+    return floor if floor == dt else floor + timedelta(hours=1)
+
+
+def _floor_day(dt):
+    return _floor_hour(dt).replace(hour=0)
+
+
+def _ceil_day(dt):
+    floor = _floor_day(dt)
+    return floor if floor == dt else floor + timedelta(days=1)
+
+
+def _hour_range_q(start, end):
+    """小时桶 [start, end) 的筛选条件（start/end 为本地整点，None 表示不限）"""
+    q = Q(hour__isnull=False)
+    if start is not None:
+        start = timezone.localtime(start)
+        q &= Q(date__gt=start.date()) | Q(date=start.date(), hour__gte=start.hour)
+    if end is not None:
+        end = timezone.localtime(end)
+        q &= Q(date__lt=end.date()) | Q(date=end.date(), hour__lt=end.hour)
+    return q
+
+
+def _day_range_q(start, end):
+    """日桶 [start, end) 的筛选条件（start/end 为本地零点，None 表示不限）"""
+    q = Q(hour__isnull=True)
+    if start is not None:
+        q &= Q(date__gte=timezone.localtime(start).date())
+    if end is not None:
+        q &= Q(date__lt=timezone.localtime(end).date())
+    return q
+
+
+class UsageStatisticsQuery:
+    """
+    时间范围内的使用统计
+    start/end 为带时区的时间（左闭右开，None 表示不限），
+    granularity 为 hour/day/month，group_by 为 user/model/provider/model_group 或 None，
+    filters 为 {维度: ID} 形式的筛选条件
+    """
+
+    def __init__(self, start=None, end=None, granularity='day', group_by=None, filters=None):
+        if granularity not in GRANULARITIES:
+            raise StatisticsQueryError(f'不支持的时间粒度: {granularity}')
+        if group_by is not None and group_by not in GROUP_BY_CHOICES:
+            raise StatisticsQueryError(f'不支持的分组维度: {group_by}')
+        filters = filters or {}
+        for dimension in filters:
+            if dimension not in GROUP_BY_CHOICES:
+                raise StatisticsQueryError(f'不支持的筛选维度: {dimension}')
+        if start and end and start >= end:
+            raise StatisticsQueryError('开始时间必须早于结束时间')
+
+        self.start = start
+        self.end = end
+        self.granularity = granularity
+        self.group_by = group_by
+        self.filters = filters
+        # 按模型组分组或筛选时只能使用模型组使用日志
+        self.use_group_logs = group_by == 'model_group' or 'model_group' in filters
+        self.with_latency = (group_by is None or group_by in SKETCH_FIELDS) and set(filters) <= set(SKETCH_FIELDS)
+        self._buckets = {}
+        self._sketches = {}
+
+    # 时间段拆分
+
+    def _segments(self):
+        """返回 (数据源, 范围) 列表：'raw' 为水位线内的原始记录，'hour'/'day' 为汇总桶"""
+        start, end = self.start, self.end
+        hour_lo = _ceil_hour(start) if start else None
+        hour_hi = _floor_hour(end) if end else None
+
+        if hour_lo and hour_hi and hour_lo >= hour_hi:
+            return [('raw', (start, end))]
+
+        segments = []
+        if start and start < hour_lo:
+            segments.append(('raw', (start, hour_lo)))
+        if end and hour_hi < end:
+            segments.append(('raw', (hour_hi, end)))
+
+        if self.granularity == 'hour':
+            segments.append(('hour', (hour_lo, hour_hi)))
+            return segments
+
+        day_lo = _ceil_day(hour_lo) if hour_lo else None
+        day_hi = _floor_day(hour_hi) if hour_hi else None
+        if day_lo and day_hi and day_lo >= day_hi:
+            segments.append(('hour', (hour_lo, hour_hi)))
+            return segments
+
+        if hour_lo and hour_lo < day_lo:
+            segments.append(('hour', (hour_lo, day_lo)))
+        if hour_hi and day_hi < hour_hi:
+            segments.append(('hour', (day_hi, hour_hi)))
+        segments.append(('day', (day_lo, day_hi)))
+        return segments
+
+    # 数据读取
+
+    def _dimension_fields(self, field_map):
+        filters = {field_map[dimension]: value for dimension, value in self.filters.items()}
+        key_field = field_map[self.group_by] if self.group_by else None
+        return filters, key_field
+
+    def _period_from_bucket(self, bucket_date, hour):
+        if self.granularity == 'hour':
+            tz = timezone.get_current_timezone()
+            return timezone.make_aware(datetime.combine(bucket_date, time(hour=hour)), tz).isoformat()
+        if self.granularity == 'day':
+            return bucket_date.isoformat()
+        return bucket_date.replace(day=1).isoformat()
+
+    def _period_from_datetime(self, value):
+        local = timezone.localtime(value)
+        if self.granularity == 'hour':
+            return local.isoformat()
+        return local.date().isoformat()
+
+    def _add(self, period, key, row):
+        bucket = self._buckets.setdefault((period, key), UsageBucket())
+        bucket.add(row)
+
+    def _add_latency(self, period, key, bins):
+        sketch = self._sketches.setdefault((period, key), DDSketch())
+        sketch.merge_bins(bins)
+
+    def _read_sketches(self, kind, bounds):
+        filters, key_field = self._dimension_fields(SKETCH_FIELDS)
+        range_q = _hour_range_q(*bounds) if kind == 'hour' else _day_range_q(*bounds)
+        values = ['date', 'hour', 'bins'] + ([key_field] if key_field else [])
+        for row in LatencySketch.objects.filter(range_q, **filters).values(*values):
+            period = self._period_from_bucket(row['date'], row['hour'])
+            self._add_latency(period, row.get(key_field), row['bins'])
+
+    def _read_raw_sketches(self, queryset):
+        """原始记录按耗时桶计数（与汇总口径一致，只统计有模型的请求）"""
+        filters, key_field = self._dimension_fields(RAW_FIELDS)
+        values = ['period', 'bin'] + ([key_field] if key_field else [])
+        rows = (
+            queryset.filter(model__isnull=False, **filters)
+            .order_by()
+            .annotate(period=RAW_TRUNC[self.granularity]('created_at'), bin=bucket_index_expression())
+            .values(*values)
+            .annotate(count=Count('id'))
+        )
+        for row in rows:
+            self._add_latency(self._period_from_datetime(row['period']), row.get(key_field), {row['bin']: row['count']})
+
+    def _read_rollups(self, kind, bounds):
+        if self.use_group_logs:
+            queryset, field_map, metrics = ModelGroupUsageLog.objects.all(), GROUP_LOG_FIELDS, GROUP_LOG_METRICS
+        else:
+            queryset, field_map, metrics = UsageStatistics.objects.all(), USAGE_FIELDS, USAGE_METRICS
+
+        filters, key_field = self._dimension_fields(field_map)
+        range_q = _hour_range_q(*bounds) if kind == 'hour' else _day_range_q(*bounds)
+        values = ['date', 'hour'] + ([key_field] if key_field else [])
+        rows = queryset.filter(range_q, **filters).order_by().values(*values).annotate(**metrics)
+        for row in rows:
+            period = self._period_from_bucket(row['date'], row['hour'])
+            self._add(period, row.get(key_field), row)
+        if self.with_latency:
+            self._read_sketches(kind, bounds)
+
+    def _read_raw(self, queryset):
+        filters, key_field = self._dimension_fields(RAW_FIELDS)
+        if self.use_group_logs:
+            # 与模型组使用日志口径一致：只统计有模型和模型组的请求
+            queryset = queryset.filter(model__isnull=False, model_group__isnull=False)
+        values = ['period'] + ([key_field] if key_field else [])
+        rows = (
+            queryset.filter(**filters)
+            .order_by()
+            .annotate(period=RAW_TRUNC[self.granularity]('created_at'))
+            .values(*values)
+            .annotate(**RAW_METRICS)
+        )
+        for row in rows:
+            row['total_cost'] = nanos_to_dollars(row['total_cost'])
+            self._add(self._period_from_datetime(row['period']), row.get(key_field), row)
+        if self.with_latency:
+            self._read_raw_sketches(queryset)
+
+    def _read_archived(self, bounds):
+        """读取已冷归档的原始记录（仅在存在重叠的归档文件时读取）"""
+        if not archived_segments(*bounds, user=self.filters.get('user')).exists():
+            return
+        key_column = FILTER_COLUMNS[self.group_by] if self.group_by else None
+        columns = [
+            'created_at', 'model_id', 'model_group_id', 'status_code', 'input_tokens', 'output_tokens',
+            'total_tokens', 'total_cost', 'duration_ms',
+        ] + ([key_column] if key_column else [])
+        for values in iter_archived_rows(columns, *bounds, filters=self.filters):
+            record = dict(zip(columns, values))
+            if self.use_group_logs and (record['model_id'] is None or record['model_group_id'] is None):
+                continue
+            local = timezone.localtime(record['created_at'])
+            if self.granularity == 'hour':
+                local = _floor_hour(local)
+            elif self.granularity == 'month':
+                local = local.replace(day=1)
+            period = self._period_from_datetime(local)
+            if self.with_latency and record['model_id'] is not None:
+                self._sketches.setdefault((period, record.get(key_column)), DDSketch()).add(record['duration_ms'])
+            self._add(period, record.get(key_column), {
+                'requests': 1,
+                'successful_requests': 1 if 200 <= record['status_code'] <= 299 else 0,
+                'input_tokens': record['input_tokens'],
+                'output_tokens': record['output_tokens'],
+                'total_tokens': record['total_tokens'],
+                'total_cost': record['total_cost'],
+                'duration_ms': record['duration_ms'],
+            })
+
+    def _time_filter(self, start, end):
+        filters = {}
+        if start is not None:
+            filters['created_at__gte'] = start
+        if end is not None:
+            filters['created_at__lt'] = end
+        return filters
+
+    def execute(self):
+        """执行查询，返回 {'totals': ..., 'series': [...]}"""
+        self._buckets = {}
+        self._sketches = {}
+        watermark = ProcessingWatermark.current(ROLLUP_WATERMARK)
+
+        for kind, bounds in self._segments():
+            if kind == 'raw':
+                self._read_raw(APIRequest.objects.filter(id__lte=watermark, **self._time_filter(*bounds)))
+                self._read_archived(bounds)
+            else:
+                self._read_rollups(kind, bounds)
+
+        # 尚未汇总的请求
+        self._read_raw(APIRequest.objects.filter(id__gt=watermark, **self._time_filter(self.start, self.end)))
+
+        return self._result()
+
+    def _result(self):
+        names = {}
+        if self.group_by:
+            ids = {key for _, key in self._buckets if key is not None}
+            names = dict(NAME_SOURCES[self.group_by](ids)) if ids else {}
+
+        totals = UsageBucket()
+        total_sketch = DDSketch()
+        series = []
+        for (period, key), bucket in sorted(self._buckets.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+            totals.add(bucket.__dict__)
+            entry = {'period': period}
+            if self.group_by:
+                entry['key'] = key
+                entry['name'] = names.get(key)
+            entry.update(bucket.as_dict())
+            if self.with_latency:
+                sketch = self._sketches.get((period, key), DDSketch())
+                total_sketch.merge(sketch)
+                entry['latency_ms'] = sketch.percentiles()
+            series.append(entry)
+
+        result = {'totals': totals.as_dict(), 'series': series}
+        if self.with_latency:
+            result['totals']['latency_ms'] = total_sketch.percentiles()
+        return result
+
+
+def parse_time_bound(value, end=False):
+    """解析查询参数中的时间：支持 ISO 日期时间或日期（结束日期包含当天）"""
+    if not value:
+        return None
+
+    try:
+        parsed_date = parse_date(value)
+        parsed = None if parsed_date else parse_datetime(value)
+    except ValueError:
+        raise StatisticsQueryError(f'无效的时间: {value}')
+
+    if parsed_date is not None:
+        if end:
+            parsed_date += timedelta(days=1)
+        return timezone.make_aware(datetime.combine(parsed_date, time.min))
+
+    if parsed is None:
+        raise StatisticsQueryError(f'无法解析的时间: {value}')
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
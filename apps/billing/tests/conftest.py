@@ -0,0 +1,10 @@
+import pytest
+from apps.billing.factories import APIRequestFactory
+
+
+@pytest.fixture
+def make_request():
+    """创建配额下指定时间的请求记录：make_request(quota, created_at, **字段)"""
+    def make(quota, created_at, **kwargs):
+        return APIRequestFactory(user=quota.user, model_group=quota.model_group, created_at=created_at, **kwargs)
+    return make
@@ -0,0 +1,176 @@
+import json
+import pytest
+from datetime import date, datetime
+from decimal import Decimal
+from django.core.management import call_command
+from django.utils import timezone
+from apps.billing.archive import archive_requests, iter_archived_rows, ArchiveError
+from apps.billing.closing import close_billing_period, month_period
+from apps.billing.export import iter_export_rows, export_stream
+from apps.billing.models import APIRequest, ArchiveSegment, BillingRecord, UsageStatistics
+from apps.billing.repricing import reprice_requests
+from apps.billing.rollups import run_rollup, rebuild_range, RebuildRangeError
+from apps.billing.statistics import UsageStatisticsQuery
+from apps.quotas.factories import UserQuotaFactory
+
+pytestmark = pytest.mark.django_db
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(settings, tmp_path):
+    settings.AUDIT_ARCHIVE_DIR = str(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def quota():
+    return UserQuotaFactory()
+
+
+@pytest.fixture
+def old_requests(quota, make_request):
+    tz = timezone.get_current_timezone()
+    rows = [
+        make_request(quota, timezone.make_aware(datetime(2026, 7, 10, 9, 15), tz), request_data={'messages': [1]}),
+        make_request(quota, timezone.make_aware(datetime(2026, 7, 20, 9, 45), tz), status_code=500),
+        make_request(quota, timezone.make_aware(datetime(2026, 8, 5, 12, 0), tz)),
+    ]
+    make_request(quota, timezone.now())
+    run_rollup(settle_seconds=0)
+    return rows
+
+
+class TestArchiveRequests:
+    def test_moves_rows_into_monthly_files(self, quota, old_requests, archive_dir):
+        result = archive_requests(date(2026, 9, 1))
+
+        assert result.rows == 3
+        assert result.segments == 2
+        assert APIRequest.objects.count() == 1
+        segments = list(ArchiveSegment.objects.order_by('month'))
+        assert [segment.month for segment in segments] == [date(2026, 7, 1), date(2026, 8, 1)]
+        assert segments[0].path == (
+            f'month=2026-07/user={quota.user_id}/part-{old_requests[0].id:012d}-{old_requests[1].id:012d}.parquet'
+        )
+        assert (archive_dir / segments[0].path).exists()
+        assert segments[0].total_cost == old_requests[0].total_cost + old_requests[1].total_cost
+
+    def test_batches_and_limits(self, old_requests):
+        result = archive_requests(date(2026, 9, 1), batch_size=1, max_segments=2)
+        assert result.segments == 2
+        assert APIRequest.objects.count() == 2
+
+    def test_skips_rows_not_yet_rolled_up(self, quota, old_requests, make_request):
+        late = make_request(quota, timezone.make_aware(datetime(2026, 7, 11)))
+        archive_requests(date(2026, 9, 1))
+        assert APIRequest.objects.filter(pk=late.pk).exists()
+
+    def test_costs_beyond_old_column_range(self, quota, make_request):
+        tz = timezone.get_current_timezone()
+        expensive = make_request(quota, timezone.make_aware(datetime(2026, 7, 10, 9, 0), tz),
+                                 input_cost=Decimal('40000.000000'), output_cost=Decimal('0.000001'))
+        run_rollup(settle_seconds=0)
+
+        archive_requests(date(2026, 9, 1))
+
+        assert ArchiveSegment.objects.get().total_cost == Decimal('40000.000001')
+        rows = list(iter_archived_rows(['id', 'total_cost']))
+        assert rows == [(expensive.id, Decimal('40000.000001'))]
+
+    def test_failed_verification_keeps_rows(self, old_requests, mocker):
+        import pyarrow.parquet
+        read_table = pyarrow.parquet.read_table
+        # 回读时少一行，模拟写入不完整的文件
+        mocker.patch(
+            'pyarrow.parquet.read_table', side_effect=lambda *args, **kwargs: read_table(*args, **kwargs).slice(1)
+        )
+
+        with pytest.raises(ArchiveError):
+            archive_requests(date(2026, 9, 1))
+
+        assert APIRequest.objects.count() == 4
+        assert not ArchiveSegment.objects.exists()
+
+    def test_read_back_with_filters(self, quota, old_requests):
+        archive_requests(date(2026, 9, 1))
+        tz = timezone.get_current_timezone()
+        rows = list(iter_archived_rows(
+            ['id', 'request_data', 'total_cost'],
+            start=timezone.make_aware(datetime(2026, 7, 1), tz),
+            end=timezone.make_aware(datetime(2026, 8, 1), tz),
+            filters={'user': quota.user_id},
+        ))
+        assert [row[0] for row in rows] == [old_requests[0].id, old_requests[1].id]
+        assert rows[0][1] == {'messages': [1]}
+        assert isinstance(rows[0][2], Decimal)
+
+    def test_export_includes_archived_rows(self, quota, old_requests):
+        archive_requests(date(2026, 9, 1))
+        rows = iter_export_rows(['id'], quota=quota)
+        lines = b''.join(export_stream(rows, ['id'])).decode('utf-8').splitlines()
+        assert [json.loads(line)['id'] for line in lines][:3] == [row.id for row in old_requests]
+        assert len(lines) == 4
+
+    def test_statistics_edges_read_archive(self, quota, old_requests):
+        tz = timezone.get_current_timezone()
+        query = UsageStatisticsQuery(
+            start=timezone.make_aware(datetime(2026, 7, 10, 9, 0), tz),
+            end=timezone.make_aware(datetime(2026, 7, 20, 9, 50), tz),
+        )
+        before = query.execute()['totals']
+        archive_requests(date(2026, 9, 1))
+        after = query.execute()['totals']
+
+        assert before['requests'] == 2
+        assert after == before
+
+    def test_command_requires_cutoff(self):
+        from django.core.management.base import CommandError
+        with pytest.raises(CommandError):
+            call_command('archive_requests')
+
+
+class TestArchivedRanges:
+    @pytest.fixture
+    def window(self):
+        tz = timezone.get_current_timezone()
+        return timezone.make_aware(datetime(2026, 7, 1), tz), timezone.make_aware(datetime(2026, 9, 1), tz)
+
+    def test_rebuild_keeps_archived_totals(self, old_requests, window):
+        query = UsageStatisticsQuery(start=window[0], end=window[1])
+        before = query.execute()['totals']
+        rows = UsageStatistics.objects.count()
+        archive_requests(date(2026, 9, 1))
+
+        with pytest.raises(RebuildRangeError):
+            rebuild_range(date(2026, 7, 1), date(2026, 8, 31))
+
+        assert query.execute()['totals'] == before
+        assert before['requests'] == 3
+        assert UsageStatistics.objects.count() == rows
+        rebuild_range(date(2026, 8, 6), timezone.localdate())
+        assert query.execute()['totals'] == before
+
+    def test_close_keeps_archived_quota_records(self, quota, old_requests, make_request):
+        # 其他配额的请求尚未汇总，不会被归档
+        other = UserQuotaFactory()
+        make_request(other, timezone.make_aware(datetime(2026, 7, 15), timezone.get_current_timezone()))
+        period_start, period_end = month_period('2026-07')
+        close_billing_period(period_start, period_end)
+        archive_requests(date(2026, 8, 1))
+
+        result = close_billing_period(period_start, period_end)
+
+        assert result.finished and result.protected == 1
+        assert BillingRecord.objects.get(quota=quota, period_start=period_start).total_requests == 2
+        assert BillingRecord.objects.get(quota=other, period_start=period_start).total_requests == 1
+
+    def test_reprice_refuses_archived_range(self, quota, old_requests, window):
+        archive_requests(date(2026, 9, 1))
+        model = APIRequest.objects.get().model
+
+        assert reprice_requests(model, window[0], timezone.now(), '1', '1').dry_run
+        with pytest.raises(RebuildRangeError):
+            reprice_requests(model, window[0], timezone.now(), '1', '1', dry_run=False)
@@ -0,0 +1,124 @@
+import pytest
+from decimal import Decimal
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from apps.billing.closing import close_billing_period, month_period
+from apps.billing.models import BillingRecord
+from apps.quotas.factories import UserQuotaFactory
+from apps.users.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def period():
+    return month_period('2026-09')
+
+
+@pytest.fixture
+def quotas(period, make_request):
+    start, end = period
+    quotas = UserQuotaFactory.create_batch(3)
+    for index, quota in enumerate(quotas):
+        for _ in range(index + 1):
+            make_request(quota, start + timezone.timedelta(days=3), input_tokens=10, output_tokens=5)
+        make_request(quota, start + timezone.timedelta(days=4), status_code=500, input_tokens=100, output_tokens=0)
+        # 周期之外的请求不计入
+        make_request(quota, end + timezone.timedelta(hours=1))
+        make_request(quota, start - timezone.timedelta(seconds=1))
+    return quotas
+
+
+class TestMonthPeriod:
+    def test_month_boundaries(self):
+        start, end = month_period('2026-12')
+        assert (start.year, start.month, start.day) == (2026, 12, 1)
+        assert (end.year, end.month, end.day) == (2027, 1, 1)
+
+    def test_invalid_month(self):
+        with pytest.raises(ValueError):
+            month_period('2026-13')
+
+
+class TestCloseBillingPeriod:
+    def test_creates_records_for_all_quotas(self, quotas, period):
+        result = close_billing_period(*period, chunk_size=2)
+
+        assert result.finished
+        assert result.quotas == 3
+        assert result.chunks == 2
+        for index, quota in enumerate(quotas):
+            record = BillingRecord.objects.get(quota=quota, period_start=period[0])
+            assert record.status == 'calculated'
+            assert record.total_requests == index + 2
+            assert record.successful_requests == index + 1
+            assert record.failed_requests == 1
+            assert record.total_input_tokens == 10 * (index + 1) + 100
+
+    def test_matches_calculate_statistics(self, quotas, period):
+        close_billing_period(*period)
+        for quota in quotas:
+            closed = BillingRecord.objects.get(quota=quota)
+            expected = BillingRecord(user=quota.user, quota=quota, period_start=period[0], period_end=period[1])
+            closed_values = {field: getattr(closed, field) for field in ('total_requests', 'total_tokens', 'total_cost')}
+            BillingRecord.objects.filter(pk=closed.pk).delete()
+            expected.calculate_statistics()
+            assert closed_values == {field: getattr(expected, field) for field in closed_values}
+
+    def test_rerun_updates_without_duplicates(self, quotas, period, make_request):
+        close_billing_period(*period)
+        make_request(quotas[0], period[0] + timezone.timedelta(days=10))
+        close_billing_period(*period)
+
+        assert BillingRecord.objects.count() == 3
+        assert BillingRecord.objects.get(quota=quotas[0]).total_requests == 3
+
+    def test_resume_in_chunks(self, quotas, period):
+        first = close_billing_period(*period, chunk_size=1, max_chunks=2)
+        assert not first.finished
+        assert BillingRecord.objects.count() == 2
+
+        second = close_billing_period(*period, chunk_size=1, resume=True)
+        assert second.finished
+        assert second.quotas == 1
+        assert BillingRecord.objects.count() == 3
+
+    def test_paid_records_are_not_recalculated(self, quotas, period, make_request):
+        close_billing_period(*period)
+        BillingRecord.objects.filter(quota=quotas[0]).update(status='paid', total_cost=Decimal('1.000000'))
+        make_request(quotas[0], period[0] + timezone.timedelta(days=10))
+
+        result = close_billing_period(*period)
+        assert result.skipped == 1
+        record = BillingRecord.objects.get(quota=quotas[0])
+        assert record.status == 'paid'
+        assert record.total_requests == 2
+
+    def test_inactive_quotas_are_skipped(self, quotas, period):
+        quotas[0].is_active = False
+        quotas[0].save()
+        close_billing_period(*period)
+        assert not BillingRecord.objects.filter(quota=quotas[0]).exists()
+
+
+class TestCloseEndpoint:
+    def test_close_month(self, api_client, quotas):
+        api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+        response = api_client.post(reverse('billing-records-close'), {'month': '2026-09'}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['finished'] is True
+        assert response.data['quotas'] == 3
+
+        response = api_client.get(reverse('billing-records-list'))
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_close_rejects_bad_month(self, api_client):
+        api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+        response = api_client.post(reverse('billing-records-close'), {'month': 'September'}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_close_requires_admin(self, api_client):
+        api_client.force_authenticate(user=UserFactory())
+        response = api_client.post(reverse('billing-records-close'), {'month': '2026-09'}, format='json')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
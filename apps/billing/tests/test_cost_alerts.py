@@ -0,0 +1,59 @@
+import pytest
+from decimal import Decimal
+from django.utils import timezone
+from apps.ai_models.models import AIModel
+from apps.billing.cost_alerts import evaluate_cost_alerts
+from apps.billing.models import APIRequest, CostAlert, CostAlertRule
+from apps.billing.rollups import run_rollup
+from apps.quotas.factories import UserQuotaFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def now():
+    return timezone.localtime()
+
+
+@pytest.fixture
+def quota(now, make_request):
+    quota = UserQuotaFactory()
+    for _ in range(2):
+        make_request(quota, now.replace(minute=0, second=0, microsecond=0), total_cost=Decimal('3.000000'))
+    run_rollup(settle_seconds=0)
+    return quota
+
+
+class TestCostAlerts:
+    def test_rule_over_threshold_creates_alert_once(self, quota, now):
+        rule = CostAlertRule.objects.create(quota=quota, period='hour', threshold=Decimal('5.00'))
+
+        result = evaluate_cost_alerts(now)
+        assert result.alerts == 1
+        alert = CostAlert.objects.get(rule=rule)
+        assert alert.alert_type == 'hourly_spend'
+        assert alert.current_value == Decimal('6.000000')
+        assert alert.user == quota.user
+
+        assert evaluate_cost_alerts(now).alerts == 0
+        assert CostAlert.objects.count() == 1
+
+    def test_rule_under_threshold_and_model_scope(self, quota, now):
+        model = APIRequest.objects.first().model
+        other = AIModel.objects.create(provider=model.provider, name='other-model', display_name='Other Model')
+        CostAlertRule.objects.create(quota=quota, period='day', threshold=Decimal('10.00'))
+        CostAlertRule.objects.create(quota=quota, model=model, period='day', threshold=Decimal('5.00'))
+        CostAlertRule.objects.create(quota=quota, model=other, period='day', threshold=Decimal('0.00'))
+
+        result = evaluate_cost_alerts(now)
+        assert result.rules == 3
+        assert list(CostAlert.objects.values_list('alert_type', flat=True)) == ['model_daily_spend']
+
+    def test_evaluation_does_not_scan_requests(self, quota, now, django_assert_max_num_queries):
+        for period in ('hour', 'day'):
+            for _ in range(3):
+                CostAlertRule.objects.create(quota=quota, period=period, threshold=Decimal('1.00'))
+        # 查询数与规则数无关：规则、两个周期的花费、已有警告、批量创建、更新评估时间
+        with django_assert_max_num_queries(6):
+            evaluate_cost_alerts(now)
+        assert CostAlert.objects.count() == 6
@@ -0,0 +1,103 @@
+import csv
+import gzip
+import io
+import json
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from apps.billing.export import (
+    ExportError, iter_export_rows, resolve_columns, export_stream, DEFAULT_COLUMNS,
+)
+from apps.billing.factories import APIRequestFactory
+from apps.quotas.factories import UserQuotaFactory
+from apps.users.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def quota():
+    return UserQuotaFactory()
+
+
+@pytest.fixture
+def requests(quota, make_request):
+    other = UserQuotaFactory()
+    rows = [APIRequestFactory(user=quota.user, model_group=quota.model_group) for _ in range(3)]
+    APIRequestFactory(user=other.user, model_group=other.model_group)
+    make_request(quota, timezone.now() - timezone.timedelta(days=30))
+    return rows
+
+
+def read(stream):
+    return b''.join(stream)
+
+
+class TestExportStream:
+    def test_ndjson_rows(self, quota, requests):
+        columns = resolve_columns(['id', 'total_cost', 'created_at'])
+        start = timezone.now() - timezone.timedelta(days=1)
+        rows = iter_export_rows(columns, chunk_size=2, quota=quota, start=start)
+
+        lines = read(export_stream(rows, columns)).decode('utf-8').splitlines()
+        records = [json.loads(line) for line in lines]
+        assert [record['id'] for record in records] == [row.id for row in requests]
+        assert set(records[0]) == {'id', 'total_cost', 'created_at'}
+
+    def test_csv_with_payload_and_gzip(self, quota, requests):
+        columns = resolve_columns(['id'], include_payload=True)
+        rows = iter_export_rows(columns, user=quota.user_id)
+
+        content = gzip.decompress(read(export_stream(rows, columns, export_format='csv', compress=True)))
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8'))))
+        assert rows[0] == ['id', 'request_data', 'response_data']
+        assert len(rows) == 5
+        assert json.loads(rows[1][1]) == requests[0].request_data
+
+    def test_default_columns_exclude_payload(self):
+        assert resolve_columns() == list(DEFAULT_COLUMNS)
+        assert 'request_data' not in DEFAULT_COLUMNS
+
+    def test_rejects_unknown_column_and_format(self):
+        with pytest.raises(ExportError):
+            resolve_columns(['password'])
+        with pytest.raises(ExportError):
+            export_stream(iter([]), ['id'], export_format='xml')
+
+
+class TestExportEndpoint:
+    def test_streams_ndjson(self, api_client, quota, requests):
+        api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+        response = api_client.get(reverse('chat-records-export'), {'quota': quota.id, 'columns': 'id,user_name'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        assert response['Content-Type'] == 'application/x-ndjson'
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        assert len(lines) == 4
+        assert json.loads(lines[0])['user_name'] == quota.user.name
+
+    def test_rejects_bad_parameters(self, api_client):
+        api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+        response = api_client.get(reverse('chat-records-export'), {'columns': 'nope'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = api_client.get(reverse('chat-records-export'), {'export_format': 'xml'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_requires_admin(self, api_client):
+        api_client.force_authenticate(user=UserFactory())
+        response = api_client.get(reverse('chat-records-export'))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+class TestExportCommand:
+    def test_writes_file(self, tmp_path, quota, requests):
+        output = tmp_path / 'requests.csv.gz'
+        call_command('export_requests', '--format', 'csv', '--gzip', '--quota', str(quota.id),
+                     '--output', str(output), stderr=io.StringIO())
+
+        rows = list(csv.reader(io.StringIO(gzip.decompress(output.read_bytes()).decode('utf-8'))))
+        assert rows[0] == list(DEFAULT_COLUMNS)
+        assert len(rows) == 5
@@ -0,0 +1,136 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from apps.billing.factories import APIRequestFactory
+from apps.billing.models import APIRequest
+from apps.quotas.factories import UserQuotaFactory
+from apps.users.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def quota():
+    return UserQuotaFactory()
+
+
+@pytest.fixture
+def request_ids(quota):
+    """25条请求，其中每5条共用同一个创建时间，覆盖 created_at 相同时按 id 排序的情况"""
+    base = timezone.now() - timezone.timedelta(days=1)
+    ids = []
+    for index in range(25):
+        api_request = APIRequestFactory(user=quota.user, model_group=quota.model_group)
+        APIRequest.objects.filter(pk=api_request.pk).update(
+            created_at=base + timezone.timedelta(minutes=index // 5)
+        )
+        ids.append(api_request.pk)
+    created = dict(APIRequest.objects.values_list('id', 'created_at'))
+    return sorted(ids, key=lambda pk: (created[pk], pk), reverse=True)
+
+
+@pytest.fixture
+def admin_client(api_client):
+    api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+    return api_client
+
+
+class TestChatRecordsCursorPagination:
+    def walk(self, client, url, params):
+        pages = []
+        response = client.get(url, params)
+        while True:
+            assert response.status_code == status.HTTP_200_OK
+            pages.append([item['id'] for item in response.data['results']])
+            if not response.data['next']:
+                return pages, response
+            response = client.get(response.data['next'])
+
+    def test_walks_all_rows_in_order(self, admin_client, request_ids):
+        pages, _ = self.walk(admin_client, reverse('chat-records-list'), {'page_size': 7})
+        assert [len(page) for page in pages] == [7, 7, 7, 4]
+        assert sum(pages, []) == request_ids
+
+    def test_no_count_by_default(self, admin_client, request_ids):
+        response = admin_client.get(reverse('chat-records-list'))
+        assert 'count' not in response.data
+        assert response.data['previous'] is None
+
+    def test_count_is_opt_in(self, admin_client, request_ids):
+        response = admin_client.get(reverse('chat-records-list'), {'count': 'approximate'})
+        assert response.data['count'] == 25
+        assert response.data['count_type'] == 'approximate'
+
+    def test_previous_link_returns_previous_page(self, admin_client, request_ids):
+        first = admin_client.get(reverse('chat-records-list'), {'page_size': 10})
+        second = admin_client.get(first.data['next'])
+        back = admin_client.get(second.data['previous'])
+
+        assert [item['id'] for item in back.data['results']] == request_ids[:10]
+        assert back.data['previous'] is None
+        assert back.data['next'] is not None
+
+    def test_invalid_cursor(self, admin_client):
+        response = admin_client.get(reverse('chat-records-list'), {'cursor': 'not-a-cursor'})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_page_parameter_keeps_page_numbers(self, admin_client, request_ids):
+        response = admin_client.get(reverse('chat-records-list'), {'page': 2, 'page_size': 10})
+        assert response.data['count'] == 25
+        assert [item['id'] for item in response.data['results']] == request_ids[10:20]
+
+    def test_out_of_range_page_is_clamped(self, admin_client, request_ids):
+        response = admin_client.get(reverse('chat-records-list'), {'page': 99, 'page_size': 10})
+        assert response.status_code == status.HTTP_200_OK
+        assert [item['id'] for item in response.data['results']] == request_ids[20:]
+
+        response = admin_client.get(reverse('chat-records-list'), {'page': 'abc', 'page_size': 10})
+        assert [item['id'] for item in response.data['results']] == request_ids[:10]
+
+
+class TestQuotaRequestsCursorPagination:
+    def test_cursor_pages(self, admin_client, quota, request_ids):
+        url = reverse('admin-quotas-requests', args=[quota.id])
+        seen = []
+        params = {'page_size': 10}
+        while True:
+            response = admin_client.get(url, params)
+            assert response.status_code == status.HTTP_200_OK
+            seen.extend(item['id'] for item in response.data['requests'])
+            cursor = response.data['pagination']['next_cursor']
+            if not cursor:
+                break
+            params['cursor'] = cursor
+        assert seen == request_ids
+
+    def test_page_parameter_keeps_page_numbers(self, admin_client, quota, request_ids):
+        url = reverse('admin-quotas-requests', args=[quota.id])
+        response = admin_client.get(url, {'page': 3, 'page_size': 10})
+        assert response.data['pagination']['count'] == 25
+        assert response.data['pagination']['pages'] == 3
+        assert len(response.data['requests']) == 5
+
+        response = admin_client.get(url, {'page': 99, 'page_size': 10})
+        assert response.data['pagination']['page'] == 3
+
+
+class TestChatRecordsQueries:
+    def test_list_query_count_is_constant(self, admin_client, quota):
+        def list_queries():
+            with CaptureQueriesContext(connection) as context:
+                response = admin_client.get(reverse('chat-records-list'), {'page_size': 100})
+            assert response.status_code == status.HTTP_200_OK
+            return len(context)
+
+        # 快照字段为空时从模型、提供商和模型组读取名称
+        APIRequestFactory(user=quota.user, model_group=quota.model_group)
+        APIRequest.objects.update(model_name='', model_provider_name='', model_group_name='')
+        small = list_queries()
+
+        for _ in range(20):
+            APIRequestFactory(user=quota.user, model_group=quota.model_group)
+        APIRequest.objects.update(model_name='', model_provider_name='', model_group_name='')
+        assert list_queries() == small
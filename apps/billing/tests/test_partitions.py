@@ -0,0 +1,127 @@
+import pytest
+from datetime import date, datetime
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from apps.billing.models import APIRequest
+from apps.billing.partitions import (
+    BOUND_CHECK, LEGACY_TABLE, Partition, PartitionError, plan_partitions, partition_name, create_partition_sql,
+    parse_bound, bound_check_sql, convert_to_partitioned, detach_partitions, get_granularity, is_partitioned,
+    list_partitions,
+)
+from apps.billing.rollups import removed_requests_until, run_rollup
+from apps.quotas.factories import UserQuotaFactory
+
+pytestmark = pytest.mark.django_db
+
+
+class TestPartitionPlanning:
+    def test_monthly_plan_crosses_year(self):
+        partitions = plan_partitions(date(2026, 11, 15), date(2027, 1, 3), 'month')
+        assert [partition.name for partition in partitions] == [
+            'api_requests_p202611', 'api_requests_p202612', 'api_requests_p202701',
+        ]
+        assert partitions[0].start == timezone.make_aware(datetime(2026, 11, 1))
+        assert partitions[-1].end == timezone.make_aware(datetime(2027, 2, 1))
+
+    def test_daily_plan(self):
+        partitions = plan_partitions(date(2026, 2, 27), date(2026, 3, 1), 'day')
+        assert [partition.name for partition in partitions] == [
+            'api_requests_p20260227', 'api_requests_p20260228', 'api_requests_p20260301',
+        ]
+
+    def test_partitions_are_contiguous(self):
+        partitions = plan_partitions(date(2026, 1, 1), date(2026, 12, 31), 'month')
+        assert len(partitions) == 12
+        for previous, current in zip(partitions, partitions[1:]):
+            assert previous.end == current.start
+
+    def test_invalid_granularity(self):
+        with pytest.raises(PartitionError):
+            get_granularity('week')
+
+    def test_partition_name(self):
+        assert partition_name(date(2026, 10, 1), 'month') == 'api_requests_p202610'
+
+
+class TestPartitionSQL:
+    def test_create_partition_sql(self):
+        partition = plan_partitions(date(2026, 10, 1), date(2026, 10, 1), 'month')[0]
+        sql = create_partition_sql(partition)
+        assert 'PARTITION OF "api_requests"' in sql
+        assert "FROM ('2026-10-01T00:00:00+08:00') TO ('2026-11-01T00:00:00+08:00')" in sql
+
+    def test_parse_bound(self):
+        partition = parse_bound(
+            'api_requests_p202610',
+            "FOR VALUES FROM ('2026-10-01 00:00:00+08') TO ('2026-11-01 00:00:00+08')"
+        )
+        assert partition.start == timezone.make_aware(datetime(2026, 10, 1))
+        legacy = parse_bound('api_requests_legacy', "FOR VALUES FROM (MINVALUE) TO ('2026-10-01 00:00:00+08')")
+        assert legacy.start is None
+        assert parse_bound('api_requests_default', 'DEFAULT') is None
+
+    def test_bound_check_sql(self):
+        sql = bound_check_sql(timezone.make_aware(datetime(2026, 11, 1)))
+        assert f'ADD CONSTRAINT "{BOUND_CHECK}"' in sql
+        assert "created_at < '2026-11-01T00:00:00+08:00'" in sql
+        assert sql.endswith('NOT VALID')
+
+    def test_overlaps(self):
+        legacy = Partition('legacy', None, timezone.make_aware(datetime(2026, 11, 1)))
+        october, november = plan_partitions(date(2026, 10, 1), date(2026, 11, 1), 'month')
+        assert legacy.overlaps(october)
+        assert not legacy.overlaps(november)
+
+
+class TestPartitionCommand:
+    def test_requires_postgresql(self):
+        assert not is_partitioned()
+        with pytest.raises(CommandError):
+            call_command('manage_partitions', '--convert')
+        with pytest.raises(CommandError):
+            call_command('manage_partitions', '--list')
+
+
+@pytest.mark.skipif(connection.vendor != 'postgresql', reason='分区仅支持 PostgreSQL')
+class TestConvertToPartitioned:
+    @pytest.fixture
+    def quota(self):
+        return UserQuotaFactory()
+
+    def test_validates_check_before_attach(self, make_request, quota):
+        created_at = timezone.now() - timezone.timedelta(days=40)
+        existing = make_request(quota, created_at)
+
+        with CaptureQueriesContext(connection) as context:
+            convert_to_partitioned('month')
+        statements = [query['sql'] for query in context.captured_queries]
+
+        def position(fragment):
+            return next(i for i, sql in enumerate(statements) if fragment in sql)
+
+        assert position('NOT VALID') < position('VALIDATE CONSTRAINT') < position('ATTACH PARTITION')
+        assert position('VALIDATE CONSTRAINT') < position('LOCK TABLE')
+        assert is_partitioned()
+        assert LEGACY_TABLE in [partition.name for partition in list_partitions()]
+        assert APIRequest.objects.get(request_id=existing.request_id).created_at == created_at
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1 FROM pg_constraint WHERE conname = %s', [BOUND_CHECK])
+            assert cursor.fetchone() is None
+
+    def test_drop_requires_rolled_up_records(self, make_request, quota):
+        created_at = timezone.now() - timezone.timedelta(days=40)
+        make_request(quota, created_at)
+        convert_to_partitioned('month')
+        legacy = next(partition for partition in list_partitions() if partition.name == LEGACY_TABLE)
+        before = timezone.localdate(legacy.end)
+
+        with pytest.raises(PartitionError):
+            detach_partitions(before, drop=True)
+        assert LEGACY_TABLE in [partition.name for partition in list_partitions()]
+
+        run_rollup(settle_seconds=0)
+        assert detach_partitions(before, drop=True) == [LEGACY_TABLE]
+        assert removed_requests_until() == created_at
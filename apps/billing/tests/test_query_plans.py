@@ -0,0 +1,148 @@
+"""
+热点审计查询的执行计划回归测试
+
+在种子数据上执行真实的代码路径，捕获访问 api_requests 的SQL并逐条 EXPLAIN，
+出现全表扫描（或分页查询需要对全部结果排序）即视为回归。
+PostgreSQL 上关闭 enable_seqscan，避免小数据量下优化器选择顺序扫描。
+"""
+import re
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from apps.billing.closing import close_billing_period, month_period
+from apps.billing.models import APIRequest
+from apps.billing.rollups import run_rollup
+from apps.quotas.factories import UserQuotaFactory
+from apps.users.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+TABLE = APIRequest._meta.db_table
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}')
+            return '\n'.join(row[0] for row in cursor.fetchall())
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return '\n'.join(row[-1] for row in cursor.fetchall())
+
+
+def is_full_scan(plan, sql):
+    """是否扫描了整张表；带 LIMIT 的查询允许按索引顺序读取前若干条"""
+    limited = 'LIMIT' in sql.upper()
+    if connection.vendor == 'postgresql':
+        return f'Seq Scan on {TABLE}' in plan or ('Index Cond' not in plan and not limited)
+    match = re.search(rf'\bSCAN {TABLE}\b( USING (COVERING )?INDEX)?', plan)
+    if match is None:
+        return False
+    return not (match.group(1) and limited)
+
+
+def audit_plans(queries, ordered=False):
+    """返回 (sql, plan) 列表中有问题的查询"""
+    problems = []
+    for query in queries:
+        sql = query['sql']
+        if not re.search(rf'\bFROM "?{TABLE}"?', sql) or not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        plan = explain(sql)
+        if is_full_scan(plan, sql) or (ordered and 'LIMIT' in sql.upper() and 'TEMP B-TREE FOR ORDER BY' in plan):
+            problems.append((sql, plan))
+    return problems
+
+
+def index_name(*fields):
+    return next(index.name for index in APIRequest._meta.indexes if index.fields == list(fields))
+
+
+def request_plans(queries):
+    return [explain(query['sql']) for query in queries if TABLE in query['sql']]
+
+
+def captured(func):
+    with CaptureQueriesContext(connection) as context:
+        func()
+    assert any(TABLE in query['sql'] for query in context.captured_queries), '代码路径没有访问 api_requests'
+    return context.captured_queries
+
+
+@pytest.fixture
+def quotas(make_request):
+    quotas = UserQuotaFactory.create_batch(3)
+    now = timezone.now()
+    for quota in quotas:
+        for index in range(30):
+            make_request(quota, now - timezone.timedelta(hours=index * 7))
+    run_rollup(settle_seconds=0)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return quotas
+
+
+@pytest.fixture
+def admin_client(api_client):
+    api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+    return api_client
+
+
+class TestHotQueryPlans:
+    def test_rate_limit_counts(self, quotas):
+        quota = quotas[0]
+        queries = captured(lambda: [quota.check_rate_limit(period) for period in ('minute', 'hour', 'day')])
+        assert audit_plans(queries) == []
+        composite = index_name('user', 'model_group', 'created_at', 'id')
+        assert all(composite in plan for plan in request_plans(queries))
+
+    def test_quota_statistics(self, admin_client, quotas):
+        url = reverse('admin-quotas-statistics', args=[quotas[0].id])
+        start = (timezone.now() - timezone.timedelta(days=3)).isoformat()
+        queries = captured(lambda: admin_client.get(url, {'start_date': start}))
+        assert audit_plans(queries) == []
+
+    def test_quota_request_pages(self, admin_client, quotas):
+        url = reverse('admin-quotas-requests', args=[quotas[0].id])
+
+        def walk():
+            params = {'page_size': 5}
+            for _ in range(3):
+                response = admin_client.get(url, params)
+                params['cursor'] = response.data['pagination']['next_cursor']
+
+        assert audit_plans(captured(walk), ordered=True) == []
+
+    def test_chat_record_pages(self, admin_client, quotas):
+        def walk():
+            response = admin_client.get(reverse('chat-records-list'), {'page_size': 10})
+            for _ in range(3):
+                response = admin_client.get(response.data['next'])
+
+        assert audit_plans(captured(walk), ordered=True) == []
+
+    def test_admin_statistics(self, admin_client, quotas):
+        start = timezone.localtime(timezone.now() - timezone.timedelta(days=2, minutes=30))
+        queries = captured(lambda: admin_client.get(reverse('chat-records-statistics'), {
+            'start_date': start.isoformat(),
+            'group_by': 'model_group',
+        }))
+        assert audit_plans(queries) == []
+
+    def test_model_group_range(self, quotas):
+        start = timezone.now() - timezone.timedelta(days=1)
+        queries = captured(lambda: list(APIRequest.objects.filter(
+            model_group=quotas[0].model_group, created_at__gte=start
+        ).values_list('id', flat=True)))
+        assert audit_plans(queries) == []
+        assert index_name('model_group', 'created_at') in request_plans(queries)[0]
+
+    def test_billing_close(self, quotas):
+        period = month_period(timezone.localdate().strftime('%Y-%m'))
+        assert audit_plans(captured(lambda: close_billing_period(*period))) == []
+
+    def test_detects_full_scan(self, quotas):
+        queries = captured(lambda: list(APIRequest.objects.filter(endpoint='/v1/chat/completions')))
+        assert len(audit_plans(queries)) == 1
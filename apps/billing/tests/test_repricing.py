@@ -0,0 +1,114 @@
+import pytest
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.utils import timezone
+from apps.billing.models import APIRequest, ProcessingWatermark, UsageStatistics
+from apps.billing.repricing import reprice_requests
+from apps.billing.rollups import run_rollup
+from apps.quotas.factories import UserQuotaFactory
+from apps.quotas.models import QuotaUsageLog
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def window():
+    now = timezone.now()
+    return now - timezone.timedelta(days=1), now
+
+
+@pytest.fixture
+def quotas():
+    return [UserQuotaFactory(used_quota=Decimal('1.000000')) for _ in range(2)]
+
+
+@pytest.fixture
+def requests(quotas, window, make_request):
+    start, _ = window
+    created_at = start + timezone.timedelta(hours=1)
+    return [
+        make_request(quota, created_at, input_tokens=1000, output_tokens=500)
+        for quota in quotas for _ in range(3)
+    ]
+
+
+class TestRepricing:
+    def test_dry_run_reports_without_changes(self, quotas, requests, window):
+        model = requests[0].model
+        before = list(APIRequest.objects.order_by('id').values_list('total_cost_nanos', flat=True))
+
+        result = reprice_requests(model, *window, Decimal('1'), Decimal('2'))
+
+        assert result.requests == 6
+        # 每条 1000×$1/1M + 500×$2/1M = $0.002
+        assert result.new_cost_nanos == 6 * 2_000_000
+        assert len(result.deltas) == 2
+        assert list(APIRequest.objects.order_by('id').values_list('total_cost_nanos', flat=True)) == before
+        assert not QuotaUsageLog.objects.exists()
+
+    def test_apply_updates_costs_and_quotas(self, quotas, requests, window):
+        model = requests[0].model
+        run_rollup(settle_seconds=0)
+        old_costs = {quota.id: sum(
+            r.total_cost for r in APIRequest.objects.filter(user=quota.user)
+        ) for quota in quotas}
+
+        result = reprice_requests(model, *window, Decimal('1'), Decimal('2'), chunk_size=4, dry_run=False)
+
+        assert result.finished
+        assert result.chunks == 2
+        for api_request in APIRequest.objects.all():
+            assert api_request.input_cost_nanos == 1_000_000
+            assert api_request.output_cost_nanos == 1_000_000
+            assert api_request.total_cost_nanos == 2_000_000
+            assert api_request.total_cost == Decimal('0.002000')
+
+        for quota in quotas:
+            quota.refresh_from_db()
+            delta = Decimal('0.006000') - old_costs[quota.id]
+            assert quota.used_quota == Decimal('1.000000') + delta
+            log = QuotaUsageLog.objects.get(quota=quota)
+            assert log.action == 'reprice'
+            assert log.amount == delta
+            assert log.remaining == quota.remaining_quota
+
+        daily = UsageStatistics.objects.filter(hour__isnull=True)
+        assert sum(stat.total_cost for stat in daily) == Decimal('0.012000')
+        assert not ProcessingWatermark.objects.filter(name__startswith='reprice:').exists()
+
+    def test_interrupted_run_resumes(self, quotas, requests, window):
+        model = requests[0].model
+        old_total = sum(r.total_cost for r in APIRequest.objects.all())
+
+        partial = reprice_requests(model, *window, Decimal('1'), Decimal('2'), chunk_size=4, dry_run=False,
+                                   max_chunks=1)
+        assert not partial.finished
+        assert not QuotaUsageLog.objects.exists()
+
+        result = reprice_requests(model, *window, Decimal('1'), Decimal('2'), chunk_size=4, dry_run=False)
+        assert result.finished
+        assert result.requests == 6
+        assert sum(log.amount for log in QuotaUsageLog.objects.all()) == Decimal('0.012000') - old_total
+
+    def test_requests_outside_range_are_untouched(self, quotas, requests, window, make_request):
+        start, end = window
+        outside = make_request(quotas[0], start - timezone.timedelta(hours=1), input_tokens=1000, output_tokens=500)
+        before = APIRequest.objects.get(pk=outside.pk).total_cost_nanos
+
+        reprice_requests(requests[0].model, start, end, Decimal('1'), Decimal('2'), dry_run=False)
+
+        assert APIRequest.objects.get(pk=outside.pk).total_cost_nanos == before
+
+    def test_command_defaults_to_dry_run(self, requests):
+        model = requests[0].model
+        today = timezone.localdate()
+        out = StringIO()
+        call_command(
+            'reprice_requests', str(model.pk),
+            '--start', str(today - timezone.timedelta(days=2)), '--end', str(today),
+            '--input-price', '1', '--output-price', '2',
+            stdout=out,
+        )
+        assert '[预览]' in out.getvalue()
+        assert not QuotaUsageLog.objects.exists()
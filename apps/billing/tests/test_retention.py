@@ -0,0 +1,171 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from apps.ai_models.models import AIModel
+from apps.apis.models import APIProvider, APIProviderLog
+from apps.billing.closing import close_billing_period, month_period
+from apps.billing.models import APIRequest, BillingRecord, RetentionPolicy, ProcessingWatermark
+from apps.billing.repricing import reprice_requests
+from apps.billing.retention import apply_policy, apply_retention, policy_queryset, watermark_name
+from apps.billing.rollups import run_rollup, rebuild_range, removed_requests_until, RebuildRangeError
+from apps.quotas.factories import UserQuotaFactory, QuotaUsageLogFactory
+from apps.quotas.models import QuotaUsageLog
+from apps.users.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def days_ago(days):
+    return timezone.now() - timezone.timedelta(days=days)
+
+
+@pytest.fixture
+def quotas():
+    return UserQuotaFactory(), UserQuotaFactory()
+
+
+@pytest.fixture
+def old_requests(quotas, make_request):
+    rows = {quota.id: [make_request(quota, days_ago(40)) for _ in range(3)] + [make_request(quota, days_ago(1))] for quota in quotas}
+    run_rollup(settle_seconds=0)
+    return rows
+
+
+class TestRetentionPolicies:
+    def test_global_delete_in_batches(self, old_requests):
+        policy = RetentionPolicy.objects.create(name='全局', target='api_requests', retention_days=30)
+        progress = []
+        result = apply_policy(policy, batch_size=2, sleep_seconds=0, progress=lambda p, r: progress.append(r.rows))
+
+        assert result.finished
+        assert result.rows == 6
+        assert progress == [2, 4, 6]
+        assert APIRequest.objects.count() == 2
+        policy.refresh_from_db()
+        assert policy.last_run_rows == 6
+
+    def test_purge_blocks_rebuild(self, old_requests):
+        policy = RetentionPolicy.objects.create(name='全局', target='api_requests', retention_days=30)
+        purged_until = max(row.created_at for rows in old_requests.values() for row in rows[:3])
+        apply_policy(policy, batch_size=2, sleep_seconds=0)
+
+        assert removed_requests_until() == purged_until
+        with pytest.raises(RebuildRangeError):
+            rebuild_range(timezone.localdate(days_ago(45)), timezone.localdate())
+        rebuild_range(timezone.localdate(days_ago(2)), timezone.localdate())
+
+    def test_quota_purge_only_blocks_its_scope(self, quotas, old_requests, make_request):
+        purged, kept = quotas
+        model = old_requests[kept.id][0].model
+        own_model = AIModel.objects.create(provider=model.provider, name='kept-model', display_name='Kept Model')
+        make_request(kept, days_ago(40), model=own_model)
+        run_rollup(settle_seconds=0)
+        policy = RetentionPolicy.objects.create(name='短期', target='api_requests', retention_days=30, quota=purged)
+        apply_policy(policy, batch_size=2, sleep_seconds=0)
+        period_start, period_end = month_period(timezone.localtime(days_ago(40)).strftime('%Y-%m'))
+
+        result = close_billing_period(period_start, period_end)
+
+        assert result.protected == 1
+        assert not BillingRecord.objects.filter(quota=purged, period_start=period_start).exists()
+        assert BillingRecord.objects.get(quota=kept, period_start=period_start).total_requests >= 3
+        assert removed_requests_until({kept.user_id}, {kept.model_group_id}) is None
+        with pytest.raises(RebuildRangeError):
+            rebuild_range(timezone.localdate(days_ago(45)), timezone.localdate())
+        with pytest.raises(RebuildRangeError):
+            reprice_requests(model, days_ago(45), timezone.now(), '1', '1', dry_run=False)
+        assert reprice_requests(own_model, days_ago(45), timezone.now(), '1', '1', dry_run=False).finished
+
+    def test_resumes_from_last_batch(self, old_requests):
+        policy = RetentionPolicy.objects.create(name='全局', target='api_requests', retention_days=30)
+        first = apply_policy(policy, batch_size=2, sleep_seconds=0, max_batches=1)
+        assert not first.finished
+        assert ProcessingWatermark.current(watermark_name(policy)) > 0
+
+        second = apply_policy(policy, batch_size=2, sleep_seconds=0)
+        assert second.finished
+        assert first.rows + second.rows == 6
+        assert ProcessingWatermark.current(watermark_name(policy)) == 0
+
+    def test_specific_policy_overrides_global(self, quotas, old_requests):
+        kept, purged = quotas
+        RetentionPolicy.objects.create(name='长期保留', target='api_requests', retention_days=365, quota=kept)
+        RetentionPolicy.objects.create(name='全局', target='api_requests', retention_days=30)
+
+        apply_retention(sleep_seconds=0)
+        assert kept.get_all_requests().count() == 4
+        assert purged.get_all_requests().count() == 1
+
+    def test_model_group_policy(self, quotas, old_requests):
+        policy = RetentionPolicy.objects.create(
+            name='模型组', target='api_requests', retention_days=30, model_group=quotas[0].model_group
+        )
+        assert policy_queryset(policy).count() == 3
+        apply_policy(policy, sleep_seconds=0)
+        assert quotas[0].get_all_requests().count() == 1
+        assert quotas[1].get_all_requests().count() == 4
+
+    def test_strip_payload_keeps_rows(self, quotas, old_requests):
+        policy = RetentionPolicy.objects.create(
+            name='清空载荷', target='api_requests', action='strip_payload', retention_days=30
+        )
+        result = apply_policy(policy, sleep_seconds=0)
+        assert result.rows == 6
+        assert APIRequest.objects.count() == 8
+        assert APIRequest.objects.filter(request_data={}, response_data={}).count() == 6
+        assert policy_queryset(policy).count() == 0
+
+    def test_unrolled_requests_are_not_deleted(self, quotas, make_request):
+        make_request(quotas[0], days_ago(40))
+        policy = RetentionPolicy.objects.create(name='全局', target='api_requests', retention_days=30)
+        assert apply_policy(policy, sleep_seconds=0).rows == 0
+
+    def test_quota_usage_logs_and_provider_logs(self, quotas):
+        for _ in range(2):
+            log = QuotaUsageLogFactory(quota=quotas[0])
+            QuotaUsageLog.objects.filter(pk=log.pk).update(created_at=timezone.now() - timezone.timedelta(days=10))
+        provider = APIProvider.objects.create(name='P', base_url='https://p.test/v1', api_key='k')
+        log = APIProviderLog.objects.create(provider=provider, action='test', success=True, details={'body': 'x'})
+        APIProviderLog.objects.filter(pk=log.pk).update(created_at=timezone.now() - timezone.timedelta(days=10))
+
+        RetentionPolicy.objects.create(
+            name='配额日志', target='quota_usage_logs', retention_days=7, model_group=quotas[0].model_group
+        )
+        RetentionPolicy.objects.create(name='提供商日志', target='provider_logs', action='strip_payload', retention_days=7)
+        apply_retention(sleep_seconds=0)
+
+        assert not QuotaUsageLog.objects.filter(quota=quotas[0]).exists()
+        log.refresh_from_db()
+        assert log.details == {}
+
+    def test_command_dry_run(self, old_requests):
+        RetentionPolicy.objects.create(name='全局', target='api_requests', retention_days=30)
+        call_command('apply_retention', '--dry-run')
+        assert APIRequest.objects.count() == 8
+
+
+class TestRetentionPolicyAPI:
+    def test_create_and_preview(self, api_client, quotas, old_requests):
+        api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+        response = api_client.post(reverse('retention-policies-list'), {
+            'name': '模型组', 'target': 'api_requests', 'retention_days': 30,
+            'model_group': quotas[0].model_group_id,
+        }, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['scope'] == 'model_group'
+
+        response = api_client.get(reverse('retention-policies-preview', args=[response.data['id']]))
+        assert response.data['pending_rows'] == 3
+
+    def test_rejects_invalid_scope(self, api_client, quotas):
+        api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+        response = api_client.post(reverse('retention-policies-list'), {
+            'name': '提供商日志', 'target': 'provider_logs', 'retention_days': 30, 'quota': quotas[0].id,
+        }, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = api_client.post(reverse('retention-policies-list'), {
+            'name': '配额日志', 'target': 'quota_usage_logs', 'action': 'strip_payload', 'retention_days': 30,
+        }, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,88 @@
+import pytest
+from decimal import Decimal
+from django.utils import timezone
+from apps.billing.models import APIRequest, UsageStatistics, ProcessingWatermark
+from apps.billing.rollups import run_rollup, rebuild_range, ROLLUP_WATERMARK
+from apps.groups.models import ModelGroupUsageLog
+from apps.quotas.factories import UserQuotaFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def quota():
+    return UserQuotaFactory()
+
+
+@pytest.fixture
+def past_hour():
+    return timezone.localtime(timezone.now() - timezone.timedelta(hours=2)).replace(minute=10)
+
+
+class TestUsageRollup:
+    def test_rollup_creates_hourly_and_daily_buckets(self, quota, past_hour, make_request):
+        make_request(quota, past_hour, input_tokens=10, output_tokens=5)
+        make_request(quota, past_hour, input_tokens=20, output_tokens=5, status_code=500)
+
+        result = run_rollup(settle_seconds=0)
+        assert result.rows == 2
+
+        hourly = UsageStatistics.objects.get(user=quota.user, date=past_hour.date(), hour=past_hour.hour)
+        daily = UsageStatistics.objects.get(user=quota.user, date=past_hour.date(), hour__isnull=True)
+        for stat in (hourly, daily):
+            assert stat.request_count == 2
+            assert stat.success_count == 1
+            assert stat.error_count == 1
+            assert stat.input_tokens == 30
+            assert stat.total_tokens == 40
+
+        group_log = ModelGroupUsageLog.objects.get(group=quota.model_group, hour=past_hour.hour)
+        assert group_log.request_count == 2
+        assert group_log.success_count == 1
+
+    def test_rows_are_counted_exactly_once(self, quota, past_hour, make_request):
+        make_request(quota, past_hour)
+        run_rollup(settle_seconds=0)
+        run_rollup(settle_seconds=0)
+        make_request(quota, past_hour)
+        run_rollup(settle_seconds=0)
+
+        daily = UsageStatistics.objects.get(user=quota.user, hour__isnull=True)
+        assert daily.request_count == 2
+        assert ProcessingWatermark.current(ROLLUP_WATERMARK) == APIRequest.objects.latest('id').id
+
+    def test_late_rows_fold_into_their_own_bucket(self, quota, past_hour, make_request):
+        make_request(quota, past_hour)
+        run_rollup(settle_seconds=0)
+
+        late_time = past_hour - timezone.timedelta(days=3)
+        make_request(quota, late_time)
+        run_rollup(settle_seconds=0)
+
+        assert UsageStatistics.objects.get(date=late_time.date(), hour__isnull=True).request_count == 1
+        assert UsageStatistics.objects.get(date=past_hour.date(), hour__isnull=True).request_count == 1
+
+    def test_unsettled_rows_wait_for_next_run(self, quota, make_request):
+        make_request(quota, timezone.now())
+        assert run_rollup(settle_seconds=60).rows == 0
+        assert UsageStatistics.objects.count() == 0
+
+    def test_batches_respect_batch_size(self, quota, past_hour, make_request):
+        for _ in range(5):
+            make_request(quota, past_hour)
+        result = run_rollup(batch_size=2, settle_seconds=0)
+        assert result.batches == 3
+        assert UsageStatistics.objects.get(hour__isnull=True).request_count == 5
+
+    def test_rebuild_range_corrects_modified_rows(self, quota, past_hour, make_request):
+        api_request = make_request(quota, past_hour, total_cost=Decimal('1.000000'))
+        run_rollup(settle_seconds=0)
+        APIRequest.objects.filter(pk=api_request.pk).update(
+            total_cost=Decimal('2.000000'), total_cost_nanos=2_000_000_000
+        )
+
+        rebuild_range(past_hour.date(), past_hour.date())
+
+        daily = UsageStatistics.objects.get(hour__isnull=True)
+        assert daily.request_count == 1
+        assert daily.total_cost == Decimal('2.000000')
@@ -0,0 +1,155 @@
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from apps.ai_models.models import AIModel
+from apps.apis.models import APIProvider
+from apps.billing.models import LatencySketch
+from apps.billing.rollups import run_rollup, rebuild_range
+from apps.billing.sketches import DDSketch, RELATIVE_ACCURACY, bucket_index
+from apps.billing.statistics import UsageStatisticsQuery
+from apps.quotas.factories import UserQuotaFactory
+from apps.users.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def exact_quantile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+
+@pytest.fixture
+def base_time():
+    return timezone.localtime(timezone.now() - timezone.timedelta(days=3)).replace(
+        hour=10, minute=0, second=0, microsecond=0
+    )
+
+
+@pytest.fixture
+def seeded(base_time, make_request):
+    quota = UserQuotaFactory()
+    models = [
+        AIModel.objects.create(
+            provider=APIProvider.objects.create(name=f'Provider {index}', base_url='https://api.test.com/v1', api_key='key'),
+            name=f'model-{index}',
+            display_name=f'Model {index}',
+        )
+        for index in range(2)
+    ]
+    durations = {model.id: [] for model in models}
+    for index in range(60):
+        model = models[index % 2]
+        duration = 50 + index * 37 % 2000
+        durations[model.id].append(duration)
+        # 跨越两天的多个小时
+        make_request(quota, base_time + timezone.timedelta(minutes=index * 50), model=model, duration_ms=duration)
+    return models, durations
+
+
+class TestDDSketch:
+    def test_quantiles_within_relative_accuracy(self):
+        values = list(range(1, 10001))
+        sketch = DDSketch()
+        for value in values:
+            sketch.add(value)
+
+        for q in (0.5, 0.95, 0.99):
+            expected = exact_quantile(values, q)
+            assert abs(sketch.quantile(q) - expected) <= expected * RELATIVE_ACCURACY
+
+    def test_merge_equals_single_sketch(self):
+        left, right, combined = DDSketch(), DDSketch(), DDSketch()
+        for value in range(1, 500):
+            (left if value % 2 else right).add(value)
+            combined.add(value)
+
+        left.merge(DDSketch(right.to_json()))
+
+        assert left.count == combined.count
+        assert left.bins == combined.bins
+
+    def test_empty_sketch(self):
+        assert DDSketch().percentiles() == {'p50': None, 'p95': None, 'p99': None}
+
+
+class TestLatencyRollup:
+    def test_rollup_builds_hourly_and_daily_sketches(self, seeded):
+        models, durations = seeded
+        run_rollup(settle_seconds=0)
+
+        for model in models:
+            daily = LatencySketch.objects.filter(model=model, hour__isnull=True)
+            hourly = LatencySketch.objects.filter(model=model, hour__isnull=False)
+            assert sum(row.count for row in daily) == len(durations[model.id])
+            assert sum(row.count for row in hourly) == len(durations[model.id])
+            assert all(row.provider_id == model.provider_id for row in daily)
+
+    def test_incremental_rollup_merges_into_existing_rows(self, seeded, base_time, make_request):
+        models, _ = seeded
+        run_rollup(settle_seconds=0)
+        make_request(UserQuotaFactory(), base_time, model=models[0], duration_ms=123)
+        run_rollup(settle_seconds=0)
+
+        row = LatencySketch.objects.get(model=models[0], date=base_time.date(), hour=base_time.hour)
+        assert row.count == sum(row.bins.values())
+        assert row.bins[str(bucket_index(123))] >= 1
+
+    def test_rebuild_range_recomputes_sketches(self, seeded, base_time):
+        run_rollup(settle_seconds=0)
+        before = {(row.model_id, row.date, row.hour): row.bins for row in LatencySketch.objects.all()}
+
+        rebuild_range(base_time.date(), base_time.date() + timezone.timedelta(days=2))
+
+        after = {(row.model_id, row.date, row.hour): row.bins for row in LatencySketch.objects.all()}
+        assert after == before
+
+
+class TestLatencyStatistics:
+    @pytest.mark.parametrize('granularity', ['hour', 'day', 'month'])
+    def test_percentiles_match_before_and_after_rollup(self, seeded, base_time, granularity):
+        start = base_time + timezone.timedelta(minutes=20)
+        end = base_time + timezone.timedelta(days=1, hours=16, minutes=30)
+
+        before = UsageStatisticsQuery(start, end, granularity=granularity).execute()
+        run_rollup(settle_seconds=0)
+        after = UsageStatisticsQuery(start, end, granularity=granularity).execute()
+
+        assert before['totals']['latency_ms'] == after['totals']['latency_ms']
+        assert [entry['latency_ms'] for entry in before['series']] == \
+            [entry['latency_ms'] for entry in after['series']]
+
+    def test_percentiles_within_accuracy_by_model(self, seeded):
+        models, durations = seeded
+        run_rollup(settle_seconds=0)
+
+        result = UsageStatisticsQuery(granularity='month', group_by='model').execute()
+
+        for entry in result['series']:
+            values = durations[entry['key']]
+            for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+                expected = exact_quantile(values, q)
+                assert abs(entry['latency_ms'][name] - expected) <= expected * RELATIVE_ACCURACY + 0.01
+
+    def test_provider_breakdown(self, seeded):
+        models, durations = seeded
+        run_rollup(settle_seconds=0)
+
+        result = UsageStatisticsQuery(granularity='month', group_by='provider').execute()
+
+        assert {entry['key'] for entry in result['series']} == {model.provider_id for model in models}
+        assert all(entry['latency_ms']['p50'] is not None for entry in result['series'])
+
+    def test_model_group_breakdown_has_no_percentiles(self, seeded):
+        result = UsageStatisticsQuery(group_by='model_group').execute()
+        assert 'latency_ms' not in result['totals']
+
+    def test_endpoint_returns_percentiles(self, api_client, seeded):
+        run_rollup(settle_seconds=0)
+        api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+
+        response = api_client.get(reverse('chat-records-statistics'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.data['latency_ms']) == {'p50', 'p95', 'p99'}
+        assert response.data['latency_ms']['p50'] is not None
@@ -0,0 +1,122 @@
+import pytest
+from decimal import Decimal
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from apps.billing.models import APIRequest
+from apps.billing.rollups import run_rollup
+from apps.billing.statistics import UsageStatisticsQuery, StatisticsQueryError
+from apps.quotas.factories import UserQuotaFactory
+from apps.users.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def base_time():
+    # 三天前的本地 10:00
+    return timezone.localtime(timezone.now() - timezone.timedelta(days=3)).replace(
+        hour=10, minute=0, second=0, microsecond=0
+    )
+
+
+@pytest.fixture
+def seeded(base_time, make_request):
+    quotas = [UserQuotaFactory(), UserQuotaFactory()]
+    offsets = [-30, 5, 50, 70, 24 * 60 + 15, 26 * 60, 47 * 60 + 59]
+    for index, minutes in enumerate(offsets):
+        for quota in quotas:
+            make_request(
+                quota,
+                base_time + timezone.timedelta(minutes=minutes),
+                total_cost=Decimal('0.100000'),
+                total_tokens=100,
+                status_code=200 if index % 3 else 500,
+            )
+    return quotas
+
+
+def raw_totals(start, end):
+    queryset = APIRequest.objects.filter(created_at__gte=start, created_at__lt=end)
+    return queryset.count(), sum(r.total_cost for r in queryset)
+
+
+class TestUsageStatisticsQuery:
+    @pytest.mark.parametrize('granularity', ['hour', 'day', 'month'])
+    def test_results_match_raw_before_and_after_rollup(self, seeded, base_time, granularity, make_request):
+        # 模型已删除（model 为空）的请求也要计入汇总
+        make_request(seeded[0], base_time + timezone.timedelta(minutes=70), model=None,
+                     input_cost=Decimal('0.050000'), output_cost=Decimal('0.050000'), total_tokens=100)
+        start = base_time + timezone.timedelta(minutes=20)
+        end = base_time + timezone.timedelta(days=1, hours=16, minutes=30)
+        expected_count, expected_cost = raw_totals(start, end)
+
+        before = UsageStatisticsQuery(start, end, granularity=granularity).execute()
+        run_rollup(settle_seconds=0)
+        after = UsageStatisticsQuery(start, end, granularity=granularity).execute()
+
+        for result in (before, after):
+            assert result['totals']['requests'] == expected_count
+            assert result['totals']['total_cost'] == pytest.approx(float(expected_cost))
+        assert before['series'] == after['series']
+
+    def test_group_by_user(self, seeded, base_time):
+        run_rollup(settle_seconds=0)
+        result = UsageStatisticsQuery(group_by='user').execute()
+        per_user = {}
+        for entry in result['series']:
+            per_user[entry['name']] = per_user.get(entry['name'], 0) + entry['requests']
+        assert per_user == {quota.user.name: 7 for quota in seeded}
+
+    def test_group_by_model_group_reads_group_logs(self, seeded, base_time, make_request):
+        run_rollup(settle_seconds=0)
+        make_request(seeded[0], timezone.now())
+        result = UsageStatisticsQuery(group_by='model_group', granularity='month').execute()
+        totals = {entry['key']: 0 for entry in result['series']}
+        for entry in result['series']:
+            totals[entry['key']] += entry['requests']
+        assert totals == {seeded[0].model_group_id: 8, seeded[1].model_group_id: 7}
+
+    def test_group_logs_match_ungrouped_metrics(self, base_time, make_request):
+        quota = UserQuotaFactory()
+        for minutes in range(5):
+            make_request(quota, base_time + timezone.timedelta(minutes=minutes),
+                         duration_ms=1000, input_tokens=100, output_tokens=20)
+        run_rollup(settle_seconds=0)
+        make_request(quota, timezone.now(), duration_ms=1000, input_tokens=100, output_tokens=20)
+
+        expected = UsageStatisticsQuery(granularity='month').execute()['totals']
+        grouped = UsageStatisticsQuery(group_by='model_group', granularity='month').execute()['totals']
+        filtered = UsageStatisticsQuery(
+            granularity='month', filters={'model_group': quota.model_group_id}
+        ).execute()['totals']
+
+        # 模型组使用日志没有耗时草图，不返回分位数
+        assert expected.pop('latency_ms')
+        assert expected['avg_duration_ms'] == 1000
+        assert expected['input_tokens'] == 600
+        assert grouped == filtered == expected
+
+    def test_invalid_arguments(self):
+        with pytest.raises(StatisticsQueryError):
+            UsageStatisticsQuery(granularity='week')
+        with pytest.raises(StatisticsQueryError):
+            UsageStatisticsQuery(group_by='ip_address')
+
+
+class TestStatisticsEndpoint:
+    def test_statistics_with_range(self, api_client, seeded, base_time):
+        api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+        run_rollup(settle_seconds=0)
+        response = api_client.get(reverse('chat-records-statistics'), {
+            'start_date': base_time.date().isoformat(),
+            'end_date': base_time.date().isoformat(),
+        })
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['total_requests'] == 8
+        assert response.data['daily_statistics'][0]['date'] == base_time.date().isoformat()
+
+    def test_statistics_rejects_bad_granularity(self, api_client):
+        api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+        response = api_client.get(reverse('chat-records-statistics'), {'granularity': 'week'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,149 @@
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.billing.jobs import rebuild_user_counters
+from apps.billing.models import APIRequest, UserUsageCounter
+from apps.billing.rollups import run_rollup
+from apps.quotas.factories import UserQuotaFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def local(*args):
+    return timezone.make_aware(datetime(*args), timezone.get_current_timezone())
+
+
+@pytest.fixture
+def quota():
+    return UserQuotaFactory()
+
+
+@pytest.fixture
+def record(make_request):
+    """保存一条请求记录后再累加计数器（与代理视图的调用顺序一致）"""
+    def record(quota, created_at, tokens, cost):
+        make_request(quota, created_at, total_tokens=tokens, total_cost=cost)
+        UserUsageCounter.record(quota.user_id, tokens, cost, created_at)
+    return record
+
+
+class TestUserUsageCounter:
+    def test_record_accumulates_buckets(self, quota, record):
+        now = timezone.now()
+        record(quota, now, 100, Decimal('0.010000'))
+        record(quota, now, 50, Decimal('0.005000'))
+
+        usage = UserUsageCounter.objects.get(user=quota.user).snapshot(now)
+        assert usage['today']['requests'] == 2
+        assert usage['month']['tokens'] == 150
+        assert usage['lifetime']['cost'] == pytest.approx(0.015)
+
+    def test_record_resets_day_and_month(self, quota, record):
+        record(quota, local(2026, 1, 31, 23, 30), 100, Decimal('0.010000'))
+        record(quota, local(2026, 2, 1, 0, 30), 10, Decimal('0.001000'))
+        record(quota, local(2026, 2, 2, 9, 0), 20, Decimal('0.002000'))
+
+        usage = UserUsageCounter.objects.get(user=quota.user).snapshot(local(2026, 2, 2, 10, 0))
+        assert usage['today']['requests'] == 1
+        assert usage['month']['requests'] == 2
+        assert usage['month']['tokens'] == 30
+        assert usage['lifetime']['requests'] == 3
+
+        stale = UserUsageCounter.objects.get(user=quota.user).snapshot(local(2026, 3, 1, 10, 0))
+        assert stale['today']['requests'] == 0
+        assert stale['month']['requests'] == 0
+        assert stale['lifetime']['tokens'] == 130
+
+    def test_record_costs_beyond_old_column_range(self, quota, record):
+        now = timezone.now()
+        for _ in range(3):
+            record(quota, now, 100, Decimal('4000000000.500000'))
+
+        counter = UserUsageCounter.objects.get(user=quota.user)
+        assert counter.total_cost == Decimal('12000000001.500000')
+        assert counter.day_cost == counter.total_cost
+
+    def test_first_record_seeds_from_history(self, quota, make_request, record):
+        now = timezone.now()
+        make_request(quota, now - timezone.timedelta(days=40))
+        make_request(quota, now - timezone.timedelta(minutes=5))
+        run_rollup(settle_seconds=0)
+        APIRequest.objects.filter(created_at__lt=now - timezone.timedelta(days=1)).delete()
+
+        record(quota, now, 100, Decimal('0.010000'))
+        record(quota, now, 50, Decimal('0.005000'))
+
+        usage = UserUsageCounter.objects.get(user=quota.user).snapshot(now)
+        assert usage['today']['requests'] == 3
+        assert usage['lifetime']['requests'] == 4
+        assert usage == UserUsageCounter.rebuild(quota.user).snapshot(now)
+
+    def test_rebuild_combines_rollups_and_pending_requests(self, quota, make_request):
+        now = timezone.now()
+        earlier = now - timezone.timedelta(days=40)
+        make_request(quota, earlier)
+        make_request(quota, now - timezone.timedelta(minutes=5))
+        run_rollup(settle_seconds=0)
+        make_request(quota, now - timezone.timedelta(minutes=1))
+
+        # 已汇总的历史记录被归档或清理后仍计入累计值
+        APIRequest.objects.filter(created_at=earlier).delete()
+        expected = APIRequest.objects.filter(user=quota.user)
+        counter = UserUsageCounter.rebuild(quota.user, at=now)
+        usage = counter.snapshot(now)
+
+        assert usage['today']['requests'] == 2
+        assert usage['lifetime']['requests'] == 3
+        assert usage['today']['tokens'] == sum(expected.values_list('total_tokens', flat=True))
+        assert counter.last_request_at == expected.latest('created_at').created_at
+
+    def test_rebuild_matches_incremental_counts(self, quota, make_request):
+        now = timezone.now()
+        for minutes in (30, 20, 10):
+            api_request = make_request(quota, now - timezone.timedelta(minutes=minutes))
+            api_request.refresh_from_db()
+            UserUsageCounter.record(
+                quota.user_id, api_request.total_tokens, api_request.total_cost, api_request.created_at
+            )
+        incremental = UserUsageCounter.objects.get(user=quota.user).snapshot(now)
+        run_rollup(settle_seconds=0, max_batches=1, batch_size=2)
+
+        assert UserUsageCounter.rebuild(quota.user, at=now).snapshot(now) == incremental
+
+
+class TestDashboardStats:
+    def test_dashboard_reads_single_counter_row(self, quota, record, django_assert_max_num_queries):
+        record(quota, timezone.now(), 100, Decimal('0.010000'))
+        client = APIClient()
+        client.force_authenticate(user=quota.user)
+
+        with django_assert_max_num_queries(1):
+            response = client.get(reverse('dashboard_stats'))
+        assert response.status_code == 200
+        assert response.data['today_requests'] == 1
+        assert response.data['month_tokens'] == 100
+        assert response.data['total_cost'] == pytest.approx(0.01)
+
+    def test_dashboard_initializes_missing_counter(self, quota, make_request):
+        make_request(quota, timezone.now() - timezone.timedelta(minutes=1))
+        client = APIClient()
+        client.force_authenticate(user=quota.user)
+
+        response = client.get(reverse('dashboard_stats'))
+        assert response.data['total_requests'] == 1
+        assert UserUsageCounter.objects.filter(user=quota.user).exists()
+
+
+class TestRebuildJob:
+    def test_job_corrects_drifted_counters(self, quota, record):
+        now = timezone.now()
+        record(quota, now, 100, Decimal('0.010000'))
+        UserUsageCounter.objects.filter(user=quota.user).update(total_requests=7, day_tokens=1)
+
+        assert rebuild_user_counters() == {'counters': 1}
+        usage = UserUsageCounter.objects.get(user=quota.user).snapshot(now)
+        assert usage['lifetime']['requests'] == 1
+        assert usage['today']['tokens'] == 100
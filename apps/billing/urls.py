@@ -4,6 +4,8 @@ from . import views
 
 router = DefaultRouter()
 router.register(r'chat-records', views.APIRequestViewSet, basename='chat-records')
+router.register(r'billing-records', views.BillingRecordViewSet, basename='billing-records')
+router.register(r'retention-policies', views.RetentionPolicyViewSet, basename='retention-policies')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,55 +1,178 @@
-from rest_framework.viewsets import ReadOnlyModelViewSet
+from rest_framework.viewsets import ReadOnlyModelViewSet, ModelViewSet
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Sum, Count, Avg
-from django.db.models.functions import TruncDate
-from decimal import Decimal
+from django.http import StreamingHttpResponse
 
-from .models import APIRequest
-from .serializers import APIRequestSerializer
+from .models import APIRequest, BillingRecord, RetentionPolicy
+from .serializers import APIRequestSerializer, BillingRecordSerializer, RetentionPolicySerializer
+from .retention import policy_queryset
+from .closing import close_billing_period, month_period
+from .pagination import RequestLogPagination
+from .export import (
+    ExportError, iter_export_rows, resolve_columns, export_stream,
+    export_filename, export_content_type,
+)
+from .archive import ArchiveError
+from apps.quotas.models import UserQuota
+from .statistics import UsageStatisticsQuery, StatisticsQueryError, parse_time_bound
 from apps.users.permissions import IsSuperAdminUser
 
 
 class APIRequestViewSet(ReadOnlyModelViewSet):
     """管理员API请求记录查看器"""
-    queryset = APIRequest.objects.select_related('user', 'model').all()
+    # 提供商和模型组用 prefetch 批量读取，避免更多的连接使分页查询放弃按索引顺序扫描
+    queryset = APIRequest.objects.select_related('user', 'model').prefetch_related('model__provider', 'model_group')
     serializer_class = APIRequestSerializer
     permission_classes = [IsSuperAdminUser]
+    pagination_class = RequestLogPagination
     
     @action(detail=False, methods=['get'])
     def statistics(self, request):
-        """获取统计信息"""
-        queryset = self.get_queryset()
-        
-        # 基本统计
-        total_requests = queryset.count()
-        successful_requests = queryset.filter(status_code__gte=200, status_code__lt=300).count()
-        success_rate = (successful_requests / total_requests * 100) if total_requests > 0 else 0
-        
-        # 聚合统计
-        aggregates = queryset.aggregate(
-            total_cost=Sum('total_cost'),
-            total_tokens=Sum('total_tokens'),
-            avg_duration=Avg('duration_ms')
-        )
+        """
+        获取统计信息
+        支持 start_date / end_date（ISO日期或日期时间）、granularity（hour/day/month）
+        和 group_by（user/model/provider/model_group）参数
+        latency_ms 为合并耗时草图得到的 p50/p95/p99（毫秒），按模型组分组时为空
+        """
+        params = request.query_params
+        granularity = params.get('granularity', 'day')
+        group_by = params.get('group_by') or None
         
-        # 按天统计
-        daily_stats = list(queryset.extra(
-            select={'date': "DATE(created_at)"}
-        ).values('date').annotate(
-            requests=Count('id'),
-            cost=Sum('total_cost'),
-            tokens=Sum('total_tokens')
-        ).order_by('date'))
+        try:
+            query = UsageStatisticsQuery(
+                start=parse_time_bound(params.get('start_date')),
+                end=parse_time_bound(params.get('end_date'), end=True),
+                granularity=granularity,
+                group_by=group_by,
+            )
+            result = query.execute()
+        except StatisticsQueryError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response({
-            'total_requests': total_requests,
-            'successful_requests': successful_requests,
-            'success_rate': round(success_rate, 2),
-            'total_cost': float(aggregates['total_cost'] or Decimal('0')),
-            'total_tokens': aggregates['total_tokens'] or 0,
-            'avg_duration_ms': float(aggregates['avg_duration'] or 0),
-            'daily_statistics': daily_stats,
+        totals = result['totals']
+        response = {
+            'total_requests': totals['requests'],
+            'successful_requests': totals['successful_requests'],
+            'success_rate': totals['success_rate'],
+            'total_cost': totals['total_cost'],
+            'total_tokens': totals['total_tokens'],
+            'avg_duration_ms': totals['avg_duration_ms'],
+            'latency_ms': totals.get('latency_ms'),
+            'granularity': granularity,
+            'group_by': group_by,
+            'series': result['series'],
             'message': 'Statistics loaded successfully'
+        }
+        
+        # 兼容原有的按天统计格式
+        if granularity == 'day' and group_by is None:
+            response['daily_statistics'] = [
+                {
+                    'date': entry['period'],
+                    'requests': entry['requests'],
+                    'cost': entry['total_cost'],
+                    'tokens': entry['total_tokens'],
+                }
+                for entry in result['series']
+            ]
+        
+        return Response(response)
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        流式导出请求记录
+        参数: export_format（ndjson/csv）、columns（逗号分隔）、include_payload、gzip、
+        user、quota、model、model_group、start_date、end_date
+        """
+        params = request.query_params
+        export_format = params.get('export_format', 'ndjson')
+        compress = params.get('gzip', '').lower() in ('1', 'true')
+        
+        try:
+            columns = resolve_columns(
+                [column.strip() for column in params['columns'].split(',') if column.strip()] if params.get('columns') else None,
+                include_payload=params.get('include_payload', '').lower() in ('1', 'true'),
+            )
+            filters = {
+                name: int(params[name]) for name in ('user', 'model', 'model_group') if params.get(name)
+            }
+            if params.get('quota'):
+                quota = UserQuota.objects.filter(pk=int(params['quota'])).first()
+                if quota is None:
+                    raise ExportError('配额不存在')
+                filters['quota'] = quota
+            rows = iter_export_rows(
+                columns,
+                start=parse_time_bound(params.get('start_date')),
+                end=parse_time_bound(params.get('end_date'), end=True),
+                **filters
+            )
+            stream = export_stream(rows, columns, export_format=export_format, compress=compress)
+        except ValueError as e:  # ExportError / StatisticsQueryError / 非法ID
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ArchiveError as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        
+        response = StreamingHttpResponse(stream, content_type=export_content_type(export_format, compress))
+        response['Content-Disposition'] = f'attachment; filename="{export_filename(export_format, compress)}"'
+        return response
+
+
+class BillingRecordViewSet(ReadOnlyModelViewSet):
+    """管理员计费记录查看器"""
+    queryset = BillingRecord.objects.select_related('user', 'quota__model_group').all()
+    serializer_class = BillingRecordSerializer
+    permission_classes = [IsSuperAdminUser]
+    
+    @action(detail=False, methods=['post'])
+    def close(self, request):
+        """
+        结算计费周期
+        参数: month（YYYY-MM）、chunk_size、max_chunks、resume
+        """
+        data = request.data
+        try:
+            period_start, period_end = month_period(data.get('month'))
+            chunk_size = int(data.get('chunk_size', 1000))
+            max_chunks = int(data['max_chunks']) if data.get('max_chunks') else None
+        except (TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if chunk_size <= 0:
+            return Response({'error': 'chunk_size 必须为正整数'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        result = close_billing_period(
+            period_start,
+            period_end,
+            chunk_size=chunk_size,
+            resume=str(data.get('resume', '')).lower() in ('1', 'true'),
+            max_chunks=max_chunks,
+        )
+        
+        return Response({
+            'period_start': period_start,
+            'period_end': period_end,
+            'quotas': result.quotas,
+            'chunks': result.chunks,
+            'skipped': result.skipped,
+            'protected': result.protected,
+            'last_quota_id': result.last_quota_id,
+            'finished': result.finished,
+        })
+
+
+class RetentionPolicyViewSet(ModelViewSet):
+    """数据保留策略管理（由 apply_retention 命令执行）"""
+    queryset = RetentionPolicy.objects.select_related('model_group', 'quota').all()
+    serializer_class = RetentionPolicySerializer
+    permission_classes = [IsSuperAdminUser]
+    
+    @action(detail=True, methods=['get'])
+    def preview(self, request, pk=None):
+        """预览策略当前待处理的记录数"""
+        policy = self.get_object()
+        return Response({
+            'policy_id': policy.id,
+            'pending_rows': policy_queryset(policy).count(),
         })
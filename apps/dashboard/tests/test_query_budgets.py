@@ -0,0 +1,425 @@
+"""
+接口查询预算回归测试
+
+先批量写入接近真实规模的数据（数百个模型、模型组、配额和数千条请求记录），
+再逐个调用 core/urls.py 中的每个路由，检查 SQL 查询数量和查询总耗时不超过 ENDPOINTS 中的预算，
+并把查询指纹（去掉字面量后的 SQL）与 query_budgets.json 中记录的基线比较：
+任何指纹的执行次数超过基线（典型的 N+1）都会失败，并输出与基线的差异。
+
+新增路由必须在 ENDPOINTS 中登记预算。查询变化是预期的时候，用下面的命令重新生成基线（同时也是各接口的查询报告）：
+
+    QUERY_BUDGETS_UPDATE=1 python -m pytest apps/dashboard/tests/test_query_budgets.py
+"""
+import difflib
+import json
+import os
+import re
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.ai_models.models import AIModel
+from apps.apis.models import APIProvider
+from apps.billing.models import APIRequest, BillingRecord, RetentionPolicy, UserUsageCounter
+from apps.billing.rollups import run_rollup
+from apps.groups.models import ModelGroup
+from apps.quotas.models import QuotaAlert, QuotaUsageCounter, QuotaUsageLog, UserQuota, generate_api_key
+
+pytestmark = pytest.mark.django_db
+
+User = get_user_model()
+
+BASELINE_PATH = Path(__file__).with_name('query_budgets.json')
+UPDATE_BASELINE = os.environ.get('QUERY_BUDGETS_UPDATE', '').lower() in ('1', 'true')
+
+PASSWORD = 'budget-password-123'
+
+PROVIDERS = 10
+MODELS_PER_PROVIDER = 30
+GROUPS = 60
+MODELS_PER_GROUP = 20
+USERS = 150
+QUOTAS = 300
+MEMBER_QUOTAS = 8
+REQUESTS = 3000
+
+
+@dataclass
+class Endpoint:
+    """一个路由的调用方式和预算"""
+    max_queries: int
+    max_ms: float = 150
+    method: str = 'get'
+    auth: str = 'admin'  # admin / member（普通用户）/ api_key（配额API Key）/ None
+    kwargs: object = None  # dataset -> reverse 参数
+    params: object = None  # dataset -> 查询参数或请求体
+    status: int = 200
+    upstream: bool = False  # 需要模拟上游API
+
+
+# 每个路由的预算；detail 路由只调用 GET，列表路由按默认分页调用
+ENDPOINTS = {
+    # 认证和个人信息
+    'login': Endpoint(max_queries=3, method='post', auth=None,
+                      params=lambda data: {'email': data.member.email, 'password': PASSWORD}),
+    'logout': Endpoint(max_queries=6, method='post', auth=None,
+                       params=lambda data: {'refresh_token': str(RefreshToken.for_user(data.member))}),
+    'change_password': Endpoint(max_queries=1, method='post', auth='member', params=lambda data: {
+        'old_password': PASSWORD, 'new_password': 'Another-password-456', 'new_password_confirm': 'Another-password-456',
+    }),
+    'user_profile': Endpoint(max_queries=1, auth='member'),
+    'user_quotas': Endpoint(max_queries=2, auth='member'),
+    'dashboard_stats': Endpoint(max_queries=17, auth='member'),
+    'get_api_key': Endpoint(max_queries=2, auth='member', kwargs=lambda data: {'quota_id': data.member_quota.id}),
+    'reset_api_key': Endpoint(max_queries=3, method='post', auth='member',
+                              kwargs=lambda data: {'quota_id': data.member_quota.id}),
+
+    # 用户管理
+    'api-root': Endpoint(max_queries=0),
+    'admin-users-list': Endpoint(max_queries=2),
+    'admin-users-detail': Endpoint(max_queries=1, kwargs=lambda data: {'pk': data.member.id}),
+    'admin_reset_user_password': Endpoint(max_queries=2, method='post', kwargs=lambda data: {'pk': data.member.id},
+                                          params=lambda data: {'new_password': 'Reset-password-789'}),
+    'admin_reset_user_all_keys': Endpoint(max_queries=6, method='post', kwargs=lambda data: {'user_id': data.member.id}),
+
+    # 配额
+    'admin-quotas-list': Endpoint(max_queries=2),
+    'admin-quotas-bulk-provision': Endpoint(max_queries=11, method='post', status=201, params=lambda data: {
+        'quotas': [{'user': user_id, 'model_group': data.group.id, 'name': 'onboarding', 'total_quota': '100'}
+                   for user_id in data.user_ids] + [{'user': data.member.id, 'name': data.member_quota.name,
+                                                     'total_quota': '500'}],
+        'grant_access': True,
+    }),
+    'admin-quotas-detail': Endpoint(max_queries=1, kwargs=lambda data: {'pk': data.member_quota.id}),
+    'admin-quotas-requests': Endpoint(max_queries=4, kwargs=lambda data: {'pk': data.member_quota.id}),
+    'admin-quotas-statistics': Endpoint(max_queries=2, kwargs=lambda data: {'pk': data.member_quota.id}),
+    'admin-quotas-reset-api-key': Endpoint(max_queries=2, method='post', kwargs=lambda data: {'pk': data.member_quota.id}),
+    'admin-quotas-rotate-keys': Endpoint(max_queries=6, method='post',
+                                         params=lambda data: {'groups': data.group_ids, 'grace_seconds': 3600}),
+    'admin-quotas-restore': Endpoint(max_queries=2, method='post', kwargs=lambda data: {'pk': data.deleted_quota.id}),
+    'admin-quota-logs-list': Endpoint(max_queries=2),
+    'admin-quota-logs-detail': Endpoint(max_queries=1, kwargs=lambda data: {'pk': data.log.id}),
+    'admin-quota-alerts-list': Endpoint(max_queries=2),
+    'admin-quota-alerts-detail': Endpoint(max_queries=1, kwargs=lambda data: {'pk': data.alert.id}),
+    'admin-quota-alerts-mark-resolved': Endpoint(max_queries=2, method='post', kwargs=lambda data: {'pk': data.alert.id}),
+
+    # 提供商、模型和模型组
+    'apiprovider-list': Endpoint(max_queries=2),
+    'apiprovider-detail': Endpoint(max_queries=1, kwargs=lambda data: {'pk': data.provider.id}),
+    'apiprovider-test': Endpoint(max_queries=1, method='post', kwargs=lambda data: {'pk': data.provider.id}, upstream=True),
+    'apiprovider-sync-models': Endpoint(max_queries=7, method='post', kwargs=lambda data: {'pk': data.provider.id},
+                                        upstream=True),
+    'apiprovider-sync-all': Endpoint(max_queries=70, max_ms=400, method='post', upstream=True),
+    'aimodel-list': Endpoint(max_queries=2),
+    'aimodel-detail': Endpoint(max_queries=1, kwargs=lambda data: {'pk': data.model.id}),
+    'modelgroup-list': Endpoint(max_queries=5),
+    'modelgroup-bulk-membership': Endpoint(max_queries=15, method='post', params=lambda data: {
+        'groups': data.group_ids[:10], 'add_models': data.model_ids[:100], 'remove_models': data.model_ids[100:120],
+        'grant_users': data.user_ids, 'revoke_users': data.user_ids[:1],
+    }),
+    'modelgroup-detail': Endpoint(max_queries=4, kwargs=lambda data: {'pk': data.group.id}),
+
+    # 请求记录、计费和数据保留
+    'chat-records-list': Endpoint(max_queries=3),
+    'chat-records-detail': Endpoint(max_queries=3, kwargs=lambda data: {'pk': data.api_request.id}),
+    'chat-records-export': Endpoint(max_queries=3, max_ms=400),
+    'chat-records-statistics': Endpoint(max_queries=5, max_ms=300),
+    'billing-records-list': Endpoint(max_queries=2),
+    'billing-records-detail': Endpoint(max_queries=1, kwargs=lambda data: {'pk': data.billing_record.id}),
+    'billing-records-close': Endpoint(max_queries=19, max_ms=400, method='post',
+                                      params=lambda data: {'month': data.last_month}),
+    'retention-policies-list': Endpoint(max_queries=2),
+    'retention-policies-detail': Endpoint(max_queries=1, kwargs=lambda data: {'pk': data.policy.id}),
+    'retention-policies-preview': Endpoint(max_queries=4, kwargs=lambda data: {'pk': data.policy.id}),
+
+    # OpenAI 兼容接口
+    'chat_completions': Endpoint(max_queries=14, method='post', auth='api_key', upstream=True,
+                                 params=lambda data: {'model': data.model.name,
+                                                      'messages': [{'role': 'user', 'content': 'Hello!'}]}),
+    'models_list': Endpoint(max_queries=2, auth='api_key'),
+    'usage': Endpoint(max_queries=2, auth='api_key'),
+}
+
+
+def route_names():
+    """core/urls.py 中所有具名路由（不含 Django admin、格式后缀重复的路由和媒体文件）"""
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                if pattern.app_name != 'admin':
+                    yield from walk(pattern.url_patterns)
+            elif pattern.name:
+                yield pattern.name
+
+    return sorted(set(walk(get_resolver().url_patterns)))
+
+
+def seed_dataset():
+    """批量写入数据，返回各接口调用需要的对象"""
+    now = timezone.now()
+
+    providers = APIProvider.objects.bulk_create([
+        APIProvider(name=f'provider-{index:02d}', base_url=f'https://provider-{index:02d}.test/v1', api_key='key')
+        for index in range(PROVIDERS)
+    ])
+    models = AIModel.objects.bulk_create([
+        AIModel(
+            provider=provider,
+            name=f'model-{index:03d}',
+            display_name=f'Model {index:03d}',
+            input_price_per_1m=Decimal('1.000000') + index,
+            output_price_per_1m=Decimal('2.000000') + index,
+        )
+        for provider_index, provider in enumerate(providers)
+        for index in range(provider_index * MODELS_PER_PROVIDER, (provider_index + 1) * MODELS_PER_PROVIDER)
+    ])
+    groups = ModelGroup.objects.bulk_create([ModelGroup(name=f'group-{index:02d}') for index in range(GROUPS)])
+    ModelGroup.ai_models.through.objects.bulk_create([
+        ModelGroup.ai_models.through(modelgroup_id=group.id, aimodel_id=models[(index * 5 + offset) % len(models)].id)
+        for index, group in enumerate(groups)
+        for offset in range(MODELS_PER_GROUP)
+    ])
+
+    password = make_password(PASSWORD)
+    admin = User.objects.create(username='budget-admin', email='admin@budget.test', name='Admin',
+                                password=password, is_super_admin=True)
+    member = User.objects.create(username='budget-member', email='member@budget.test', name='Member',
+                                 password=password)
+    users = [member] + User.objects.bulk_create([
+        User(username=f'user-{index:03d}', email=f'user-{index:03d}@budget.test', name=f'User {index:03d}',
+             password=password)
+        for index in range(USERS)
+    ])
+
+    quotas = UserQuota.objects.bulk_create([
+        UserQuota(
+            name=f'quota-{index:03d}',
+            user=member if index < MEMBER_QUOTAS else users[index % len(users)],
+            model_group=groups[index % len(groups)],
+            api_key=generate_api_key(),
+            total_quota=Decimal('1000.000000'),
+            used_quota=Decimal(index % 50),
+            deleted_at=now if index == QUOTAS - 1 else None,
+        )
+        for index in range(QUOTAS)
+    ])
+
+    api_requests = APIRequest.objects.bulk_create([
+        APIRequest(
+            user=quota.user,
+            model=models[(quota.model_group_id * 5 + index % MODELS_PER_GROUP) % len(models)],
+            model_group=quota.model_group,
+            model_name='model',
+            model_provider_name='provider',
+            model_group_name=quota.model_group.name,
+            endpoint='/v1/chat/completions',
+            input_tokens=100,
+            output_tokens=50,
+            total_tokens=150,
+            total_cost_nanos=1500,
+            total_cost=Decimal('0.000002'),
+            status_code=200 if index % 10 else 500,
+            duration_ms=100 + index % 900,
+            ip_address='127.0.0.1',
+        )
+        for index, quota in ((index, quotas[index % (QUOTAS - 1)]) for index in range(REQUESTS))
+    ])
+    # 分布到最近十天
+    chunk = REQUESTS // 30
+    for index in range(30):
+        APIRequest.objects.filter(
+            id__in=[api_request.id for api_request in api_requests[index * chunk:(index + 1) * chunk]]
+        ).update(created_at=now - timedelta(days=index // 3, hours=index % 3 + 1))
+    run_rollup(max_batches=None)
+    # 计数器已由迁移回填，请求路径只做增量累加
+    UserUsageCounter.rebuild(member)
+    QuotaUsageCounter.rebuild(quotas[0])
+
+    logs = QuotaUsageLog.objects.bulk_create([
+        QuotaUsageLog(quota=quotas[index % QUOTAS], action='deduct', amount=Decimal('0.100000'),
+                      remaining=Decimal('999.000000'))
+        for index in range(600)
+    ])
+    alerts = QuotaAlert.objects.bulk_create([
+        QuotaAlert(quota=quotas[index * 2], alert_type='expiring_soon', message='即将到期', is_resolved=index % 2 == 1)
+        for index in range(120)
+    ])
+
+    last_month = (now.replace(day=1) - timedelta(days=1)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    billing_records = BillingRecord.objects.bulk_create([
+        BillingRecord(user=quota.user, quota=quota, period_start=last_month, period_end=now.replace(day=1))
+        for quota in quotas[:100]
+    ])
+    policies = RetentionPolicy.objects.bulk_create([
+        RetentionPolicy(name='global', target='api_requests', retention_days=3),
+        RetentionPolicy(name='group', target='api_requests', retention_days=1, model_group=groups[0]),
+        RetentionPolicy(name='quota', target='quota_usage_logs', retention_days=1, quota=quotas[0]),
+        RetentionPolicy(name='payload', target='api_requests', action='strip_payload', retention_days=2),
+        RetentionPolicy(name='providers', target='provider_logs', retention_days=7),
+    ])
+
+    return SimpleNamespace(
+        admin=admin,
+        member=member,
+        member_quota=quotas[0],
+        deleted_quota=quotas[-1],
+        provider=providers[0],
+        model=models[0],
+        group=groups[0],
+        group_ids=[group.id for group in groups],
+        model_ids=[model.id for model in models],
+        user_ids=[user.id for user in users],
+        log=logs[0],
+        alert=alerts[0],
+        api_request=api_requests[0],
+        billing_record=billing_records[0],
+        policy=policies[0],
+        last_month=last_month.strftime('%Y-%m'),
+    )
+
+
+@pytest.fixture(scope='module')
+def dataset(django_db_setup, django_db_blocker):
+    """整个模块共用一份数据；每个测试在事务中运行，修改会被回滚"""
+    with django_db_blocker.unblock():
+        yield seed_dataset()
+        call_command('flush', interactive=False, verbosity=0)
+
+
+@pytest.fixture
+def mock_upstream(mocker):
+    """模拟上游：模型目录和对话补全"""
+    catalog = mocker.Mock(status_code=200, headers={})
+    catalog.json.return_value = {'data': [
+        {'id': f'model-{index:03d}', 'name': f'Model {index:03d}',
+         'pricing': {'prompt': '0.000003', 'completion': '0.000006'}}
+        for index in range(MODELS_PER_PROVIDER)
+    ]}
+    mocker.patch('requests.get', return_value=catalog)
+
+    completion = mocker.Mock(status_code=200, headers={})
+    completion.json.return_value = {
+        'id': 'chatcmpl-budget',
+        'object': 'chat.completion',
+        'model': 'model-000',
+        'usage': {'prompt_tokens': 10, 'completion_tokens': 20, 'total_tokens': 30},
+        'choices': [{'message': {'role': 'assistant', 'content': 'Hi'}, 'finish_reason': 'stop', 'index': 0}],
+    }
+    mocker.patch('requests.post', return_value=completion)
+
+
+SAVEPOINT_RE = re.compile(r'"s\d+_x\d+"')
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?(?:e[-+]?\d+)?\b', re.IGNORECASE)
+LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+ROWS_RE = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+
+
+def fingerprint(sql):
+    """去掉字面量、IN 列表长度和保存点名称后的 SQL，用于比较查询的形状"""
+    sql = SAVEPOINT_RE.sub('"savepoint"', sql)
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = LIST_RE.sub('(...)', sql)
+    sql = ROWS_RE.sub('(...)', sql)
+    return ' '.join(sql.split())
+
+
+def fingerprint_counts(queries):
+    counts = {}
+    for query in queries:
+        key = fingerprint(query['sql'])
+        counts[key] = counts.get(key, 0) + 1
+    return dict(sorted(counts.items()))
+
+
+def load_baseline():
+    if BASELINE_PATH.exists():
+        return json.loads(BASELINE_PATH.read_text(encoding='utf-8'))
+    return {}
+
+
+def save_baseline(name, counts):
+    baseline = load_baseline()
+    baseline[name] = {'queries': sum(counts.values()), 'fingerprints': counts}
+    BASELINE_PATH.write_text(
+        json.dumps(dict(sorted(baseline.items())), ensure_ascii=False, indent=2) + '\n', encoding='utf-8'
+    )
+
+
+def fingerprint_diff(expected, actual):
+    """基线和本次查询指纹的差异（每行为 次数× 指纹）"""
+    return '\n'.join(difflib.unified_diff(
+        [f'{count}× {sql}' for sql, count in expected.items()],
+        [f'{count}× {sql}' for sql, count in actual.items()],
+        fromfile='baseline', tofile='current', lineterm='',
+    ))
+
+
+def call_endpoint(client, name, endpoint, data):
+    if endpoint.auth == 'admin':
+        client.force_authenticate(user=data.admin)
+    elif endpoint.auth == 'member':
+        client.force_authenticate(user=data.member)
+    elif endpoint.auth == 'api_key':
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {data.member_quota.api_key}')
+
+    url = reverse(name, kwargs=endpoint.kwargs(data) if endpoint.kwargs else None)
+    params = endpoint.params(data) if endpoint.params else None
+    # 清空进程内的 ContentType 缓存，保证每个接口都在相同的缓存状态下统计
+    ContentType.objects.clear_cache()
+
+    with CaptureQueriesContext(connection) as context:
+        if endpoint.method == 'get':
+            response = client.get(url, params)
+        else:
+            response = getattr(client, endpoint.method)(url, params, format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+    return response, context.captured_queries
+
+
+def test_every_route_has_a_budget():
+    missing = sorted(set(route_names()) - set(ENDPOINTS))
+    stale = sorted(set(ENDPOINTS) - set(route_names()))
+    assert not missing, f'以下路由没有查询预算，请在 ENDPOINTS 中登记: {missing}'
+    assert not stale, f'以下预算对应的路由已不存在: {stale}'
+
+
+@pytest.mark.parametrize('name', sorted(ENDPOINTS))
+def test_query_budget(name, dataset, api_client, request):
+    endpoint = ENDPOINTS[name]
+    if endpoint.upstream:
+        request.getfixturevalue('mock_upstream')
+
+    response, queries = call_endpoint(api_client, name, endpoint, dataset)
+
+    assert response.status_code == endpoint.status, getattr(response, 'data', response)
+
+    counts = fingerprint_counts(queries)
+    if UPDATE_BASELINE:
+        save_baseline(name, counts)
+        return
+
+    expected = load_baseline().get(name, {}).get('fingerprints', {})
+    report = fingerprint_diff(expected, counts)
+    repeated = {sql: count for sql, count in counts.items() if count > expected.get(sql, 1)}
+    assert not repeated, f'{name} 的查询次数超过基线（可能出现 N+1）:\n{report}'
+    assert len(queries) <= endpoint.max_queries, (
+        f'{name} 执行了 {len(queries)} 条查询，预算为 {endpoint.max_queries}:\n{report}'
+    )
+    elapsed_ms = sum(float(query['time']) for query in queries) * 1000
+    assert elapsed_ms <= endpoint.max_ms, f'{name} 查询总耗时 {elapsed_ms:.1f} 毫秒，预算为 {endpoint.max_ms} 毫秒'
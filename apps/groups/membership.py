@@ -0,0 +1,131 @@
+"""
+批量维护模型组成员
+
+一次请求为多个模型组添加/移除模型、授予/撤销用户访问权限：
+模型组、模型和用户各用一次查询校验是否存在，已有的关联用一次查询读出，
+新增关联直接批量插入多对多中间表，移除的关联用一条 DELETE 删除，查询数量不随模型组、模型和用户数量增长。
+直接写中间表不会触发 m2m_changed 信号，模型有变化时在事务提交后手动使模型目录缓存失效。
+"""
+from dataclasses import dataclass
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from apps.ai_models.models import AIModel
+from apps.proxy.catalog import invalidate_model_catalog
+from .models import ModelGroup
+
+BATCH_SIZE = 500
+
+
+class MembershipError(ValueError):
+    """请求中引用了不存在的模型组、模型或用户；errors 为 字段 -> 错误信息"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(f'{key}: {message}' for key, message in errors.items()))
+
+
+@dataclass
+class MembershipResult:
+    """一次批量维护写入的关联数量"""
+    models_added: int = 0
+    models_removed: int = 0
+    users_granted: int = 0
+    users_revoked: int = 0
+
+    def as_dict(self):
+        return {
+            'models_added': self.models_added,
+            'models_removed': self.models_removed,
+            'users_granted': self.users_granted,
+            'users_revoked': self.users_revoked,
+        }
+
+
+def _resolve(model, ids, label):
+    """一次查询确认 ids 都存在，返回缺失的ID错误信息（全部存在时返回 None）"""
+    ids = set(ids)
+    if not ids:
+        return None
+    missing = ids - set(model.objects.filter(pk__in=ids).order_by().values_list('pk', flat=True))
+    if missing:
+        return f'{label}不存在: {sorted(missing)}'
+    return None
+
+
+def _add(through, group_field, target_field, pairs):
+    """插入 (模型组ID, 目标ID) 关联中尚不存在的部分，返回插入数量"""
+    pairs = set(pairs)
+    if not pairs:
+        return 0
+    existing = set(through.objects.filter(
+        **{f'{group_field}__in': {group_id for group_id, _ in pairs},
+           f'{target_field}__in': {target_id for _, target_id in pairs}}
+    ).values_list(group_field, target_field))
+    rows = [
+        through(**{group_field: group_id, target_field: target_id})
+        for group_id, target_id in sorted(pairs - existing)
+    ]
+    # 并发请求插入了相同的关联时忽略冲突
+    through.objects.bulk_create(rows, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return len(rows)
+
+
+def grant_group_access(pairs):
+    """批量授予 (模型组ID, 用户ID) 访问权限，返回新增的数量"""
+    return _add(ModelGroup.allowed_users.through, 'modelgroup_id', 'user_id', pairs)
+
+
+def _remove(through, group_field, target_field, group_ids, target_ids):
+    if not target_ids:
+        return 0
+    return through.objects.filter(
+        **{f'{group_field}__in': group_ids, f'{target_field}__in': target_ids}
+    ).delete()[0]
+
+
+def apply_membership(group_ids, add_models=(), remove_models=(), grant_users=(), revoke_users=()):
+    """
+    对 group_ids 中的每个模型组添加/移除模型、授予/撤销用户访问权限，返回 MembershipResult
+    任何ID不存在时抛出 MembershipError，不写入任何数据；同时出现在添加和移除中的ID以移除为准
+    """
+    group_ids = sorted(set(group_ids))
+    remove_models, revoke_users = sorted(set(remove_models)), sorted(set(revoke_users))
+    add_models = sorted(set(add_models) - set(remove_models))
+    grant_users = sorted(set(grant_users) - set(revoke_users))
+
+    errors = {}
+    if not group_ids:
+        errors['groups'] = '至少需要一个模型组'
+    checks = (
+        ('groups', ModelGroup, group_ids, '模型组'),
+        ('models', AIModel, add_models + remove_models, '模型'),
+        ('users', get_user_model(), grant_users + revoke_users, '用户'),
+    )
+    for key, model, ids, label in checks:
+        error = _resolve(model, ids, label)
+        if error:
+            errors.setdefault(key, error)
+    if errors:
+        raise MembershipError(errors)
+
+    models_through = ModelGroup.ai_models.through
+    users_through = ModelGroup.allowed_users.through
+    result = MembershipResult()
+    with transaction.atomic():
+        result.models_removed = _remove(models_through, 'modelgroup_id', 'aimodel_id', group_ids, remove_models)
+        result.models_added = _add(models_through, 'modelgroup_id', 'aimodel_id',
+                                   [(group_id, model_id) for group_id in group_ids for model_id in add_models])
+        result.users_revoked = _remove(users_through, 'modelgroup_id', 'user_id', group_ids, revoke_users)
+        result.users_granted = grant_group_access(
+            [(group_id, user_id) for group_id in group_ids for user_id in grant_users]
+        )
+        if result.models_added or result.models_removed:
+            transaction.on_commit(lambda: _invalidate_catalogs(group_ids))
+    return result
+
+
+def _invalidate_catalogs(group_ids):
+    for group_id in group_ids:
+        invalidate_model_catalog(group_id)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='modelgroupusagelog',
+            name='success_count',
+            field=models.IntegerField(default=0, verbose_name='成功次数'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0003_modelgroupusagelog_success_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='modelgroupusagelog',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=6, default=0, max_digits=20, verbose_name='总成本'),
+        ),
+    ]
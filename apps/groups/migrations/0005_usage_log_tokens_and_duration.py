@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-19 20:04
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+
+def backfill_usage_logs(apps, schema_editor):
+    """
+    按已汇总的API请求回填新增的 token 和耗时字段（与 rollups.fold_requests 的口径一致）
+    已冷归档或已删除的请求无法回填，这些日期的新字段保持为 0
+    """
+    APIRequest = apps.get_model('billing', 'APIRequest')
+    ProcessingWatermark = apps.get_model('billing', 'ProcessingWatermark')
+    ModelGroupUsageLog = apps.get_model('groups', 'ModelGroupUsageLog')
+
+    last_id = ProcessingWatermark.objects.filter(name='usage_rollup').values_list('last_id', flat=True).first()
+    if not last_id:
+        return
+    rows = (
+        APIRequest.objects.filter(id__lte=last_id, model__isnull=False, model_group__isnull=False)
+        .order_by()
+        .annotate(bucket=TruncHour('created_at'))
+        .values('model_group_id', 'user_id', 'model_id', 'bucket')
+        .annotate(input_tokens=Sum('input_tokens'), output_tokens=Sum('output_tokens'), duration_ms=Sum('duration_ms'))
+    )
+    for row in rows.iterator():
+        bucket = timezone.localtime(row['bucket'])
+        logs = ModelGroupUsageLog.objects.filter(
+            group_id=row['model_group_id'], user_id=row['user_id'], model_id=row['model_id'], date=bucket.date(),
+        )
+        for hour_logs in (logs.filter(hour=bucket.hour), logs.filter(hour__isnull=True)):
+            hour_logs.update(
+                input_tokens=F('input_tokens') + (row['input_tokens'] or 0),
+                output_tokens=F('output_tokens') + (row['output_tokens'] or 0),
+                total_duration_ms=F('total_duration_ms') + (row['duration_ms'] or 0),
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0004_widen_usage_log_cost'),
+        ('billing', '0014_widen_cost_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='modelgroupusagelog',
+            name='input_tokens',
+            field=models.IntegerField(default=0, verbose_name='输入token数'),
+        ),
+        migrations.AddField(
+            model_name='modelgroupusagelog',
+            name='output_tokens',
+            field=models.IntegerField(default=0, verbose_name='输出token数'),
+        ),
+        migrations.AddField(
+            model_name='modelgroupusagelog',
+            name='total_duration_ms',
+            field=models.BigIntegerField(default=0, verbose_name='总耗时(毫秒)'),
+        ),
+        migrations.RunPython(backfill_usage_logs, migrations.RunPython.noop),
+    ]
@@ -98,8 +98,12 @@ class ModelGroupUsageLog(models.Model):
     
     # 使用统计
     request_count = models.IntegerField('请求次数', default=0)
+    success_count = models.IntegerField('成功次数', default=0)
+    input_tokens = models.IntegerField('输入token数', default=0)
+    output_tokens = models.IntegerField('输出token数', default=0)
     total_tokens = models.IntegerField('总token数', default=0)
-    total_cost = models.DecimalField('总成本', max_digits=10, decimal_places=6, default=0)
+    total_cost = models.DecimalField('总成本', max_digits=20, decimal_places=6, default=0)
+    total_duration_ms = models.BigIntegerField('总耗时(毫秒)', default=0)
     
     # 时间维度
     date = models.DateField('日期')
@@ -1,30 +1,27 @@
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
 from .models import ModelGroup
 from apps.ai_models.models import AIModel
 
 
-class ModelGroupSerializer(serializers.ModelSerializer):
-    """模型组序列化器"""
-    model_count = serializers.SerializerMethodField()
-    models_info = serializers.SerializerMethodField()
-    model_names = serializers.SerializerMethodField()
-    model_ids = serializers.SerializerMethodField()
+class ModelGroupModelsMixin:
+    """
+    模型组的模型信息字段
+    都从 ai_models 的预取缓存读取（视图集的查询集需要 prefetch_related('ai_models__provider')），
+    列表中每个模型组不再产生额外的查询；没有预取时每个模型组只查询一次
+    """
     
-    class Meta:
-        model = ModelGroup
-        fields = [
-            'id', 'name', 'description', 'model_ids', 'default_quota',
-            'is_public', 'allowed_users', 'is_active', 'created_at', 
-            'updated_at', 'model_count', 'models_info', 'model_names'
-        ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'model_count', 'models_info', 'model_names', 'model_ids']
+    def _models(self, obj):
+        if 'ai_models' not in getattr(obj, '_prefetched_objects_cache', {}):
+            prefetch_related_objects([obj], 'ai_models__provider')
+        return list(obj.ai_models.all())
     
     def get_model_ids(self, obj):
         """获取关联的模型ID列表"""
-        return list(obj.ai_models.values_list('id', flat=True))
+        return [model.id for model in self._models(obj)]
     
     def get_model_count(self, obj):
-        return obj.get_model_count()
+        return len(self._models(obj))
     
     def get_models_info(self, obj):
         return [
@@ -34,15 +31,32 @@ class ModelGroupSerializer(serializers.ModelSerializer):
                 'display_name': model.display_name,
                 'provider_name': model.provider.name
             }
-            for model in obj.ai_models.select_related('provider').all()[:5]  # 只显示前5个
+            for model in self._models(obj)[:5]  # 只显示前5个
         ]
     
     def get_model_names(self, obj):
         """获取模型名称列表用于表格显示"""
-        return [f"[{model.provider.name}] {model.display_name}" for model in obj.ai_models.select_related('provider').all()]
+        return [f"[{model.provider.name}] {model.display_name}" for model in self._models(obj)]
 
 
-class ModelGroupCreateSerializer(serializers.ModelSerializer):
+class ModelGroupSerializer(ModelGroupModelsMixin, serializers.ModelSerializer):
+    """模型组序列化器"""
+    model_count = serializers.SerializerMethodField()
+    models_info = serializers.SerializerMethodField()
+    model_names = serializers.SerializerMethodField()
+    model_ids = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ModelGroup
+        fields = [
+            'id', 'name', 'description', 'model_ids', 'default_quota',
+            'is_public', 'allowed_users', 'is_active', 'created_at', 
+            'updated_at', 'model_count', 'models_info', 'model_names'
+        ]
+        read_only_fields = ['id', 'created_at', 'updated_at', 'model_count', 'models_info', 'model_names', 'model_ids']
+
+
+class ModelGroupCreateSerializer(ModelGroupModelsMixin, serializers.ModelSerializer):
     """创建模型组序列化器"""
     model_count = serializers.SerializerMethodField()
     models_info = serializers.SerializerMethodField()
@@ -62,24 +76,6 @@ class ModelGroupCreateSerializer(serializers.ModelSerializer):
             'updated_at', 'model_count', 'models_info', 'model_names'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'model_count', 'models_info', 'model_names']
-        
-    def get_model_count(self, obj):
-        return obj.get_model_count()
-    
-    def get_models_info(self, obj):
-        return [
-            {
-                'id': model.id,
-                'name': model.name,
-                'display_name': model.display_name,
-                'provider_name': model.provider.name
-            }
-            for model in obj.ai_models.select_related('provider').all()[:5]  # 只显示前5个
-        ]
-    
-    def get_model_names(self, obj):
-        """获取模型名称列表用于表格显示"""
-        return [f"[{model.provider.name}] {model.display_name}" for model in obj.ai_models.select_related('provider').all()]
     
     def create(self, validated_data):
         """创建模型组时处理model_ids字段"""
@@ -95,7 +91,7 @@ class ModelGroupCreateSerializer(serializers.ModelSerializer):
         return instance
 
 
-class ModelGroupUpdateSerializer(serializers.ModelSerializer):
+class ModelGroupUpdateSerializer(ModelGroupModelsMixin, serializers.ModelSerializer):
     """更新模型组序列化器"""
     model_count = serializers.SerializerMethodField()
     models_info = serializers.SerializerMethodField()
@@ -115,24 +111,6 @@ class ModelGroupUpdateSerializer(serializers.ModelSerializer):
             'updated_at', 'model_count', 'models_info', 'model_names'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'model_count', 'models_info', 'model_names']
-        
-    def get_model_count(self, obj):
-        return obj.get_model_count()
-    
-    def get_models_info(self, obj):
-        return [
-            {
-                'id': model.id,
-                'name': model.name,
-                'display_name': model.display_name,
-                'provider_name': model.provider.name
-            }
-            for model in obj.ai_models.select_related('provider').all()[:5]  # 只显示前5个
-        ]
-    
-    def get_model_names(self, obj):
-        """获取模型名称列表用于表格显示"""
-        return [f"[{model.provider.name}] {model.display_name}" for model in obj.ai_models.select_related('provider').all()]
     
     def update(self, instance, validated_data):
         """更新模型组时处理model_ids字段"""
@@ -145,4 +123,13 @@ class ModelGroupUpdateSerializer(serializers.ModelSerializer):
             models = AIModel.objects.filter(id__in=model_ids)
             updated_instance.ai_models.set(models)
         
-        return updated_instance 
\ No newline at end of file
+        return updated_instance 
+
+
+class ModelGroupMembershipSerializer(serializers.Serializer):
+    """批量维护模型组成员请求（ID是否存在由 apply_membership 一次性检查）"""
+    groups = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, help_text='模型组ID列表')
+    add_models = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    remove_models = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    grant_users = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    revoke_users = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
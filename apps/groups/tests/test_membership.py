@@ -0,0 +1,108 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from apps.ai_models.models import AIModel
+from apps.apis.models import APIProvider
+from apps.groups.models import ModelGroup
+from apps.users.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def admin_client(api_client):
+    api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+    return api_client
+
+
+@pytest.fixture
+def models():
+    provider = APIProvider.objects.create(name='Provider', base_url='https://api.test.com/v1', api_key='key')
+    return AIModel.objects.bulk_create([
+        AIModel(provider=provider, name=f'model-{index:03d}', display_name=f'Model {index}')
+        for index in range(200)
+    ])
+
+
+@pytest.fixture
+def groups():
+    return ModelGroup.objects.bulk_create([ModelGroup(name=f'group-{index}') for index in range(3)])
+
+
+def post(client, data):
+    """返回响应和 INSERT 以外的查询数（SQLite 按参数数量限制把批量插入拆成多条语句）"""
+    with CaptureQueriesContext(connection) as context:
+        response = client.post(reverse('modelgroup-bulk-membership'), data, format='json')
+    return response, sum(1 for query in context.captured_queries if not query['sql'].startswith('INSERT'))
+
+
+class TestBulkMembership:
+    def test_add_and_remove_models(self, admin_client, models, groups, django_capture_on_commit_callbacks, mocker):
+        invalidate = mocker.patch('apps.groups.membership.invalidate_model_catalog')
+        groups[0].ai_models.add(models[0], models[1])
+        group_ids = [group.id for group in groups]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response, queries = post(admin_client, {
+                'groups': group_ids,
+                'add_models': [model.id for model in models],
+                'remove_models': [models[1].id],
+            })
+
+        assert response.status_code == status.HTTP_200_OK
+        # 已存在的关联不重复插入，同时出现在添加和移除中的模型以移除为准
+        assert response.data['models_added'] == 3 * 199 - 1
+        assert response.data['models_removed'] == 1
+        for group in groups:
+            assert set(group.ai_models.values_list('id', flat=True)) == {model.id for model in models[:1] + models[2:]}
+        assert queries <= 10
+        assert sorted(call.args[0] for call in invalidate.call_args_list) == sorted(group_ids)
+
+    def test_query_count_does_not_grow(self, admin_client, models, groups):
+        _, small = post(admin_client, {'groups': [groups[0].id], 'add_models': [models[0].id]})
+        _, large = post(admin_client, {
+            'groups': [group.id for group in groups], 'add_models': [model.id for model in models[1:]],
+        })
+
+        assert large == small
+
+    def test_grant_and_revoke_users(self, admin_client, groups):
+        users = [UserFactory() for _ in range(3)]
+        groups[0].allowed_users.add(users[2])
+
+        response, _ = post(admin_client, {
+            'groups': [groups[0].id, groups[1].id],
+            'grant_users': [users[0].id, users[1].id],
+            'revoke_users': [users[2].id],
+        })
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['users_granted'] == 4
+        assert response.data['users_revoked'] == 1
+        assert set(groups[0].allowed_users.all()) == set(users[:2])
+        assert set(groups[1].allowed_users.all()) == set(users[:2])
+
+    def test_unknown_ids_write_nothing(self, admin_client, models, groups):
+        response, _ = post(admin_client, {
+            'groups': [groups[0].id, 99999],
+            'add_models': [models[0].id, 88888],
+        })
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert '99999' in response.data['groups']
+        assert '88888' in response.data['models']
+        assert not ModelGroup.ai_models.through.objects.exists()
+
+    def test_requires_groups(self, admin_client):
+        response, _ = post(admin_client, {'groups': [], 'add_models': [1]})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_requires_admin(self, api_client, groups):
+        api_client.force_authenticate(user=UserFactory())
+
+        response, _ = post(api_client, {'groups': [groups[0].id]})
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
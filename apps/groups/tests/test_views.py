@@ -0,0 +1,75 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from apps.ai_models.models import AIModel
+from apps.apis.models import APIProvider
+from apps.groups.models import ModelGroup
+from apps.users.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def admin_client(api_client):
+    api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+    return api_client
+
+
+@pytest.fixture
+def models():
+    provider = APIProvider.objects.create(name='Provider', base_url='https://api.test.com/v1', api_key='key')
+    return [
+        AIModel.objects.create(provider=provider, name=f'model-{index}', display_name=f'Model {index}')
+        for index in range(7)
+    ]
+
+
+def make_groups(count, models):
+    start = ModelGroup.objects.count()
+    for index in range(start, start + count):
+        group = ModelGroup.objects.create(name=f'group-{index:03d}')
+        group.ai_models.set(models[:index % len(models) + 1])
+
+
+def list_queries(client):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(reverse('modelgroup-list'), {'page_size': 1000})
+    assert response.status_code == status.HTTP_200_OK
+    return len(context), response
+
+
+class TestModelGroupList:
+    def test_query_count_is_constant(self, admin_client, models):
+        make_groups(3, models)
+        small, _ = list_queries(admin_client)
+
+        make_groups(40, models)
+        large, response = list_queries(admin_client)
+
+        assert large == small
+        assert response.data['count'] == 43
+
+    def test_model_fields_from_prefetch(self, admin_client, models):
+        make_groups(7, models)
+
+        _, response = list_queries(admin_client)
+
+        group = next(item for item in response.data['results'] if item['name'] == 'group-006')
+        expected = AIModel.objects.filter(id__in=group['model_ids'])
+        assert group['model_count'] == 7
+        assert group['model_ids'] == [model.id for model in expected.order_by('provider__name', 'name')]
+        assert len(group['models_info']) == 5
+        assert group['model_names'][0] == '[Provider] Model 0'
+
+    def test_update_response_reflects_new_models(self, admin_client, models):
+        make_groups(1, models)
+        group = ModelGroup.objects.get()
+
+        response = admin_client.patch(
+            reverse('modelgroup-detail', args=[group.id]), {'model_ids': [models[2].id, models[3].id]}, format='json'
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['model_count'] == 2
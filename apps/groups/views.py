@@ -1,13 +1,17 @@
 from django.shortcuts import render
 from rest_framework.viewsets import ModelViewSet
+from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 
+from .membership import MembershipError, apply_membership
 from .models import ModelGroup
-from .serializers import ModelGroupSerializer, ModelGroupCreateSerializer, ModelGroupUpdateSerializer
+from .serializers import (
+    ModelGroupSerializer, ModelGroupCreateSerializer, ModelGroupUpdateSerializer, ModelGroupMembershipSerializer
+)
 from apps.users.permissions import IsSuperAdminUser
 
 
@@ -37,3 +41,27 @@ class ModelGroupViewSet(ModelViewSet):
         elif self.action in ['update', 'partial_update']:
             return ModelGroupUpdateSerializer
         return ModelGroupSerializer
+    
+    @action(detail=False, methods=['post'])
+    def bulk_membership(self, request):
+        """
+        批量维护模型组成员
+        参数: groups（模型组ID列表）、add_models、remove_models、grant_users、revoke_users
+        所有操作应用到每个模型组，任何ID不存在时不写入任何数据
+        """
+        serializer = ModelGroupMembershipSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        try:
+            result = apply_membership(
+                data['groups'],
+                add_models=data['add_models'],
+                remove_models=data['remove_models'],
+                grant_users=data['grant_users'],
+                revoke_users=data['revoke_users'],
+            )
+        except MembershipError as e:
+            return Response(e.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(result.as_dict())
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ProxyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.proxy'
+
+    def ready(self):
+        from . import signals  # noqa: F401
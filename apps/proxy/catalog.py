@@ -0,0 +1,72 @@
+"""
+/v1/models 的模型目录缓存
+
+每个模型组的模型列表预先序列化为 JSON 字节并缓存在进程内，
+同时根据模型组、模型和提供商的 updated_at 计算 ETag / Last-Modified，
+条件请求命中缓存时无需访问数据库即可返回 304
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+
+from utils.cache import TTLCache
+
+_catalog_cache = TTLCache(
+    maxsize=getattr(settings, 'MODELS_LIST_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'MODELS_LIST_CACHE_TTL', 60),
+)
+
+
+@dataclass(frozen=True)
+class ModelCatalog:
+    """已序列化的模型列表"""
+    body: bytes
+    etag: str
+    last_modified: datetime
+
+
+def build_model_catalog(model_group):
+    """查询模型组中的可用模型并构造 OpenAI 兼容的响应体"""
+    models = model_group.ai_models.filter(
+        provider__is_active=True
+    ).select_related('provider').order_by('id')
+
+    model_list = []
+    versions = [f'group:{model_group.id}:{model_group.updated_at.isoformat()}']
+    last_modified = model_group.updated_at
+    for model in models:
+        model_list.append({
+            'id': model.name,
+            'object': 'model',
+            'created': int(model.created_at.timestamp()),
+            'owned_by': model.provider.name.lower(),
+            'permission': []
+        })
+        versions.append(
+            f'{model.id}:{model.updated_at.isoformat()}:{model.provider_id}:{model.provider.updated_at.isoformat()}'
+        )
+        last_modified = max(last_modified, model.updated_at, model.provider.updated_at)
+
+    body = json.dumps({'object': 'list', 'data': model_list}, ensure_ascii=False).encode('utf-8')
+    etag = '"%s"' % hashlib.sha1('|'.join(versions).encode('utf-8')).hexdigest()
+    return ModelCatalog(body=body, etag=etag, last_modified=last_modified)
+
+
+def get_model_catalog(model_group):
+    """获取模型组的模型列表（优先读取缓存）"""
+    catalog = _catalog_cache.get(model_group.id)
+    if catalog is None or catalog.last_modified < model_group.updated_at:
+        catalog = build_model_catalog(model_group)
+        _catalog_cache.set(model_group.id, catalog)
+    return catalog
+
+
+def invalidate_model_catalog(group_id=None):
+    """使模型列表缓存失效；不指定模型组时清空全部缓存"""
+    if group_id is None:
+        _catalog_cache.clear()
+    else:
+        _catalog_cache.delete(group_id)
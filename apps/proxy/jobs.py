@@ -0,0 +1,10 @@
+"""代理相关的定时任务（由 apps.scheduler 调度）"""
+from apps.scheduler.registry import periodic_job
+
+from .models import IdempotencyRecord
+
+
+@periodic_job('proxy.purge_idempotency_records', interval=60 * 60, jitter=5 * 60)
+def purge_idempotency_records():
+    """清理过期的幂等请求记录"""
+    return {'deleted': IdempotencyRecord.purge_expired()}
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from apps.proxy.models import IdempotencyRecord
+
+
+class Command(BaseCommand):
+    help = '清理过期的幂等请求记录'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='每批删除的记录数'
+        )
+
+    def handle(self, *args, **options):
+        deleted = IdempotencyRecord.purge_expired(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'已清理 {deleted} 条过期的幂等请求记录')
+        )
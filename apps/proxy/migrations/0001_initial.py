@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('quotas', '0006_change_modelgroup_delete_cascade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, verbose_name='幂等键')),
+                ('request_hash', models.CharField(max_length=64, verbose_name='请求摘要')),
+                ('status', models.CharField(choices=[('processing', '处理中'), ('completed', '已完成')], default='processing', max_length=20, verbose_name='状态')),
+                ('response_status', models.IntegerField(blank=True, null=True, verbose_name='响应状态码')),
+                ('response_data', models.JSONField(default=dict, verbose_name='响应数据')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('expires_at', models.DateTimeField(verbose_name='过期时间')),
+                ('quota', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_records', to='quotas.userquota')),
+            ],
+            options={
+                'verbose_name': '幂等请求记录',
+                'verbose_name_plural': '幂等请求记录',
+                'db_table': 'idempotency_records',
+                'indexes': [models.Index(fields=['expires_at'], name='idempotency_expires_79c374_idx')],
+                'unique_together': {('quota', 'key')},
+            },
+        ),
+    ]
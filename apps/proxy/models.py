@@ -1,3 +1,103 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.conf import settings
+from django.utils import timezone
+import hashlib
+import json
 
-# Create your models here.
+
+class IdempotencyRecord(models.Model):
+    """幂等请求记录（按配额隔离的 Idempotency-Key 存储）"""
+
+    STATUS_CHOICES = [
+        ('processing', '处理中'),
+        ('completed', '已完成'),
+    ]
+
+    quota = models.ForeignKey('quotas.UserQuota', on_delete=models.CASCADE, related_name='idempotency_records')
+    key = models.CharField('幂等键', max_length=255)
+    request_hash = models.CharField('请求摘要', max_length=64)
+
+    # 首次请求的处理状态和结果
+    status = models.CharField('状态', max_length=20, choices=STATUS_CHOICES, default='processing')
+    response_status = models.IntegerField('响应状态码', null=True, blank=True)
+    response_data = models.JSONField('响应数据', default=dict)
+
+    # 时间戳（处理中时 expires_at 为锁的过期时间，完成后为结果的保留期限）
+    created_at = models.DateTimeField('创建时间', auto_now_add=True)
+    expires_at = models.DateTimeField('过期时间')
+
+    class Meta:
+        db_table = 'idempotency_records'
+        verbose_name = '幂等请求记录'
+        verbose_name_plural = '幂等请求记录'
+        unique_together = ['quota', 'key']
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.quota_id} - {self.key} - {self.status}"
+
+    @staticmethod
+    def fingerprint(data):
+        """计算请求体摘要，用于识别同一幂等键下的不同请求"""
+        payload = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def claim(cls, quota, key, request_hash):
+        """
+        占用幂等键
+        返回 (record, created)：created 为 True 表示当前请求获得了处理权，
+        否则 record 为已存在的（处理中或已完成的）记录
+        """
+        now = timezone.now()
+        lock_timeout = timezone.timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 300))
+
+        try:
+            with transaction.atomic():
+                record = cls.objects.create(
+                    quota=quota,
+                    key=key,
+                    request_hash=request_hash,
+                    expires_at=now + lock_timeout
+                )
+            return record, True
+        except IntegrityError:
+            pass
+
+        # 已过期的记录（结果过期或处理中的请求已超时）可以被原子地接管
+        taken = cls.objects.filter(quota=quota, key=key, expires_at__lte=now).update(
+            request_hash=request_hash,
+            status='processing',
+            response_status=None,
+            response_data={},
+            expires_at=now + lock_timeout
+        )
+        record = cls.objects.get(quota=quota, key=key)
+        return record, bool(taken)
+
+    def complete(self, response_status, response_data):
+        """保存首次请求的结果，供重试时重放"""
+        ttl = timezone.timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400))
+        self.status = 'completed'
+        self.response_status = response_status
+        self.response_data = response_data
+        self.expires_at = timezone.now() + ttl
+        self.save(update_fields=['status', 'response_status', 'response_data', 'expires_at'])
+
+    def release(self):
+        """释放幂等键（首次请求失败时调用，允许客户端重试）"""
+        type(self).objects.filter(pk=self.pk, status='processing').delete()
+
+    @classmethod
+    def purge_expired(cls, batch_size=1000):
+        """分批清理过期记录，返回删除数量"""
+        deleted = 0
+        while True:
+            ids = list(
+                cls.objects.filter(expires_at__lte=timezone.now()).values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return deleted
+            deleted += cls.objects.filter(id__in=ids).delete()[0]
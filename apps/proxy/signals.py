@@ -0,0 +1,29 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from apps.ai_models.models import AIModel
+from apps.apis.models import APIProvider
+from apps.groups.models import ModelGroup
+from .catalog import invalidate_model_catalog
+
+
+@receiver([post_save, post_delete], sender=ModelGroup)
+def invalidate_group_catalog(sender, instance, **kwargs):
+    """模型组变化时使其模型列表缓存失效"""
+    invalidate_model_catalog(instance.id)
+
+
+@receiver([post_save, post_delete], sender=AIModel)
+@receiver([post_save, post_delete], sender=APIProvider)
+def invalidate_all_catalogs(sender, instance, **kwargs):
+    """模型或提供商变化可能影响多个模型组，清空全部缓存"""
+    invalidate_model_catalog()
+
+
+@receiver(m2m_changed, sender=ModelGroup.ai_models.through)
+def invalidate_membership_catalog(sender, instance, reverse, **kwargs):
+    """模型组成员变化时使缓存失效"""
+    if reverse:
+        invalidate_model_catalog()
+    else:
+        invalidate_model_catalog(instance.id)
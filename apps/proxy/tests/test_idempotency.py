@@ -0,0 +1,124 @@
+import pytest
+from decimal import Decimal
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from apps.quotas.factories import UserQuotaFactory
+from apps.ai_models.models import AIModel
+from apps.apis.models import APIProvider
+from apps.billing.models import APIRequest
+from apps.proxy.models import IdempotencyRecord
+
+pytestmark = pytest.mark.django_db
+
+CHAT_PAYLOAD = {
+    'model': 'gpt-4o',
+    'messages': [{'role': 'user', 'content': 'Hello!'}]
+}
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_quota():
+    quota = UserQuotaFactory()
+    provider = APIProvider.objects.create(
+        name='OpenAI',
+        base_url='https://api.openai.com/v1',
+        api_key='sk-test'
+    )
+    model = AIModel.objects.create(
+        provider=provider,
+        name='gpt-4o',
+        display_name='GPT-4 Optimized',
+        input_price_per_1m=Decimal('10.000000'),
+        output_price_per_1m=Decimal('30.000000')
+    )
+    quota.model_group.ai_models.add(model)
+    return quota
+
+
+@pytest.fixture
+def mock_provider(mocker):
+    mock_response = mocker.Mock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {
+        'id': 'chatcmpl-123',
+        'object': 'chat.completion',
+        'model': 'gpt-4o',
+        'usage': {'prompt_tokens': 10, 'completion_tokens': 20, 'total_tokens': 30},
+        'choices': [{'message': {'role': 'assistant', 'content': 'Hi'}, 'finish_reason': 'stop', 'index': 0}]
+    }
+    return mocker.patch('requests.post', return_value=mock_response)
+
+
+class TestIdempotencyKey:
+    def _post(self, api_client, quota, key, payload=CHAT_PAYLOAD):
+        api_client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {quota.api_key}',
+            HTTP_IDEMPOTENCY_KEY=key
+        )
+        return api_client.post(reverse('chat_completions'), payload, format='json')
+
+    def test_retry_replays_without_forwarding_or_charging(self, api_client, user_quota, mock_provider):
+        first = self._post(api_client, user_quota, 'retry-1')
+        assert first.status_code == status.HTTP_200_OK
+        user_quota.refresh_from_db()
+        used_after_first = user_quota.used_quota
+        assert used_after_first > 0
+
+        second = self._post(api_client, user_quota, 'retry-1')
+        assert second.status_code == status.HTTP_200_OK
+        assert second['Idempotent-Replayed'] == 'true'
+        assert second.data == first.data
+
+        user_quota.refresh_from_db()
+        assert mock_provider.call_count == 1
+        assert user_quota.used_quota == used_after_first
+        assert APIRequest.objects.count() == 1
+
+    def test_reused_key_with_different_body_is_rejected(self, api_client, user_quota, mock_provider):
+        self._post(api_client, user_quota, 'retry-2')
+        other_payload = dict(CHAT_PAYLOAD, messages=[{'role': 'user', 'content': 'Bye'}])
+        response = self._post(api_client, user_quota, 'retry-2', other_payload)
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert mock_provider.call_count == 1
+
+    def test_in_flight_key_returns_conflict(self, api_client, user_quota, mock_provider):
+        IdempotencyRecord.claim(user_quota, 'retry-3', IdempotencyRecord.fingerprint(CHAT_PAYLOAD))
+        response = self._post(api_client, user_quota, 'retry-3')
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert mock_provider.call_count == 0
+
+    def test_failed_request_releases_key(self, api_client, user_quota, mock_provider):
+        import requests
+        mock_provider.side_effect = requests.exceptions.ConnectionError('boom')
+        response = self._post(api_client, user_quota, 'retry-4')
+        assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+        assert not IdempotencyRecord.objects.filter(key='retry-4').exists()
+
+    def test_keys_are_scoped_to_quota(self, api_client, user_quota, mock_provider):
+        other_quota = UserQuotaFactory(model_group=user_quota.model_group)
+        self._post(api_client, user_quota, 'shared-key')
+        response = self._post(api_client, other_quota, 'shared-key')
+        assert response.status_code == status.HTTP_200_OK
+        assert 'Idempotent-Replayed' not in response
+        assert mock_provider.call_count == 2
+
+    def test_expired_record_can_be_reclaimed_and_purged(self, user_quota):
+        request_hash = IdempotencyRecord.fingerprint(CHAT_PAYLOAD)
+        record, created = IdempotencyRecord.claim(user_quota, 'old-key', request_hash)
+        assert created is True
+        IdempotencyRecord.objects.filter(pk=record.pk).update(
+            expires_at=timezone.now() - timezone.timedelta(seconds=1)
+        )
+
+        _, created = IdempotencyRecord.claim(user_quota, 'old-key', request_hash)
+        assert created is True
+
+        IdempotencyRecord.objects.update(expires_at=timezone.now() - timezone.timedelta(seconds=1))
+        assert IdempotencyRecord.purge_expired() == 1
@@ -108,9 +108,36 @@ class TestOpenAICompatibleViews:
         response = api_client.get(url)
         
         assert response.status_code == status.HTTP_200_OK
-        assert response.data['object'] == 'list'
-        assert len(response.data['data']) > 0
-        assert response.data['data'][0]['id'] == 'gpt-4o'
+        data = response.json()
+        assert data['object'] == 'list'
+        assert len(data['data']) > 0
+        assert data['data'][0]['id'] == 'gpt-4o'
+        assert response['ETag']
+        assert response['Last-Modified']
+
+    def test_list_models_conditional_request(self, api_client, user_quota, django_assert_max_num_queries):
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_quota.api_key}')
+        url = reverse('models_list')
+        etag = api_client.get(url)['ETag']
+
+        # 仅认证查询，模型列表不再访问数据库
+        with django_assert_max_num_queries(1):
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_list_models_etag_changes_with_group_membership(self, api_client, user_quota):
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_quota.api_key}')
+        url = reverse('models_list')
+        etag = api_client.get(url)['ETag']
+
+        model = user_quota.model_group.ai_models.get()
+        other = AIModel.objects.create(provider=model.provider, name='gpt-4o-mini', display_name='GPT-4o mini')
+        user_quota.model_group.ai_models.add(other)
+
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+        assert {m['id'] for m in response.json()['data']} == {'gpt-4o', 'gpt-4o-mini'}
 
     def test_get_usage(self, api_client, user_quota):
         api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_quota.api_key}')
@@ -123,6 +150,28 @@ class TestOpenAICompatibleViews:
         assert 'recent_cost' in response.data
         assert response.data['quota']['total_quota'] == float(user_quota.total_quota)
 
+    def test_get_usage_reads_counters(self, api_client, user_quota, mocker, django_assert_max_num_queries):
+        mock_response = mocker.Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {
+            'id': 'chatcmpl-123',
+            'usage': {'prompt_tokens': 10, 'completion_tokens': 20, 'total_tokens': 30},
+            'choices': []
+        }
+        mocker.patch('requests.post', return_value=mock_response)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_quota.api_key}')
+        api_client.post(reverse('chat_completions'), {'model': 'gpt-4o', 'messages': []}, format='json')
+
+        # 认证查询 + 计数器主键查询
+        with django_assert_max_num_queries(2):
+            response = api_client.get(reverse('usage'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['usage']['today']['requests'] == 1
+        assert response.data['usage']['lifetime']['tokens'] == 30
+        assert response.data['recent_requests'] == 1
+        assert response.data['recent_calls'][0]['total_tokens'] == 30
+
     def test_unauthorized_access(self, api_client):
         url = reverse('chat_completions')
         data = {
@@ -0,0 +1,42 @@
+"""
+配额最近调用的进程内环形缓冲区
+
+每个配额只保留最近 USAGE_RECENT_CALLS 次调用的摘要，
+/v1/usage 读取它而不查询 api_requests 表
+"""
+from collections import deque
+
+from django.conf import settings
+
+from utils.cache import TTLCache
+
+_recent_calls = TTLCache(
+    maxsize=getattr(settings, 'USAGE_RECENT_QUOTAS', 10000),
+    ttl=24 * 60 * 60,
+)
+
+
+def remember_call(quota_id, api_request):
+    """记录一次调用摘要"""
+    calls = _recent_calls.get(quota_id)
+    if calls is None:
+        calls = deque(maxlen=getattr(settings, 'USAGE_RECENT_CALLS', 20))
+        _recent_calls.set(quota_id, calls)
+    calls.appendleft({
+        'request_id': str(api_request.request_id),
+        'model': api_request.model_name,
+        'total_tokens': api_request.total_tokens,
+        'cost': float(api_request.total_cost),
+        'status_code': api_request.status_code,
+        'created_at': api_request.created_at.isoformat(),
+    })
+
+
+def recent_calls(quota_id):
+    """获取最近调用摘要（按时间倒序）"""
+    return list(_recent_calls.get(quota_id) or [])
+
+
+def clear_recent_calls():
+    """清空全部最近调用记录"""
+    _recent_calls.clear()
@@ -2,8 +2,10 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
+from django.http import HttpResponse
 from django.utils import timezone
-from decimal import Decimal
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 import requests
 import traceback
 import json
@@ -11,8 +13,13 @@ import logging
 
 from apps.users.authentication import APIKeyAuthentication
 from apps.apis.models import APIProvider
-from apps.billing.models import APIRequest
+from apps.billing.models import APIRequest, UserUsageCounter
 from apps.ai_models.models import AIModel
+from .models import IdempotencyRecord
+from apps.quotas.alerts import notify_deduction
+from apps.quotas.models import QuotaUsageCounter
+from .catalog import get_model_catalog
+from .usage import remember_call, recent_calls
 
 logger = logging.getLogger(__name__)
 
@@ -74,27 +81,55 @@ class ChatCompletionView(APIView):
                     status=status.HTTP_429_TOO_MANY_REQUESTS
                 )
             
-            # 转发请求到 AI 提供商
-            provider = ai_model.provider
-            response_data, usage_data = self._forward_request(provider, data)
-            
-            # 记录API请求
-            api_request = self._record_request(
-                current_quota, ai_model, data, response_data, usage_data, request
-            )
+            # 幂等键：重试请求直接重放首次结果，不再转发和扣费
+            idempotency_record = None
+            idempotency_key = request.META.get('HTTP_IDEMPOTENCY_KEY')
+            if idempotency_key:
+                if len(idempotency_key) > 255:
+                    return Response(
+                        {'error': 'Idempotency-Key must be at most 255 characters'}, 
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                request_hash = IdempotencyRecord.fingerprint(data)
+                idempotency_record, claimed = IdempotencyRecord.claim(
+                    current_quota, idempotency_key, request_hash
+                )
+                if not claimed:
+                    return self._replay_idempotent_response(idempotency_record, request_hash)
             
-            # 更新配额使用量（更新美元成本）
-            if usage_data:
-                # 计算本次请求的成本
-                input_tokens = int(usage_data.get('prompt_tokens', 0))
-                output_tokens = int(usage_data.get('completion_tokens', 0))
+            try:
+                # 转发请求到 AI 提供商
+                provider = ai_model.provider
+                response_data, usage_data = self._forward_request(provider, data)
                 
-                input_cost = (Decimal(str(input_tokens)) / Decimal('1000000')) * ai_model.input_price_per_1m
-                output_cost = (Decimal(str(output_tokens)) / Decimal('1000000')) * ai_model.output_price_per_1m
-                request_cost = input_cost + output_cost
+                # 记录API请求
+                api_request = self._record_request(
+                    current_quota, ai_model, data, response_data, usage_data, request
+                )
+                
+                # 更新配额使用量（使用记录请求时算出的成本）
+                if usage_data:
+                    used_before = current_quota.used_quota
+                    current_quota.used_quota += api_request.total_cost
+                    current_quota.save()
+                    notify_deduction(current_quota, used_before, current_quota.used_quota)
                 
-                current_quota.used_quota += request_cost
-                current_quota.save()
+                # 更新使用计数器
+                QuotaUsageCounter.record(
+                    current_quota.id, api_request.total_tokens, api_request.total_cost, api_request.created_at
+                )
+                UserUsageCounter.record(
+                    api_request.user_id, api_request.total_tokens, api_request.total_cost, api_request.created_at
+                )
+                remember_call(current_quota.id, api_request)
+            except Exception:
+                # 首次请求失败时释放幂等键，允许客户端重试
+                if idempotency_record:
+                    idempotency_record.release()
+                raise
+            
+            if idempotency_record:
+                idempotency_record.complete(status.HTTP_200_OK, response_data)
             
             return Response(response_data)
             
@@ -106,6 +141,26 @@ class ChatCompletionView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    def _replay_idempotent_response(self, record, request_hash):
+        """重放幂等键对应的首次请求结果"""
+        if record.request_hash != request_hash:
+            return Response(
+                {'error': 'Idempotency-Key has already been used with a different request body'}, 
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        
+        if record.status != 'completed':
+            return Response(
+                {'error': 'A request with this Idempotency-Key is still being processed'}, 
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        return Response(
+            record.response_data,
+            status=record.response_status,
+            headers={'Idempotent-Replayed': 'true'}
+        )
+    
     def _forward_request(self, provider, data):
         """转发请求到AI提供商"""
         url = f"{provider.base_url.rstrip('/')}/chat/completions"
@@ -132,13 +187,10 @@ class ChatCompletionView(APIView):
     def _record_request(self, quota, model, request_data, response_data, usage_data, request):
         """记录API请求"""
         
-        # 计算成本
+        # 计算成本（整数纳美元，每个请求只计算一次）
         input_tokens = int(usage_data.get('prompt_tokens', 0))
         output_tokens = int(usage_data.get('completion_tokens', 0))
-        
-        input_cost = (Decimal(str(input_tokens)) / Decimal('1000000')) * model.input_price_per_1m
-        output_cost = (Decimal(str(output_tokens)) / Decimal('1000000')) * model.output_price_per_1m
-        total_cost = input_cost + output_cost
+        cost = model.pricing.cost(input_tokens, output_tokens)
         
         # 获取客户端IP
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -158,9 +210,7 @@ class ChatCompletionView(APIView):
             input_tokens=input_tokens,
             output_tokens=output_tokens,
             total_tokens=int(usage_data.get('total_tokens', input_tokens + output_tokens)),
-            input_cost=input_cost,
-            output_cost=output_cost,
-            total_cost=total_cost,
+            **cost.as_fields(),
             status_code=200,
             duration_ms=0,  # 暂时设为0，后续可以添加计时功能
             ip_address=ip_address,
@@ -186,26 +236,24 @@ class ModelsListView(APIView):
                     status=status.HTTP_401_UNAUTHORIZED
                 )
             
-            # 获取用户配额中的可用模型
-            models = current_quota.model_group.ai_models.filter(
-                provider__is_active=True
-            ).select_related('provider')
+            # 获取用户配额中的可用模型（预序列化并缓存）
+            catalog = get_model_catalog(current_quota.model_group)
             
-            # 构造OpenAI兼容的响应格式
-            model_list = []
-            for model in models:
-                model_list.append({
-                    'id': model.name,
-                    'object': 'model',
-                    'created': int(model.created_at.timestamp()) if hasattr(model, 'created_at') else 0,
-                    'owned_by': model.provider.name.lower(),
-                    'permission': []
-                })
+            # 条件请求：ETag / Last-Modified 未变化时返回304
+            not_modified = get_conditional_response(
+                request,
+                etag=catalog.etag,
+                last_modified=int(catalog.last_modified.timestamp())
+            )
+            if not_modified is not None:
+                response = not_modified
+            else:
+                response = HttpResponse(catalog.body, content_type='application/json')
             
-            return Response({
-                'object': 'list',
-                'data': model_list
-            })
+            response['ETag'] = catalog.etag
+            response['Last-Modified'] = http_date(catalog.last_modified.timestamp())
+            response['Cache-Control'] = 'private, no-cache'
+            return response
             
         except Exception as e:
             logger.error(f"Models list error: {str(e)}")
@@ -230,13 +278,10 @@ class UsageView(APIView):
                     status=status.HTTP_401_UNAUTHORIZED
                 )
             
-            # 获取最近的请求统计
-            recent_requests = APIRequest.objects.filter(
-                user=current_quota.user,
-                model_group=current_quota.model_group
-            ).order_by('-created_at')[:10]
-            
-            total_cost = sum(req.total_cost for req in recent_requests)
+            # 从计数器读取使用量（不查询 api_requests）
+            counter = QuotaUsageCounter.objects.filter(quota_id=current_quota.id).first()
+            usage = counter.snapshot() if counter else QuotaUsageCounter.empty_snapshot()
+            recent = recent_calls(current_quota.id)
             
             return Response({
                 'quota': {
@@ -244,11 +289,11 @@ class UsageView(APIView):
                     'used_quota': float(current_quota.used_quota),
                     'remaining_quota': float(current_quota.total_quota - current_quota.used_quota),
                     'model_group': current_quota.model_group.name,
-                    'period_type': current_quota.period_type,
-                    'expires_at': current_quota.expires_at.isoformat() if current_quota.expires_at else None
                 },
-                'recent_requests': len(recent_requests),
-                'recent_cost': float(total_cost)
+                'usage': usage,
+                'recent_requests': len(recent),
+                'recent_cost': sum(call['cost'] for call in recent),
+                'recent_calls': recent,
             })
             
         except Exception as e:
@@ -0,0 +1,96 @@
+"""
+配额告警引擎
+
+扣费路径上只比较扣费前后的使用率是否跨过 QUOTA_ALERT_THRESHOLDS 中的阈值（纯计算，不查询数据库）；
+跨过阈值时在事务提交后把告警的创建交给后台线程，请求路径上不增加任何查询。
+同一配额同一类型未解决的告警只保留一条，再次跨过更高的阈值时更新其内容。
+ALERTS_RUN_SYNC 为 True 时在事务提交回调中同步创建（用于测试）。
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def alert_type_for(threshold):
+    """阈值对应的告警类型"""
+    return 'quota_depleted' if threshold >= 100 else 'quota_exceeded'
+
+
+def crossed_thresholds(total, before, after, thresholds=None):
+    """扣费使使用率从 before 变为 after 时跨过的阈值（百分比，升序）"""
+    thresholds = settings.QUOTA_ALERT_THRESHOLDS if thresholds is None else thresholds
+    if not total or total <= 0 or after <= before:
+        return []
+    before_ratio = Decimal(before) * 100 / total
+    after_ratio = Decimal(after) * 100 / total
+    return [threshold for threshold in thresholds if before_ratio < Decimal(str(threshold)) <= after_ratio]
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.ALERT_WORKERS, thread_name_prefix='alerts')
+        return _executor
+
+
+def _run(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception(f"Alert job {func.__name__} failed")
+
+
+def _run_in_background(func, *args):
+    try:
+        _run(func, *args)
+    finally:
+        # 后台线程使用独立的数据库连接，任务结束后释放
+        connections.close_all()
+
+
+def dispatch(func, *args):
+    """在当前事务提交后执行告警任务（后台线程）"""
+    def submit():
+        if settings.ALERTS_RUN_SYNC:
+            _run(func, *args)
+        else:
+            _get_executor().submit(_run_in_background, func, *args)
+
+    transaction.on_commit(submit)
+
+
+def notify_deduction(quota, before, after):
+    """记录一次扣费：跨过阈值时安排创建告警"""
+    crossed = crossed_thresholds(quota.total_quota, before, after)
+    if crossed:
+        dispatch(create_quota_alerts, quota.id, crossed, float(Decimal(after) * 100 / quota.total_quota))
+
+
+def create_quota_alerts(quota_id, thresholds, usage_percentage):
+    """为跨过的阈值创建（或更新）告警，在后台执行"""
+    from .models import QuotaAlert
+
+    by_type = {}
+    for threshold in thresholds:
+        by_type[alert_type_for(threshold)] = threshold
+
+    for alert_type, threshold in by_type.items():
+        if alert_type == 'quota_depleted':
+            message = f'配额已用完，当前使用率: {usage_percentage:.1f}%'
+        else:
+            message = f'配额使用率超过 {threshold:g}%，当前使用率: {usage_percentage:.1f}%'
+        updated = QuotaAlert.objects.filter(
+            quota_id=quota_id, alert_type=alert_type, is_resolved=False
+        ).update(message=message, is_read=False)
+        if not updated:
+            QuotaAlert.objects.create(quota_id=quota_id, alert_type=alert_type, message=message)
@@ -12,7 +12,7 @@ class ModelGroupFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = ModelGroup
 
-    name = factory.LazyFunction(lambda: fake.word())
+    name = factory.Sequence(lambda n: f'{fake.word()}-{n}')
     description = factory.LazyFunction(lambda: fake.text())
     is_active = True
 
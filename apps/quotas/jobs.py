@@ -0,0 +1,22 @@
+"""配额相关的定时任务（由 apps.scheduler 调度）"""
+from apps.scheduler.registry import periodic_job
+
+from .models import QuotaUsageCounter
+from .rotation import expire_previous_keys as clear_expired_keys
+
+
+@periodic_job('quotas.expire_previous_keys', interval=60 * 60, jitter=5 * 60)
+def expire_previous_keys():
+    """清空已过宽限期的轮换前旧密钥"""
+    return {'cleared': clear_expired_keys()}
+
+
+@periodic_job('quotas.rebuild_quota_counters', interval=24 * 60 * 60, jitter=30 * 60, lease=2 * 60 * 60)
+def rebuild_quota_counters():
+    """按API请求记录重建未删除配额的使用计数器，校正增量累加的偏差"""
+    count = 0
+    counters = QuotaUsageCounter.objects.filter(quota__deleted_at__isnull=True).select_related('quota__user')
+    for counter in counters.iterator():
+        QuotaUsageCounter.rebuild(counter.quota)
+        count += 1
+    return {'counters': count}
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from apps.quotas.models import UserQuota, QuotaUsageCounter
+
+
+class Command(BaseCommand):
+    help = '根据API请求记录重建配额使用计数器（初始化或校正）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--quota-id',
+            type=int,
+            action='append',
+            help='只重建指定配额（可多次指定）'
+        )
+
+    def handle(self, *args, **options):
+        quotas = UserQuota.objects.filter(deleted_at__isnull=True).select_related('user', 'model_group')
+        if options['quota_id']:
+            quotas = quotas.filter(id__in=options['quota_id'])
+
+        count = 0
+        for quota in quotas.iterator():
+            QuotaUsageCounter.rebuild(quota)
+            count += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'已重建 {count} 个配额的使用计数器')
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.quotas.rotation import RotationError, rotate_api_keys, rotation_queryset
+
+
+class Command(BaseCommand):
+    help = '批量轮换API Key（宽限期内新旧密钥都可以认证）；新密钥可在管理后台查看，不在此输出'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, action='append', default=[], help='轮换指定用户的配额（可多次指定）')
+        parser.add_argument('--group-id', type=int, action='append', default=[], help='轮换指定模型组的配额（可多次指定）')
+        parser.add_argument('--quota-id', type=int, action='append', default=[], help='轮换指定配额（可多次指定）')
+        parser.add_argument('--all', action='store_true', help='轮换全部配额')
+        parser.add_argument(
+            '--grace-seconds',
+            type=int,
+            help='旧密钥继续有效的秒数（默认 API_KEY_ROTATION_GRACE_SECONDS，0 表示立即失效）'
+        )
+
+    def handle(self, *args, **options):
+        if options['grace_seconds'] is not None and options['grace_seconds'] < 0:
+            raise CommandError('--grace-seconds 不能为负数')
+        try:
+            queryset = rotation_queryset(
+                options['user_id'], options['group_id'], options['quota_id'], all_quotas=options['all']
+            )
+        except RotationError as e:
+            raise CommandError(str(e))
+
+        result = rotate_api_keys(queryset, grace_seconds=options['grace_seconds'])
+
+        expires = f'，旧密钥在 {result.expires_at:%Y-%m-%d %H:%M:%S} 前仍可使用' if result.expires_at else '，旧密钥已失效'
+        self.stdout.write(self.style.SUCCESS(f'已轮换 {len(result.keys)} 个API Key{expires}'))
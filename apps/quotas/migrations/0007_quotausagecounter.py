@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:35
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotas', '0006_change_modelgroup_delete_cascade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuotaUsageCounter',
+            fields=[
+                ('quota', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage_counter', serialize=False, to='quotas.userquota')),
+                ('hour_start', models.DateTimeField(blank=True, null=True, verbose_name='当前小时')),
+                ('hour_requests', models.IntegerField(default=0, verbose_name='本小时请求数')),
+                ('hour_tokens', models.BigIntegerField(default=0, verbose_name='本小时tokens')),
+                ('hour_cost', models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=16, verbose_name='本小时成本')),
+                ('day', models.DateField(blank=True, null=True, verbose_name='当前日期')),
+                ('day_requests', models.IntegerField(default=0, verbose_name='今日请求数')),
+                ('day_tokens', models.BigIntegerField(default=0, verbose_name='今日tokens')),
+                ('day_cost', models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=16, verbose_name='今日成本')),
+                ('total_requests', models.BigIntegerField(default=0, verbose_name='累计请求数')),
+                ('total_tokens', models.BigIntegerField(default=0, verbose_name='累计tokens')),
+                ('total_cost', models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=16, verbose_name='累计成本')),
+                ('last_request_at', models.DateTimeField(blank=True, null=True, verbose_name='最近请求时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '配额使用计数器',
+                'verbose_name_plural': '配额使用计数器',
+                'db_table': 'quota_usage_counters',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotas', '0007_quotausagecounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userquota',
+            name='previous_api_key',
+            field=models.CharField(blank=True, db_index=True, max_length=100, verbose_name='上一个API密钥'),
+        ),
+        migrations.AddField(
+            model_name='userquota',
+            name='previous_key_expires_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='上一个API密钥失效时间'),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:02
+
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+HASHED_FIELDS = ['key_prefix', 'key_suffix', 'key_hash', 'previous_key_prefix', 'previous_key_hash']
+
+
+# 以下两个函数复制自 apps.quotas.models 当时的实现，之后修改模型代码不会改变这个迁移的结果
+def hash_api_key(key):
+    secret = getattr(settings, 'API_KEY_HASH_SECRET', settings.SECRET_KEY)
+    return hmac.new(secret.encode('utf-8'), key.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def api_key_lookup_prefix(key):
+    length = getattr(settings, 'API_KEY_LOOKUP_LENGTH', 8)
+    return key[:key.rfind('-') + 1 + length]
+
+
+def hash_existing_keys(apps, schema_editor):
+    # 明文密钥删除后无法恢复，因此这个迁移不可回滚
+    UserQuota = apps.get_model('quotas', 'UserQuota')
+    batch = []
+    for quota in UserQuota.objects.only('id', 'api_key', 'previous_api_key').order_by('id').iterator(chunk_size=BATCH_SIZE):
+        quota.key_prefix = api_key_lookup_prefix(quota.api_key)
+        quota.key_suffix = quota.api_key[-4:]
+        quota.key_hash = hash_api_key(quota.api_key)
+        if quota.previous_api_key:
+            quota.previous_key_prefix = api_key_lookup_prefix(quota.previous_api_key)
+            quota.previous_key_hash = hash_api_key(quota.previous_api_key)
+        batch.append(quota)
+        if len(batch) >= BATCH_SIZE:
+            UserQuota.objects.bulk_update(batch, HASHED_FIELDS)
+            batch = []
+    if batch:
+        UserQuota.objects.bulk_update(batch, HASHED_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotas', '0008_api_key_rotation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userquota',
+            name='key_prefix',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=40, verbose_name='API密钥前缀'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='userquota',
+            name='key_suffix',
+            field=models.CharField(default='', editable=False, max_length=4, verbose_name='API密钥后4位'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='userquota',
+            name='key_hash',
+            field=models.CharField(default='', editable=False, max_length=64, verbose_name='API密钥哈希'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='userquota',
+            name='previous_key_prefix',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=40, verbose_name='上一个API密钥前缀'),
+        ),
+        migrations.AddField(
+            model_name='userquota',
+            name='previous_key_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='上一个API密钥哈希'),
+        ),
+        migrations.RunPython(hash_existing_keys),
+        migrations.RemoveIndex(
+            model_name='userquota',
+            name='user_quotas_api_key_cd9e70_idx',
+        ),
+        migrations.RemoveField(
+            model_name='userquota',
+            name='api_key',
+        ),
+        migrations.RemoveField(
+            model_name='userquota',
+            name='previous_api_key',
+        ),
+    ]
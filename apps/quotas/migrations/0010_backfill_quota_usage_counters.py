@@ -0,0 +1,75 @@
+# Generated by Django 5.2.4 on 2026-10-19 20:55
+
+from django.db import migrations
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+BATCH_SIZE = 500
+COUNTER_FIELDS = [
+    'hour_start', 'hour_requests', 'hour_tokens', 'hour_cost',
+    'day', 'day_requests', 'day_tokens', 'day_cost',
+    'total_requests', 'total_tokens', 'total_cost', 'last_request_at',
+]
+
+
+def backfill_quota_counters(apps, schema_editor):
+    """
+    为未删除的配额重建使用计数器（口径与当时的 QuotaUsageCounter.rebuild 一致：
+    配额的请求为同一用户在同一模型组下的全部 API 请求记录）
+    之前首次请求时从 1 开始计数的计数器也一并覆盖校正
+    """
+    APIRequest = apps.get_model('billing', 'APIRequest')
+    UserQuota = apps.get_model('quotas', 'UserQuota')
+    QuotaUsageCounter = apps.get_model('quotas', 'QuotaUsageCounter')
+
+    now = timezone.localtime()
+    hour_start = now.replace(minute=0, second=0, microsecond=0)
+    day_start = hour_start.replace(hour=0)
+
+    sums = {}
+    for window, condition in (
+        ('hour', Q(created_at__gte=hour_start)),
+        ('day', Q(created_at__gte=day_start)),
+        ('total', None),
+    ):
+        options = {'filter': condition} if condition else {}
+        sums[f'{window}_requests'] = Count('id', **options)
+        sums[f'{window}_tokens'] = Sum('total_tokens', **options)
+        sums[f'{window}_cost'] = Sum('total_cost', **options)
+    rows = APIRequest.objects.filter(created_at__lte=now, model_group__isnull=False).order_by().values(
+        'user_id', 'model_group_id'
+    ).annotate(last_request_at=Max('created_at'), **sums)
+    usage = {}
+    for row in rows.iterator():
+        key = (row.pop('user_id'), row.pop('model_group_id'))
+        usage[key] = {field: value or 0 for field, value in row.items() if field != 'last_request_at'}
+        usage[key]['last_request_at'] = row['last_request_at']
+
+    batch = []
+    quotas = UserQuota.objects.filter(deleted_at__isnull=True).order_by('id').values_list('id', 'user_id', 'model_group_id')
+    for quota_id, user_id, model_group_id in quotas.iterator(chunk_size=BATCH_SIZE):
+        values = usage.get((user_id, model_group_id))
+        if values is None:
+            continue
+        batch.append(QuotaUsageCounter(quota_id=quota_id, hour_start=hour_start, day=day_start.date(), **values))
+        if len(batch) >= BATCH_SIZE:
+            QuotaUsageCounter.objects.bulk_create(
+                batch, update_conflicts=True, unique_fields=['quota'], update_fields=COUNTER_FIELDS
+            )
+            batch = []
+    if batch:
+        QuotaUsageCounter.objects.bulk_create(
+            batch, update_conflicts=True, unique_fields=['quota'], update_fields=COUNTER_FIELDS
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotas', '0009_hashed_api_keys'),
+        ('billing', '0014_widen_cost_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_quota_counters, migrations.RunPython.noop),
+    ]
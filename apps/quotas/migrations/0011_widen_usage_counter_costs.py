@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-19 20:19
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotas', '0010_backfill_quota_usage_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='quotausagecounter',
+            name='day_cost',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=20, verbose_name='今日成本'),
+        ),
+        migrations.AlterField(
+            model_name='quotausagecounter',
+            name='hour_cost',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=20, verbose_name='本小时成本'),
+        ),
+        migrations.AlterField(
+            model_name='quotausagecounter',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=20, verbose_name='累计成本'),
+        ),
+    ]
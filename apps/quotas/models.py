@@ -2,10 +2,14 @@ from django.db import models
 from django.utils import timezone
 from decimal import Decimal
 import uuid
+import hashlib
+import hmac
 import secrets
 import string
 from django.conf import settings
-from django.db.models import Sum, Count, Avg, Q
+from django.db.models import Sum, Count, Avg, Q, F, Case, When, Value
+
+from .alerts import notify_deduction
 
 
 def generate_api_key():
@@ -17,6 +21,34 @@ def generate_api_key():
     return f"{prefix}{random_str}"
 
 
+def hash_api_key(key):
+    """API Key 的 HMAC-SHA256 哈希（数据库只保存哈希，不保存明文）"""
+    secret = getattr(settings, 'API_KEY_HASH_SECRET', settings.SECRET_KEY)
+    return hmac.new(secret.encode('utf-8'), key.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def api_key_lookup_prefix(key):
+    """用于索引查找的密钥前缀：固定前缀（最后一个 - 及之前）加随机部分的前 API_KEY_LOOKUP_LENGTH 个字符"""
+    length = getattr(settings, 'API_KEY_LOOKUP_LENGTH', 8)
+    return key[:key.rfind('-') + 1 + length]
+
+
+def mask_api_key(key_prefix, key_suffix):
+    """根据保存的前缀和后4位构造掩码后的API Key（长度与原密钥相同）"""
+    if not key_prefix:
+        return None
+    visible = key_prefix[:key_prefix.rfind('-') + 1]
+    key_length = getattr(settings, 'API_KEY_LENGTH', 32)
+    return f"{visible}{'*' * (key_length - len(key_suffix))}{key_suffix}"
+
+
+# 生成或轮换API Key时写入的字段
+API_KEY_FIELDS = [
+    'key_prefix', 'key_suffix', 'key_hash',
+    'previous_key_prefix', 'previous_key_hash', 'previous_key_expires_at',
+]
+
+
 class UserQuota(models.Model):
     """用户配额"""
     
@@ -29,7 +61,6 @@ class UserQuota(models.Model):
         # unique_together = ['user', 'model_group']  # 移除唯一约束，允许同一用户同一模型组有多个配额
         indexes = [
             models.Index(fields=['user', 'model_group']),
-            models.Index(fields=['api_key']),
             models.Index(fields=['created_at']),
             models.Index(fields=['name']),  # 为配额名称添加索引
         ]
@@ -42,8 +73,14 @@ class UserQuota(models.Model):
     user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='quotas')
     model_group = models.ForeignKey('groups.ModelGroup', on_delete=models.CASCADE, related_name='quotas')
     
-    # API密钥
-    api_key = models.CharField('API密钥', max_length=100, unique=True, default=generate_api_key)
+    # API密钥：只保存查找前缀、后4位（用于掩码显示）和 HMAC 哈希，明文只在生成时返回一次
+    key_prefix = models.CharField('API密钥前缀', max_length=40, db_index=True, editable=False)
+    key_suffix = models.CharField('API密钥后4位', max_length=4, editable=False)
+    key_hash = models.CharField('API密钥哈希', max_length=64, editable=False)
+    # 轮换后旧密钥在宽限期内仍可认证，避免正在使用旧密钥的客户端立即失效
+    previous_key_prefix = models.CharField('上一个API密钥前缀', max_length=40, blank=True, db_index=True, editable=False)
+    previous_key_hash = models.CharField('上一个API密钥哈希', max_length=64, blank=True, editable=False)
+    previous_key_expires_at = models.DateTimeField('上一个API密钥失效时间', null=True, blank=True)
     
     # 配额信息
     total_quota = models.DecimalField('总配额($)', max_digits=10, decimal_places=6)
@@ -67,6 +104,24 @@ class UserQuota(models.Model):
     def __str__(self):
         return f"{self.name} ({self.user.name} - {self.model_group.name}) - ${self.total_quota}"
     
+    def save(self, *args, **kwargs):
+        # 新配额没有指定密钥时自动生成
+        if not self.key_hash:
+            self.api_key = generate_api_key()
+        super().save(*args, **kwargs)
+    
+    @property
+    def api_key(self):
+        """明文API Key，只在生成或设置它的实例上可用；从数据库读出的配额返回 None"""
+        return getattr(self, '_api_key', None)
+    
+    @api_key.setter
+    def api_key(self, key):
+        self._api_key = key
+        self.key_prefix = api_key_lookup_prefix(key)
+        self.key_suffix = key[-4:]
+        self.key_hash = hash_api_key(key)
+    
     @property
     def is_deleted(self):
         """是否已删除"""
@@ -99,37 +154,47 @@ class UserQuota(models.Model):
     @property
     def masked_api_key(self):
         """掩码后的API Key"""
-        if not self.api_key:
-            return None
-        prefix = getattr(settings, 'API_KEY_PREFIX', 'sk-audit-')
-        visible_chars = 4
-        key_length = len(self.api_key)
-        prefix_length = len(prefix)
-        return f"{prefix}{'*' * (key_length - prefix_length - visible_chars)}{self.api_key[-visible_chars:]}"
-    
-    def regenerate_api_key(self):
-        """重新生成API Key"""
+        return mask_api_key(self.key_prefix, self.key_suffix)
+    
+    def regenerate_api_key(self, grace_seconds=0):
+        """
+        重新生成API Key，返回新的明文密钥
+        grace_seconds 大于 0 时旧密钥在这段时间内仍可认证（默认立即失效，用于密钥泄露后的重置）
+        """
+        from .rotation import grace_expiry
+        
+        expires_at = grace_expiry(grace_seconds)
+        self.previous_key_prefix = self.key_prefix if expires_at else ''
+        self.previous_key_hash = self.key_hash if expires_at else ''
+        self.previous_key_expires_at = expires_at
         self.api_key = generate_api_key()
-        self.save()
+        self.save(update_fields=API_KEY_FIELDS + ['updated_at'])
         return self.api_key
     
-    def get_all_requests(self):
-        """获取所有API请求记录"""
-        return self.user.api_requests.filter(model_group=self.model_group)
+    def get_all_requests(self, since=None, until=None):
+        """
+        获取所有API请求记录
+        since/until 限定 created_at 范围 [since, until]，api_requests 分区后只扫描涉及的分区
+        """
+        requests = self.user.api_requests.filter(model_group=self.model_group)
+        if since is not None:
+            requests = requests.filter(created_at__gte=since)
+        if until is not None:
+            requests = requests.filter(created_at__lte=until)
+        return requests
     
     def check_rate_limit(self, period='minute'):
         """检查速率限制"""
         now = timezone.now()
-        requests = self.get_all_requests()
         
         if period == 'minute':
-            count = requests.filter(created_at__gte=now - timezone.timedelta(minutes=1)).count()
+            count = self.get_all_requests(since=now - timezone.timedelta(minutes=1)).count()
             return count < self.rate_limit_per_minute
         elif period == 'hour':
-            count = requests.filter(created_at__gte=now - timezone.timedelta(hours=1)).count()
+            count = self.get_all_requests(since=now - timezone.timedelta(hours=1)).count()
             return count < self.rate_limit_per_hour
         elif period == 'day':
-            count = requests.filter(created_at__gte=now - timezone.timedelta(days=1)).count()
+            count = self.get_all_requests(since=now - timezone.timedelta(days=1)).count()
             return count < self.rate_limit_per_day
         else:
             raise ValueError(f"不支持的速率限制周期: {period}")
@@ -152,6 +217,7 @@ class UserQuota(models.Model):
         if self.used_quota + amount > self.total_quota:
             raise ValueError("配额不足")
         
+        before = self.used_quota
         self.used_quota += amount
         self.save()
         
@@ -163,38 +229,12 @@ class UserQuota(models.Model):
             remaining=self.remaining_quota
         )
         
-        # 检查是否需要发送警告
-        self.check_and_create_alerts()
+        # 跨过告警阈值时在后台创建警告（不在扣费路径上查询）
+        notify_deduction(self, before, self.used_quota)
     
-    def check_and_create_alerts(self):
-        """检查并创建警告"""
-        # 配额使用超过90%
-        if self.usage_percentage >= 90 and not QuotaAlert.objects.filter(
-            quota=self,
-            alert_type='quota_exceeded',
-            is_resolved=False
-        ).exists():
-            QuotaAlert.objects.create(
-                quota=self,
-                alert_type='quota_exceeded',
-                message=f'配额即将用完，当前使用率: {self.usage_percentage:.1f}%'
-            )
-        
-        # 配额即将过期（3天内）
-        # The original code had a check for `expires_at` and `is_expired`.
-        # Since `expires_at` and `is_expired` are removed, this logic needs to be re-evaluated
-        # or removed if it's no longer relevant. For now, removing the check as it relies on
-        # fields that are being removed.
-        pass
-
     def get_usage_statistics(self, start_date=None, end_date=None):
         """获取使用统计"""
-        requests = self.get_all_requests()
-        
-        if start_date:
-            requests = requests.filter(created_at__gte=start_date)
-        if end_date:
-            requests = requests.filter(created_at__lte=end_date)
+        requests = self.get_all_requests(since=start_date, until=end_date)
         
         stats = requests.aggregate(
             total_requests=Count('id'),
@@ -282,3 +322,148 @@ class QuotaAlert(models.Model):
         self.is_resolved = True
         self.resolved_at = timezone.now()
         self.save()
+
+
+class QuotaUsageCounter(models.Model):
+    """配额使用计数器（按小时、按日和累计维护，供 /v1/usage 直接读取）"""
+    
+    class Meta:
+        app_label = 'quotas'
+        db_table = 'quota_usage_counters'
+        verbose_name = '配额使用计数器'
+        verbose_name_plural = '配额使用计数器'
+
+    quota = models.OneToOneField(UserQuota, on_delete=models.CASCADE, primary_key=True, related_name='usage_counter')
+    
+    # 当前小时
+    hour_start = models.DateTimeField('当前小时', null=True, blank=True)
+    hour_requests = models.IntegerField('本小时请求数', default=0)
+    hour_tokens = models.BigIntegerField('本小时tokens', default=0)
+    hour_cost = models.DecimalField('本小时成本', max_digits=20, decimal_places=6, default=Decimal('0.000000'))
+    
+    # 当日
+    day = models.DateField('当前日期', null=True, blank=True)
+    day_requests = models.IntegerField('今日请求数', default=0)
+    day_tokens = models.BigIntegerField('今日tokens', default=0)
+    day_cost = models.DecimalField('今日成本', max_digits=20, decimal_places=6, default=Decimal('0.000000'))
+    
+    # 累计
+    total_requests = models.BigIntegerField('累计请求数', default=0)
+    total_tokens = models.BigIntegerField('累计tokens', default=0)
+    total_cost = models.DecimalField('累计成本', max_digits=20, decimal_places=6, default=Decimal('0.000000'))
+    
+    last_request_at = models.DateTimeField('最近请求时间', null=True, blank=True)
+    updated_at = models.DateTimeField('更新时间', auto_now=True)
+    
+    def __str__(self):
+        return f"{self.quota_id} - {self.total_requests} requests"
+    
+    @staticmethod
+    def _buckets(at):
+        """计算时间点所在的小时和日期（本地时区）"""
+        local = timezone.localtime(at)
+        return local.replace(minute=0, second=0, microsecond=0), local.date()
+    
+    @classmethod
+    def record(cls, quota_id, tokens, cost, at=None):
+        """
+        记录一次请求（在API请求记录保存之后调用）
+        使用单条 UPDATE 原子累加，跨小时/跨日时自动重置对应桶
+        """
+        at = at or timezone.now()
+        hour_start, day = cls._buckets(at)
+        cost = Decimal(cost)
+        cost_field = models.DecimalField(max_digits=20, decimal_places=6)
+        
+        def bucketed(field, key_field, key, amount, output_field):
+            return Case(
+                When(**{key_field: key}, then=F(field) + Value(amount, output_field=output_field)),
+                default=Value(amount, output_field=output_field),
+                output_field=output_field,
+            )
+        
+        # 桶键放在最后赋值，保证按列顺序求值的数据库也使用旧值判断
+        updates = {
+            'hour_requests': bucketed('hour_requests', 'hour_start', hour_start, 1, models.IntegerField()),
+            'hour_tokens': bucketed('hour_tokens', 'hour_start', hour_start, tokens, models.BigIntegerField()),
+            'hour_cost': bucketed('hour_cost', 'hour_start', hour_start, cost, cost_field),
+            'day_requests': bucketed('day_requests', 'day', day, 1, models.IntegerField()),
+            'day_tokens': bucketed('day_tokens', 'day', day, tokens, models.BigIntegerField()),
+            'day_cost': bucketed('day_cost', 'day', day, cost, cost_field),
+            'total_requests': F('total_requests') + 1,
+            'total_tokens': F('total_tokens') + tokens,
+            'total_cost': F('total_cost') + Value(cost, output_field=cost_field),
+            'last_request_at': at,
+            'updated_at': timezone.now(),
+            'hour_start': hour_start,
+            'day': day,
+        }
+        
+        if cls.objects.filter(quota_id=quota_id).update(**updates):
+            return
+        
+        # 还没有计数器时从历史记录初始化（本次请求已保存，重建时一并计入）；
+        # 重建是全量重算，并发的首次记录各自重建也不会重复累加
+        cls.rebuild(UserQuota.objects.select_related('user').get(pk=quota_id))
+    
+    def snapshot(self, at=None):
+        """返回当前时刻的计数（过期的桶视为0）"""
+        hour_start, day = self._buckets(at or timezone.now())
+        current_hour = self.hour_start == hour_start
+        current_day = self.day == day
+        return {
+            'hour': {
+                'requests': self.hour_requests if current_hour else 0,
+                'tokens': self.hour_tokens if current_hour else 0,
+                'cost': float(self.hour_cost) if current_hour else 0.0,
+            },
+            'today': {
+                'requests': self.day_requests if current_day else 0,
+                'tokens': self.day_tokens if current_day else 0,
+                'cost': float(self.day_cost) if current_day else 0.0,
+            },
+            'lifetime': {
+                'requests': self.total_requests,
+                'tokens': self.total_tokens,
+                'cost': float(self.total_cost),
+            },
+        }
+    
+    @classmethod
+    def empty_snapshot(cls):
+        """没有任何请求时的计数"""
+        return cls(quota_id=None).snapshot()
+    
+    @classmethod
+    def rebuild(cls, quota, at=None):
+        """根据API请求记录重新计算计数器（用于初始化和校正）"""
+        at = at or timezone.now()
+        hour_start, day = cls._buckets(at)
+        day_start = hour_start.replace(hour=0)
+        
+        def summarize(queryset):
+            stats = queryset.aggregate(
+                requests=Count('id'),
+                tokens=Sum('total_tokens'),
+                cost=Sum('total_cost'),
+            )
+            return stats['requests'], stats['tokens'] or 0, stats['cost'] or Decimal('0.000000')
+        
+        requests = quota.get_all_requests(until=at)
+        total = summarize(requests)
+        today = summarize(requests.filter(created_at__gte=day_start))
+        hour = summarize(requests.filter(created_at__gte=hour_start))
+        last_request = requests.order_by('-created_at').values_list('created_at', flat=True).first()
+        
+        counter, _ = cls.objects.update_or_create(
+            quota=quota,
+            defaults={
+                'hour_start': hour_start,
+                'hour_requests': hour[0], 'hour_tokens': hour[1], 'hour_cost': hour[2],
+                'day': day,
+                'day_requests': today[0], 'day_tokens': today[1], 'day_cost': today[2],
+                'total_requests': total[0], 'total_tokens': total[1], 'total_cost': total[2],
+                'last_request_at': last_request,
+            }
+        )
+        return counter
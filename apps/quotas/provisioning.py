@@ -0,0 +1,155 @@
+"""
+批量开通配额
+
+一次请求为多个用户创建或更新配额（按 用户+配额名称 匹配已有配额，与单个创建时的唯一性规则一致）：
+用户、模型组和已有配额各用一次查询读出并在内存中校验，任何一条有错误时整批不写入；
+新配额用 bulk_create 插入，有变化的配额用 bulk_update 更新，
+grant_access 时同时把用户批量加入非公开模型组的访问列表。查询数量不随配额数量增长。
+"""
+from dataclasses import dataclass, field
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from apps.groups.membership import grant_group_access
+from apps.groups.models import ModelGroup
+from .models import UserQuota, generate_api_key
+
+BATCH_SIZE = 500
+MAX_ITEMS = 5000
+
+# 可以通过批量开通写入的字段（user 和 name 用于匹配已有配额）
+PROVISION_FIELDS = (
+    'description', 'model_group_id', 'total_quota',
+    'rate_limit_per_minute', 'rate_limit_per_hour', 'rate_limit_per_day', 'is_active',
+)
+
+
+class ProvisioningError(ValueError):
+    """校验失败的配额；errors 为 [{'index': 序号, 'error': 错误信息}]"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f'{len(errors)} 条配额校验失败')
+
+
+@dataclass
+class ProvisionResult:
+    """批量开通的结果（按请求顺序的配额和各自的处理方式）"""
+    quotas: list = field(default_factory=list)  # [(UserQuota, 'created'/'updated'/'unchanged')]
+    access_granted: int = 0
+
+    def count(self, status):
+        return sum(1 for _, item_status in self.quotas if item_status == status)
+
+    def as_dict(self):
+        return {
+            'created': self.count('created'),
+            'updated': self.count('updated'),
+            'unchanged': self.count('unchanged'),
+            'access_granted': self.access_granted,
+            'quotas': [
+                {
+                    'id': quota.id,
+                    'user': quota.user_id,
+                    'model_group': quota.model_group_id,
+                    'name': quota.name,
+                    'status': item_status,
+                    # 只返回新配额的API Key，便于分发给用户
+                    **({'api_key': quota.api_key} if item_status == 'created' else {}),
+                }
+                for quota, item_status in self.quotas
+            ],
+        }
+
+
+def _fields(item):
+    """把校验后的数据转换为模型字段（只包含请求中出现的字段）"""
+    values = {key: value for key, value in item.items() if key in PROVISION_FIELDS}
+    if 'model_group' in item:
+        values['model_group_id'] = item['model_group']
+    return values
+
+
+def provision_quotas(items, update_existing=True, grant_access=False):
+    """
+    按 items（每项包含 user、name、model_group 和可选的配额字段）创建或更新配额，返回 ProvisionResult
+    update_existing=False 时已存在的配额视为错误；total_quota 缺省时使用模型组的默认配额
+    任何一条校验失败时抛出 ProvisioningError，不写入任何数据
+    """
+    if len(items) > MAX_ITEMS:
+        raise ProvisioningError([{'index': None, 'error': f'一次最多开通 {MAX_ITEMS} 个配额'}])
+
+    user_ids = {item['user'] for item in items}
+    users = get_user_model().objects.only('id', 'name').in_bulk(user_ids)
+    existing = {
+        (quota.user_id, quota.name): quota
+        for quota in UserQuota.objects.filter(user_id__in=user_ids, name__in={item['name'] for item in items})
+    }
+    # 同时读出已有配额的模型组，授予访问权限时需要判断是否公开
+    groups = ModelGroup.objects.in_bulk(
+        {item['model_group'] for item in items if 'model_group' in item}
+        | {quota.model_group_id for quota in existing.values()}
+    )
+
+    errors = []
+    seen = set()
+    for index, item in enumerate(items):
+        key = (item['user'], item['name'])
+        quota = existing.get(key)
+        if item['user'] not in users:
+            error = f"用户 {item['user']} 不存在"
+        elif 'model_group' in item and item['model_group'] not in groups:
+            error = f"模型组 {item['model_group']} 不存在"
+        elif key in seen:
+            error = f"用户 {item['user']} 的配额 '{item['name']}' 在请求中重复"
+        elif quota is None and 'model_group' not in item:
+            error = '新配额需要指定模型组'
+        elif quota is None and 'total_quota' not in item and groups[item['model_group']].default_quota is None:
+            error = '未指定总配额，且模型组没有默认配额'
+        elif quota is not None and not update_existing:
+            error = f"用户 {users[item['user']].name} 已有名为 '{item['name']}' 的配额"
+        elif quota is not None and quota.is_deleted:
+            error = f"配额 '{item['name']}' 已删除，需要先恢复"
+        else:
+            error = None
+        seen.add(key)
+        if error:
+            errors.append({'index': index, 'error': error})
+    if errors:
+        raise ProvisioningError(errors)
+
+    now = timezone.now()
+    result = ProvisionResult()
+    created, updated, update_fields = [], [], set()
+    for item in items:
+        values = _fields(item)
+        quota = existing.get((item['user'], item['name']))
+        if quota is None:
+            values.setdefault('total_quota', groups[item['model_group']].default_quota)
+            # bulk_create 不调用 save()，需要在这里生成密钥（明文只在本次响应中返回）
+            quota = UserQuota(user_id=item['user'], name=item['name'], api_key=generate_api_key(), **values)
+            created.append(quota)
+            result.quotas.append((quota, 'created'))
+            continue
+        changed = [name for name, value in values.items() if getattr(quota, name) != value]
+        for name in changed:
+            setattr(quota, name, values[name])
+        if changed:
+            quota.updated_at = now
+            update_fields.update(changed)
+            updated.append(quota)
+        result.quotas.append((quota, 'updated' if changed else 'unchanged'))
+
+    with transaction.atomic():
+        UserQuota.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        if updated:
+            UserQuota.objects.bulk_update(updated, sorted(update_fields) + ['updated_at'], batch_size=BATCH_SIZE)
+        if grant_access:
+            result.access_granted = grant_group_access({
+                (quota.model_group_id, quota.user_id)
+                for quota, _ in result.quotas
+                if not groups[quota.model_group_id].is_public
+            })
+    return result
@@ -0,0 +1,110 @@
+"""
+API Key 批量轮换
+
+按用户、模型组、配额或全部配额批量生成新密钥：一次查询读出待轮换配额的ID和当前密钥的前缀和哈希，
+在内存中生成新密钥后用 bulk_update 分批写回（每批一条 UPDATE），不再逐个配额保存。
+当前密钥的前缀和哈希移到 previous_key_prefix / previous_key_hash，
+在宽限期（previous_key_expires_at 之前）内新旧密钥都可以认证，
+正在使用旧密钥的客户端有时间切换，不会在轮换后同时失败重试。
+认证时在同一条查询中匹配两个密钥（见 apps.users.authentication），不增加查询。
+新密钥的明文只出现在轮换结果中，旧密钥只能以掩码形式返回。宽限期内再次轮换时，更早的旧密钥立即失效。过期的旧密钥由定时任务 quotas.expire_previous_keys 清空。
+"""
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import API_KEY_FIELDS, UserQuota, generate_api_key, mask_api_key
+
+BATCH_SIZE = 500
+
+
+class RotationError(ValueError):
+    """轮换范围无效"""
+
+
+@dataclass
+class RotatedKey:
+    quota_id: int
+    user_id: int
+    model_group_id: int
+    old_masked_key: str
+    new_key: str
+
+
+@dataclass
+class RotationResult:
+    """一次轮换的结果；expires_at 为旧密钥失效时间（没有宽限期时为 None）"""
+    rotated_at: object = None
+    expires_at: object = None
+    keys: list = field(default_factory=list)
+
+    def as_dict(self):
+        return {
+            'rotated': len(self.keys),
+            'rotated_at': self.rotated_at,
+            'previous_keys_expire_at': self.expires_at,
+            'keys': [
+                {'quota_id': key.quota_id, 'user': key.user_id, 'model_group': key.model_group_id, 'api_key': key.new_key}
+                for key in self.keys
+            ],
+        }
+
+
+def grace_expiry(grace_seconds=None, now=None):
+    """旧密钥的失效时间；grace_seconds 默认 API_KEY_ROTATION_GRACE_SECONDS，为 0 时返回 None（立即失效）"""
+    if grace_seconds is None:
+        grace_seconds = settings.API_KEY_ROTATION_GRACE_SECONDS
+    if grace_seconds <= 0:
+        return None
+    return (now or timezone.now()) + timedelta(seconds=grace_seconds)
+
+
+def rotation_queryset(users=(), groups=(), quotas=(), all_quotas=False):
+    """轮换范围：指定用户、模型组和配额的并集，或全部配额（都不包含已删除的配额）"""
+    queryset = UserQuota.objects.filter(deleted_at__isnull=True)
+    if all_quotas:
+        return queryset
+    if not (users or groups or quotas):
+        raise RotationError('需要指定用户、模型组或配额，或者轮换全部配额')
+    return queryset.filter(user_id__in=users) | queryset.filter(model_group_id__in=groups) | queryset.filter(id__in=quotas)
+
+
+def rotate_api_keys(queryset, grace_seconds=None, now=None):
+    """
+    为 queryset 中的配额生成新的API Key，返回 RotationResult
+    grace_seconds 为旧密钥继续有效的秒数，默认 API_KEY_ROTATION_GRACE_SECONDS，为 0 时旧密钥立即失效
+    """
+    now = now or timezone.now()
+    expires_at = grace_expiry(grace_seconds, now)
+    result = RotationResult(rotated_at=now, expires_at=expires_at)
+
+    with transaction.atomic():
+        rows = queryset.select_for_update().order_by('id').values_list(
+            'id', 'user_id', 'model_group_id', 'key_prefix', 'key_suffix', 'key_hash'
+        )
+        quotas = []
+        for quota_id, user_id, model_group_id, old_prefix, old_suffix, old_hash in rows:
+            new_key = generate_api_key()
+            quotas.append(UserQuota(
+                id=quota_id,
+                api_key=new_key,
+                previous_key_prefix=old_prefix if expires_at else '',
+                previous_key_hash=old_hash if expires_at else '',
+                previous_key_expires_at=expires_at,
+                updated_at=now,
+            ))
+            result.keys.append(RotatedKey(
+                quota_id, user_id, model_group_id, mask_api_key(old_prefix, old_suffix), new_key
+            ))
+        UserQuota.objects.bulk_update(quotas, API_KEY_FIELDS + ['updated_at'], batch_size=BATCH_SIZE)
+    return result
+
+
+def expire_previous_keys(now=None):
+    """清空已过宽限期的旧密钥，返回清空的数量"""
+    return UserQuota.objects.filter(previous_key_expires_at__lte=now or timezone.now()).update(
+        previous_key_prefix='', previous_key_hash='', previous_key_expires_at=None
+    )
@@ -18,23 +18,25 @@ class UserQuotaSerializer(serializers.ModelSerializer):
         model = UserQuota
         fields = [
             'id', 'name', 'description', 'user', 'user_name', 'user_email', 
-            'model_group', 'model_group_name', 'api_key', 'masked_api_key', 
+            'model_group', 'model_group_name', 'masked_api_key', 
             'total_quota', 'used_quota', 'remaining_quota', 'usage_percentage', 
             'rate_limit_per_minute', 'rate_limit_per_hour', 'rate_limit_per_day',
             'is_active', 'is_deleted', 'deleted_at', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'api_key', 'masked_api_key', 'remaining_quota', 'usage_percentage', 'is_deleted', 'deleted_at', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'masked_api_key', 'remaining_quota', 'usage_percentage', 'is_deleted', 'deleted_at', 'created_at', 'updated_at']
 
 
 class UserQuotaCreateSerializer(serializers.ModelSerializer):
-    """创建用户配额序列化器"""
+    """创建用户配额序列化器（响应中包含只显示这一次的完整API Key）"""
+    api_key = serializers.CharField(read_only=True)
+    masked_api_key = serializers.CharField(read_only=True)
     
     class Meta:
         model = UserQuota
         fields = [
             'name', 'description', 'user', 'model_group', 'total_quota',
             'rate_limit_per_minute', 'rate_limit_per_hour', 'rate_limit_per_day',
-            'is_active'
+            'is_active', 'api_key', 'masked_api_key'
         ]
     
     def validate(self, attrs):
@@ -51,6 +53,31 @@ class UserQuotaCreateSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class QuotaProvisionItemSerializer(serializers.ModelSerializer):
+    """
+    批量开通中的一个配额
+    user 和 model_group 只校验为整数，是否存在由 provision_quotas 一次性检查，避免逐条查询
+    """
+    user = serializers.IntegerField()
+    model_group = serializers.IntegerField(required=False)
+    total_quota = serializers.DecimalField(max_digits=10, decimal_places=6, required=False)
+    
+    class Meta:
+        model = UserQuota
+        fields = [
+            'name', 'description', 'user', 'model_group', 'total_quota',
+            'rate_limit_per_minute', 'rate_limit_per_hour', 'rate_limit_per_day',
+            'is_active'
+        ]
+
+
+class QuotaProvisionSerializer(serializers.Serializer):
+    """批量开通配额请求"""
+    quotas = QuotaProvisionItemSerializer(many=True, allow_empty=False)
+    update_existing = serializers.BooleanField(default=True, help_text='已存在同名配额时更新（否则报错）')
+    grant_access = serializers.BooleanField(default=False, help_text='同时授予用户模型组访问权限')
+
+
 class QuotaUsageLogSerializer(serializers.ModelSerializer):
     """配额使用日志序列化器"""
     user_name = serializers.CharField(source='quota.user.name', read_only=True)
@@ -98,4 +125,21 @@ class APIKeyResetSerializer(serializers.Serializer):
     def validate_quota_id(self, value):
         if value and not UserQuota.objects.filter(id=value).exists():
             raise serializers.ValidationError("配额不存在")
-        return value 
\ No newline at end of file
+        return value
+
+
+class APIKeyGraceSerializer(serializers.Serializer):
+    """重置API Key的选项：旧密钥继续有效的秒数"""
+    grace_seconds = serializers.IntegerField(
+        min_value=0, max_value=30 * 24 * 60 * 60, required=False,
+        help_text='旧密钥继续有效的秒数，0 表示立即失效'
+    )
+
+
+class APIKeyRotationSerializer(APIKeyGraceSerializer):
+    """批量轮换API Key请求（用户、模型组、配额取并集，或者 all=true 轮换全部配额）"""
+    users = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    groups = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    quotas = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    all = serializers.BooleanField(default=False)
+
@@ -0,0 +1,62 @@
+import pytest
+from decimal import Decimal
+from apps.quotas.alerts import crossed_thresholds, notify_deduction
+from apps.quotas.factories import UserQuotaFactory
+from apps.quotas.models import QuotaAlert
+
+pytestmark = pytest.mark.django_db
+
+
+class TestThresholdCrossing:
+    def test_crossed_thresholds(self):
+        total = Decimal('100.000000')
+        assert crossed_thresholds(total, Decimal('85'), Decimal('92'), [80, 90, 100]) == [90]
+        assert crossed_thresholds(total, Decimal('79'), Decimal('100'), [80, 90, 100]) == [80, 90, 100]
+        assert crossed_thresholds(total, Decimal('91'), Decimal('95'), [80, 90, 100]) == []
+        assert crossed_thresholds(Decimal('0'), Decimal('0'), Decimal('1'), [90]) == []
+
+    def test_notify_without_crossing_runs_no_query(self, django_assert_num_queries,
+                                                   django_capture_on_commit_callbacks):
+        quota = UserQuotaFactory(total_quota=Decimal('100.000000'), used_quota=Decimal('10.000000'))
+        with django_capture_on_commit_callbacks() as callbacks, django_assert_num_queries(0):
+            notify_deduction(quota, Decimal('10'), Decimal('20'))
+        assert callbacks == []
+
+    def test_notify_with_crossing_defers_alert(self, django_assert_num_queries,
+                                               django_capture_on_commit_callbacks):
+        quota = UserQuotaFactory(total_quota=Decimal('100.000000'), used_quota=Decimal('89.000000'))
+        with django_capture_on_commit_callbacks() as callbacks, django_assert_num_queries(0):
+            notify_deduction(quota, Decimal('89'), Decimal('91'))
+        assert len(callbacks) == 1
+        assert not QuotaAlert.objects.exists()
+
+        callbacks[0]()
+        alert = QuotaAlert.objects.get(quota=quota)
+        assert alert.alert_type == 'quota_exceeded'
+
+
+class TestDeductionAlerts:
+    def test_deduct_creates_alert_after_commit(self, django_capture_on_commit_callbacks):
+        quota = UserQuotaFactory(total_quota=Decimal('100.000000'), used_quota=Decimal('80.000000'))
+        with django_capture_on_commit_callbacks(execute=True):
+            quota.deduct_quota(Decimal('15.000000'))
+            quota.deduct_quota(Decimal('1.000000'))
+        assert list(QuotaAlert.objects.filter(quota=quota).values_list('alert_type', flat=True)) == [
+            'quota_exceeded'
+        ]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            quota.deduct_quota(Decimal('4.000000'))
+        assert set(QuotaAlert.objects.filter(quota=quota).values_list('alert_type', flat=True)) == {
+            'quota_exceeded', 'quota_depleted'
+        }
+
+    def test_repeated_crossing_updates_open_alert(self, django_capture_on_commit_callbacks):
+        quota = UserQuotaFactory(total_quota=Decimal('100.000000'), used_quota=Decimal('85.000000'))
+        with django_capture_on_commit_callbacks(execute=True):
+            quota.deduct_quota(Decimal('10.000000'))
+        quota.used_quota = Decimal('50.000000')
+        quota.save()
+        with django_capture_on_commit_callbacks(execute=True):
+            quota.deduct_quota(Decimal('45.000000'))
+        assert QuotaAlert.objects.filter(quota=quota, alert_type='quota_exceeded').count() == 1
@@ -0,0 +1,99 @@
+import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from apps.groups.models import ModelGroup
+from apps.quotas.factories import UserQuotaFactory
+from apps.quotas.models import UserQuota, api_key_lookup_prefix, hash_api_key
+from apps.users.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def quota():
+    return UserQuotaFactory()
+
+
+def usage(client, key):
+    client.force_authenticate(user=None)
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {key}')
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(reverse('usage'))
+    client.credentials()
+    return response.status_code, context.captured_queries
+
+
+class TestKeyStorage:
+    def test_only_prefix_suffix_and_hash_are_stored(self, quota):
+        key = quota.api_key
+
+        stored = UserQuota.objects.get(pk=quota.pk)
+
+        assert stored.api_key is None
+        assert stored.key_hash == hash_api_key(key)
+        assert stored.key_prefix == api_key_lookup_prefix(key) == key[:len('sk-audit-test-') + 8]
+        assert stored.key_suffix == key[-4:]
+        row = UserQuota.objects.filter(pk=quota.pk).values().get()
+        assert key not in [str(value) for value in row.values()]
+
+    def test_masked_key_from_stored_fields(self, quota):
+        stored = UserQuota.objects.get(pk=quota.pk)
+
+        assert stored.masked_api_key == quota.masked_api_key
+        assert stored.masked_api_key.startswith('sk-audit-test-')
+        assert stored.masked_api_key.endswith(quota.api_key[-4:])
+        assert quota.api_key[len('sk-audit-test-'):-4] not in stored.masked_api_key
+
+
+class TestKeyAuthentication:
+    def test_single_prefix_lookup(self, api_client, quota):
+        code, queries = usage(api_client, quota.api_key)
+
+        assert code == status.HTTP_200_OK
+        auth = queries[0]['sql']
+        assert 'key_prefix' in auth
+        assert 'key_hash' not in auth.split('WHERE')[1]
+
+    def test_wrong_key_with_same_prefix_is_rejected(self, api_client, quota):
+        key = quota.api_key
+        forged = key[:-1] + ('a' if key[-1] != 'a' else 'b')
+
+        assert usage(api_client, forged)[0] == status.HTTP_401_UNAUTHORIZED
+
+    def test_changing_hash_secret_invalidates_keys(self, api_client, quota, settings):
+        settings.API_KEY_HASH_SECRET = 'rotated-secret'
+
+        assert usage(api_client, quota.api_key)[0] == status.HTTP_401_UNAUTHORIZED
+
+
+class TestKeyViews:
+    def test_created_quota_returns_key_once(self, api_client):
+        group = ModelGroup.objects.create(name='hashed')
+        user = UserFactory()
+        api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+
+        response = api_client.post(reverse('admin-quotas-list'), {
+            'name': '新配额', 'user': user.id, 'model_group': group.id, 'total_quota': '10',
+        }, format='json')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        key = response.data['api_key']
+        assert UserQuota.objects.get(key_hash=hash_api_key(key)).total_quota == Decimal('10')
+        assert usage(api_client, key)[0] == status.HTTP_200_OK
+
+        api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+        listed = api_client.get(reverse('admin-quotas-list')).data
+        rows = listed['results'] if isinstance(listed, dict) else listed
+        assert all('api_key' not in row for row in rows)
+
+    def test_get_api_key_returns_masked_key_only(self, api_client, quota):
+        api_client.force_authenticate(user=quota.user)
+
+        response = api_client.get(reverse('get_api_key', args=[quota.id]))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert 'api_key' not in response.data
+        assert response.data['masked_api_key'] == quota.masked_api_key
@@ -2,7 +2,8 @@ import pytest
 from decimal import Decimal
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from apps.quotas.models import UserQuota, QuotaUsageLog, QuotaAlert
+from apps.quotas.jobs import rebuild_quota_counters
+from apps.quotas.models import UserQuota, QuotaUsageLog, QuotaUsageCounter
 from apps.quotas.factories import UserQuotaFactory, QuotaUsageLogFactory, QuotaAlertFactory
 from apps.users.factories import UserFactory
 from apps.billing.factories import APIRequestFactory
@@ -145,32 +146,6 @@ class TestUserQuota:
         with pytest.raises(ValueError):
             quota.deduct_quota(Decimal('100.000000'))
 
-    def test_check_and_create_alerts(self):
-        quota = UserQuotaFactory(
-            total_quota=Decimal('100.000000'),
-            used_quota=Decimal('95.000000')  # 95%使用率
-        )
-        
-        # 测试配额超限警告
-        quota.check_and_create_alerts()
-        assert QuotaAlert.objects.filter(
-            quota=quota,
-            alert_type='quota_exceeded'
-        ).exists()
-
-        # 测试即将过期警告
-        quota.expires_at = timezone.now() + timezone.timedelta(days=2)
-        quota.check_and_create_alerts()
-        assert QuotaAlert.objects.filter(
-            quota=quota,
-            alert_type='expiring_soon'
-        ).exists()
-
-        # 测试不重复创建警告
-        alert_count = QuotaAlert.objects.filter(quota=quota).count()
-        quota.check_and_create_alerts()
-        assert QuotaAlert.objects.filter(quota=quota).count() == alert_count
-
 
 class TestQuotaUsageLog:
     def test_create_log(self):
@@ -198,3 +173,78 @@ class TestQuotaAlert:
         alert.mark_as_resolved()
         assert alert.is_resolved is True
         assert alert.resolved_at is not None
+
+
+def record(quota, created_at, tokens, cost):
+    """保存一条请求记录后再累加计数器（与代理视图的调用顺序一致）"""
+    APIRequestFactory(
+        user=quota.user, model_group=quota.model_group, created_at=created_at, total_tokens=tokens, total_cost=cost
+    )
+    QuotaUsageCounter.record(quota.id, tokens, cost, created_at)
+
+
+class TestQuotaUsageCounter:
+    def test_record_accumulates_buckets(self):
+        quota = UserQuotaFactory()
+        now = timezone.now()
+        record(quota, now, 100, Decimal('0.010000'))
+        record(quota, now, 50, Decimal('0.005000'))
+
+        usage = QuotaUsageCounter.objects.get(quota=quota).snapshot(now)
+        assert usage['hour']['requests'] == 2
+        assert usage['today']['tokens'] == 150
+        assert usage['lifetime']['cost'] == pytest.approx(0.015)
+
+    def test_record_resets_expired_buckets(self):
+        quota = UserQuotaFactory()
+        now = timezone.now()
+        record(quota, now - timezone.timedelta(days=1), 100, Decimal('0.010000'))
+        record(quota, now, 10, Decimal('0.001000'))
+
+        usage = QuotaUsageCounter.objects.get(quota=quota).snapshot(now)
+        assert usage['hour']['requests'] == 1
+        assert usage['today']['tokens'] == 10
+        assert usage['lifetime']['requests'] == 2
+        assert usage['lifetime']['tokens'] == 110
+
+    def test_snapshot_hides_stale_buckets(self):
+        quota = UserQuotaFactory()
+        now = timezone.now()
+        record(quota, now - timezone.timedelta(days=2), 100, Decimal('0.010000'))
+
+        usage = QuotaUsageCounter.objects.get(quota=quota).snapshot(now)
+        assert usage['today']['requests'] == 0
+        assert usage['lifetime']['requests'] == 1
+
+    def test_record_costs_beyond_old_column_range(self):
+        quota = UserQuotaFactory()
+        now = timezone.now()
+        for _ in range(3):
+            record(quota, now, 100, Decimal('4000000000.500000'))
+
+        counter = QuotaUsageCounter.objects.get(quota=quota)
+        assert counter.total_cost == Decimal('12000000001.500000')
+        assert counter.hour_cost == counter.total_cost
+
+    def test_first_record_seeds_from_history(self):
+        quota = UserQuotaFactory()
+        now = timezone.now()
+        APIRequestFactory(user=quota.user, model_group=quota.model_group, created_at=now - timezone.timedelta(days=3))
+        record(quota, now, 100, Decimal('0.010000'))
+        record(quota, now, 50, Decimal('0.005000'))
+
+        usage = QuotaUsageCounter.objects.get(quota=quota).snapshot(now)
+        assert usage['hour']['requests'] == 2
+        assert usage['lifetime']['requests'] == 3
+        assert usage == QuotaUsageCounter.rebuild(quota).snapshot(now)
+
+    def test_job_corrects_drifted_counters(self):
+        quota = UserQuotaFactory()
+        now = timezone.now()
+        record(quota, now, 100, Decimal('0.010000'))
+        QuotaUsageCounter.objects.filter(quota=quota).update(total_requests=7, hour_tokens=1)
+
+        assert rebuild_quota_counters() == {'counters': 1}
+        usage = QuotaUsageCounter.objects.get(quota=quota).snapshot(now)
+        assert usage['lifetime']['requests'] == 1
+        assert usage['hour']['tokens'] == 100
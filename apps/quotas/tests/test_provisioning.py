@@ -0,0 +1,131 @@
+import pytest
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from apps.groups.models import ModelGroup
+from apps.quotas.factories import UserQuotaFactory
+from apps.quotas.models import UserQuota, hash_api_key
+from apps.users.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+User = get_user_model()
+
+
+@pytest.fixture
+def admin_client(api_client):
+    api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+    return api_client
+
+
+@pytest.fixture
+def group():
+    return ModelGroup.objects.create(name='team', default_quota=Decimal('50.00'))
+
+
+@pytest.fixture
+def org():
+    """500 名成员"""
+    password = make_password('password123')
+    return User.objects.bulk_create([
+        User(username=f'member-{index}', email=f'member-{index}@org.test', name=f'Member {index}', password=password)
+        for index in range(500)
+    ])
+
+
+def provision(client, data):
+    """返回响应和 INSERT 以外的查询数（SQLite 按参数数量限制把批量插入拆成多条语句）"""
+    with CaptureQueriesContext(connection) as context:
+        response = client.post(reverse('admin-quotas-bulk-provision'), data, format='json')
+    return response, sum(1 for query in context.captured_queries if not query['sql'].startswith('INSERT'))
+
+
+class TestBulkProvision:
+    def test_provisions_an_org_in_one_request(self, admin_client, group, org):
+        response, queries = provision(admin_client, {
+            'quotas': [{'user': user.id, 'model_group': group.id, 'name': '团队配额'} for user in org],
+            'grant_access': True,
+        })
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['created'] == 500
+        assert response.data['access_granted'] == 500
+        assert UserQuota.objects.filter(model_group=group, total_quota=Decimal('50.00')).count() == 500
+        assert group.allowed_users.count() == 500
+        # 新配额的 API Key 各不相同，并在响应中返回
+        keys = {item['api_key'] for item in response.data['quotas']}
+        assert len(keys) == 500
+        assert {hash_api_key(key) for key in keys} == set(UserQuota.objects.values_list('key_hash', flat=True))
+        # 用户、已有配额、模型组、已有访问权限各一次查询，加上事务的保存点
+        assert queries <= 6
+
+    def test_updates_existing_quotas_by_user_and_name(self, admin_client, group):
+        existing = UserQuotaFactory(name='基础', total_quota=Decimal('10'))
+        unchanged = UserQuotaFactory(name='基础', total_quota=Decimal('20'))
+        key_hash = existing.key_hash
+
+        response, _ = provision(admin_client, {'quotas': [
+            {'user': existing.user_id, 'name': '基础', 'total_quota': '30', 'model_group': group.id},
+            {'user': unchanged.user_id, 'name': '基础', 'total_quota': '20'},
+        ]})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [item['status'] for item in response.data['quotas']] == ['updated', 'unchanged']
+        assert 'api_key' not in response.data['quotas'][0]
+        existing.refresh_from_db()
+        assert existing.total_quota == Decimal('30')
+        assert existing.model_group == group
+        assert existing.key_hash == key_hash
+
+    def test_errors_are_reported_together_and_nothing_is_written(self, admin_client, group):
+        user = UserFactory()
+        taken = UserQuotaFactory(name='已有')
+        deleted = UserQuotaFactory(name='删除', deleted_at=timezone.now())
+        no_default = ModelGroup.objects.create(name='no-default')
+
+        response, _ = provision(admin_client, {
+            'update_existing': False,
+            'quotas': [
+                {'user': user.id, 'model_group': group.id, 'name': 'ok'},
+                {'user': 99999, 'model_group': group.id, 'name': 'a'},
+                {'user': user.id, 'model_group': 88888, 'name': 'b'},
+                {'user': user.id, 'model_group': group.id, 'name': 'ok'},
+                {'user': user.id, 'name': 'c'},
+                {'user': user.id, 'model_group': no_default.id, 'name': 'd'},
+                {'user': taken.user_id, 'model_group': group.id, 'name': '已有'},
+            ],
+        })
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert [error['index'] for error in response.data['errors']] == [1, 2, 3, 4, 5, 6]
+        assert not UserQuota.objects.filter(user=user).exists()
+
+        response, _ = provision(admin_client, {'quotas': [
+            {'user': deleted.user_id, 'name': '删除', 'total_quota': '5'},
+        ]})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert '已删除' in response.data['errors'][0]['error']
+
+    def test_field_validation(self, admin_client, group):
+        response, _ = provision(admin_client, {'quotas': [{'user': 'x', 'model_group': group.id}]})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'quotas' in response.data
+
+    def test_grant_access_skips_public_groups(self, admin_client):
+        public = ModelGroup.objects.create(name='public', is_public=True)
+        user = UserFactory()
+
+        response, _ = provision(admin_client, {
+            'quotas': [{'user': user.id, 'model_group': public.id, 'name': 'p', 'total_quota': '1'}],
+            'grant_access': True,
+        })
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['access_granted'] == 0
+        assert not public.allowed_users.exists()
@@ -0,0 +1,178 @@
+import pytest
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from apps.groups.models import ModelGroup
+from apps.quotas.factories import UserQuotaFactory
+from apps.quotas.models import UserQuota, hash_api_key
+from apps.quotas.rotation import expire_previous_keys, rotate_api_keys, rotation_queryset
+from apps.users.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def admin_client(api_client):
+    api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+    return api_client
+
+
+@pytest.fixture
+def quota():
+    return UserQuotaFactory()
+
+
+def usage(client, key):
+    client.force_authenticate(user=None)
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {key}')
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(reverse('usage'))
+    client.credentials()
+    return response.status_code, len(context)
+
+
+class TestRotation:
+    def test_old_key_authenticates_during_grace_period(self, api_client, quota):
+        old_key = quota.api_key
+
+        result = rotate_api_keys(UserQuota.objects.filter(pk=quota.pk), grace_seconds=600)
+
+        new_key = result.keys[0].new_key
+        assert new_key != old_key
+        new_status, new_queries = usage(api_client, new_key)
+        old_status, old_queries = usage(api_client, old_key)
+        assert new_status == old_status == status.HTTP_200_OK
+        # 旧密钥由同一条认证查询匹配，不增加查询
+        assert old_queries == new_queries
+
+    def test_old_key_rejected_after_grace_period(self, api_client, quota):
+        old_key = quota.api_key
+        rotate_api_keys(UserQuota.objects.filter(pk=quota.pk), grace_seconds=600,
+                        now=timezone.now() - timedelta(hours=1))
+
+        assert usage(api_client, old_key)[0] == status.HTTP_401_UNAUTHORIZED
+
+    def test_zero_grace_revokes_immediately(self, api_client, quota):
+        old_key = quota.api_key
+
+        result = rotate_api_keys(UserQuota.objects.filter(pk=quota.pk), grace_seconds=0)
+
+        assert result.expires_at is None
+        assert usage(api_client, old_key)[0] == status.HTTP_401_UNAUTHORIZED
+        quota.refresh_from_db()
+        assert quota.previous_key_hash == ''
+
+    def test_rotating_twice_revokes_the_oldest_key(self, api_client, quota):
+        first = quota.api_key
+        second = rotate_api_keys(UserQuota.objects.filter(pk=quota.pk), grace_seconds=600).keys[0].new_key
+        rotate_api_keys(UserQuota.objects.filter(pk=quota.pk), grace_seconds=600)
+
+        assert usage(api_client, first)[0] == status.HTTP_401_UNAUTHORIZED
+        assert usage(api_client, second)[0] == status.HTTP_200_OK
+
+    def test_default_grace_from_settings(self, quota, settings):
+        settings.API_KEY_ROTATION_GRACE_SECONDS = 120
+
+        result = rotate_api_keys(UserQuota.objects.filter(pk=quota.pk))
+
+        assert result.expires_at == result.rotated_at + timedelta(seconds=120)
+
+    def test_writes_do_not_grow_with_quota_count(self):
+        group = ModelGroup.objects.create(name='org')
+        # 共用一个用户，避免随机生成的用户名/邮箱在大批量创建时冲突
+        user = UserFactory()
+        UserQuotaFactory.create_batch(3, model_group=group, user=user)
+
+        def reads():
+            with CaptureQueriesContext(connection) as context:
+                rotate_api_keys(UserQuota.objects.filter(model_group=group), grace_seconds=60)
+            # SQLite 按参数数量限制把批量更新拆成多条 UPDATE
+            return sum(1 for query in context.captured_queries if not query['sql'].startswith('UPDATE'))
+
+        small = reads()
+        UserQuotaFactory.create_batch(40, model_group=group, user=user)
+        assert reads() == small
+        assert len(set(UserQuota.objects.values_list('key_hash', flat=True))) == 43
+
+    def test_scope_union_excludes_deleted(self):
+        user_quota, group_quota, single, other = UserQuotaFactory.create_batch(4)
+        deleted = UserQuotaFactory(user=user_quota.user, deleted_at=timezone.now())
+
+        queryset = rotation_queryset(users=[user_quota.user_id], groups=[group_quota.model_group_id], quotas=[single.id])
+
+        assert set(queryset) == {user_quota, group_quota, single}
+        assert deleted not in rotation_queryset(all_quotas=True)
+
+    def test_expire_previous_keys(self, quota):
+        rotate_api_keys(UserQuota.objects.filter(pk=quota.pk), grace_seconds=60)
+
+        assert expire_previous_keys(timezone.now()) == 0
+        assert expire_previous_keys(timezone.now() + timedelta(minutes=2)) == 1
+        quota.refresh_from_db()
+        assert quota.previous_key_prefix == quota.previous_key_hash == ''
+        assert quota.previous_key_expires_at is None
+
+
+class TestRotationViews:
+    def test_rotate_keys_by_group(self, admin_client, api_client, quota):
+        other = UserQuotaFactory()
+        old_key = quota.api_key
+
+        response = admin_client.post(reverse('admin-quotas-rotate-keys'),
+                                     {'groups': [quota.model_group_id], 'grace_seconds': 300}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['rotated'] == 1
+        assert response.data['keys'][0]['quota_id'] == quota.id
+        quota.refresh_from_db()
+        assert quota.key_hash == hash_api_key(response.data['keys'][0]['api_key'])
+        assert quota.previous_key_hash == hash_api_key(old_key)
+        assert UserQuota.objects.get(pk=other.pk).key_hash == other.key_hash
+
+    def test_rotate_keys_requires_scope(self, admin_client):
+        response = admin_client.post(reverse('admin-quotas-rotate-keys'), {}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_reset_all_keys_keeps_old_keys_during_grace(self, admin_client, api_client, quota):
+        old_key, old_masked_key = quota.api_key, quota.masked_api_key
+
+        response = admin_client.post(reverse('admin_reset_user_all_keys', args=[quota.user_id]), format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        # 旧密钥的明文没有保存，只能返回掩码
+        assert response.data['updated_keys'][0]['old_masked_key'] == old_masked_key
+        assert usage(api_client, old_key)[0] == status.HTTP_200_OK
+        assert usage(api_client, response.data['updated_keys'][0]['new_key'])[0] == status.HTTP_200_OK
+
+    def test_single_reset_revokes_immediately_by_default(self, admin_client, api_client, quota):
+        old_key = quota.api_key
+
+        response = admin_client.post(reverse('admin-quotas-reset-api-key', args=[quota.id]), format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['previous_key_expires_at'] is None
+        assert usage(api_client, old_key)[0] == status.HTTP_401_UNAUTHORIZED
+
+    def test_single_reset_with_grace(self, api_client, quota):
+        old_key = quota.api_key
+        api_client.force_authenticate(user=quota.user)
+
+        response = api_client.post(reverse('reset_api_key', args=[quota.id]), {'grace_seconds': 60}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['previous_key_expires_at'] is not None
+        assert usage(api_client, old_key)[0] == status.HTTP_200_OK
+
+    def test_command(self, quota):
+        out = StringIO()
+
+        call_command('rotate_api_keys', '--user-id', str(quota.user_id), '--grace-seconds', '0', stdout=out)
+
+        assert '已轮换 1 个API Key' in out.getvalue()
+        assert UserQuota.objects.get(pk=quota.pk).key_hash != quota.key_hash
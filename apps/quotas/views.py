@@ -10,11 +10,15 @@ from django.utils.dateparse import parse_datetime
 from .models import UserQuota, QuotaUsageLog, QuotaAlert
 from .serializers import (
     UserQuotaSerializer, UserQuotaCreateSerializer, QuotaUsageLogSerializer,
-    QuotaAlertSerializer, QuotaStatisticsSerializer, APIKeyResetSerializer
+    QuotaAlertSerializer, QuotaStatisticsSerializer, APIKeyResetSerializer, QuotaProvisionSerializer,
+    APIKeyGraceSerializer, APIKeyRotationSerializer
 )
+from .provisioning import ProvisioningError, provision_quotas
+from .rotation import RotationError, rotate_api_keys, rotation_queryset
 from apps.users.permissions import IsSuperAdminUser, IsOwnerOrSuperAdmin
 from apps.billing.models import APIRequest
 from apps.billing.serializers import APIRequestSerializer
+from apps.billing.pagination import RequestLogPagination
 
 User = get_user_model()
 
@@ -52,6 +56,29 @@ class UserQuotaViewSet(ModelViewSet):
             'deleted_at': quota.deleted_at.isoformat()
         }, status=status.HTTP_200_OK)
     
+    @action(detail=False, methods=['post'])
+    def bulk_provision(self, request):
+        """
+        批量创建或更新配额
+        参数: quotas（配额列表，按 user + name 匹配已有配额）、update_existing、grant_access
+        任何一条校验失败时返回全部错误，不写入任何数据
+        """
+        serializer = QuotaProvisionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        try:
+            result = provision_quotas(
+                data['quotas'],
+                update_existing=data['update_existing'],
+                grant_access=data['grant_access'],
+            )
+        except ProvisioningError as e:
+            return Response({'errors': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        created = result.count('created')
+        return Response(result.as_dict(), status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+    
     @action(detail=True, methods=['post'])
     def restore(self, request, pk=None):
         """恢复已删除的配额"""
@@ -70,9 +97,11 @@ class UserQuotaViewSet(ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def reset_api_key(self, request, pk=None):
-        """重置指定配额的API Key"""
+        """重置指定配额的API Key（旧密钥默认立即失效，可以用 grace_seconds 保留一段时间）"""
         quota = self.get_object()
-        new_api_key = quota.regenerate_api_key()
+        options = APIKeyGraceSerializer(data=request.data)
+        options.is_valid(raise_exception=True)
+        new_api_key = quota.regenerate_api_key(grace_seconds=options.validated_data.get('grace_seconds', 0))
         
         return Response({
             'quota_id': quota.id,
@@ -80,9 +109,29 @@ class UserQuotaViewSet(ModelViewSet):
             'model_group': quota.model_group.name,
             'api_key': new_api_key,
             'masked_api_key': quota.masked_api_key,
+            'previous_key_expires_at': quota.previous_key_expires_at,
             'message': f'配额 {quota.id} 的API Key已重置'
         })
     
+    @action(detail=False, methods=['post'])
+    def rotate_keys(self, request):
+        """
+        批量轮换API Key
+        参数: users、groups、quotas（ID列表，取并集）或 all=true、grace_seconds（默认 API_KEY_ROTATION_GRACE_SECONDS）
+        宽限期内新旧密钥都可以认证
+        """
+        serializer = APIKeyRotationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        try:
+            queryset = rotation_queryset(data['users'], data['groups'], data['quotas'], all_quotas=data['all'])
+        except RotationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        result = rotate_api_keys(queryset, grace_seconds=data.get('grace_seconds'))
+        return Response(result.as_dict())
+    
     @action(detail=True, methods=['get'])
     def requests(self, request, pk=None):
         """获取指定配额下的所有API请求记录"""
@@ -91,29 +140,19 @@ class UserQuotaViewSet(ModelViewSet):
         # 获取查询参数
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
-        page_size = int(request.query_params.get('page_size', 20))
-        
-        # 获取请求记录
-        requests_queryset = quota.get_all_requests()
         
-        if start_date:
-            start_dt = parse_datetime(start_date)
-            if start_dt:
-                requests_queryset = requests_queryset.filter(created_at__gte=start_dt)
+        # 获取请求记录（带时间范围时只扫描涉及的分区）
+        requests_queryset = quota.get_all_requests(
+            since=parse_datetime(start_date) if start_date else None,
+            until=parse_datetime(end_date) if end_date else None,
+        ).select_related('model').prefetch_related('model__provider', 'model_group')
         
-        if end_date:
-            end_dt = parse_datetime(end_date)
-            if end_dt:
-                requests_queryset = requests_queryset.filter(created_at__lte=end_dt)
-        
-        # 分页
-        from django.core.paginator import Paginator
-        paginator = Paginator(requests_queryset, page_size)
-        page_number = request.query_params.get('page', 1)
-        page_obj = paginator.get_page(page_number)
+        # 分页（默认按 created_at、id 游标分页，传入 page 参数时使用页码分页）
+        paginator = RequestLogPagination()
+        page = paginator.paginate_queryset(requests_queryset, request, view=self)
         
         # 序列化数据
-        serializer = APIRequestSerializer(page_obj.object_list, many=True)
+        serializer = APIRequestSerializer(page, many=True)
         
         return Response({
             'quota_info': {
@@ -125,13 +164,7 @@ class UserQuotaViewSet(ModelViewSet):
                 'remaining_quota': quota.remaining_quota,
             },
             'requests': serializer.data,
-            'pagination': {
-                'count': paginator.count,
-                'page': page_obj.number,
-                'pages': paginator.num_pages,
-                'has_next': page_obj.has_next(),
-                'has_previous': page_obj.has_previous(),
-            }
+            'pagination': paginator.get_pagination_info()
         })
     
     @action(detail=True, methods=['get'])
@@ -175,7 +208,9 @@ def reset_user_all_keys(request, user_id):
     """重置指定用户的所有API Key"""
     try:
         user = User.objects.get(id=user_id)
-        updated_keys = user.regenerate_all_api_keys()
+        options = APIKeyGraceSerializer(data=request.data)
+        options.is_valid(raise_exception=True)
+        updated_keys = user.regenerate_all_api_keys(grace_seconds=options.validated_data.get('grace_seconds'))
         
         return Response({
             'user_id': user.id,
@@ -0,0 +1,15 @@
+"""调度器自身的定时任务"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import JobRun
+from .registry import periodic_job
+
+
+@periodic_job('scheduler.purge_runs', interval=24 * 60 * 60, jitter=30 * 60)
+def purge_runs():
+    """清理超过保留天数的任务执行记录"""
+    cutoff = timezone.now() - timedelta(days=settings.SCHEDULER_RUN_HISTORY_DAYS)
+    return {'deleted': JobRun.purge_before(cutoff)}
@@ -0,0 +1,88 @@
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.scheduler.models import JobLease
+from apps.scheduler.registry import autodiscover, registry
+from apps.scheduler.runner import Scheduler
+
+
+class Command(BaseCommand):
+    help = '运行定时任务调度器（可在多个节点上同时运行，每个任务同一时刻只由一个节点执行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='只执行一轮到期的任务后退出'
+        )
+        parser.add_argument(
+            '--run',
+            metavar='JOB',
+            action='append',
+            help='立即执行指定的任务（可重复），执行后退出'
+        )
+        parser.add_argument(
+            '--status',
+            action='store_true',
+            help='显示已注册任务的调度状态和统计'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=int,
+            help='轮询间隔(秒)'
+        )
+
+    def handle(self, *args, **options):
+        autodiscover()
+
+        if options['status']:
+            self.show_status()
+            return
+
+        scheduler = Scheduler(poll_interval=options['poll_interval'])
+
+        if options['run']:
+            for name in options['run']:
+                job = registry.get(name)
+                if job is None:
+                    raise CommandError(f'任务 {name} 未注册')
+                JobLease.trigger(name)
+                run = scheduler.run_job(job)
+                if run is None:
+                    self.stdout.write(self.style.WARNING(f'{name}: 正由其他节点执行'))
+                else:
+                    self.report(run)
+            return
+
+        if options['once']:
+            for run in scheduler.tick():
+                self.report(run)
+            return
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: scheduler.stop())
+        self.stdout.write(self.style.SUCCESS(
+            f'调度器 {scheduler.owner} 已启动，共 {len(registry.jobs())} 个任务'
+        ))
+        scheduler.run_forever()
+
+    def report(self, run):
+        style = self.style.SUCCESS if run.status == run.STATUS_SUCCESS else self.style.ERROR
+        detail = run.error or run.result or ''
+        self.stdout.write(style(f'{run.job}: {run.get_status_display()}（{run.duration_ms} 毫秒）{detail}'))
+
+    def show_status(self):
+        leases = {lease.name: lease for lease in JobLease.objects.filter(name__in=[job.name for job in registry.jobs()])}
+        for job in registry.jobs():
+            lease = leases.get(job.name)
+            if lease is None:
+                self.stdout.write(f'{job.name}: 每 {job.interval} 秒，尚未执行')
+                continue
+            self.stdout.write(
+                f'{job.name}: 每 {job.interval} 秒，下次 {timezone.localtime(lease.next_run_at):%Y-%m-%d %H:%M:%S}，'
+                f'最后状态 {lease.last_status or "-"}，执行 {lease.run_count} 次，失败 {lease.failure_count} 次，'
+                f'平均耗时 {lease.avg_duration_ms} 毫秒'
+                + (f'，租约持有者 {lease.owner}' if lease.leased_until else '')
+            )
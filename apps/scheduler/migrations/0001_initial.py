@@ -0,0 +1,61 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:46
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='任务名称')),
+                ('owner', models.CharField(blank=True, max_length=200, verbose_name='持有者')),
+                ('leased_until', models.DateTimeField(blank=True, null=True, verbose_name='租约到期时间')),
+                ('next_run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='下次执行时间')),
+                ('last_started_at', models.DateTimeField(blank=True, null=True, verbose_name='最后开始时间')),
+                ('last_finished_at', models.DateTimeField(blank=True, null=True, verbose_name='最后结束时间')),
+                ('last_status', models.CharField(blank=True, max_length=20, verbose_name='最后状态')),
+                ('run_count', models.IntegerField(default=0, verbose_name='执行次数')),
+                ('failure_count', models.IntegerField(default=0, verbose_name='失败次数')),
+                ('consecutive_failures', models.IntegerField(default=0, verbose_name='连续失败次数')),
+                ('last_duration_ms', models.IntegerField(blank=True, null=True, verbose_name='最后耗时(毫秒)')),
+                ('total_duration_ms', models.BigIntegerField(default=0, verbose_name='累计耗时(毫秒)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '任务租约',
+                'verbose_name_plural': '任务租约',
+                'db_table': 'scheduler_job_leases',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='JobRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.CharField(max_length=100, verbose_name='任务名称')),
+                ('owner', models.CharField(max_length=200, verbose_name='执行节点')),
+                ('status', models.CharField(choices=[('running', '执行中'), ('success', '成功'), ('failed', '失败')], default='running', max_length=20, verbose_name='状态')),
+                ('started_at', models.DateTimeField(verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='结束时间')),
+                ('duration_ms', models.IntegerField(blank=True, null=True, verbose_name='耗时(毫秒)')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='执行结果')),
+                ('error', models.TextField(blank=True, verbose_name='错误信息')),
+            ],
+            options={
+                'verbose_name': '任务执行记录',
+                'verbose_name_plural': '任务执行记录',
+                'db_table': 'scheduler_job_runs',
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['job', '-started_at'], name='scheduler_j_job_f77609_idx'), models.Index(fields=['started_at'], name='scheduler_j_started_9091f1_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,139 @@
+from datetime import timedelta
+
+from django.db import models
+from django.db.models import F, Q
+from django.utils import timezone
+
+
+class JobLease(models.Model):
+    """定时任务的租约和调度状态（每个任务一行，持有未过期租约的节点才能执行该任务）"""
+
+    name = models.CharField('任务名称', max_length=100, unique=True)
+
+    # 租约
+    owner = models.CharField('持有者', max_length=200, blank=True)  # 主机名:进程号:随机串
+    leased_until = models.DateTimeField('租约到期时间', null=True, blank=True)
+
+    # 调度
+    next_run_at = models.DateTimeField('下次执行时间', default=timezone.now)
+    last_started_at = models.DateTimeField('最后开始时间', null=True, blank=True)
+    last_finished_at = models.DateTimeField('最后结束时间', null=True, blank=True)
+    last_status = models.CharField('最后状态', max_length=20, blank=True)
+
+    # 统计
+    run_count = models.IntegerField('执行次数', default=0)
+    failure_count = models.IntegerField('失败次数', default=0)
+    consecutive_failures = models.IntegerField('连续失败次数', default=0)
+    last_duration_ms = models.IntegerField('最后耗时(毫秒)', null=True, blank=True)
+    total_duration_ms = models.BigIntegerField('累计耗时(毫秒)', default=0)
+
+    updated_at = models.DateTimeField('更新时间', auto_now=True)
+
+    class Meta:
+        db_table = 'scheduler_job_leases'
+        verbose_name = '任务租约'
+        verbose_name_plural = '任务租约'
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({self.owner or '-'})"
+
+    @property
+    def avg_duration_ms(self):
+        return round(self.total_duration_ms / self.run_count, 2) if self.run_count else 0
+
+    @classmethod
+    def ensure(cls, names, now=None):
+        """为尚未登记的任务创建租约行（首次立即到期）"""
+        now = now or timezone.now()
+        existing = set(cls.objects.filter(name__in=names).values_list('name', flat=True))
+        missing = [cls(name=name, next_run_at=now) for name in names if name not in existing]
+        if missing:
+            cls.objects.bulk_create(missing, ignore_conflicts=True)
+
+    @classmethod
+    def acquire(cls, name, owner, lease_seconds, now=None):
+        """
+        到期且租约空闲（或已过期）时获取租约，返回是否获取成功
+        条件更新保证同一时刻只有一个节点能获取
+        """
+        now = now or timezone.now()
+        free = Q(leased_until__isnull=True) | Q(leased_until__lte=now)
+        return bool(cls.objects.filter(free, name=name, next_run_at__lte=now).update(
+            owner=owner,
+            leased_until=now + timedelta(seconds=lease_seconds),
+            last_started_at=now,
+            updated_at=now,
+        ))
+
+    @classmethod
+    def release(cls, name, owner, status, duration_ms, next_run_at, now=None):
+        """释放租约并记录本次执行结果；租约已被其他节点接管时返回 False"""
+        now = now or timezone.now()
+        failed = status != JobRun.STATUS_SUCCESS
+        return bool(cls.objects.filter(name=name, owner=owner).update(
+            leased_until=None,
+            next_run_at=next_run_at,
+            last_finished_at=now,
+            last_status=status,
+            run_count=F('run_count') + 1,
+            failure_count=F('failure_count') + (1 if failed else 0),
+            consecutive_failures=F('consecutive_failures') + 1 if failed else 0,
+            last_duration_ms=duration_ms,
+            total_duration_ms=F('total_duration_ms') + duration_ms,
+            updated_at=now,
+        ))
+
+    @classmethod
+    def trigger(cls, name, now=None):
+        """让任务在下次轮询时立即执行"""
+        now = now or timezone.now()
+        cls.ensure([name], now)
+        return cls.objects.filter(name=name).update(next_run_at=now)
+
+
+class JobRun(models.Model):
+    """定时任务的执行记录"""
+
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCESS = 'success'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, '执行中'),
+        (STATUS_SUCCESS, '成功'),
+        (STATUS_FAILED, '失败'),
+    ]
+
+    job = models.CharField('任务名称', max_length=100)
+    owner = models.CharField('执行节点', max_length=200)
+    status = models.CharField('状态', max_length=20, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+
+    started_at = models.DateTimeField('开始时间')
+    finished_at = models.DateTimeField('结束时间', null=True, blank=True)
+    duration_ms = models.IntegerField('耗时(毫秒)', null=True, blank=True)
+
+    result = models.JSONField('执行结果', null=True, blank=True)
+    error = models.TextField('错误信息', blank=True)
+
+    class Meta:
+        db_table = 'scheduler_job_runs'
+        verbose_name = '任务执行记录'
+        verbose_name_plural = '任务执行记录'
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['job', '-started_at']),
+            models.Index(fields=['started_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.job} @ {self.started_at} - {self.status}"
+
+    @classmethod
+    def purge_before(cls, cutoff, batch_size=1000):
+        """分批删除 cutoff 之前的执行记录，返回删除数量"""
+        deleted = 0
+        while True:
+            ids = list(cls.objects.filter(started_at__lt=cutoff).order_by().values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += cls.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,81 @@
+"""
+定时任务注册表
+
+各应用在自己的 jobs.py 中用 @periodic_job 注册任务，调度器启动时通过 autodiscover 导入：
+
+    @periodic_job('billing.rollup_usage', interval=60)
+    def rollup_usage():
+        return run_rollup()
+
+interval 为两次执行之间的间隔（秒），每次在其基础上增加 [0, jitter] 秒的随机延迟，
+避免多个节点或多个任务同时启动；lease 为租约时长（秒），执行时间超过租约的任务可能被其他节点重复执行。
+SCHEDULER_DISABLED_JOBS 中的任务不会被执行。
+"""
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.utils.module_loading import autodiscover_modules
+
+
+@dataclass(frozen=True)
+class Job:
+    """一个定时任务"""
+    name: str
+    func: object
+    interval: int
+    jitter: int = 0
+    lease: int = 600
+    description: str = ''
+
+    def run(self):
+        return self.func()
+
+
+class JobRegistry:
+    """任务名称到 Job 的映射"""
+
+    def __init__(self):
+        self._jobs = {}
+
+    def register(self, job):
+        if job.name in self._jobs and self._jobs[job.name].func is not job.func:
+            raise ValueError(f'任务 {job.name} 已注册')
+        self._jobs[job.name] = job
+        return job
+
+    def unregister(self, name):
+        self._jobs.pop(name, None)
+
+    def get(self, name):
+        return self._jobs.get(name)
+
+    def jobs(self):
+        """启用的任务（按名称排序）"""
+        disabled = set(settings.SCHEDULER_DISABLED_JOBS)
+        return [job for name, job in sorted(self._jobs.items()) if name not in disabled]
+
+    def __contains__(self, name):
+        return name in self._jobs
+
+
+registry = JobRegistry()
+
+
+def periodic_job(name, interval, jitter=None, lease=None, description=''):
+    """注册定时任务的装饰器；jitter 默认为间隔的 10%，lease 默认为间隔和 10 分钟中的较大者"""
+    def decorator(func):
+        registry.register(Job(
+            name=name,
+            func=func,
+            interval=interval,
+            jitter=interval // 10 if jitter is None else jitter,
+            lease=max(interval, 600) if lease is None else lease,
+            description=description or (func.__doc__ or '').strip(),
+        ))
+        return func
+    return decorator
+
+
+def autodiscover():
+    """导入各应用的 jobs 模块"""
+    autodiscover_modules('jobs')
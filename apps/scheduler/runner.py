@@ -0,0 +1,140 @@
+"""
+定时任务调度器
+
+每轮轮询为所有已注册的任务确保租约行存在，然后依次尝试获取到期任务的租约：
+获取成功的节点执行任务、写入执行记录并释放租约（同时按 间隔+随机抖动 安排下次执行），
+获取失败说明任务未到期或正由其他节点执行。多个进程/节点可以同时运行调度器，每个任务同一时刻只有一个节点执行。
+
+可以用 run_scheduler 命令作为独立的工作进程运行，也可以设置 SCHEDULER_IN_PROCESS
+在 Web 进程中以后台线程运行（见 start_background_scheduler）。
+"""
+import dataclasses
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from .models import JobLease, JobRun
+from .registry import autodiscover, registry as default_registry
+
+logger = logging.getLogger(__name__)
+
+_background = None
+_background_lock = threading.Lock()
+
+
+def default_owner():
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def result_payload(result):
+    """把任务返回值转换为可以写入 JSON 字段的形式"""
+    if result is None:
+        return None
+    if dataclasses.is_dataclass(result) and not isinstance(result, type):
+        result = dataclasses.asdict(result)
+    if isinstance(result, dict):
+        return {str(key): value if isinstance(value, (int, float, str, bool, type(None))) else str(value)
+                for key, value in result.items()}
+    return {'value': str(result)}
+
+
+def next_run_time(job, finished_at):
+    """下次执行时间：间隔加上 [0, jitter] 秒的随机延迟"""
+    return finished_at + timedelta(seconds=job.interval + random.uniform(0, job.jitter))
+
+
+class Scheduler:
+    """在当前进程中轮询并执行到期的任务"""
+
+    def __init__(self, owner=None, registry=None, poll_interval=None):
+        self.owner = owner or default_owner()
+        self.registry = registry or default_registry
+        self.poll_interval = poll_interval or settings.SCHEDULER_POLL_INTERVAL
+        self._stop = threading.Event()
+
+    def run_job(self, job, now=None):
+        """获取租约并执行任务，返回 JobRun（未获取到租约时返回 None）"""
+        now = now or timezone.now()
+        if not JobLease.acquire(job.name, self.owner, job.lease, now):
+            return None
+
+        run = JobRun.objects.create(job=job.name, owner=self.owner, started_at=now)
+        started = time.monotonic()
+        try:
+            run.result = result_payload(job.run())
+            run.status = JobRun.STATUS_SUCCESS
+        except Exception as e:
+            logger.exception(f"Scheduled job {job.name} failed")
+            run.status = JobRun.STATUS_FAILED
+            run.error = f'{type(e).__name__}: {e}'
+        run.duration_ms = int((time.monotonic() - started) * 1000)
+        run.finished_at = timezone.now()
+        run.save(update_fields=['status', 'result', 'error', 'duration_ms', 'finished_at'])
+
+        if not JobLease.release(job.name, self.owner, run.status, run.duration_ms,
+                                next_run_time(job, run.finished_at), run.finished_at):
+            logger.warning(f"Lease of job {job.name} expired while running ({run.duration_ms} ms)")
+        return run
+
+    def tick(self, now=None):
+        """执行一轮：运行所有到期且获取到租约的任务，返回本轮的执行记录"""
+        jobs = self.registry.jobs()
+        if not jobs:
+            return []
+        JobLease.ensure([job.name for job in jobs], now)
+        due = set(JobLease.objects.filter(
+            name__in=[job.name for job in jobs], next_run_at__lte=now or timezone.now()
+        ).values_list('name', flat=True))
+
+        runs = []
+        for job in jobs:
+            if self._stop.is_set():
+                break
+            if job.name in due:
+                run = self.run_job(job, now)
+                if run is not None:
+                    runs.append(run)
+        return runs
+
+    def run_forever(self):
+        """持续轮询直到 stop()"""
+        logger.info(f"Scheduler {self.owner} started with {len(self.registry.jobs())} jobs")
+        while not self._stop.is_set():
+            close_old_connections()
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Scheduler tick failed")
+            self._stop.wait(self.poll_interval)
+        logger.info(f"Scheduler {self.owner} stopped")
+
+    def stop(self):
+        self._stop.set()
+
+
+def start_background_scheduler():
+    """在当前进程中以守护线程运行调度器（重复调用只启动一次），返回 Scheduler"""
+    global _background
+    with _background_lock:
+        if _background is None:
+            autodiscover()
+            scheduler = Scheduler()
+
+            def target():
+                try:
+                    scheduler.run_forever()
+                finally:
+                    connections.close_all()
+
+            threading.Thread(target=target, name='scheduler', daemon=True).start()
+            _background = scheduler
+        return _background
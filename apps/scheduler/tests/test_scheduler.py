@@ -0,0 +1,140 @@
+import pytest
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.utils import timezone
+from apps.scheduler.models import JobLease, JobRun
+from apps.scheduler.registry import Job, JobRegistry, autodiscover, registry as default_registry
+from apps.scheduler.runner import Scheduler, next_run_time
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def registry(calls):
+    registry = JobRegistry()
+
+    def ok():
+        calls.append('ok')
+        return {'rows': 3}
+
+    def broken():
+        calls.append('broken')
+        raise RuntimeError('boom')
+
+    registry.register(Job(name='test.ok', func=ok, interval=60, jitter=10, lease=120))
+    registry.register(Job(name='test.broken', func=broken, interval=60, lease=120))
+    return registry
+
+
+class TestScheduler:
+    def test_tick_runs_due_jobs_and_records_history(self, registry, calls):
+        now = timezone.now()
+        runs = Scheduler(owner='node-a', registry=registry).tick(now)
+
+        assert sorted(calls) == ['broken', 'ok']
+        assert {run.job: run.status for run in runs} == {'test.ok': 'success', 'test.broken': 'failed'}
+        ok_run = JobRun.objects.get(job='test.ok')
+        assert ok_run.result == {'rows': 3}
+        assert ok_run.duration_ms is not None
+        assert 'boom' in JobRun.objects.get(job='test.broken').error
+
+        lease = JobLease.objects.get(name='test.ok')
+        assert lease.leased_until is None
+        assert lease.run_count == 1
+        assert lease.last_status == 'success'
+        assert now + timedelta(seconds=60) <= lease.next_run_at <= lease.last_finished_at + timedelta(seconds=70)
+        broken = JobLease.objects.get(name='test.broken')
+        assert broken.failure_count == 1
+        assert broken.consecutive_failures == 1
+
+    def test_jobs_are_not_rerun_before_interval(self, registry, calls):
+        scheduler = Scheduler(owner='node-a', registry=registry)
+        scheduler.tick()
+
+        assert scheduler.tick() == []
+        assert len(calls) == 2
+
+    def test_lease_held_by_other_node_blocks_run(self, registry, calls):
+        now = timezone.now()
+        JobLease.ensure(['test.ok', 'test.broken'], now)
+        assert JobLease.acquire('test.ok', 'node-b', 120, now)
+
+        runs = Scheduler(owner='node-a', registry=registry).tick(now)
+
+        assert [run.job for run in runs] == ['test.broken']
+        assert calls == ['broken']
+
+    def test_expired_lease_is_taken_over(self, registry, calls):
+        now = timezone.now()
+        JobLease.ensure(['test.ok'], now)
+        JobLease.acquire('test.ok', 'node-b', 120, now - timedelta(minutes=5))
+
+        run = Scheduler(owner='node-a', registry=registry).run_job(registry.get('test.ok'), now)
+
+        assert run.status == 'success'
+        # 原持有者结束时无法再释放租约
+        assert not JobLease.release('test.ok', 'node-b', 'success', 10, now)
+
+    def test_consecutive_failures_reset_on_success(self):
+        now = timezone.now()
+        JobLease.ensure(['job'], now)
+        for status in ('failed', 'failed', 'success'):
+            JobLease.acquire('job', 'node', 60, now)
+            JobLease.release('job', 'node', status, 5, now, now)
+
+        lease = JobLease.objects.get(name='job')
+        assert lease.failure_count == 2
+        assert lease.consecutive_failures == 0
+        assert lease.avg_duration_ms == 5
+
+    def test_jitter_bounds(self):
+        job = Job(name='j', func=lambda: None, interval=100, jitter=20)
+        finished = timezone.now()
+        for _ in range(20):
+            delay = (next_run_time(job, finished) - finished).total_seconds()
+            assert 100 <= delay <= 120
+
+    def test_disabled_jobs_are_skipped(self, registry, calls, settings):
+        settings.SCHEDULER_DISABLED_JOBS = ['test.broken']
+
+        Scheduler(owner='node-a', registry=registry).tick()
+
+        assert calls == ['ok']
+
+    def test_purge_runs(self):
+        now = timezone.now()
+        JobRun.objects.create(job='old', owner='n', started_at=now - timedelta(days=40))
+        JobRun.objects.create(job='new', owner='n', started_at=now)
+
+        assert JobRun.purge_before(now - timedelta(days=30)) == 1
+        assert list(JobRun.objects.values_list('job', flat=True)) == ['new']
+
+
+class TestRegisteredJobs:
+    def test_autodiscover_registers_app_jobs(self):
+        autodiscover()
+        for name in ('billing.rollup_usage', 'billing.evaluate_cost_alerts', 'billing.apply_retention',
+                     'billing.rebuild_user_counters',
+                     'apis.sync_catalogs', 'proxy.purge_idempotency_records', 'quotas.expire_previous_keys',
+                     'quotas.rebuild_quota_counters',
+                     'scheduler.purge_runs'):
+            assert name in default_registry
+
+    def test_run_command(self):
+        out = StringIO()
+
+        call_command('run_scheduler', '--run', 'billing.rollup_usage', stdout=out)
+
+        assert 'billing.rollup_usage: 成功' in out.getvalue()
+        assert JobRun.objects.get(job='billing.rollup_usage').status == 'success'
+
+    def test_status_command(self):
+        out = StringIO()
+        call_command('run_scheduler', '--status', stdout=out)
+        assert 'billing.rollup_usage' in out.getvalue()
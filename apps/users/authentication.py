@@ -1,6 +1,10 @@
+import hmac
+
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 User = get_user_model()
@@ -34,22 +38,39 @@ class APIKeyAuthentication(BaseAuthentication):
         return self.authenticate_credentials(token, request)
     
     def authenticate_credentials(self, key, request):
-        from apps.quotas.models import UserQuota
+        from apps.quotas.models import UserQuota, api_key_lookup_prefix, hash_api_key
         
-        try:
-            quota = UserQuota.objects.select_related('user', 'model_group').get(
-                api_key=key, 
-                is_active=True,
-                user__is_active=True,
-                deleted_at__isnull=True  # 排除软删除的配额
-            )
-        except UserQuota.DoesNotExist:
+        # 按短前缀走索引查出候选配额（当前密钥，或轮换后仍在宽限期内的旧密钥，同一条查询），
+        # 再用常量时间比较 HMAC 哈希确认密钥
+        now = timezone.now()
+        prefix = api_key_lookup_prefix(key)
+        digest = hash_api_key(key)
+        candidates = UserQuota.objects.select_related('user', 'model_group').filter(
+            Q(key_prefix=prefix) | Q(previous_key_prefix=prefix, previous_key_expires_at__gt=now),
+            is_active=True,
+            user__is_active=True,
+            deleted_at__isnull=True  # 排除软删除的配额
+        )
+        matches = [quota for quota in candidates if self._key_matches(quota, digest, now)]
+        if len(matches) != 1:
             raise AuthenticationFailed(_('Invalid API key'))
+        quota = matches[0]
         
         # 将当前配额信息附加到request上，方便后续使用
         request.current_quota = quota
         
         return (quota.user, quota)
     
+    @staticmethod
+    def _key_matches(quota, digest, now):
+        if hmac.compare_digest(quota.key_hash, digest):
+            return True
+        return (
+            bool(quota.previous_key_hash)
+            and quota.previous_key_expires_at is not None
+            and quota.previous_key_expires_at > now
+            and hmac.compare_digest(quota.previous_key_hash, digest)
+        )
+    
     def authenticate_header(self, request):
         return f'{self.keyword} realm="api"' 
\ No newline at end of file
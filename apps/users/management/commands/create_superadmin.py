@@ -85,7 +85,7 @@ class Command(BaseCommand):
             self.stdout.write('\n关联的配额和API Keys:')
             for quota in quotas:
                 self.stdout.write(f'  模型组: {quota.model_group.name}')
-                self.stdout.write(f'  API Key: {quota.api_key}')
+                # 数据库只保存密钥哈希，这里只能显示掩码
                 self.stdout.write(f'  掩码 API Key: {quota.masked_api_key}')
         else:
             self.stdout.write('\n注意: 超级管理员账户已创建，但尚未分配任何配额。')
@@ -44,16 +44,24 @@ class User(AbstractUser):
             return True
         return super().has_perm(perm, obj)
     
-    def regenerate_all_api_keys(self):
-        """重新生成所有API Key"""
-        updated_keys = []
-        for quota in self.quotas.all():
-            old_key = quota.api_key
-            new_key = quota.regenerate_api_key()
-            updated_keys.append({
-                'quota_id': quota.id,
-                'model_group': quota.model_group.name,
-                'old_key': old_key,
-                'new_key': new_key
-            })
-        return updated_keys
+    def regenerate_all_api_keys(self, grace_seconds=None):
+        """
+        重新生成所有API Key（一次批量更新）
+        旧密钥在宽限期内仍可认证，默认 API_KEY_ROTATION_GRACE_SECONDS
+        """
+        from apps.groups.models import ModelGroup
+        from apps.quotas.rotation import rotate_api_keys
+        
+        result = rotate_api_keys(self.quotas.all(), grace_seconds=grace_seconds)
+        group_names = dict(ModelGroup.objects.filter(
+            id__in={key.model_group_id for key in result.keys}
+        ).values_list('id', 'name'))
+        return [
+            {
+                'quota_id': key.quota_id,
+                'model_group': group_names[key.model_group_id],
+                'old_masked_key': key.old_masked_key,
+                'new_key': key.new_key
+            }
+            for key in result.keys
+        ]
@@ -18,7 +18,9 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'quota_count', 'created_at', 'updated_at']
     
     def get_quota_count(self, obj):
-        """获取用户的配额数量"""
+        """获取用户的配额数量（列表查询集已注解 active_quota_count 时直接读取）"""
+        if hasattr(obj, 'active_quota_count'):
+            return obj.active_quota_count
         return obj.quotas.filter(is_active=True).count()
 
 
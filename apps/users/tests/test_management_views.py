@@ -0,0 +1,45 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from apps.quotas.factories import UserQuotaFactory
+from apps.users.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def admin_client(api_client):
+    api_client.force_authenticate(user=UserFactory(is_super_admin=True))
+    return api_client
+
+
+def list_queries(client):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(reverse('admin-users-list'))
+    assert response.status_code == status.HTTP_200_OK
+    return len(context), response
+
+
+class TestUserManagementList:
+    def test_quota_count_from_annotation(self, admin_client):
+        user = UserFactory()
+        UserQuotaFactory(user=user)
+        UserQuotaFactory(user=user)
+        UserQuotaFactory(user=user, is_active=False)
+
+        _, response = list_queries(admin_client)
+
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        assert next(item for item in results if item['id'] == user.id)['quota_count'] == 2
+
+    def test_query_count_is_constant(self, admin_client):
+        UserQuotaFactory()
+        small, _ = list_queries(admin_client)
+
+        for _ in range(10):
+            UserQuotaFactory()
+        large, _ = list_queries(admin_client)
+
+        assert large == small
@@ -5,6 +5,9 @@ from rest_framework.viewsets import ModelViewSet
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
 from django.db import transaction
+from django.db.models import Count, Prefetch, Q
+
+from apps.ai_models.models import AIModel
 
 from .serializers import (
     UserSerializer, UserCreateSerializer, UserUpdateSerializer,
@@ -55,15 +58,18 @@ class AuthViewSet:
     def get_user_quotas(request):
         """获取当前用户的所有配额信息"""
         user = request.user
-        quotas = user.quotas.filter(is_active=True).select_related('model_group').prefetch_related(
-            'model_group__ai_models__provider'
-        )
+        # 可用模型在预取时过滤，避免在循环中对每个配额单独查询
+        quotas = user.quotas.filter(is_active=True).select_related('model_group').prefetch_related(Prefetch(
+            'model_group__ai_models',
+            queryset=AIModel.objects.filter(is_active=True, is_available=True).select_related('provider'),
+            to_attr='available_models',
+        ))
         
         quota_data = []
         for quota in quotas:
             # 获取模型组中的活跃模型
             models_info = []
-            for model in quota.model_group.ai_models.filter(is_active=True, is_available=True):
+            for model in quota.model_group.available_models:
                 models_info.append({
                     'id': model.id,
                     'name': model.name,
@@ -101,40 +107,26 @@ class AuthViewSet:
     @api_view(['GET'])
     @permission_classes([permissions.IsAuthenticated])
     def get_dashboard_stats(request):
-        """获取用户仪表盘统计数据"""
-        user = request.user
+        """获取用户仪表盘统计数据（读取用户使用计数器）"""
+        from apps.billing.models import UserUsageCounter
         
-        # 导入模型
-        from apps.billing.models import APIRequest
-        from django.utils import timezone
-        from django.db.models import Sum, Count
-        from datetime import datetime, timedelta
-        
-        today = timezone.now().date()
-        
-        # 获取今日和总统计
-        today_requests = APIRequest.objects.filter(
-            user=user,
-            created_at__date=today
-        )
-        
-        all_requests = APIRequest.objects.filter(user=user)
-        
-        today_stats = today_requests.aggregate(
-            count=Count('id'),
-            cost=Sum('total_cost')
-        )
-        
-        total_stats = all_requests.aggregate(
-            count=Count('id'),
-            cost=Sum('total_cost')
-        )
+        counter = UserUsageCounter.objects.filter(user=request.user).first()
+        if counter is None:
+            # 首次访问时初始化计数器，之后由请求记录增量维护
+            counter = UserUsageCounter.rebuild(request.user)
+        usage = counter.snapshot()
         
         return Response({
-            'today_requests': today_stats['count'] or 0,
-            'today_cost': float(today_stats['cost'] or 0),
-            'total_requests': total_stats['count'] or 0,
-            'total_cost': float(total_stats['cost'] or 0),
+            'today_requests': usage['today']['requests'],
+            'today_tokens': usage['today']['tokens'],
+            'today_cost': usage['today']['cost'],
+            'month_requests': usage['month']['requests'],
+            'month_tokens': usage['month']['tokens'],
+            'month_cost': usage['month']['cost'],
+            'total_requests': usage['lifetime']['requests'],
+            'total_tokens': usage['lifetime']['tokens'],
+            'total_cost': usage['lifetime']['cost'],
+            'last_request_at': counter.last_request_at,
         })
     
     @staticmethod
@@ -163,6 +155,7 @@ class AuthViewSet:
         """用户重置自己的API Key"""
         try:
             from apps.quotas.models import UserQuota
+            from apps.quotas.serializers import APIKeyGraceSerializer
             
             # 只能重置自己的配额
             quota = UserQuota.objects.get(
@@ -171,13 +164,18 @@ class AuthViewSet:
                 is_active=True
             )
             
-            new_api_key = quota.regenerate_api_key()
+            # 旧密钥默认立即失效，可以用 grace_seconds 保留一段时间
+            options = APIKeyGraceSerializer(data=request.data)
+            if not options.is_valid():
+                return Response(options.errors, status=status.HTTP_400_BAD_REQUEST)
+            new_api_key = quota.regenerate_api_key(grace_seconds=options.validated_data.get('grace_seconds', 0))
             
             return Response({
                 'quota_id': quota.id,
                 'model_group': quota.model_group.name,
                 'api_key': new_api_key,
                 'masked_api_key': quota.masked_api_key,
+                'previous_key_expires_at': quota.previous_key_expires_at,
                 'message': f'配额 {quota.model_group.name} 的API Key已重置'
             })
             
@@ -196,7 +194,7 @@ class AuthViewSet:
     @api_view(['GET'])
     @permission_classes([permissions.IsAuthenticated])
     def get_api_key(request, quota_id):
-        """用户查看自己的完整API Key"""
+        """用户查看自己的API Key（数据库只保存哈希，完整密钥只在创建或重置时返回一次）"""
         try:
             from apps.quotas.models import UserQuota
             
@@ -210,8 +208,8 @@ class AuthViewSet:
             return Response({
                 'quota_id': quota.id,
                 'model_group': quota.model_group.name,
-                'api_key': quota.api_key,
                 'masked_api_key': quota.masked_api_key,
+                'message': '完整API Key只在创建或重置时显示一次，遗失后请重置API Key',
             })
             
         except UserQuota.DoesNotExist:
@@ -223,7 +221,9 @@ class AuthViewSet:
 
 class UserManagementViewSet(ModelViewSet):
     """用户管理视图集（仅超级管理员可用）"""
-    queryset = User.objects.all()
+    queryset = User.objects.annotate(
+        active_quota_count=Count('quotas', filter=Q(quotas__is_active=True))
+    )
     permission_classes = [IsSuperAdminUser]
     
     def get_serializer_class(self):
@@ -6,6 +6,16 @@ from apps.ai_models.models import AIModel
 from apps.apis.models import APIProvider
 
 
+@pytest.fixture(autouse=True)
+def clear_process_caches():
+    """清空进程内缓存，避免测试之间因主键复用而串数据"""
+    from apps.proxy.catalog import invalidate_model_catalog
+    from apps.proxy.usage import clear_recent_calls
+    invalidate_model_catalog()
+    clear_recent_calls()
+    yield
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
@@ -56,6 +56,7 @@ INSTALLED_APPS = [
     'apps.proxy',
     'apps.billing',
     'apps.dashboard',
+    'apps.scheduler',
 ]
 
 MIDDLEWARE = [
@@ -229,6 +230,51 @@ LOGGING = {
 # API Key settings
 API_KEY_PREFIX = 'sk-audit-'
 API_KEY_LENGTH = 32
+# 数据库只保存API Key的 HMAC-SHA256 哈希；更换此密钥会使所有已发放的API Key失效
+API_KEY_HASH_SECRET = config('API_KEY_HASH_SECRET', default=SECRET_KEY)
+# 用于索引查找的密钥前缀长度（前缀之后的随机字符数）
+API_KEY_LOOKUP_LENGTH = 8
+# 批量轮换后旧密钥继续有效的时间(秒)，0 表示立即失效
+API_KEY_ROTATION_GRACE_SECONDS = config('API_KEY_ROTATION_GRACE_SECONDS', default=24 * 60 * 60, cast=int)
+
+# 幂等键（Idempotency-Key）设置
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=24 * 60 * 60, cast=int)  # 结果保留时间(秒)
+IDEMPOTENCY_LOCK_TIMEOUT = config('IDEMPOTENCY_LOCK_TIMEOUT', default=300, cast=int)  # 处理中状态的超时时间(秒)
+
+# /v1/models 模型列表缓存
+MODELS_LIST_CACHE_TTL = config('MODELS_LIST_CACHE_TTL', default=60, cast=int)  # 缓存有效期(秒)
+MODELS_LIST_CACHE_SIZE = 1024  # 最多缓存的模型组数量
+
+# /v1/usage 最近调用缓冲区
+USAGE_RECENT_CALLS = 20  # 每个配额保留的最近调用数
+USAGE_RECENT_QUOTAS = 10000  # 最多保留的配额数
+
+# api_requests 分区设置（仅 PostgreSQL，需先执行 manage_partitions --convert）
+API_REQUESTS_PARTITION_GRANULARITY = config('API_REQUESTS_PARTITION_GRANULARITY', default='month')  # month 或 day
+API_REQUESTS_PARTITIONS_AHEAD = config('API_REQUESTS_PARTITIONS_AHEAD', default=3, cast=int)  # 预先创建的分区数
+
+# 审计记录冷归档设置（需要安装 pyarrow）
+AUDIT_ARCHIVE_DIR = config('AUDIT_ARCHIVE_DIR', default=str(BASE_DIR / 'archive'))
+AUDIT_ARCHIVE_COMPRESSION = config('AUDIT_ARCHIVE_COMPRESSION', default='zstd')
+
+# 告警设置
+QUOTA_ALERT_THRESHOLDS = config(
+    'QUOTA_ALERT_THRESHOLDS', default='90,100', cast=lambda v: sorted(float(s) for s in v.split(','))
+)  # 配额使用率告警阈值(%)
+ALERT_WORKERS = config('ALERT_WORKERS', default=1, cast=int)  # 后台创建告警的线程数
+ALERTS_RUN_SYNC = config('ALERTS_RUN_SYNC', default=False, cast=bool)  # 在事务提交回调中同步创建告警（测试用）
+
+# 模型目录同步设置
+CATALOG_SYNC_WORKERS = config('CATALOG_SYNC_WORKERS', default=8, cast=int)  # 同时获取目录的提供商数
+CATALOG_SYNC_TIMEOUT = config('CATALOG_SYNC_TIMEOUT', default=15, cast=int)  # 每个提供商获取目录的超时时间(秒)
+
+# 定时任务调度器设置（见 apps.scheduler）
+SCHEDULER_IN_PROCESS = config('SCHEDULER_IN_PROCESS', default=False, cast=bool)  # 在Web进程中以后台线程运行调度器
+SCHEDULER_POLL_INTERVAL = config('SCHEDULER_POLL_INTERVAL', default=5, cast=int)  # 轮询间隔(秒)
+SCHEDULER_DISABLED_JOBS = config(
+    'SCHEDULER_DISABLED_JOBS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()]
+)  # 不执行的任务名称
+SCHEDULER_RUN_HISTORY_DAYS = config('SCHEDULER_RUN_HISTORY_DAYS', default=30, cast=int)  # 执行记录保留天数
 
 # Rate limiting
 RATELIMIT_USE_CACHE = 'default'
@@ -19,6 +19,9 @@ CACHES = {
 # Use test API key prefix
 API_KEY_PREFIX = 'sk-audit-test-'
 
+# Create alerts synchronously in tests
+ALERTS_RUN_SYNC = True
+
 # Disable logging during tests
 LOGGING = {
     'version': 1,
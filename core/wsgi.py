@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.SCHEDULER_IN_PROCESS:
+    from apps.scheduler.runner import start_background_scheduler
+    start_background_scheduler()
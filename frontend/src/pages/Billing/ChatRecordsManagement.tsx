@@ -43,6 +43,9 @@ export const ChatRecordsManagement: React.FC = () => {
     pageSize: 20,
     total: 0,
   });
+  // 游标分页：记录已访问页的下一页游标（第 1 页不需要游标），只能翻到已知游标的页
+  const [cursors, setCursors] = useState<Record<number, string>>({});
+  const [approximateTotal, setApproximateTotal] = useState<number | undefined>();
 
   // 统计数据
   const [statistics, setStatistics] = useState<{
@@ -79,18 +82,31 @@ export const ChatRecordsManagement: React.FC = () => {
   const loadChatRecords = async () => {
     setLoading(true);
     try {
+      const firstPage = pagination.current === 1;
       const response = await BillingService.getChatRecords({
-        page: pagination.current,
+        cursor: firstPage ? undefined : cursors[pagination.current],
         page_size: pagination.pageSize,
+        // 只在第一页请求估算总数，翻页时不再计数
+        count: firstPage ? 'approximate' : undefined,
         search: searchText || undefined,
         user: selectedUser,
         model: selectedModel,
         status_code: selectedStatus,
       });
+      const nextCursor = response.next ? new URL(response.next).searchParams.get('cursor') : null;
+      if (nextCursor) {
+        setCursors(prev => ({ ...prev, [pagination.current + 1]: nextCursor }));
+      }
+      if (response.count !== undefined) {
+        setApproximateTotal(response.count);
+      }
       setRecords(response.results);
+      // 总数只用于渲染页码：有下一页时多显示一页，已访问过的页都有游标
       setPagination(prev => ({
         ...prev,
-        total: response.count,
+        total: nextCursor
+          ? prev.current * prev.pageSize + 1
+          : (prev.current - 1) * prev.pageSize + response.results.length,
       }));
     } catch (error) {
       message.error('加载聊天记录失败');
@@ -137,17 +153,29 @@ export const ChatRecordsManagement: React.FC = () => {
     }
   };
 
+  // 筛选条件或每页条数变化后游标失效，回到第一页
+  const resetPaging = () => {
+    setCursors({});
+    setPagination(prev => ({ ...prev, current: 1 }));
+  };
+
   const handleSearch = (value: string) => {
     setSearchText(value);
-    setPagination(prev => ({ ...prev, current: 1 }));
+    resetPaging();
+  };
+
+  const handleFilterChange = <T,>(setter: (value: T) => void) => (value: T) => {
+    setter(value);
+    resetPaging();
   };
 
   const handleTableChange = (paginationConfig: any) => {
-    setPagination(prev => ({
-      ...prev,
-      current: paginationConfig.current,
-      pageSize: paginationConfig.pageSize,
-    }));
+    if (paginationConfig.pageSize !== pagination.pageSize) {
+      setCursors({});
+      setPagination(prev => ({ ...prev, current: 1, pageSize: paginationConfig.pageSize }));
+      return;
+    }
+    setPagination(prev => ({ ...prev, current: paginationConfig.current }));
   };
 
   const handleViewDetails = (record: APIRequest) => {
@@ -427,7 +455,7 @@ export const ChatRecordsManagement: React.FC = () => {
               placeholder="选择用户"
               allowClear
               style={{ width: '100%' }}
-              onChange={setSelectedUser}
+              onChange={handleFilterChange(setSelectedUser)}
               showSearch
               filterOption={(input, option) =>
                 String(option?.children || '').toLowerCase().includes(input.toLowerCase())
@@ -445,7 +473,7 @@ export const ChatRecordsManagement: React.FC = () => {
               placeholder="选择模型"
               allowClear
               style={{ width: '100%' }}
-              onChange={setSelectedModel}
+              onChange={handleFilterChange(setSelectedModel)}
               showSearch
               filterOption={(input, option) =>
                 String(option?.children || '').toLowerCase().includes(input.toLowerCase())
@@ -463,7 +491,7 @@ export const ChatRecordsManagement: React.FC = () => {
               placeholder="状态码"
               allowClear
               style={{ width: '100%' }}
-              onChange={setSelectedStatus}
+              onChange={handleFilterChange(setSelectedStatus)}
             >
               <Option value={200}>200 - 成功</Option>
               <Option value={400}>400 - 客户端错误</Option>
@@ -485,9 +513,8 @@ export const ChatRecordsManagement: React.FC = () => {
             pageSize: pagination.pageSize,
             total: pagination.total,
             showSizeChanger: true,
-            showQuickJumper: true,
-            showTotal: (total, range) => 
-              `第 ${range?.[0]}-${range?.[1]} 条，共 ${total} 条记录`,
+            showTotal: (_, range) =>
+              `第 ${range?.[0]}-${range?.[1]} 条` + (approximateTotal !== undefined ? `，约 ${approximateTotal} 条记录` : ''),
             pageSizeOptions: ['10', '20', '50', '100'],
           }}
           onChange={handleTableChange}
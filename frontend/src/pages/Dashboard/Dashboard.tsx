@@ -567,10 +567,10 @@ export const Dashboard: React.FC = () => {
             />
             
             <div style={{ marginBottom: 8 }}>
-              <Text strong>完整API Key:</Text>
+              <Text strong>API Key:</Text>
             </div>
             <Input.TextArea
-              value={currentApiKeyData.api_key}
+              value={currentApiKeyData.masked_api_key}
               readOnly
               rows={3}
               style={{ 
@@ -588,7 +588,7 @@ export const Dashboard: React.FC = () => {
               fontSize: '12px'
             }}>
               <Text type="secondary">
-                ⚠️ 请妥善保管您的API Key，不要在不安全的环境中分享。
+                ⚠️ {currentApiKeyData.message}
               </Text>
             </div>
           </div>
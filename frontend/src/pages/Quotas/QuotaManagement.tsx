@@ -158,8 +158,9 @@ export const QuotaManagement: React.FC = () => {
         message.success('配额更新成功');
       } else {
         // 创建配额
-        await QuotaService.createQuota(quotaData);
+        const created = await QuotaService.createQuota(quotaData);
         message.success('配额创建成功');
+        showApiKey('配额创建成功', created.name, created.api_key);
       }
       
       loadQuotas();
@@ -170,6 +171,42 @@ export const QuotaManagement: React.FC = () => {
     }
   };
 
+  // 完整的API Key 只在创建或重置时返回一次，关闭后无法再次查看
+  const showApiKey = (title: string, quotaName: string, apiKey: string) => {
+    Modal.info({
+      title,
+      content: (
+        <div>
+          <p><strong>配额:</strong> {quotaName}</p>
+          <p><strong>API Key:</strong></p>
+          <Input.TextArea
+            value={apiKey}
+            readOnly
+            rows={3}
+            style={{
+              fontFamily: 'Consolas, Monaco, "Courier New", monospace',
+              fontSize: '12px',
+              backgroundColor: '#f5f5f5',
+              marginBottom: 12
+            }}
+          />
+          <Text copyable={{ text: apiKey }}>复制API Key</Text>
+          <div style={{
+            marginTop: 12,
+            padding: '12px',
+            backgroundColor: '#fff3cd',
+            border: '1px solid #ffeaa7',
+            borderRadius: '4px',
+            fontSize: '12px'
+          }}>
+            ⚠️ 请立即将API Key 交给配额所属用户。关闭后将无法再次查看完整密钥，只能重新重置。
+          </div>
+        </div>
+      ),
+      width: 600,
+    });
+  };
+
   const handleDeleteQuota = async (id: number) => {
     try {
       await QuotaService.deleteQuota(id);
@@ -182,8 +219,9 @@ export const QuotaManagement: React.FC = () => {
 
   const handleResetApiKey = async (quota: UserQuota) => {
     try {
-      await QuotaService.resetApiKey(quota.id);
+      const result = await QuotaService.resetApiKey(quota.id);
       message.success('API密钥重置成功');
+      showApiKey('API密钥重置成功', quota.name, result.api_key);
       loadQuotas();
     } catch (error) {
       message.error('重置API密钥失败');
@@ -1,16 +1,17 @@
 import { apiClient } from './api';
-import { APIRequest, PaginatedResponse } from '@/types/api';
+import { APIRequest, CursorPaginatedResponse } from '@/types/api';
 
 export class BillingService {
-  // 获取所有聊天记录（管理员专用）
+  // 获取所有聊天记录（管理员专用，按游标分页）
   static async getChatRecords(params?: { 
-    page?: number; 
+    cursor?: string;
     page_size?: number; 
+    count?: 'approximate' | 'exact';
     search?: string;
     user?: number;
     model?: number;
     status_code?: number;
-  }): Promise<PaginatedResponse<APIRequest>> {
+  }): Promise<CursorPaginatedResponse<APIRequest>> {
     return await apiClient.get('/admin/chat-records/', params);
   }
 
@@ -42,7 +42,8 @@ export class QuotaService {
   }
 
   // 创建配额
-  static async createQuota(data: QuotaCreateRequest): Promise<Quota> {
+  // 创建配额（完整的 api_key 只在创建时返回一次）
+  static async createQuota(data: QuotaCreateRequest): Promise<Quota & { api_key: string }> {
     return await apiClient.post('/admin/quotas/', data);
   }
 
@@ -57,7 +58,7 @@ export class QuotaService {
   }
 
   // 重置API密钥
-  static async resetApiKey(quotaId: number): Promise<{ api_key: string }> {
+  static async resetApiKey(quotaId: number): Promise<{ api_key: string; masked_api_key: string }> {
     return await apiClient.post(`/admin/quotas/${quotaId}/reset_api_key/`);
   }
 
@@ -76,8 +77,8 @@ export class QuotaService {
     return await apiClient.get('/quotas/', params);
   }
 
-  // 用户查看自己的完整API Key
-  static async getUserApiKey(quotaId: number): Promise<{ quota_id: number; model_group: string; api_key: string; masked_api_key: string }> {
+  // 用户查看自己的API Key（只返回掩码，完整密钥只在创建或重置时返回）
+  static async getUserApiKey(quotaId: number): Promise<{ quota_id: number; model_group: string; masked_api_key: string; message: string }> {
     return await apiClient.get(`/quotas/${quotaId}/api_key/`);
   }
 
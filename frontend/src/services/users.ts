@@ -54,7 +54,7 @@ export class UserService {
     updated_keys: Array<{
       quota_id: number;
       model_group: string;
-      old_key: string;
+      old_masked_key: string;
       new_key: string;
     }>;
     message: string;
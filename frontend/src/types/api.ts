@@ -12,6 +12,15 @@ export interface PaginatedResponse<T> {
   results: T[];
 }
 
+// 游标分页响应（请求日志），count 只在传入 count=approximate/exact 时返回
+export interface CursorPaginatedResponse<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+  count?: number;
+  count_type?: 'approximate' | 'exact';
+}
+
 export interface ErrorResponse {
   error: string;
   details?: Record<string, any>;
@@ -67,7 +76,6 @@ export interface UserQuota {
   user_email: string;
   model_group: number;
   model_group_name: string;
-  api_key: string;
   masked_api_key: string;
   total_quota: string;
   used_quota: string;
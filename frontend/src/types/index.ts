@@ -52,7 +52,6 @@ export interface Quota {
   used_quota: string;
   remaining_quota: string;
   usage_percentage: number;
-  api_key: string;
   masked_api_key: string;
   rate_limit_per_minute: number;
   rate_limit_per_hour: number;
@@ -75,7 +74,6 @@ export interface UserQuota {
   total_quota: string;
   used_quota: string;
   remaining_quota: string;
-  api_key: string;
   masked_api_key: string;
   usage_percentage: number;
   rate_limit_per_minute: number;
@@ -11,7 +11,6 @@ export interface Quota {
   used_quota: string;
   remaining_quota: string;
   usage_percentage: number;
-  api_key: string;
   masked_api_key: string;
   rate_limit_per_minute: number;
   rate_limit_per_hour: number;
@@ -0,0 +1,107 @@
+"""
+在线索引迁移操作
+
+AddIndexOnline / RemoveIndexOnline 在 PostgreSQL 上使用 CREATE/DROP INDEX CONCURRENTLY，
+建索引期间不阻塞表的读写；其他数据库退回普通的建索引/删索引。
+分区表不支持 CONCURRENTLY：先在父表上建 ON ONLY 索引，再在各分区上并发建索引并挂载。
+使用这些操作的迁移需要设置 atomic = False。
+"""
+from django.db import migrations
+
+
+def _is_partitioned(schema_editor, table):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [table]
+        )
+        return cursor.fetchone() is not None
+
+
+def _partitions(schema_editor, table):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = %s AND pg_table_is_visible(p.oid)",
+            [table]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _index_columns(model, index, quote):
+    columns = []
+    for field_name in index.fields:
+        descending = field_name.startswith('-')
+        column = model._meta.get_field(field_name.lstrip('-')).column
+        columns.append(quote(column) + (' DESC' if descending else ''))
+    return ', '.join(columns)
+
+
+class AddIndexOnline(migrations.AddIndex):
+    """不锁表地添加索引"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if schema_editor.connection.vendor != 'postgresql':
+            schema_editor.add_index(model, self.index)
+            return
+
+        table = model._meta.db_table
+        quote = schema_editor.quote_name
+        if not _is_partitioned(schema_editor, table):
+            schema_editor.add_index(model, self.index, concurrently=True)
+            return
+
+        columns = _index_columns(model, self.index, quote)
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {quote(self.index.name)} ON ONLY {quote(table)} ({columns})')
+        for partition in _partitions(schema_editor, table):
+            partition_index = f"{self.index.name}_{partition.rsplit('_', 1)[-1]}"[:63]
+            schema_editor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote(partition_index)} ON {quote(partition)} ({columns})'
+            )
+            schema_editor.execute(f'ALTER INDEX {quote(self.index.name)} ATTACH PARTITION {quote(partition_index)}')
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        _remove_index(schema_editor, model, self.index)
+
+    def describe(self):
+        return f'{super().describe()} (online)'
+
+
+class RemoveIndexOnline(migrations.RemoveIndex):
+    """不锁表地删除索引"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        index = from_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+        _remove_index(schema_editor, model, index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        index = to_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+        AddIndexOnline(self.model_name, index).database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def describe(self):
+        return f'{super().describe()} (online)'
+
+
+def _remove_index(schema_editor, model, index):
+    # 分区表上的索引不能并发删除
+    concurrently = (
+        schema_editor.connection.vendor == 'postgresql'
+        and not _is_partitioned(schema_editor, model._meta.db_table)
+    )
+    if concurrently:
+        schema_editor.remove_index(model, index, concurrently=True)
+    else:
+        schema_editor.remove_index(model, index)